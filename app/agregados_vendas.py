@@ -0,0 +1,192 @@
+import threading
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.concorrencia import BasePreguicosa
+
+
+# Status cujos pedidos contam como venda nos relatórios.
+STATUS_FATURADOS = ("pago", "enviado", "entregue")
+
+
+def _centavos(valor: Optional[float]) -> int:
+    return 0 if valor is None else round(valor * 100)
+
+
+# ==============================================================================
+# CLASSE AGREGADOS VENDAS
+# ==============================================================================
+class AgregadosVendas(BasePreguicosa):
+    """
+    Totais de vendas mantidos de forma incremental: quantidade e receita por
+    status, e quantidade e receita das vendas (pedidos pagos, enviados ou
+    entregues) por método de pagamento e por dia do pagamento.
+
+    Cada criação de pedido e cada mudança de status custa O(1): o pedido sai
+    dos totais do status anterior e entra nos do novo. Pedidos pendentes não
+    têm receita; um pedido cancelado depois de pago mantém sua receita no
+    status "cancelado", mas deixa de contar como venda. Valores são somados
+    em centavos, para que inclusões e remoções não acumulem erro.
+
+    Os totais de uma base já existente (snapshot, banco) podem ser carregados
+    sob demanda com `definir_base`: como tudo é soma, as transições
+    registradas antes da carga continuam corretas, desde que a base não as
+    inclua. Uma base que muda junto com o sistema (o banco, que recebe cada
+    transição) é carregada com `antes_de_alterar=True`, antes da primeira
+    alteração.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        # status -> [quantidade, centavos]
+        self._por_status: Dict[str, List[int]] = {}
+        # (status, método) -> [quantidade, centavos] (só vendas)
+        self._por_metodo: Dict[Tuple[str, str], List[int]] = {}
+        # dia do pagamento -> [quantidade, centavos] (só vendas)
+        self._por_dia: Dict[date, List[int]] = {}
+
+    @staticmethod
+    def _somar(tabela: Dict[Any, List[int]], chave: Any, quantidade: int, centavos: int) -> None:
+        totais = tabela.get(chave)
+        if totais is None:
+            totais = tabela[chave] = [0, 0]
+        totais[0] += quantidade
+        totais[1] += centavos
+
+    def _aplicar(
+        self, status: str, metodo: str, centavos: int, dia: Optional[date], quantidade: int
+    ) -> None:
+        self._somar(self._por_status, status, quantidade, centavos)
+        if status in STATUS_FATURADOS:
+            self._somar(self._por_metodo, (status, metodo), quantidade, centavos)
+            if dia is not None:
+                self._somar(self._por_dia, dia, quantidade, centavos)
+
+    def registrar(
+        self,
+        status: str,
+        metodo: str,
+        valor_pago: Optional[float],
+        dia_pagamento: Optional[date],
+        quantidade: int = 1,
+    ) -> None:
+        """
+        Soma `quantidade` pedidos num estado; `valor_pago` é a soma dos valores pagos.
+        """
+        centavos = 0 if status == "pendente" else _centavos(valor_pago)
+        with self._lock:
+            self._aplicar(status, metodo, centavos, dia_pagamento, quantidade)
+
+    def registrar_pedido(self, pedido: Any) -> None:
+        """
+        Soma um pedido recém-criado (ou restaurado) no seu status atual.
+        """
+        self._garantir_base_para_alterar()
+        data_pagamento = pedido.datas.get("pagamento")
+        self.registrar(
+            pedido.status_pedido,
+            pedido.metodo_pagamento_escolhido,
+            pedido.valor_final_pago,
+            data_pagamento.date() if data_pagamento else None,
+        )
+
+    def registrar_pedidos(self, pedidos: Iterable[Any]) -> None:
+        """
+        `registrar_pedido` para vários pedidos, com uma única aquisição do lock.
+        """
+        self._garantir_base_para_alterar()
+        with self._lock:
+            for pedido in pedidos:
+                status = pedido.status_pedido
+                data_pagamento = pedido.datas.get("pagamento")
+                self._aplicar(
+                    status,
+                    pedido.metodo_pagamento_escolhido,
+                    0 if status == "pendente" else _centavos(pedido.valor_final_pago),
+                    data_pagamento.date() if data_pagamento else None,
+                    1,
+                )
+
+    def registrar_transicao(self, pedido: Any, status_anterior: str) -> None:
+        """
+        Move o pedido dos totais de `status_anterior` para os do status atual.
+        """
+        self.registrar_transicoes(((pedido, status_anterior),))
+
+    def registrar_transicoes(self, transicoes: Iterable[Tuple[Any, str]]) -> None:
+        """
+        `registrar_transicao` para vários (pedido, status_anterior) de uma
+        vez, com uma única aquisição do lock.
+        """
+        self._garantir_base_para_alterar()
+        with self._lock:
+            for pedido, status_anterior in transicoes:
+                metodo = pedido.metodo_pagamento_escolhido
+                data_pagamento = pedido.datas.get("pagamento")
+                dia = data_pagamento.date() if data_pagamento else None
+                valor = _centavos(pedido.valor_final_pago)
+                self._aplicar(
+                    status_anterior, metodo, 0 if status_anterior == "pendente" else -valor, dia, -1
+                )
+                self._aplicar(
+                    pedido.status_pedido, metodo, 0 if pedido.status_pedido == "pendente" else valor, dia, 1
+                )
+
+    def _ler(self, tabela: Dict[Any, List[int]]) -> Dict[Any, Dict[str, Any]]:
+        self._garantir_base()
+        with self._lock:
+            return {
+                chave: {"quantidade": quantidade, "receita": centavos / 100}
+                for chave, (quantidade, centavos) in tabela.items()
+                if quantidade
+            }
+
+    def por_status(self) -> Dict[str, Dict[str, Any]]:
+        return self._ler(self._por_status)
+
+    def por_metodo_pagamento(
+        self, status: Iterable[str] = STATUS_FATURADOS
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Vendas por método de pagamento, somadas sobre os status informados.
+        """
+        aceitos = set(status)
+        self._garantir_base()
+        with self._lock:
+            por_metodo: Dict[str, List[int]] = {}
+            for (status_venda, metodo), (quantidade, centavos) in self._por_metodo.items():
+                if status_venda in aceitos:
+                    self._somar(por_metodo, metodo, quantidade, centavos)
+        return {
+            metodo: {"quantidade": quantidade, "receita": centavos / 100}
+            for metodo, (quantidade, centavos) in por_metodo.items()
+            if quantidade
+        }
+
+    def por_dia(
+        self, inicio: Optional[date] = None, fim: Optional[date] = None
+    ) -> Dict[date, Dict[str, Any]]:
+        """
+        Vendas por dia do pagamento, opcionalmente entre `inicio` e `fim` (inclusive).
+        """
+        dias = self._ler(self._por_dia)
+        return {
+            dia: totais
+            for dia, totais in sorted(dias.items())
+            if (inicio is None or dia >= inicio) and (fim is None or dia <= fim)
+        }
+
+    def totais(self, status: Iterable[str]) -> Tuple[int, float]:
+        """
+        (quantidade, receita) somadas sobre os status informados.
+        """
+        self._garantir_base()
+        with self._lock:
+            quantidade = centavos = 0
+            for s in status:
+                totais = self._por_status.get(s)
+                if totais is not None:
+                    quantidade += totais[0]
+                    centavos += totais[1]
+        return quantidade, centavos / 100
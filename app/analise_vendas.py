@@ -0,0 +1,400 @@
+import math
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.agregados_vendas import STATUS_FATURADOS
+from app.ecommerce_sistema import Pedido, SistemaEcommerce
+
+
+# ==============================================================================
+# TABELAS COLUNARES
+# ==============================================================================
+class _Dicionario:
+    """
+    Codificação de textos (status, métodos de pagamento) em inteiros pequenos.
+    """
+
+    def __init__(self, valores: Iterable[str] = ()):
+        self.valores: List[str] = []
+        self._codigos: Dict[str, int] = {}
+        for valor in valores:
+            self.codigo(valor)
+
+    def codigo(self, valor: str) -> int:
+        codigo = self._codigos.get(valor)
+        if codigo is None:
+            codigo = self._codigos[valor] = len(self.valores)
+            self.valores.append(valor)
+        return codigo
+
+    def codigos(self, valores: Iterable[str]) -> List[int]:
+        return [self.codigo(v) for v in valores]
+
+    def procurar(self, valor: str) -> Optional[int]:
+        return self._codigos.get(valor)
+
+
+class _TabelaColunar:
+    """
+    Colunas NumPy de mesmo tamanho que crescem por inclusão em lote, com
+    capacidade dobrada quando necessário (custo amortizado constante).
+    """
+
+    def __init__(self, tipos: Dict[str, Any]):
+        self._colunas = {nome: np.empty(0, dtype=tipo) for nome, tipo in tipos.items()}
+        self.tamanho = 0
+
+    def __getitem__(self, nome: str) -> np.ndarray:
+        return self._colunas[nome][: self.tamanho]
+
+    def anexar(self, colunas: Dict[str, Any]) -> None:
+        quantidade = len(next(iter(colunas.values())))
+        necessario = self.tamanho + quantidade
+        capacidade = len(next(iter(self._colunas.values())))
+        if necessario > capacidade:
+            nova = max(necessario, 2 * capacidade, 1024)
+            for nome, coluna in self._colunas.items():
+                ampliada = np.empty(nova, dtype=coluna.dtype)
+                ampliada[: self.tamanho] = coluna[: self.tamanho]
+                self._colunas[nome] = ampliada
+        for nome, valores in colunas.items():
+            self._colunas[nome][self.tamanho : necessario] = valores
+        self.tamanho = necessario
+
+    def reordenar(self, ordem: np.ndarray) -> None:
+        for nome, coluna in self._colunas.items():
+            coluna[: self.tamanho] = coluna[: self.tamanho][ordem]
+
+
+_TIPOS_PEDIDOS = {
+    "id": np.int64,
+    "status": np.intp,
+    "metodo": np.intp,
+    "valor_total": np.float64,
+    "valor_pago": np.float64,
+    "criacao": np.float64,
+    "pagamento": np.float64,
+    "num_itens": np.int32,
+    "unidades": np.int32,
+}
+_TIPOS_ITENS = {
+    "id_pedido": np.int64,
+    "id_produto": np.int64,
+    "quantidade": np.int64,
+    "preco": np.float64,
+}
+
+
+def _timestamp(data: Any) -> float:
+    return math.nan if data is None else data.timestamp()
+
+
+# ==============================================================================
+# CLASSE ANALISE VENDAS
+# ==============================================================================
+class AnaliseVendas:
+    """
+    Análises ad hoc de vendas sobre uma cópia colunar (NumPy) dos pedidos e
+    das linhas de pedido.
+
+    Os pedidos são exportados uma única vez; depois disso, `atualizar()`
+    acrescenta só os pedidos criados desde a última chamada e corrige o
+    status, o valor pago e a data de pagamento dos pedidos alterados, que
+    são acompanhados pelos eventos de domínio do sistema. Agrupamentos e
+    percentis são calculados de forma vetorizada (`np.bincount`,
+    `np.percentile`) sobre as colunas, sem percorrer objetos Pedido.
+
+    Requer NumPy (dependência opcional, listada em requirements.txt).
+    """
+
+    def __init__(self, sistema: Optional[SistemaEcommerce] = None):
+        self.sistema = sistema
+        self._status = _Dicionario(Pedido.ESTADOS_VALIDOS)
+        self._metodos = _Dicionario()
+        self.pedidos = _TabelaColunar(_TIPOS_PEDIDOS)
+        self.itens = _TabelaColunar(_TIPOS_ITENS)
+        self._lock = threading.Lock()
+        self._novos: List[int] = []
+        self._alterados: set = set()
+        # Seleções por status, refeitas quando as tabelas mudam (_versao).
+        self._versao = 0
+        self._versao_cache = 0
+        self._cache: Dict[Any, np.ndarray] = {}
+        if sistema is not None:
+            # O ouvinte é registrado antes da exportação, para que nenhuma
+            # mudança feita durante ela se perca.
+            sistema.adicionar_ouvinte(self._ao_evento)
+            self._anexar_pedidos(list(sistema.pedidos_registrados.values()))
+
+    @classmethod
+    def de_colunas(
+        cls,
+        pedidos: Dict[str, Any],
+        status: Sequence[str],
+        metodos: Sequence[str],
+        itens: Optional[Dict[str, Any]] = None,
+    ) -> "AnaliseVendas":
+        """
+        Monta uma análise sem sistema a partir de colunas já prontas (cargas
+        sintéticas, importações). `pedidos["status"]` e `pedidos["metodo"]`
+        são códigos que indexam as listas `status` e `metodos`; os ids dos
+        pedidos devem estar em ordem crescente.
+        """
+        analise = cls()
+        analise._status = _Dicionario(status)
+        analise._metodos = _Dicionario(metodos)
+        analise.pedidos.anexar(pedidos)
+        if itens is not None:
+            analise.itens.anexar(itens)
+        analise._versao += 1
+        return analise
+
+    def _ao_evento(self, tipo: str, dados: Dict[str, Any]) -> None:
+        if tipo == "pedido_criado":
+            with self._lock:
+                self._novos.append(dados["id_pedido"])
+        elif tipo in ("pedido_pago", "pedido_cancelado", "pedido_status_alterado"):
+            with self._lock:
+                self._alterados.add(dados["id_pedido"])
+
+    def fechar(self) -> None:
+        """
+        Deixa de acompanhar o sistema.
+        """
+        if self.sistema is not None:
+            self.sistema.remover_ouvinte(self._ao_evento)
+            self.sistema = None
+
+    # ------------------------------------------------------------------ carga
+    def _linhas(self, ids: np.ndarray) -> np.ndarray:
+        """
+        Posições dos ids na tabela de pedidos (ordenada por id); -1 se ausente.
+        """
+        colunas_id = self.pedidos["id"]
+        posicoes = np.searchsorted(colunas_id, ids)
+        validas = posicoes < len(colunas_id)
+        encontrados = np.zeros(len(ids), dtype=bool)
+        encontrados[validas] = colunas_id[posicoes[validas]] == ids[validas]
+        return np.where(encontrados, posicoes, -1)
+
+    def _anexar_pedidos(self, pedidos: List[Pedido]) -> None:
+        if not pedidos:
+            return
+        pedidos.sort(key=lambda p: p.id_pedido)
+        ultimo = self.pedidos["id"][-1] if self.pedidos.tamanho else None
+        linhas = [p.linhas for p in pedidos]
+        self.pedidos.anexar(
+            {
+                "id": [p.id_pedido for p in pedidos],
+                "status": self._status.codigos(p.status_pedido for p in pedidos),
+                "metodo": self._metodos.codigos(p.metodo_pagamento_escolhido for p in pedidos),
+                "valor_total": [p.valor_total_pedido for p in pedidos],
+                "valor_pago": [
+                    math.nan if p.valor_final_pago is None else p.valor_final_pago for p in pedidos
+                ],
+                "criacao": [_timestamp(p.datas["criacao"]) for p in pedidos],
+                "pagamento": [_timestamp(p.datas["pagamento"]) for p in pedidos],
+                "num_itens": [len(l) for l in linhas],
+                "unidades": [sum(l.quantidades) for l in linhas],
+            }
+        )
+        self.itens.anexar(
+            {
+                "id_pedido": np.repeat([p.id_pedido for p in pedidos], [len(l) for l in linhas]),
+                "id_produto": np.concatenate([l.ids for l in linhas]),
+                "quantidade": np.concatenate([l.quantidades for l in linhas]),
+                "preco": np.concatenate([l.precos for l in linhas]),
+            }
+        )
+        # Ids são alocados em ordem, mas um pedido pode ser publicado depois
+        # de outro com id maior; nesse caso raro a tabela é reordenada.
+        if ultimo is not None and pedidos[0].id_pedido < ultimo:
+            self.pedidos.reordenar(np.argsort(self.pedidos["id"], kind="stable"))
+        self._versao += 1
+
+    def atualizar(self) -> Tuple[int, int]:
+        """
+        Acrescenta os pedidos novos e corrige os alterados desde a última
+        chamada. Retorna (pedidos acrescentados, pedidos corrigidos).
+        """
+        if self.sistema is None:
+            return 0, 0
+        with self._lock:
+            novos, self._novos = self._novos, []
+            alterados, self._alterados = self._alterados, set()
+
+        registrados = self.sistema.pedidos_registrados
+        pendentes = []
+        if novos:
+            ids = np.array(novos, dtype=np.int64)
+            ids = ids[self._linhas(ids) < 0]
+            acrescentar = []
+            for id_pedido in ids.tolist():
+                pedido = registrados.get(id_pedido)
+                if pedido is None:
+                    # Evento emitido, pedido ainda não publicado: fica para a próxima.
+                    pendentes.append(id_pedido)
+                else:
+                    acrescentar.append(pedido)
+            self._anexar_pedidos(acrescentar)
+            alterados.difference_update(p.id_pedido for p in acrescentar)
+        else:
+            acrescentar = []
+
+        corrigidos = 0
+        if alterados:
+            ids = np.array(sorted(alterados), dtype=np.int64)
+            posicoes = self._linhas(ids)
+            status, valor_pago, pagamento = (
+                self.pedidos["status"], self.pedidos["valor_pago"], self.pedidos["pagamento"]
+            )
+            for id_pedido, posicao in zip(ids.tolist(), posicoes.tolist()):
+                pedido = registrados.get(id_pedido)
+                if posicao < 0 or pedido is None:
+                    continue
+                status[posicao] = self._status.codigo(pedido.status_pedido)
+                valor_pago[posicao] = (
+                    math.nan if pedido.valor_final_pago is None else pedido.valor_final_pago
+                )
+                pagamento[posicao] = _timestamp(pedido.datas["pagamento"])
+                corrigidos += 1
+            self._versao += 1
+
+        if pendentes:
+            with self._lock:
+                self._novos.extend(pendentes)
+        return len(acrescentar), corrigidos
+
+    # ------------------------------------------------------------------ consultas
+    def _filtrada(self, coluna: str, status: Optional[Iterable[str]]) -> np.ndarray:
+        """
+        Coluna restrita aos pedidos nos status informados (por padrão, os
+        faturados). As seleções ficam em cache até a próxima alteração das
+        tabelas, então várias consultas seguidas filtram cada coluna uma vez.
+        """
+        if self._versao_cache != self._versao:
+            self._cache.clear()
+            self._versao_cache = self._versao
+        chave_status = tuple(status) if status else STATUS_FATURADOS
+        posicoes = self._cache.get(chave_status)
+        if posicoes is None:
+            selecionados = np.zeros(len(self._status.valores), dtype=bool)
+            for s in chave_status:
+                codigo = self._status.procurar(s)
+                if codigo is not None:
+                    selecionados[codigo] = True
+            posicoes = np.flatnonzero(selecionados[self.pedidos["status"]])
+            self._cache[chave_status] = posicoes
+        filtrada = self._cache.get((chave_status, coluna))
+        if filtrada is None:
+            # np.take com as posições é bem mais rápido que indexar pela máscara.
+            filtrada = np.take(self.pedidos[coluna], posicoes)
+            if filtrada.dtype.kind == "f":
+                ausentes = np.isnan(filtrada)
+                if ausentes.any():
+                    filtrada[ausentes] = 0.0
+            self._cache[(chave_status, coluna)] = filtrada
+        return filtrada
+
+    def agrupar(
+        self,
+        chave: str,
+        valor: str = "valor_pago",
+        status: Optional[Iterable[str]] = None,
+    ) -> Dict[str, Dict[str, float]]:
+        """
+        Quantidade, soma e média de uma coluna de pedidos (`valor_pago`,
+        `valor_total`, `unidades`, `num_itens`) agrupada por `metodo` ou
+        `status`, considerando os pedidos faturados ou os de `status`.
+        """
+        if chave not in ("metodo", "status"):
+            raise ValueError("Chave de agrupamento deve ser 'metodo' ou 'status'.")
+        if valor not in ("valor_pago", "valor_total", "unidades", "num_itens"):
+            raise ValueError(f"Coluna '{valor}' não pode ser agregada.")
+        dicionario = self._metodos if chave == "metodo" else self._status
+        codigos = self._filtrada(chave, status)
+        quantidades = np.bincount(codigos, minlength=len(dicionario.valores))
+        somas = np.bincount(codigos, weights=self._filtrada(valor, status), minlength=len(dicionario.valores))
+        return {
+            dicionario.valores[codigo]: {
+                "quantidade": int(quantidades[codigo]),
+                "soma": float(somas[codigo]),
+                "media": float(somas[codigo] / quantidades[codigo]),
+            }
+            for codigo in np.flatnonzero(quantidades).tolist()
+        }
+
+    def ticket_medio_por_metodo(self) -> Dict[str, float]:
+        return {metodo: t["media"] for metodo, t in self.agrupar("metodo").items()}
+
+    def percentis(
+        self,
+        coluna: str,
+        percentis: Sequence[float] = (50, 90, 99),
+        status: Optional[Iterable[str]] = None,
+    ) -> Dict[float, float]:
+        """
+        Percentis (interpolação linear, como `np.percentile`) de uma coluna
+        de pedidos entre os pedidos faturados (ou os de `status`). Colunas
+        inteiras e não negativas usam a contagem por valor em vez de ordenar.
+        """
+        valores = self._filtrada(coluna, status)
+        if not len(valores):
+            return {}
+        if valores.dtype.kind == "f" or valores.min() < 0:
+            return dict(zip(percentis, np.percentile(valores, percentis).tolist()))
+        acumulado = np.cumsum(np.bincount(valores))
+        posicoes = np.asarray(percentis, dtype=np.float64) / 100 * (len(valores) - 1)
+        abaixo = np.floor(posicoes)
+        inferior = np.searchsorted(acumulado, abaixo, side="right")
+        superior = np.searchsorted(acumulado, np.minimum(abaixo + 1, len(valores) - 1), side="right")
+        resultado = inferior + (posicoes - abaixo) * (superior - inferior)
+        return dict(zip(percentis, resultado.tolist()))
+
+    def distribuicao_tamanho_cesta(self) -> Dict[int, int]:
+        """
+        Quantos pedidos faturados têm 1, 2, 3, ... unidades.
+        """
+        contagem = np.bincount(self._filtrada("unidades", None))
+        return {int(u): int(contagem[u]) for u in np.flatnonzero(contagem)}
+
+    def _diferenca_por_metodo(self, metodo: str, sinal: float) -> float:
+        codigo = self._metodos.procurar(metodo)
+        if codigo is None:
+            return 0.0
+        metodos = self._filtrada("metodo", None)
+        somas = self._cache.get(("diferenca", sinal))
+        if somas is None:
+            diferenca = sinal * (self._filtrada("valor_total", None) - self._filtrada("valor_pago", None))
+            np.maximum(diferenca, 0.0, out=diferenca)
+            somas = np.bincount(metodos, weights=diferenca, minlength=len(self._metodos.valores))
+            self._cache[("diferenca", sinal)] = somas
+        return round(float(somas[codigo]), 2)
+
+    def custo_desconto_pix(self) -> float:
+        """
+        Quanto deixou de ser recebido pelos descontos do PIX nas vendas.
+        """
+        return self._diferenca_por_metodo("pix", 1.0)
+
+    def receita_juros_parcelamento(self) -> float:
+        """
+        Receita de juros das vendas parceladas no cartão.
+        """
+        return self._diferenca_por_metodo("cartao_credito", -1.0)
+
+    def unidades_por_produto(self, status: Optional[Iterable[str]] = None) -> Dict[int, int]:
+        """
+        Unidades vendidas por produto nos pedidos faturados (ou nos de `status`).
+        """
+        ids_validos = self._filtrada("id", status)
+        if not len(ids_validos):
+            return {}
+        itens_id = self.itens["id_pedido"]
+        posicoes = np.minimum(np.searchsorted(ids_validos, itens_id), len(ids_validos) - 1)
+        selecionados = ids_validos[posicoes] == itens_id
+        produtos, inverso = np.unique(self.itens["id_produto"][selecionados], return_inverse=True)
+        unidades = np.bincount(inverso, weights=self.itens["quantidade"][selecionados])
+        return dict(zip(produtos.tolist(), unidades.astype(np.int64).tolist()))
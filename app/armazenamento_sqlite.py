@@ -0,0 +1,686 @@
+import json
+import queue
+import sqlite3
+import threading
+import weakref
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from datetime import date, datetime
+from itertools import groupby
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.ecommerce_sistema import SistemaEcommerce, Produto, Pedido, LinhasPedido
+from app.estoque_armazens import EstoqueArmazens, alocacao_de_dados, alocacao_para_dados
+from app.cache_produtos import CacheProdutos
+from app.agregados_vendas import AgregadosVendas
+from app.rollups_vendas import RollupsVendas
+from app.indices_pedidos import IndicesPedidos
+from app.razao_transacoes import LivroRazaoTransacoes
+
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS produtos (
+    id INTEGER PRIMARY KEY,
+    nome TEXT NOT NULL,
+    descricao TEXT NOT NULL,
+    preco REAL NOT NULL,
+    estoque INTEGER NOT NULL,
+    categoria TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS usuarios (
+    id TEXT PRIMARY KEY,
+    dados TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pedidos (
+    id INTEGER PRIMARY KEY,
+    cliente_id TEXT NOT NULL,
+    endereco TEXT NOT NULL,
+    metodo TEXT NOT NULL,
+    status TEXT NOT NULL,
+    valor_total REAL NOT NULL,
+    valor_pago REAL,
+    id_transacao TEXT,
+    data_criacao REAL,
+    data_pagamento REAL,
+    data_envio REAL,
+    data_entrega REAL,
+    data_cancelamento REAL,
+    datas TEXT,
+    alocacao TEXT
+);
+CREATE TABLE IF NOT EXISTS itens_pedido (
+    id_pedido INTEGER NOT NULL,
+    posicao INTEGER NOT NULL,
+    id_produto INTEGER NOT NULL,
+    quantidade INTEGER NOT NULL,
+    preco_unitario REAL,
+    nome TEXT,
+    PRIMARY KEY (id_pedido, posicao)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS estoque_armazens (
+    id_produto INTEGER NOT NULL,
+    id_armazem TEXT NOT NULL,
+    quantidade INTEGER NOT NULL,
+    PRIMARY KEY (id_produto, id_armazem)
+) WITHOUT ROWID;
+"""
+
+# Comandos fixos: o sqlite3 mantém um cache de comandos preparados por
+# conexão, então cada texto abaixo é compilado uma única vez.
+_INSERIR_PRODUTO = "INSERT INTO produtos (id, nome, descricao, preco, estoque, categoria) VALUES (?, ?, ?, ?, ?, ?)"
+_ALTERAR_ESTOQUE = "UPDATE produtos SET estoque = estoque + ? WHERE id = ?"
+_ALTERAR_PRECO = "UPDATE produtos SET preco = ? WHERE id = ?"
+_INSERIR_USUARIO = "INSERT INTO usuarios (id, dados) VALUES (?, ?)"
+_INSERIR_PEDIDO = (
+    "INSERT INTO pedidos (id, cliente_id, endereco, metodo, status, valor_total, data_criacao, alocacao) "
+    "VALUES (?, ?, ?, ?, 'pendente', ?, ?, ?)"
+)
+_INSERIR_ITEM = (
+    "INSERT INTO itens_pedido (id_pedido, posicao, id_produto, quantidade, preco_unitario, nome) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+_REGISTRAR_PAGAMENTO = (
+    "UPDATE pedidos SET status = ?, id_transacao = ?, valor_pago = ?, data_pagamento = ?, alocacao = ? "
+    "WHERE id = ?"
+)
+_ALTERAR_ESTOQUE_ARMAZEM = (
+    "INSERT INTO estoque_armazens (id_produto, id_armazem, quantidade) VALUES (?, ?, ?) "
+    "ON CONFLICT (id_produto, id_armazem) DO UPDATE SET quantidade = quantidade + excluded.quantidade"
+)
+# Datas dos estados padrão têm colunas próprias (usadas pelas consultas de
+# vendas e capturas); as de estados acrescentados à máquina de estados ficam
+# no mapa JSON `datas`, por campo. O timestamp entra como texto JSON: um REAL
+# seria escrito pelo SQLite com 15 dígitos e perderia os microssegundos.
+_CAMPOS_DATAS = ("criacao", "pagamento", "envio", "entrega", "cancelamento")
+_ALTERAR_STATUS = {
+    campo: f"UPDATE pedidos SET status = ?, data_{campo} = ? WHERE id = ?" for campo in _CAMPOS_DATAS
+}
+_ALTERAR_STATUS_DATA_EXTRA = (
+    "UPDATE pedidos SET status = ?, datas = json_set(COALESCE(datas, '{}'), ?, json(?)) WHERE id = ?"
+)
+_ALTERAR_SO_STATUS = "UPDATE pedidos SET status = ? WHERE id = ?"
+
+_LER_PRODUTO = "SELECT id, nome, descricao, preco, estoque, categoria FROM produtos WHERE id = ?"
+_LER_PEDIDO = (
+    "SELECT id, cliente_id, endereco, metodo, status, valor_total, valor_pago, id_transacao, "
+    "alocacao, datas, data_criacao, data_pagamento, data_envio, data_entrega, data_cancelamento "
+    "FROM pedidos WHERE id = ?"
+)
+_LER_ITENS = (
+    "SELECT id_produto, quantidade, preco_unitario, nome FROM itens_pedido "
+    "WHERE id_pedido = ? ORDER BY posicao"
+)
+_AGREGAR_VENDAS = (
+    "SELECT status, metodo, date(data_pagamento, 'unixepoch', 'localtime'), COUNT(*), "
+    "COALESCE(SUM(CAST(ROUND(valor_pago * 100) AS INTEGER)), 0) "
+    "FROM pedidos GROUP BY 1, 2, 3"
+)
+_LER_VENDAS = (
+    "SELECT p.id, p.data_pagamento, p.valor_pago, i.id_produto, i.quantidade, i.preco_unitario, "
+    "pr.categoria "
+    "FROM pedidos p JOIN itens_pedido i ON i.id_pedido = p.id "
+    "LEFT JOIN produtos pr ON pr.id = i.id_produto "
+    "WHERE p.status IN ('pago', 'enviado', 'entregue') AND p.data_pagamento IS NOT NULL "
+    "ORDER BY p.id, i.posicao"
+)
+_LER_ESTOQUE_ARMAZENS = "SELECT id_produto, id_armazem, quantidade FROM estoque_armazens"
+_INDEXAR_PEDIDOS = "SELECT id, cliente_id, status, data_criacao FROM pedidos ORDER BY id"
+_LER_CAPTURAS = (
+    "SELECT id_transacao, valor_pago, metodo, id, data_pagamento FROM pedidos "
+    "WHERE id_transacao IS NOT NULL AND valor_pago IS NOT NULL ORDER BY id"
+)
+
+Operacao = Tuple[str, Tuple[Any, ...]]
+
+
+def _alocacao_em_texto(dados: Optional[List[Any]]) -> Optional[str]:
+    return None if dados is None else json.dumps(dados, ensure_ascii=False)
+
+
+def _operacoes_do_evento(tipo: str, dados: Dict[str, Any]) -> List[Operacao]:
+    """
+    Traduz um evento de domínio do SistemaEcommerce em comandos SQL.
+    """
+    if tipo == "estoque_alterado":
+        return [(_ALTERAR_ESTOQUE, (dados["variacao"], dados["id_produto"]))]
+    if tipo == "estoque_armazem_alterado":
+        return [(_ALTERAR_ESTOQUE_ARMAZEM, (dados["id_produto"], dados["id_armazem"], dados["variacao"]))]
+    if tipo == "preco_alterado":
+        return [(_ALTERAR_PRECO, (dados["preco"], dados["id_produto"]))]
+    if tipo == "pedido_pago":
+        return [
+            (
+                _REGISTRAR_PAGAMENTO,
+                (
+                    dados["status"],
+                    dados["id_transacao"],
+                    dados["valor_pago"],
+                    dados["data"],
+                    _alocacao_em_texto(dados["alocacao"]),
+                    dados["id_pedido"],
+                ),
+            )
+        ]
+    if tipo in ("pedido_cancelado", "pedido_status_alterado"):
+        campo = "cancelamento" if tipo == "pedido_cancelado" else dados["campo_data"]
+        if campo is None:
+            return [(_ALTERAR_SO_STATUS, (dados["status"], dados["id_pedido"]))]
+        sql = _ALTERAR_STATUS.get(campo)
+        if sql is None:
+            return [
+                (
+                    _ALTERAR_STATUS_DATA_EXTRA,
+                    (dados["status"], f'$."{campo}"', json.dumps(dados["data"]), dados["id_pedido"]),
+                )
+            ]
+        return [(sql, (dados["status"], dados["data"], dados["id_pedido"]))]
+    if tipo == "pedido_criado":
+        operacoes: List[Operacao] = [
+            (
+                _INSERIR_PEDIDO,
+                (
+                    dados["id_pedido"],
+                    dados["cliente_id"],
+                    json.dumps(dados["endereco_entrega"], ensure_ascii=False),
+                    dados["metodo_pagamento"],
+                    dados["valor_total"],
+                    dados["data"],
+                    _alocacao_em_texto(dados["alocacao"]),
+                ),
+            )
+        ]
+        for posicao, (id_produto, quantidade, preco, nome) in enumerate(dados["itens"]):
+            operacoes.append(
+                (_INSERIR_ITEM, (dados["id_pedido"], posicao, id_produto, quantidade, preco, nome))
+            )
+        return operacoes
+    if tipo == "produto_adicionado":
+        return [
+            (
+                _INSERIR_PRODUTO,
+                (
+                    dados["id_produto"],
+                    dados["nome"],
+                    dados["descricao"],
+                    dados["preco"],
+                    dados["quantidade_em_estoque"],
+                    dados["categoria"],
+                ),
+            )
+        ]
+    if tipo == "usuario_registrado":
+        return [(_INSERIR_USUARIO, (dados["user_id"], json.dumps(dados["dados"], ensure_ascii=False)))]
+    return []
+
+
+# ==============================================================================
+# CLASSE ARMAZENAMENTO SQLITE
+# ==============================================================================
+class ArmazenamentoSQLite:
+    """
+    Armazenamento do SistemaEcommerce num arquivo SQLite em modo WAL.
+
+    As escritas usam uma única conexão (protegida por lock) e chegam como
+    eventos de domínio do sistema. Eventos emitidos dentro de `transacao()`
+    são acumulados por thread e gravados numa única transação ao final, com
+    comandos iguais consecutivos agrupados em `executemany` — é assim que o
+    pagamento de um pedido grava status e baixas de estoque juntos. As
+    leituras usam um pool de até `tamanho_pool_leitura` conexões, que no
+    modo WAL não bloqueiam nem são bloqueadas pela escrita.
+    """
+
+    def __init__(self, caminho: str, tamanho_pool_leitura: int = 4, tamanho_lote: int = 1000):
+        if not isinstance(tamanho_pool_leitura, int) or tamanho_pool_leitura <= 0:
+            raise ValueError("Tamanho do pool de leitura deve ser um inteiro positivo.")
+        self.caminho = caminho
+        self.tamanho_lote = tamanho_lote
+        self._escrita = self._conectar()
+        self._escrita.execute("PRAGMA journal_mode=WAL")
+        self._escrita.executescript(_ESQUEMA)
+        self._trava_escrita = threading.Lock()
+        self._local = threading.local()
+
+        self.tamanho_pool_leitura = tamanho_pool_leitura
+        self._leitores: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._leitores_criados = 0
+        self._trava_pool = threading.Lock()
+        self.transacoes_gravadas = 0
+        # Chamado com o id de cada produto alterado direto no banco, para
+        # que o cache de leitura descarte a cópia em memória.
+        self.ao_invalidar_produto: Optional[Callable[[int], None]] = None
+
+    def _conectar(self) -> sqlite3.Connection:
+        conexao = sqlite3.connect(
+            self.caminho, isolation_level=None, check_same_thread=False, cached_statements=64
+        )
+        conexao.execute("PRAGMA synchronous=NORMAL")
+        return conexao
+
+    # ------------------------------------------------------------------ escrita
+    def _executar(self, operacoes: List[Operacao]) -> None:
+        if not operacoes:
+            return
+        with self._trava_escrita:
+            self._escrita.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, grupo in groupby(operacoes, key=lambda operacao: operacao[0]):
+                    parametros = [p for _, p in grupo]
+                    if len(parametros) == 1:
+                        self._escrita.execute(sql, parametros[0])
+                    else:
+                        self._escrita.executemany(sql, parametros)
+                self._escrita.execute("COMMIT")
+            except BaseException:
+                self._escrita.execute("ROLLBACK")
+                raise
+            self.transacoes_gravadas += 1
+
+    def registrar_evento(self, tipo: str, dados: Dict[str, Any]) -> None:
+        """
+        Ouvinte de eventos do SistemaEcommerce.
+        """
+        operacoes = _operacoes_do_evento(tipo, dados)
+        pendentes = getattr(self._local, "pendentes", None)
+        if pendentes is not None:
+            pendentes.extend(operacoes)
+        else:
+            self._executar(operacoes)
+
+    @contextmanager
+    def transacao(self) -> Iterator[None]:
+        """
+        Agrupa os eventos emitidos pela thread atual numa única transação.
+        Transações aninhadas são incorporadas à mais externa. A transação é
+        gravada mesmo se uma exceção escapar do bloco, pois o estado em
+        memória já refletirá as mudanças; o que ela garante é que uma queda
+        do processo não deixe só parte das mudanças no arquivo.
+        """
+        if getattr(self._local, "pendentes", None) is not None:
+            yield
+            return
+        self._local.pendentes = []
+        try:
+            yield
+        finally:
+            pendentes, self._local.pendentes = self._local.pendentes, None
+            self._executar(pendentes)
+
+    def importar_produtos(
+        self, sistema: SistemaEcommerce, produtos: Iterable[Tuple[str, str, float, int, str]]
+    ) -> int:
+        """
+        Carga em massa do catálogo: grava (nome, descricao, preco, estoque,
+        categoria) direto no banco, em lotes de `tamanho_lote` com
+        `executemany`, sem criar objetos Produto nem emitir eventos. Os ids
+        são alocados em bloco no contador do sistema. Retorna quantos
+        produtos foram importados.
+        """
+        total = 0
+        lote: List[Tuple[str, str, float, int, str]] = []
+
+        def gravar() -> None:
+            primeiro = sistema._contador_produtos.alocar(len(lote))
+            self._executar(
+                [(_INSERIR_PRODUTO, (primeiro + i, *campos)) for i, campos in enumerate(lote)]
+            )
+            # Descarta eventuais entradas negativas dos ids recém-criados.
+            self._invalidar(range(primeiro, primeiro + len(lote)))
+
+        for campos in produtos:
+            nome, _, preco, estoque, _ = campos
+            if not nome or preco <= 0 or not isinstance(estoque, int) or estoque < 0:
+                raise ValueError(f"Produto inválido na importação: {campos!r}")
+            lote.append(campos)
+            if len(lote) >= self.tamanho_lote:
+                gravar()
+                total += len(lote)
+                lote = []
+        if lote:
+            gravar()
+            total += len(lote)
+        return total
+
+    def atualizar_precos(self, precos: Dict[int, float]) -> None:
+        """
+        Atualiza preços direto no banco (ex.: carga de tabela de preços), em
+        lote, e invalida os produtos afetados no cache de leitura.
+        """
+        for id_produto, preco in precos.items():
+            if preco <= 0:
+                raise ValueError(f"Preço inválido para o produto {id_produto}: {preco}")
+        self._executar([(_ALTERAR_PRECO, (preco, id_produto)) for id_produto, preco in precos.items()])
+        self._invalidar(precos)
+
+    def ajustar_estoques(self, variacoes: Dict[int, int]) -> None:
+        """
+        Soma variações de estoque direto no banco (ex.: recebimento de
+        mercadoria), em lote, e invalida os produtos afetados no cache.
+        """
+        self._executar(
+            [(_ALTERAR_ESTOQUE, (variacao, id_produto)) for id_produto, variacao in variacoes.items()]
+        )
+        self._invalidar(variacoes)
+
+    def _invalidar(self, ids_produtos: Iterable[int]) -> None:
+        if self.ao_invalidar_produto is not None:
+            for id_produto in ids_produtos:
+                self.ao_invalidar_produto(id_produto)
+
+    # ------------------------------------------------------------------ leitura
+    @contextmanager
+    def _leitor(self) -> Iterator[sqlite3.Connection]:
+        try:
+            conexao = self._leitores.get_nowait()
+        except queue.Empty:
+            with self._trava_pool:
+                criar = self._leitores_criados < self.tamanho_pool_leitura
+                if criar:
+                    self._leitores_criados += 1
+            conexao = self._conectar() if criar else self._leitores.get()
+        try:
+            yield conexao
+        finally:
+            self._leitores.put(conexao)
+
+    def ler_produto(self, id_produto: int) -> Optional[Produto]:
+        with self._leitor() as conexao:
+            linha = conexao.execute(_LER_PRODUTO, (id_produto,)).fetchone()
+        return Produto(*linha) if linha else None
+
+    def ler_pedido(self, id_pedido: int) -> Optional[Pedido]:
+        with self._leitor() as conexao:
+            linha = conexao.execute(_LER_PEDIDO, (id_pedido,)).fetchone()
+            if linha is None:
+                return None
+            itens = conexao.execute(_LER_ITENS, (id_pedido,)).fetchall()
+        (
+            _, cliente_id, endereco, metodo, status, valor_total, valor_pago, id_transacao, alocacao,
+            datas_extras, *datas,
+        ) = linha
+        pedido = Pedido.restaurar(
+            id_pedido,
+            cliente_id,
+            LinhasPedido.de_tuplas(itens),
+            valor_total,
+            json.loads(endereco),
+            metodo,
+            None,
+        )
+        pedido.status_pedido = status
+        pedido.datas = {
+            chave: datetime.fromtimestamp(ts) if ts is not None else None
+            for chave, ts in zip(_CAMPOS_DATAS, datas)
+        }
+        if datas_extras is not None:
+            for chave, ts in json.loads(datas_extras).items():
+                pedido.datas[chave] = datetime.fromtimestamp(ts)
+        pedido.id_transacao_pagamento = id_transacao
+        pedido.valor_final_pago = valor_pago
+        if alocacao is not None:
+            pedido.alocacao = alocacao_de_dados(json.loads(alocacao))
+        return pedido
+
+    def existe(self, tabela: str, chave: int) -> bool:
+        with self._leitor() as conexao:
+            return conexao.execute(f"SELECT 1 FROM {tabela} WHERE id = ?", (chave,)).fetchone() is not None
+
+    def ids(self, tabela: str) -> Iterator[int]:
+        with self._leitor() as conexao:
+            linhas = conexao.execute(f"SELECT id FROM {tabela} ORDER BY id").fetchall()
+        return (linha[0] for linha in linhas)
+
+    def contar(self, tabela: str) -> int:
+        with self._leitor() as conexao:
+            return conexao.execute(f"SELECT COUNT(*) FROM {tabela}").fetchone()[0]
+
+    def maior_id(self, tabela: str) -> int:
+        with self._leitor() as conexao:
+            return conexao.execute(f"SELECT COALESCE(MAX(id), 0) FROM {tabela}").fetchone()[0]
+
+    def agregar_vendas(self, agregados: AgregadosVendas) -> None:
+        """
+        Soma os pedidos gravados nos agregados de vendas, agrupados no banco.
+        """
+        with self._leitor() as conexao:
+            grupos = conexao.execute(_AGREGAR_VENDAS).fetchall()
+        for status, metodo, dia, quantidade, centavos in grupos:
+            agregados.registrar(
+                status, metodo, centavos / 100, date.fromisoformat(dia) if dia else None, quantidade
+            )
+
+    def agregar_rollups(self, rollups: RollupsVendas) -> None:
+        """
+        Soma as vendas gravadas (pedidos pagos, enviados ou entregues) nos
+        baldes de tempo, lendo pedidos e itens numa única consulta.
+        """
+        with self._leitor() as conexao:
+            linhas = conexao.execute(_LER_VENDAS)
+            for _, grupo in groupby(linhas, key=lambda linha: linha[0]):
+                grupo = list(grupo)
+                _, data_pagamento, valor_pago = grupo[0][:3]
+                for linha in grupo:
+                    rollups.definir_categoria(linha[3], linha[6])
+                rollups.registrar_venda(
+                    datetime.fromtimestamp(data_pagamento),
+                    valor_pago,
+                    [linha[3:6] for linha in grupo],
+                )
+
+    def indexar_pedidos(self, indices: IndicesPedidos) -> None:
+        """
+        Inclui os pedidos gravados nos índices secundários, em ordem de id.
+        """
+        with self._leitor() as conexao:
+            for id_pedido, cliente_id, status, data_criacao in conexao.execute(_INDEXAR_PEDIDOS):
+                indices.registrar(id_pedido, cliente_id, status, data_criacao)
+
+    def restaurar_capturas(self, livro: LivroRazaoTransacoes) -> None:
+        """
+        Inclui no livro razão a captura de cada pedido pago gravado.
+        """
+        with self._leitor() as conexao:
+            for id_transacao, valor_pago, metodo, id_pedido, data_pagamento in conexao.execute(_LER_CAPTURAS):
+                livro.restaurar_captura(
+                    id_transacao,
+                    valor_pago,
+                    metodo,
+                    id_pedido,
+                    int(data_pagamento * 1000) if data_pagamento is not None else None,
+                )
+
+    def carregar_estoque_armazens(self, estoque: EstoqueArmazens) -> None:
+        """
+        Soma ao estoque por armazém as quantidades gravadas.
+        """
+        with self._leitor() as conexao:
+            for id_produto, id_armazem, quantidade in conexao.execute(_LER_ESTOQUE_ARMAZENS):
+                estoque.ajustar(id_produto, id_armazem, quantidade)
+
+    def ler_usuarios(self) -> Dict[str, Dict]:
+        with self._leitor() as conexao:
+            return {
+                id_usuario: json.loads(dados)
+                for id_usuario, dados in conexao.execute("SELECT id, dados FROM usuarios")
+            }
+
+    def fechar(self) -> None:
+        with self._trava_escrita:
+            self._escrita.close()
+        while True:
+            try:
+                self._leitores.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+# ==============================================================================
+# CLASSE CACHE LEITURA
+# ==============================================================================
+class CacheLeitura(MutableMapping):
+    """
+    Dicionário id -> objeto que lê do armazenamento o que ainda não está em
+    memória (read-through). Inclusões só atualizam o cache: a gravação no
+    armazenamento acontece pelos eventos de domínio.
+
+    Sem `cache`, todo objeto lido fica em memória. Com um `CacheProdutos`,
+    só as entradas que cabem no limite ficam presas ao cache; as descartadas
+    continuam sendo devolvidas enquanto houver outra referência a elas (um
+    carrinho, um pedido, uma operação em andamento), de modo que nunca há
+    duas instâncias vivas do mesmo id.
+    """
+
+    def __init__(
+        self,
+        carregar: Callable[[int], Optional[Any]],
+        existe: Callable[[int], bool],
+        ids: Callable[[], Iterator[int]],
+        contar: Callable[[], int],
+        cache: Optional[CacheProdutos] = None,
+    ):
+        self._carregar = carregar
+        self._existe = existe
+        self._ids = ids
+        self._contar = contar
+        self.cache = cache
+        self._objetos: Dict[int, Any] = {}
+        self._vivos: "weakref.WeakValueDictionary[int, Any]" = weakref.WeakValueDictionary()
+        self._trava = threading.Lock()
+
+    def __getitem__(self, chave: int) -> Any:
+        if self.cache is None:
+            try:
+                return self._objetos[chave]
+            except KeyError:
+                pass
+        else:
+            encontrado, objeto = self.cache.obter(chave)
+            if encontrado:
+                if objeto is None:
+                    raise KeyError(chave)
+                return objeto
+            objeto = self._vivos.get(chave)
+            if objeto is not None:
+                self.cache.guardar(chave, objeto)
+                return objeto
+
+        objeto = self._carregar(chave)
+        if objeto is None:
+            if self.cache is not None:
+                self.cache.guardar_ausente(chave)
+            raise KeyError(chave)
+        with self._trava:
+            # Se outra thread carregou o mesmo registro, fica a dela.
+            if self.cache is None:
+                return self._objetos.setdefault(chave, objeto)
+            objeto = self._vivos.setdefault(chave, objeto)
+        self.cache.guardar(chave, objeto)
+        return objeto
+
+    def get(self, chave: int, padrao: Any = None) -> Any:
+        try:
+            return self[chave]
+        except KeyError:
+            return padrao
+
+    def ler_sem_reter(self, chave: int) -> Optional[Any]:
+        """
+        O objeto em memória do id ou, se não houver, uma cópia lida do
+        armazenamento que não entra no cache. Para varreduras só de leitura
+        (exportações), que não devem encher a memória.
+        """
+        objeto = self._objetos.get(chave) if self.cache is None else self._vivos.get(chave)
+        return objeto if objeto is not None else self._carregar(chave)
+
+    def __contains__(self, chave: object) -> bool:
+        if self.cache is None:
+            return chave in self._objetos or self._existe(chave)
+        return self.get(chave) is not None
+
+    def __setitem__(self, chave: int, objeto: Any) -> None:
+        if self.cache is None:
+            self._objetos[chave] = objeto
+        else:
+            self._vivos[chave] = objeto
+            self.cache.guardar(chave, objeto)
+
+    def __delitem__(self, chave: int) -> None:
+        raise TypeError("Remoção de registros não é suportada pelo armazenamento.")
+
+    def __iter__(self) -> Iterator[int]:
+        return self._ids()
+
+    def __len__(self) -> int:
+        return self._contar()
+
+    def invalidar(self, chave: int) -> None:
+        """
+        Descarta o objeto em memória do id, que será relido do armazenamento
+        no próximo acesso. Usado quando o registro é alterado no banco sem
+        passar pelo objeto.
+        """
+        if self.cache is None:
+            self._objetos.pop(chave, None)
+        else:
+            self.cache.invalidar(chave)
+            self._vivos.pop(chave, None)
+
+    @property
+    def num_em_cache(self) -> int:
+        return len(self._objetos) if self.cache is None else len(self.cache)
+
+
+def abrir_sistema_sqlite(
+    caminho: str, cache_produtos: Optional[CacheProdutos] = None, **opcoes: Any
+) -> SistemaEcommerce:
+    """
+    Abre (ou cria) um SistemaEcommerce apoiado no arquivo SQLite `caminho`.
+    Catálogo e pedidos passam a ser caches de leitura sobre o banco, e cada
+    mudança de estado é gravada nele. `cache_produtos` limita quantos
+    produtos ficam em memória.
+    """
+    armazenamento = ArmazenamentoSQLite(caminho, **opcoes)
+    sistema = SistemaEcommerce()
+
+    def carregar_produto(id_produto: int) -> Optional[Produto]:
+        produto = armazenamento.ler_produto(id_produto)
+        if produto is not None:
+            sistema._vincular_produto(produto)
+        return produto
+
+    def carregar_pedido(id_pedido: int) -> Optional[Pedido]:
+        pedido = armazenamento.ler_pedido(id_pedido)
+        if pedido is not None:
+            sistema._vincular_pedido(pedido)
+        return pedido
+
+    sistema.produtos_catalogo = CacheLeitura(
+        carregar_produto,
+        lambda chave: armazenamento.existe("produtos", chave),
+        lambda: armazenamento.ids("produtos"),
+        lambda: armazenamento.contar("produtos"),
+        cache=cache_produtos,
+    )
+    armazenamento.ao_invalidar_produto = sistema.produtos_catalogo.invalidar
+    sistema.pedidos_registrados = CacheLeitura(
+        carregar_pedido,
+        lambda chave: armazenamento.existe("pedidos", chave),
+        lambda: armazenamento.ids("pedidos"),
+        lambda: armazenamento.contar("pedidos"),
+    )
+    sistema.usuarios.update(armazenamento.ler_usuarios())
+    armazenamento.carregar_estoque_armazens(sistema.estoque_armazens)
+    # Totais, baldes e índices são montados do banco sob demanda. O banco
+    # recebe cada transição, então a carga acontece antes da primeira
+    # consulta ou alteração: uma transição somada antes dela seria contada
+    # de novo ao ler o banco.
+    sistema.agregados_vendas.definir_base(armazenamento.agregar_vendas, antes_de_alterar=True)
+    sistema.rollups_vendas.definir_base(armazenamento.agregar_rollups, antes_de_alterar=True)
+    sistema.indices_pedidos.definir_base(armazenamento.indexar_pedidos)
+    # As capturas dos pedidos pagos só entram no livro razão na primeira
+    # consulta a ele (ex.: um reembolso).
+    sistema.sistema_pagamento.livro_razao.definir_base(armazenamento.restaurar_capturas)
+    sistema._proximo_id_produto = armazenamento.maior_id("produtos") + 1
+    sistema._proximo_id_pedido = armazenamento.maior_id("pedidos") + 1
+    sistema.armazenamento = armazenamento
+    sistema.adicionar_ouvinte(armazenamento.registrar_evento)
+    return sistema
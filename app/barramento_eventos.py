@@ -0,0 +1,393 @@
+import collections
+import os
+import threading
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from app.persistencia import RegistroEscritaAntecipada
+
+
+# ==============================================================================
+# EVENTOS
+# ==============================================================================
+class PedidoCriado(NamedTuple):
+    id_pedido: int
+    cliente_id: str
+    valor_total: float
+    metodo_pagamento: str
+    itens: List[List[Any]]
+    data: float
+
+
+class PagamentoAprovado(NamedTuple):
+    id_pedido: int
+    id_transacao: Optional[str]
+    valor_pago: Optional[float]
+    data: float
+
+
+class PedidoCancelado(NamedTuple):
+    id_pedido: int
+    status_anterior: str
+    data: float
+
+
+class EstoqueAlterado(NamedTuple):
+    id_produto: int
+    variacao: int
+
+
+TIPOS_EVENTOS = {
+    classe.__name__: classe for classe in (PedidoCriado, PagamentoAprovado, PedidoCancelado, EstoqueAlterado)
+}
+
+
+class Envelope(NamedTuple):
+    """
+    Evento entregue a um consumidor. `id_evento` é crescente e único na
+    caixa de saída: como a entrega é pelo menos uma vez, consumidores que
+    não toleram repetições devem ignorar ids já processados.
+    """
+
+    id_evento: int
+    evento: Any
+
+
+def _evento_de_dominio(tipo: str, dados: Dict[str, Any]) -> Optional[Any]:
+    """
+    Converte um evento de domínio do SistemaEcommerce no evento tipado
+    correspondente (ou None, se o barramento não o publica).
+    """
+    if tipo == "pedido_criado":
+        return PedidoCriado(
+            dados["id_pedido"],
+            dados["cliente_id"],
+            dados["valor_total"],
+            dados["metodo_pagamento"],
+            dados["itens"],
+            dados["data"],
+        )
+    if tipo == "pedido_pago":
+        return PagamentoAprovado(dados["id_pedido"], dados["id_transacao"], dados["valor_pago"], dados["data"])
+    if tipo == "pedido_cancelado":
+        return PedidoCancelado(dados["id_pedido"], dados["status_anterior"], dados["data"])
+    if tipo == "estoque_alterado":
+        return EstoqueAlterado(dados["id_produto"], dados["variacao"])
+    return None
+
+
+# ==============================================================================
+# CLASSE BARRAMENTO EVENTOS
+# ==============================================================================
+class BarramentoEventos:
+    """
+    Barramento de eventos com caixa de saída (outbox) persistente.
+
+    `publicar` grava o evento na caixa de saída (um log de escrita antecipada
+    em `diretorio`, com gravações agrupadas) e o põe numa fila em memória
+    limitada a `capacidade` eventos; não espera nenhum consumidor. Com a
+    `politica_fsync` padrão, "sempre", `publicar` só retorna depois do fsync
+    do grupo que contém o evento (feito fora do lock do barramento, e
+    compartilhado entre publicações concorrentes); com "lote" ou "nunca", um
+    evento recém-publicado pode se perder numa queda. Nenhum evento é
+    entregue antes de estar gravado. Uma
+    thread de fundo tira os eventos da fila em lotes de até `tamanho_lote` e
+    os entrega a cada consumidor registrado com `assinar`. Depois que todos
+    os consumidores aceitam um lote, o id do último evento é gravado como
+    confirmado; eventos não confirmados são entregues de novo na próxima
+    abertura do mesmo diretório (entrega pelo menos uma vez). Um consumidor
+    que levanta exceção recebe o lote de novo, com espera crescente, sem
+    repetir a entrega para os que já o aceitaram. A entrega só começa depois
+    do primeiro `assinar`.
+
+    Com a fila cheia, `politica` decide:
+        "bloquear": `publicar` espera haver espaço (até `espera_maxima`
+            segundos, se informado, e então levanta TimeoutError).
+        "descartar": o evento é descartado, sem ir para a caixa de saída,
+            e contado em `descartados`.
+        "derramar": o evento fica só na caixa de saída em disco; a entrega
+            passa a ler do arquivo até alcançar o fim dele, e só então volta
+            a usar a fila. A ordem dos eventos é mantida.
+    """
+
+    POLITICAS = ("bloquear", "descartar", "derramar")
+    _CURSOR = "confirmado"
+
+    def __init__(
+        self,
+        diretorio: str,
+        capacidade: int = 10_000,
+        politica: str = "bloquear",
+        tamanho_lote: int = 256,
+        espera_maxima: Optional[float] = None,
+        politica_fsync: str = "sempre",
+        eventos_por_segmento: int = 10_000,
+        espera_retentativa: float = 0.05,
+        espera_retentativa_maxima: float = 5.0,
+    ):
+        if politica not in self.POLITICAS:
+            raise ValueError(f"Política deve ser uma de {', '.join(self.POLITICAS)}.")
+        if not isinstance(capacidade, int) or capacidade <= 0:
+            raise ValueError("Capacidade deve ser um inteiro positivo.")
+        if not isinstance(tamanho_lote, int) or tamanho_lote <= 0:
+            raise ValueError("Tamanho do lote deve ser um inteiro positivo.")
+
+        self.diretorio = diretorio
+        self.capacidade = capacidade
+        self.politica = politica
+        self.tamanho_lote = tamanho_lote
+        self.espera_maxima = espera_maxima
+        self.eventos_por_segmento = eventos_por_segmento
+        self.espera_retentativa = espera_retentativa
+        self.espera_retentativa_maxima = espera_retentativa_maxima
+        self._caixa = RegistroEscritaAntecipada(diretorio, politica_fsync=politica_fsync)
+        self._politica_fsync = politica_fsync
+        self.confirmado = self._ler_cursor()
+        self._rotacionado_em = self.confirmado
+        self._cond = threading.Condition()
+        self._fila: Deque[Envelope] = collections.deque()
+        # Primeiro id ainda não entregue que está só no arquivo (derramado
+        # ou pendente de uma execução anterior); None quando a fila basta.
+        self._derramado_desde: Optional[int] = (
+            self.confirmado + 1 if self._caixa.ultimo_lsn > self.confirmado else None
+        )
+        self._leitor: Optional[Iterator[Envelope]] = None
+        self._consumidores: List[Tuple[Callable[[List[Envelope]], None], Optional[frozenset]]] = []
+        self._fechando = False
+        self._fechado = False
+        self.publicados = 0
+        self.descartados = 0
+        self.derramados = 0
+        self.entregues = 0
+        self.falhas = 0
+        self._sistemas: List[Tuple[Any, Callable[[str, Dict[str, Any]], None]]] = []
+        # A entrega começa no primeiro `assinar`, para que eventos pendentes
+        # de uma execução anterior não se percam sem consumidores.
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------ cursor
+    def _caminho_cursor(self) -> str:
+        return os.path.join(self.diretorio, self._CURSOR)
+
+    def _ler_cursor(self) -> int:
+        try:
+            with open(self._caminho_cursor(), "r", encoding="ascii") as arquivo:
+                return int(arquivo.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _gravar_cursor(self, id_evento: int) -> None:
+        temporario = self._caminho_cursor() + ".tmp"
+        with open(temporario, "w", encoding="ascii") as arquivo:
+            arquivo.write(str(id_evento))
+            arquivo.flush()
+            if self._politica_fsync != "nunca":
+                os.fsync(arquivo.fileno())
+        os.replace(temporario, self._caminho_cursor())
+
+    # ------------------------------------------------------------------ publicação
+    def assinar(
+        self, consumidor: Callable[[List[Envelope]], None], tipos: Optional[Iterable[type]] = None
+    ) -> None:
+        """
+        Registra `consumidor(lote)`, chamado na thread de entrega com listas
+        de Envelope. Com `tipos`, recebe só eventos dessas classes.
+        """
+        with self._cond:
+            self._consumidores.append((consumidor, None if tipos is None else frozenset(tipos)))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._despachar, daemon=True)
+                self._thread.start()
+
+    def publicar(self, evento: Any) -> Optional[int]:
+        """
+        Grava o evento na caixa de saída e o enfileira para entrega. Retorna
+        o id do evento, ou None se ele foi descartado pela política.
+        """
+        tipo = type(evento).__name__
+        if TIPOS_EVENTOS.get(tipo) is not type(evento):
+            raise ValueError(f"Tipo de evento não suportado: '{tipo}'.")
+        with self._cond:
+            if self._fechando:
+                raise ValueError("Barramento de eventos já foi fechado.")
+            if self._derramado_desde is None and len(self._fila) >= self.capacidade:
+                if self.politica == "descartar":
+                    self.descartados += 1
+                    return None
+                if self.politica == "bloquear":
+                    cheia = lambda: (
+                        self._derramado_desde is None
+                        and len(self._fila) >= self.capacidade
+                        and not self._fechando
+                    )
+                    if not self._cond.wait_for(lambda: not cheia(), self.espera_maxima):
+                        raise TimeoutError("Fila de eventos cheia.")
+                    if self._fechando:
+                        raise ValueError("Barramento de eventos já foi fechado.")
+            # O id e a posição na fila são definidos sob o lock; o fsync é
+            # esperado fora dele.
+            id_evento = self._caixa.registrar(tipo, evento._asdict(), aguardar=False)
+            self.publicados += 1
+            if self._derramado_desde is not None:
+                self.derramados += 1
+            elif len(self._fila) >= self.capacidade:
+                self._derramado_desde = id_evento
+                self.derramados += 1
+            else:
+                self._fila.append(Envelope(id_evento, evento))
+            self._cond.notify_all()
+        if self._politica_fsync == "sempre":
+            self._caixa.aguardar_durabilidade(id_evento)
+        return id_evento
+
+    def anexar(self, sistema: Any) -> None:
+        """
+        Publica os eventos de domínio de `sistema` (criação, pagamento e
+        cancelamento de pedidos e alterações de estoque) como eventos tipados.
+        Os eventos chegam depois de cada operação do sistema terminar
+        (`adicionar_ouvinte(..., apos_confirmacao=True)`): fora dos locks de
+        pedido e só se a transação do armazenamento foi confirmada, de modo
+        que uma fila cheia não segura nenhum pedido bloqueado.
+        """
+
+        def ouvinte(tipo: str, dados: Dict[str, Any]) -> None:
+            evento = _evento_de_dominio(tipo, dados)
+            if evento is not None:
+                self.publicar(evento)
+
+        sistema.adicionar_ouvinte(ouvinte, apos_confirmacao=True)
+        self._sistemas.append((sistema, ouvinte))
+
+    # ------------------------------------------------------------------ entrega
+    def _ler_derramados(self, a_partir_de: int) -> Iterator[Envelope]:
+        for id_evento, tipo, dados in RegistroEscritaAntecipada.ler_eventos(
+            self.diretorio, apos_lsn=a_partir_de - 1
+        ):
+            yield Envelope(id_evento, TIPOS_EVENTOS[tipo](**dados))
+
+    def _proximo_lote(self) -> Optional[List[Envelope]]:
+        """
+        Próximo lote a entregar, da fila ou do arquivo; None ao terminar.
+        """
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._fila or self._derramado_desde is not None or self._fechando
+            )
+            lote = [self._fila.popleft() for _ in range(min(self.tamanho_lote, len(self._fila)))]
+            if lote:
+                self._cond.notify_all()
+            elif self._derramado_desde is None:
+                return None
+            else:
+                desde = self._derramado_desde
+        if lote:
+            # O cursor de confirmação nunca passa do que está em disco.
+            self._caixa.aguardar_durabilidade(lote[-1].id_evento)
+            return lote
+        # Eventos derramados: lidos do arquivo com o mesmo leitor enquanto ele
+        # tiver registros, para não reler o segmento a cada lote.
+        self._caixa.descarregar()
+        for _ in range(2):
+            if self._leitor is None:
+                self._leitor = self._ler_derramados(desde)
+            for envelope in self._leitor:
+                if envelope.id_evento >= desde:
+                    lote.append(envelope)
+                    if len(lote) == self.tamanho_lote:
+                        break
+            else:
+                self._leitor = None
+            if lote:
+                break
+        with self._cond:
+            if lote:
+                self._derramado_desde = lote[-1].id_evento + 1
+            if self._derramado_desde > self._caixa.ultimo_lsn:
+                self._derramado_desde = None
+                self._leitor = None
+        return lote
+
+    def _entregar(self, lote: List[Envelope]) -> bool:
+        """
+        Entrega o lote a todos os consumidores, repetindo para os que
+        falharem. Retorna False se o barramento fechou antes do sucesso.
+        """
+        pendentes = list(self._consumidores)
+        tentativa = 0
+        while pendentes:
+            falharam = []
+            for consumidor, tipos in pendentes:
+                sublote = lote if tipos is None else [e for e in lote if type(e.evento) in tipos]
+                if not sublote:
+                    continue
+                try:
+                    consumidor(sublote)
+                except Exception:
+                    self.falhas += 1
+                    falharam.append((consumidor, tipos))
+            pendentes = falharam
+            if pendentes:
+                espera = min(self.espera_retentativa * 2 ** tentativa, self.espera_retentativa_maxima)
+                tentativa += 1
+                with self._cond:
+                    if self._fechando or self._cond.wait_for(lambda: self._fechando, espera):
+                        return False
+        return True
+
+    def _despachar(self) -> None:
+        while True:
+            lote = self._proximo_lote()
+            if lote is None:
+                return
+            if not lote:
+                continue
+            if not self._entregar(lote):
+                return
+            ultimo = lote[-1].id_evento
+            self._gravar_cursor(ultimo)
+            with self._cond:
+                self.confirmado = ultimo
+                self.entregues += len(lote)
+                self._cond.notify_all()
+            if ultimo - self._rotacionado_em >= self.eventos_por_segmento:
+                # Segmentos só com eventos confirmados não são mais necessários.
+                self._caixa.rotacionar()
+                self._caixa.remover_segmentos_ate(ultimo)
+                self._rotacionado_em = ultimo
+
+    def aguardar_entrega(self, timeout: Optional[float] = None) -> bool:
+        """
+        Espera até que todos os eventos publicados tenham sido confirmados.
+        """
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: self.confirmado >= self._caixa.ultimo_lsn or self._fechado, timeout
+            ) and self.confirmado >= self._caixa.ultimo_lsn
+
+    @property
+    def pendentes(self) -> int:
+        """
+        Eventos publicados e ainda não confirmados (na fila ou só no arquivo).
+        """
+        with self._cond:
+            return self._caixa.ultimo_lsn - self.confirmado
+
+    def fechar(self, timeout: Optional[float] = None) -> None:
+        """
+        Para de aceitar eventos e espera (até `timeout`) a entrega dos que
+        já foram publicados; os que não forem confirmados ficam na caixa de
+        saída para a próxima abertura.
+        """
+        for sistema, ouvinte in self._sistemas:
+            sistema.remover_ouvinte(ouvinte)
+        self._sistemas.clear()
+        if self._thread is not None:
+            self.aguardar_entrega(timeout)
+        with self._cond:
+            self._fechando = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        self._caixa.fechar()
+        with self._cond:
+            self._fechado = True
+            self._cond.notify_all()
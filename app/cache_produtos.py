@@ -0,0 +1,228 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+def estimar_bytes_produto(produto: Any) -> int:
+    """
+    Tamanho aproximado de um Produto em memória: o objeto, seu dicionário de
+    atributos e os textos. Não conta objetos compartilhados (locks, etc.).
+    """
+    atributos = vars(produto)
+    return (
+        sys.getsizeof(produto)
+        + sys.getsizeof(atributos)
+        + sum(sys.getsizeof(v) for v in atributos.values() if isinstance(v, str))
+    )
+
+
+# Tamanho contado para uma entrada negativa (id inexistente).
+_BYTES_ENTRADA_NEGATIVA = 64
+
+
+class _OrdemLRU:
+    """
+    Ordem de descarte do menos recentemente usado.
+    """
+
+    def __init__(self):
+        self._ordem: "OrderedDict[Hashable, None]" = OrderedDict()
+
+    def adicionar(self, chave: Hashable) -> None:
+        self._ordem[chave] = None
+
+    def tocar(self, chave: Hashable) -> None:
+        self._ordem.move_to_end(chave)
+
+    def remover(self, chave: Hashable) -> None:
+        del self._ordem[chave]
+
+    def vitima(self) -> Hashable:
+        return next(iter(self._ordem))
+
+    def limpar(self) -> None:
+        self._ordem.clear()
+
+
+class _OrdemLFU:
+    """
+    Ordem de descarte do menos frequentemente usado, em O(1): as chaves ficam
+    em baldes por frequência de acesso e, dentro de um balde, em ordem de uso
+    (empates são resolvidos pelo menos recente).
+    """
+
+    def __init__(self):
+        self._frequencia: Dict[Hashable, int] = {}
+        self._baldes: Dict[int, "OrderedDict[Hashable, None]"] = {}
+        self._menor = 0
+
+    def adicionar(self, chave: Hashable) -> None:
+        self._frequencia[chave] = 1
+        self._baldes.setdefault(1, OrderedDict())[chave] = None
+        self._menor = 1
+
+    def tocar(self, chave: Hashable) -> None:
+        frequencia = self._frequencia[chave]
+        balde = self._baldes[frequencia]
+        del balde[chave]
+        if not balde:
+            del self._baldes[frequencia]
+            if self._menor == frequencia:
+                self._menor = frequencia + 1
+        self._frequencia[chave] = frequencia + 1
+        self._baldes.setdefault(frequencia + 1, OrderedDict())[chave] = None
+
+    def remover(self, chave: Hashable) -> None:
+        frequencia = self._frequencia.pop(chave)
+        balde = self._baldes[frequencia]
+        del balde[chave]
+        if not balde:
+            del self._baldes[frequencia]
+            if self._menor == frequencia and self._baldes:
+                self._menor = min(self._baldes)
+
+    def vitima(self) -> Hashable:
+        return next(iter(self._baldes[self._menor]))
+
+    def limpar(self) -> None:
+        self._frequencia.clear()
+        self._baldes.clear()
+        self._menor = 0
+
+
+# ==============================================================================
+# CLASSE CACHE PRODUTOS
+# ==============================================================================
+class CacheProdutos:
+    """
+    Cache limitado de objetos Produto por id, com descarte LRU ou LFU.
+
+    O limite pode ser dado em número de entradas (`max_entradas`), em bytes
+    aproximados (`max_bytes`, medidos por `estimar_bytes`) ou ambos. Ids
+    inexistentes também podem ser guardados (cache negativo), para que
+    consultas repetidas a ids ausentes não cheguem ao armazenamento; essas
+    entradas contam para os limites como as demais. `invalidar` remove uma
+    entrada, positiva ou negativa, quando o estoque ou o preço do produto é
+    alterado fora do objeto em cache.
+    """
+
+    POLITICAS = ("lru", "lfu")
+
+    def __init__(
+        self,
+        max_entradas: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        politica: str = "lru",
+        cache_negativo: bool = True,
+        estimar_bytes: Callable[[Any], int] = estimar_bytes_produto,
+    ):
+        if max_entradas is None and max_bytes is None:
+            raise ValueError("Informe o limite do cache: max_entradas e/ou max_bytes.")
+        if max_entradas is not None and (not isinstance(max_entradas, int) or max_entradas <= 0):
+            raise ValueError("Número máximo de entradas deve ser um inteiro positivo.")
+        if max_bytes is not None and (not isinstance(max_bytes, int) or max_bytes <= 0):
+            raise ValueError("Limite de bytes deve ser um inteiro positivo.")
+        if politica not in self.POLITICAS:
+            raise ValueError(f"Política de descarte deve ser uma de {', '.join(self.POLITICAS)}.")
+
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.politica = politica
+        self.cache_negativo = cache_negativo
+        self.estimar_bytes = estimar_bytes
+        # chave -> (produto ou None para entrada negativa, bytes estimados)
+        self._entradas: Dict[Hashable, Tuple[Optional[Any], int]] = {}
+        self._ordem = _OrdemLRU() if politica == "lru" else _OrdemLFU()
+        self._lock = threading.Lock()
+        self.bytes_estimados = 0
+
+        self.acertos = 0
+        self.acertos_negativos = 0
+        self.falhas = 0
+        self.descartes = 0
+        self.invalidacoes = 0
+
+    def obter(self, chave: Hashable) -> Tuple[bool, Optional[Any]]:
+        """
+        Retorna (True, produto) num acerto, (True, None) se o id está no
+        cache negativo e (False, None) se o id não está em cache.
+        """
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                self.falhas += 1
+                return False, None
+            self._ordem.tocar(chave)
+            if entrada[0] is None:
+                self.acertos_negativos += 1
+            else:
+                self.acertos += 1
+            return True, entrada[0]
+
+    def guardar(self, chave: Hashable, produto: Any) -> None:
+        self._guardar(chave, produto, self.estimar_bytes(produto))
+
+    def guardar_ausente(self, chave: Hashable) -> None:
+        if self.cache_negativo:
+            self._guardar(chave, None, _BYTES_ENTRADA_NEGATIVA)
+
+    def _guardar(self, chave: Hashable, valor: Optional[Any], tamanho: int) -> None:
+        with self._lock:
+            if chave in self._entradas:
+                self._remover(chave)
+            # Abre espaço antes de inserir, para que a nova entrada não seja
+            # a própria vítima (no LFU ela teria a menor frequência).
+            while self._entradas and self._excederia(tamanho):
+                self._remover(self._ordem.vitima())
+                self.descartes += 1
+            self._entradas[chave] = (valor, tamanho)
+            self._ordem.adicionar(chave)
+            self.bytes_estimados += tamanho
+
+    def _excederia(self, tamanho: int) -> bool:
+        return (self.max_entradas is not None and len(self._entradas) >= self.max_entradas) or (
+            self.max_bytes is not None and self.bytes_estimados + tamanho > self.max_bytes
+        )
+
+    def _remover(self, chave: Hashable) -> None:
+        _, tamanho = self._entradas.pop(chave)
+        self._ordem.remover(chave)
+        self.bytes_estimados -= tamanho
+
+    def invalidar(self, chave: Hashable) -> bool:
+        """
+        Remove a entrada do id (positiva ou negativa). Retorna True se havia uma.
+        """
+        with self._lock:
+            if chave not in self._entradas:
+                return False
+            self._remover(chave)
+            self.invalidacoes += 1
+            return True
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._entradas.clear()
+            self._ordem.limpar()
+            self.bytes_estimados = 0
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+    def __contains__(self, chave: Hashable) -> bool:
+        return chave in self._entradas
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            consultas = self.acertos + self.acertos_negativos + self.falhas
+            return {
+                "entradas": len(self._entradas),
+                "bytes_estimados": self.bytes_estimados,
+                "acertos": self.acertos,
+                "acertos_negativos": self.acertos_negativos,
+                "falhas": self.falhas,
+                "descartes": self.descartes,
+                "invalidacoes": self.invalidacoes,
+                "taxa_acerto": (self.acertos + self.acertos_negativos) / consultas if consultas else 0.0,
+            }
@@ -0,0 +1,175 @@
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+# ==============================================================================
+# CLASSE LOCKS LISTRADOS
+# ==============================================================================
+class LocksListrados:
+    """
+    Conjunto fixo de locks ("lock striping"): cada chave inteira é mapeada
+    para um dos `num_listras` locks por `chave % num_listras`.
+
+    Permite bloquear produtos ou pedidos individualmente sem manter um lock
+    por objeto. Para evitar deadlocks, `adquirir` sempre bloqueia as listras
+    em ordem crescente de índice, e chaves que caem na mesma listra a
+    bloqueiam uma única vez.
+    """
+
+    def __init__(self, num_listras: int = 64):
+        if not isinstance(num_listras, int) or num_listras <= 0:
+            raise ValueError("Número de listras deve ser um inteiro positivo.")
+        self.num_listras = num_listras
+        self._locks: List[threading.Lock] = [threading.Lock() for _ in range(num_listras)]
+
+    def indices(self, chaves: Iterable[int]) -> List[int]:
+        return sorted({chave % self.num_listras for chave in chaves})
+
+    def lock_de(self, chave: int) -> threading.Lock:
+        return self._locks[chave % self.num_listras]
+
+    @contextmanager
+    def adquirir(self, chaves: Iterable[int]) -> Iterator[None]:
+        """
+        Bloqueia as listras de todas as chaves, em ordem consistente.
+        """
+        adquiridos: List[threading.Lock] = []
+        try:
+            for indice in self.indices(chaves):
+                lock = self._locks[indice]
+                lock.acquire()
+                adquiridos.append(lock)
+            yield
+        finally:
+            for lock in reversed(adquiridos):
+                lock.release()
+
+
+# ==============================================================================
+# CLASSE CONTADOR ATOMICO
+# ==============================================================================
+class ContadorAtomico:
+    """
+    Contador inteiro com incremento atômico, para alocação de ids e contagens
+    atualizadas por várias threads.
+    """
+
+    def __init__(self, valor_inicial: int = 1):
+        self._proximo = valor_inicial
+        self._lock = threading.Lock()
+
+    def alocar(self, quantidade: int = 1) -> int:
+        """
+        Reserva `quantidade` valores consecutivos e retorna o primeiro deles.
+        """
+        with self._lock:
+            primeiro = self._proximo
+            self._proximo += quantidade
+            return primeiro
+
+    @property
+    def proximo(self) -> int:
+        return self._proximo
+
+    def ajustar(self, valor: int) -> None:
+        """
+        Redefine o próximo valor (ex.: ao restaurar estado persistido).
+        """
+        with self._lock:
+            self._proximo = valor
+
+
+# ==============================================================================
+# CLASSE ENTREGA ORDENADA
+# ==============================================================================
+class EntregaOrdenada:
+    """
+    Entrega itens na ordem de números reservados antes, sem que quem os
+    produz espere pelos outros.
+
+    `reservar()` dá o número de um item (ex.: dentro de um lock, o que fixa
+    a ordem) e `concluir` libera itens já numerados (ex.: depois de soltar o
+    lock). Quem libera o próximo número da sequência entrega, em ordem, todos
+    os itens já liberados; se outra thread já estiver entregando, os itens
+    só ficam para ela. Um item None (ex.: de uma operação desfeita) apenas
+    ocupa o seu número.
+    """
+
+    def __init__(self, entregar: Callable[[Any], None]):
+        self._entregar = entregar
+        self._numeros = ContadorAtomico(1)
+        self._prontos: Dict[int, Any] = {}
+        self._proximo = 1
+        self._entregando = False
+        self._lock = threading.Lock()
+
+    def reservar(self) -> int:
+        return self._numeros.alocar()
+
+    def concluir(self, itens: Iterable[Tuple[int, Any]]) -> None:
+        """
+        Libera os itens (numero, item) e entrega os que já estão na vez.
+        """
+        with self._lock:
+            self._prontos.update(itens)
+            if self._entregando:
+                return
+            self._entregando = True
+        while True:
+            with self._lock:
+                if self._proximo not in self._prontos:
+                    self._entregando = False
+                    return
+                item = self._prontos.pop(self._proximo)
+                self._proximo += 1
+            if item is not None:
+                try:
+                    self._entregar(item)
+                except BaseException:
+                    with self._lock:
+                        self._entregando = False
+                    raise
+
+
+# ==============================================================================
+# CLASSE BASE PREGUICOSA
+# ==============================================================================
+class BasePreguicosa:
+    """
+    Estrutura derivada (totais, índices, livro razão) cujos dados de uma base
+    já existente (snapshot, banco) são carregados sob demanda, uma única vez.
+
+    `definir_base(carregar)` guarda a carga; `_garantir_base()` a executa
+    antes da primeira consulta, com verificação dupla para que threads
+    concorrentes não a repitam. Com `antes_de_alterar=True`, as alterações
+    também a executam antes (via `_garantir_base_para_alterar()`): é o caso
+    de uma base que muda junto com o sistema, como o banco, que recebe cada
+    transição e a contaria duas vezes.
+    """
+
+    def __init__(self):
+        self._lock_base = threading.Lock()
+        self._carregar_base: Optional[Callable[[Any], None]] = None
+        self._base_antes_de_alterar = False
+
+    def definir_base(self, carregar: Callable[[Any], None], antes_de_alterar: bool = False) -> None:
+        """
+        `carregar(estrutura)` será chamado uma vez, antes da primeira consulta
+        (ou alteração, com `antes_de_alterar`).
+        """
+        self._base_antes_de_alterar = antes_de_alterar
+        self._carregar_base = carregar
+
+    def _garantir_base(self) -> None:
+        if self._carregar_base is None:
+            return
+        with self._lock_base:
+            carregar = self._carregar_base
+            if carregar is not None:
+                carregar(self)
+                self._carregar_base = None
+
+    def _garantir_base_para_alterar(self) -> None:
+        if self._base_antes_de_alterar:
+            self._garantir_base()
@@ -0,0 +1,180 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+
+# ==============================================================================
+# CLASSE CONTADOR JANELA DESLIZANTE
+# ==============================================================================
+class ContadorJanelaDeslizante:
+    """
+    Contador de eventos em janela deslizante, implementado como um anel de
+    baldes de tempo (ring counter).
+
+    A janela de `janela_segundos` é dividida em `num_baldes` baldes de largura
+    fixa. Cada balde guarda o número de eventos e o índice de tempo (época) a
+    que pertence; baldes de épocas antigas são zerados quando reaproveitados.
+    A memória por chave é, portanto, limitada a `num_baldes` contadores.
+    """
+
+    __slots__ = ("janela_segundos", "num_baldes", "largura_balde", "_contagens", "_epocas")
+
+    def __init__(self, janela_segundos: float, num_baldes: int = 10):
+        if not isinstance(janela_segundos, (int, float)) or janela_segundos <= 0:
+            raise ValueError("Janela em segundos deve ser um número positivo.")
+        if not isinstance(num_baldes, int) or num_baldes <= 0:
+            raise ValueError("Número de baldes deve ser um inteiro positivo.")
+
+        self.janela_segundos = float(janela_segundos)
+        self.num_baldes = num_baldes
+        self.largura_balde = self.janela_segundos / num_baldes
+        self._contagens: List[int] = [0] * num_baldes
+        self._epocas: List[int] = [-1] * num_baldes
+
+    def _epoca(self, instante: float) -> int:
+        return int(instante // self.largura_balde)
+
+    def registrar(self, instante: float, quantidade: int = 1) -> int:
+        """
+        Registra `quantidade` eventos no instante informado e retorna o total
+        de eventos dentro da janela, já incluindo os recém-registrados.
+        """
+        epoca = self._epoca(instante)
+        posicao = epoca % self.num_baldes
+        if self._epocas[posicao] != epoca:
+            self._epocas[posicao] = epoca
+            self._contagens[posicao] = 0
+        self._contagens[posicao] += quantidade
+        return self._somar(epoca)
+
+    def contar(self, instante: float) -> int:
+        """
+        Retorna o número de eventos dentro da janela que termina no instante informado.
+        """
+        return self._somar(self._epoca(instante))
+
+    def _somar(self, epoca_atual: int) -> int:
+        epoca_minima = epoca_atual - self.num_baldes + 1
+        total = 0
+        for epoca, contagem in zip(self._epocas, self._contagens):
+            if epoca_minima <= epoca <= epoca_atual:
+                total += contagem
+        return total
+
+
+# ==============================================================================
+# CLASSE ARMAZEM CONTADORES VELOCIDADE
+# ==============================================================================
+class ArmazemContadoresVelocidade:
+    """
+    Armazena contadores de janela deslizante por chave (ex.: cartão ou cliente).
+
+    Chaves são mantidas em ordem de uso (LRU). Ao ultrapassar `max_chaves`, as
+    chaves usadas há mais tempo são descartadas; chaves ociosas por mais de uma
+    janela também são removidas, pois já não contribuem para nenhuma contagem.
+    """
+
+    def __init__(
+        self,
+        janela_segundos: float,
+        num_baldes: int = 10,
+        max_chaves: int = 100_000,
+        relogio: Optional[Callable[[], float]] = None,
+    ):
+        if not isinstance(max_chaves, int) or max_chaves <= 0:
+            raise ValueError("Número máximo de chaves deve ser um inteiro positivo.")
+        # Valida janela e baldes de uma só vez.
+        ContadorJanelaDeslizante(janela_segundos, num_baldes)
+
+        self.janela_segundos = float(janela_segundos)
+        self.num_baldes = num_baldes
+        self.max_chaves = max_chaves
+        self.relogio = relogio or time.monotonic
+        self._contadores: "OrderedDict[str, ContadorJanelaDeslizante]" = OrderedDict()
+        self._ultimo_uso: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.chaves_descartadas = 0
+
+    def registrar(self, chave: str, quantidade: int = 1) -> int:
+        """
+        Registra eventos para a chave e retorna a contagem atual da janela.
+        """
+        agora = self.relogio()
+        with self._lock:
+            contador = self._contadores.get(chave)
+            if contador is None:
+                contador = ContadorJanelaDeslizante(self.janela_segundos, self.num_baldes)
+                self._contadores[chave] = contador
+            else:
+                self._contadores.move_to_end(chave)
+            self._ultimo_uso[chave] = agora
+            total = contador.registrar(agora, quantidade)
+            self._descartar_excedentes(agora)
+            return total
+
+    def contar(self, chave: str) -> int:
+        """
+        Retorna a contagem atual da janela para a chave, sem registrar eventos.
+        """
+        agora = self.relogio()
+        with self._lock:
+            contador = self._contadores.get(chave)
+            if contador is None:
+                return 0
+            return contador.contar(agora)
+
+    def _descartar_excedentes(self, agora: float) -> None:
+        while self._contadores:
+            chave_antiga = next(iter(self._contadores))
+            ociosa = agora - self._ultimo_uso[chave_antiga] > self.janela_segundos
+            if len(self._contadores) <= self.max_chaves and not ociosa:
+                break
+            del self._contadores[chave_antiga]
+            del self._ultimo_uso[chave_antiga]
+            self.chaves_descartadas += 1
+
+    def __len__(self) -> int:
+        return len(self._contadores)
+
+
+# ==============================================================================
+# CLASSE LIMITE VELOCIDADE
+# ==============================================================================
+class LimiteVelocidade:
+    """
+    Regra de limitação: no máximo `maximo` eventos por chave dentro da janela
+    do armazém de contadores.
+    """
+
+    def __init__(self, armazem: ArmazemContadoresVelocidade, maximo: int):
+        if not isinstance(maximo, int) or maximo <= 0:
+            raise ValueError("Máximo de eventos por janela deve ser um inteiro positivo.")
+        self.armazem = armazem
+        self.maximo = maximo
+
+    @classmethod
+    def criar(
+        cls,
+        maximo: int,
+        janela_segundos: float,
+        num_baldes: int = 10,
+        max_chaves: int = 100_000,
+        relogio: Optional[Callable[[], float]] = None,
+    ) -> "LimiteVelocidade":
+        armazem = ArmazemContadoresVelocidade(
+            janela_segundos, num_baldes=num_baldes, max_chaves=max_chaves, relogio=relogio
+        )
+        return cls(armazem, maximo)
+
+    def permitir(self, chave: str) -> bool:
+        """
+        Registra uma tentativa para a chave e indica se ela está dentro do limite.
+        """
+        return self.armazem.registrar(chave) <= self.maximo
+
+    def excedido(self, chave: str) -> bool:
+        """
+        Indica se a chave já atingiu o limite, sem registrar nova tentativa.
+        """
+        return self.armazem.contar(chave) >= self.maximo
@@ -1,6 +1,23 @@
-from typing import Dict, Any, Tuple, List, Optional
+from typing import Dict, Any, Tuple, List, Optional, Callable, Iterable, Iterator, NamedTuple, Set
+from array import array
+import contextlib
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+from app.contadores_velocidade import LimiteVelocidade
+from app.resiliencia_pagamento import ResilienciaGateway
+from app.identificadores import GeradorIds, obter_gerador_padrao
+from app.razao_transacoes import LivroRazaoTransacoes
+from app.concorrencia import ContadorAtomico, EntregaOrdenada, LocksListrados
+from app.venda_relampago import EstoqueFragmentado
+from app.agregados_vendas import AgregadosVendas, STATUS_FATURADOS
+from app.rollups_vendas import RollupsVendas
+from app.indices_pedidos import IndicesPedidos
+from app.maquina_estados import MaquinaEstados
+from app.estoque_armazens import Alocacao, EstoqueArmazens, alocacao_para_dados
+
 
 # ==============================================================================
 # CLASSE PRODUTO
@@ -16,6 +33,11 @@ class Produto:
         preco (float): Preço unitário do produto. Deve ser positivo.
         quantidade_em_estoque (int): Número de unidades do produto disponíveis em estoque. Deve ser não negativo.
         categoria (str): Categoria à qual o produto pertence.
+        versao_estoque (int): Versão do estoque, incrementada a cada alteração; usada nas
+            atualizações otimistas (compare-and-set) de `comparar_e_definir_estoque`.
+
+    Em modo de venda relâmpago (`iniciar_venda_relampago`), o estoque fica
+    dividido em sub-contadores (`EstoqueFragmentado`) até `encerrar_venda_relampago`.
     """
 
     def __init__(
@@ -48,8 +70,116 @@ class Produto:
         self.nome = nome
         self.descricao = descricao
         self.preco = float(preco)
-        self.quantidade_em_estoque = quantidade_em_estoque
+        self._quantidade_em_estoque = quantidade_em_estoque
         self.categoria = categoria
+        self.versao_estoque = 0
+        self._trava_estoque = threading.Lock()
+        self._estoque_fragmentado: Optional[EstoqueFragmentado] = None
+        # Notificado a cada alteração de estoque: observador_estoque(produto, variacao)
+        self.observador_estoque: Optional[Callable[["Produto", int], None]] = None
+
+    def _notificar_estoque(self, variacao: int) -> None:
+        if self.observador_estoque is not None and variacao:
+            self.observador_estoque(self, variacao)
+
+    @property
+    def quantidade_em_estoque(self) -> int:
+        fragmentado = self._estoque_fragmentado
+        if fragmentado is not None:
+            return fragmentado.total()
+        return self._quantidade_em_estoque
+
+    @quantidade_em_estoque.setter
+    def quantidade_em_estoque(self, valor: int) -> None:
+        with self._trava_estoque:
+            if self._estoque_fragmentado is not None:
+                raise ValueError("Estoque em venda relâmpago não pode ser redefinido.")
+            variacao = valor - self._quantidade_em_estoque
+            self._quantidade_em_estoque = valor
+            self.versao_estoque += 1
+        self._notificar_estoque(variacao)
+
+    @property
+    def em_venda_relampago(self) -> bool:
+        return self._estoque_fragmentado is not None
+
+    def iniciar_venda_relampago(self, num_fragmentos: int) -> None:
+        """
+        Divide o estoque atual em `num_fragmentos` sub-contadores.
+        """
+        with self._trava_estoque:
+            if self._estoque_fragmentado is not None:
+                raise ValueError(f"Produto '{self.nome}' já está em venda relâmpago.")
+            self._estoque_fragmentado = EstoqueFragmentado(
+                self._quantidade_em_estoque,
+                num_fragmentos,
+                destino_apos_encerramento=self._somar_estoque_unificado,
+            )
+            self._quantidade_em_estoque = 0
+            self.versao_estoque += 1
+
+    def _somar_estoque_unificado(self, quantidade: int) -> None:
+        # Devolução de unidades internas à venda relâmpago (sobras de reservas);
+        # não é uma alteração de estoque observável, então não notifica.
+        with self._trava_estoque:
+            self._quantidade_em_estoque += quantidade
+            self.versao_estoque += 1
+
+    def encerrar_venda_relampago(self) -> int:
+        """
+        Junta os sub-contadores de volta num único estoque e retorna o total.
+        """
+        with self._trava_estoque:
+            if self._estoque_fragmentado is None:
+                raise ValueError(f"Produto '{self.nome}' não está em venda relâmpago.")
+            self._quantidade_em_estoque = self._estoque_fragmentado.drenar()
+            self._estoque_fragmentado = None
+            self.versao_estoque += 1
+            return self._quantidade_em_estoque
+
+    def __getstate__(self) -> Dict[str, Any]:
+        estado = self.__dict__.copy()
+        del estado["_trava_estoque"]
+        estado["observador_estoque"] = None
+        if estado["_estoque_fragmentado"] is not None:
+            estado["_quantidade_em_estoque"] = estado["_estoque_fragmentado"].total()
+            estado["_estoque_fragmentado"] = None
+        return estado
+
+    def __setstate__(self, estado: Dict[str, Any]) -> None:
+        self.__dict__.update(estado)
+        self._trava_estoque = threading.Lock()
+
+    def ler_estoque(self) -> Tuple[int, int]:
+        """
+        Retorna (quantidade_em_estoque, versao_estoque) lidos de forma consistente.
+        """
+        with self._trava_estoque:
+            if self._estoque_fragmentado is not None:
+                return self._estoque_fragmentado.total(), self.versao_estoque
+            return self._quantidade_em_estoque, self.versao_estoque
+
+    def comparar_e_definir_estoque(
+        self, versao_esperada: int, nova_quantidade: int
+    ) -> bool:
+        """
+        Define o estoque para `nova_quantidade` somente se a versão atual ainda
+        for `versao_esperada` (compare-and-set). Retorna False em caso de conflito.
+        """
+        if not isinstance(nova_quantidade, int) or nova_quantidade < 0:
+            raise ValueError("Quantidade em estoque deve ser um inteiro não negativo.")
+        with self._trava_estoque:
+            if self._estoque_fragmentado is not None:
+                raise ValueError(
+                    f"Estoque do produto '{self.nome}' está fragmentado (venda relâmpago); use reduzir_estoque."
+                )
+            if self.versao_estoque != versao_esperada:
+                return False
+            variacao = nova_quantidade - self._quantidade_em_estoque
+            self._quantidade_em_estoque = nova_quantidade
+            self.versao_estoque += 1
+        self._notificar_estoque(variacao)
+        return True
 
     def verificar_disponibilidade(self, quantidade_desejada: int) -> bool:
         """
@@ -57,6 +187,8 @@ class Produto:
         """
         if not isinstance(quantidade_desejada, int) or quantidade_desejada <= 0:
             raise ValueError("Quantidade desejada deve ser um inteiro positivo.")
+        # Em venda relâmpago o total é uma soma consistente dos fragmentos, que
+        # desconsidera unidades em trânsito (resposta conservadora).
         return self.quantidade_em_estoque >= quantidade_desejada
 
     def reduzir_estoque(self, quantidade_vendida: int) -> None:
@@ -65,12 +197,23 @@ class Produto:
         """
         if not isinstance(quantidade_vendida, int) or quantidade_vendida <= 0:
             raise ValueError("Quantidade vendida deve ser um inteiro positivo.")
-        if quantidade_vendida > self.quantidade_em_estoque:
-            raise ValueError(
-                f"Não há estoque suficiente para esta venda do produto '{self.nome}'. "
-                f"Solicitado: {quantidade_vendida}, Disponível: {self.quantidade_em_estoque}."
-            )
-        self.quantidade_em_estoque -= quantidade_vendida
+        fragmentado = self._estoque_fragmentado
+        if fragmentado is not None:
+            if not fragmentado.reservar(quantidade_vendida):
+                raise ValueError(
+                    f"Não há estoque suficiente para esta venda do produto '{self.nome}'. "
+                    f"Solicitado: {quantidade_vendida}, Disponível: {fragmentado.total()}."
+                )
+        else:
+            with self._trava_estoque:
+                if quantidade_vendida > self._quantidade_em_estoque:
+                    raise ValueError(
+                        f"Não há estoque suficiente para esta venda do produto '{self.nome}'. "
+                        f"Solicitado: {quantidade_vendida}, Disponível: {self._quantidade_em_estoque}."
+                    )
+                self._quantidade_em_estoque -= quantidade_vendida
+                self.versao_estoque += 1
+        self._notificar_estoque(-quantidade_vendida)
 
     def adicionar_estoque(self, quantidade_adicionada: int) -> None:
         """
@@ -78,7 +221,14 @@ class Produto:
         """
         if not isinstance(quantidade_adicionada, int) or quantidade_adicionada <= 0:
             raise ValueError("Quantidade adicionada deve ser um inteiro positivo.")
-        self.quantidade_em_estoque += quantidade_adicionada
+        fragmentado = self._estoque_fragmentado
+        if fragmentado is not None:
+            fragmentado.devolver(quantidade_adicionada)
+        else:
+            with self._trava_estoque:
+                self._quantidade_em_estoque += quantidade_adicionada
+                self.versao_estoque += 1
+        self._notificar_estoque(quantidade_adicionada)
 
     def obter_informacoes_detalhadas(self) -> Dict[str, Any]:
         """
@@ -238,6 +388,10 @@ class SistemaPagamento:
         self,
         taxa_juros_parcelamento: float = TAXA_JUROS_PARCELAMENTO_DEFAULT,
         desconto_pix: float = DESCONTO_PIX_DEFAULT,
+        limite_velocidade: Optional[LimiteVelocidade] = None,
+        resiliencia: Optional[ResilienciaGateway] = None,
+        gerador_ids: Optional[GeradorIds] = None,
+        livro_razao: Optional[LivroRazaoTransacoes] = None,
     ):
         if not (0 <= taxa_juros_parcelamento <= 1):
             raise ValueError("Taxa de juros para parcelamento deve estar entre 0 e 1.")
@@ -246,6 +400,13 @@ class SistemaPagamento:
 
         self.taxa_juros_parcelamento = taxa_juros_parcelamento
         self.desconto_pix = desconto_pix
+        # Limite de tentativas de pagamento por cartão/cliente (desativado se None)
+        self.limite_velocidade = limite_velocidade
+        # Prazos, retentativas e disjuntor nas chamadas ao gateway (desativado se None)
+        self.resiliencia = resiliencia
+        self.gerador_ids = gerador_ids or obter_gerador_padrao()
+        # Capturas e reembolsos, indexados para validar reembolsos em O(1)
+        self.livro_razao = livro_razao if livro_razao is not None else LivroRazaoTransacoes()
 
     def calcular_valor_final_cartao_credito_a_vista(
         self, valor_original: float
@@ -290,6 +451,13 @@ class SistemaPagamento:
                 "id_transacao": None,
             }
 
+        if self._verificar_velocidade_excedida(detalhes_pagamento):
+            return {
+                "status": "rejeitado",
+                "mensagem": "Pagamento rejeitado: excesso de tentativas em curto intervalo.",
+                "id_transacao": None,
+            }
+
         if self._simular_verificacao_fraude(detalhes_pagamento, valor_a_pagar):
             return {
                 "status": "rejeitado",
@@ -307,38 +475,11 @@ class SistemaPagamento:
                     "mensagem": "Número do cartão não fornecido.",
                     "id_transacao": None,
                 }
-            if "timeout" in numero_cartao:
-                return {
-                    "status": "erro",
-                    "mensagem": "Timeout na comunicação com o gateway de pagamento.",
-                    "id_transacao": None,
-                }
-            if "falha_autorizacao" in numero_cartao:
-                return {
-                    "status": "rejeitado",
-                    "mensagem": "Falha na autorização do cartão de crédito.",
-                    "id_transacao": None,
-                }
-
-            valor_da_parcela = (
-                round(valor_a_pagar / numero_parcelas, 2)
-                if numero_parcelas > 0
-                else valor_a_pagar
-            )
-            mensagem_aprovado = (
-                f"Pagamento de R${valor_a_pagar:.2f} com cartão de crédito aprovado"
-            )
-            if numero_parcelas > 1:
-                mensagem_aprovado += (
-                    f" em {numero_parcelas}x de R${valor_da_parcela:.2f}."
+            resultado = self._chamar_gateway(
+                lambda: self._autorizar_cartao_no_gateway(
+                    numero_cartao, numero_parcelas, valor_a_pagar
                 )
-            else:
-                mensagem_aprovado += " à vista."
-            return {
-                "status": "aprovado",
-                "mensagem": mensagem_aprovado,
-                "id_transacao": f"CC_SIM_{abs(hash(numero_cartao + str(valor_a_pagar)))}",
-            }
+            )
 
         elif metodo_pagamento == "pix":
             chave_pix = detalhes_pagamento.get("chave_pix", "")
@@ -348,11 +489,9 @@ class SistemaPagamento:
                     "mensagem": "Chave PIX não fornecida.",
                     "id_transacao": None,
                 }
-            return {
-                "status": "aprovado",
-                "mensagem": f"Pagamento PIX de R${valor_a_pagar:.2f} aprovado.",
-                "id_transacao": f"PIX_SIM_{abs(hash(chave_pix + str(valor_a_pagar)))}",
-            }
+            resultado = self._chamar_gateway(
+                lambda: self._autorizar_pix_no_gateway(chave_pix, valor_a_pagar)
+            )
 
         else:
             return {
@@ -361,6 +500,87 @@ class SistemaPagamento:
                 "id_transacao": None,
             }
 
+        if resultado["status"] == "aprovado":
+            self.livro_razao.registrar_captura(
+                resultado["id_transacao"],
+                valor_a_pagar,
+                metodo=metodo_pagamento,
+                id_pedido=detalhes_pagamento.get("id_pedido"),
+            )
+        return resultado
+
+    def _chamar_gateway(
+        self, chamada: Callable[[], Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Encaminha a chamada ao gateway, através da camada de resiliência quando configurada.
+        """
+        if self.resiliencia is None:
+            return chamada()
+        return self.resiliencia.executar(chamada)
+
+    def _autorizar_cartao_no_gateway(
+        self, numero_cartao: str, numero_parcelas: int, valor_a_pagar: float
+    ) -> Dict[str, Any]:
+        if "timeout" in numero_cartao:
+            return {
+                "status": "erro",
+                "mensagem": "Timeout na comunicação com o gateway de pagamento.",
+                "id_transacao": None,
+                "codigo_erro": "timeout",
+            }
+        if "falha_autorizacao" in numero_cartao:
+            return {
+                "status": "rejeitado",
+                "mensagem": "Falha na autorização do cartão de crédito.",
+                "id_transacao": None,
+            }
+
+        valor_da_parcela = (
+            round(valor_a_pagar / numero_parcelas, 2)
+            if numero_parcelas > 0
+            else valor_a_pagar
+        )
+        mensagem_aprovado = (
+            f"Pagamento de R${valor_a_pagar:.2f} com cartão de crédito aprovado"
+        )
+        if numero_parcelas > 1:
+            mensagem_aprovado += f" em {numero_parcelas}x de R${valor_da_parcela:.2f}."
+        else:
+            mensagem_aprovado += " à vista."
+        return {
+            "status": "aprovado",
+            "mensagem": mensagem_aprovado,
+            "id_transacao": self.gerador_ids.proximo_com_prefixo("CC_SIM"),
+        }
+
+    def _autorizar_pix_no_gateway(
+        self, chave_pix: str, valor_a_pagar: float
+    ) -> Dict[str, Any]:
+        return {
+            "status": "aprovado",
+            "mensagem": f"Pagamento PIX de R${valor_a_pagar:.2f} aprovado.",
+            "id_transacao": self.gerador_ids.proximo_com_prefixo("PIX_SIM"),
+        }
+
+    def _verificar_velocidade_excedida(self, detalhes_pagamento: Dict[str, Any]) -> bool:
+        """
+        Registra a tentativa para o cartão e para o cliente e indica se alguma
+        das chaves ultrapassou o limite de tentativas da janela.
+        """
+        if self.limite_velocidade is None:
+            return False
+        chaves = []
+        if detalhes_pagamento.get("numero_cartao"):
+            chaves.append(f"cartao:{detalhes_pagamento['numero_cartao']}")
+        if detalhes_pagamento.get("cliente_id"):
+            chaves.append(f"cliente:{detalhes_pagamento['cliente_id']}")
+        excedido = False
+        for chave in chaves:
+            if not self.limite_velocidade.permitir(chave):
+                excedido = True
+        return excedido
+
     def _simular_verificacao_fraude(
         self, detalhes_pagamento: Dict[str, Any], valor_compra: float
     ) -> bool:
@@ -384,10 +604,18 @@ class SistemaPagamento:
                 "mensagem": "Valor do reembolso deve ser positivo.",
             }
 
+        id_reembolso = self.gerador_ids.proximo_com_prefixo("REEMB")
+        try:
+            self.livro_razao.registrar_reembolso(
+                id_reembolso, id_transacao_original, valor_reembolso
+            )
+        except ValueError as e:
+            return {"status": "falha", "mensagem": str(e)}
+
         return {
             "status": "sucesso",
             "mensagem": f"Reembolso de R${valor_reembolso:.2f} para transação {id_transacao_original} processado.",
-            "id_reembolso": f"REEMB_{abs(hash(id_transacao_original))}",
+            "id_reembolso": id_reembolso,
         }
 
     def gerar_comprovante(self, id_transacao: str, dados_compra: Dict[str, Any]) -> str:
@@ -410,6 +638,106 @@ class SistemaPagamento:
         )
 
 
+# ==============================================================================
+# CLASSE LINHAS PEDIDO
+# ==============================================================================
+class ItemPedido(NamedTuple):
+    """
+    Linha de um pedido, com preço unitário e nome do produto no momento da compra.
+    """
+
+    id_produto: int
+    quantidade: int
+    preco_unitario: float
+    nome: str
+
+    @property
+    def preco(self) -> float:
+        return self.preco_unitario
+
+
+class LinhasPedido:
+    """
+    Linhas de um pedido em formato compacto: ids, quantidades e preços
+    unitários em arrays tipados, e os nomes numa tupla (os textos são os
+    mesmos objetos do catálogo, não cópias). Não guarda referências a
+    objetos Produto, então pedidos antigos não prendem o catálogo em memória
+    e notas fiscais e relatórios usam o preço da compra, não o atual.
+    """
+
+    __slots__ = ("ids", "quantidades", "precos", "nomes")
+
+    def __init__(
+        self,
+        ids: "array[int]",
+        quantidades: "array[int]",
+        precos: "array[float]",
+        nomes: Tuple[str, ...],
+    ):
+        self.ids = ids
+        self.quantidades = quantidades
+        self.precos = precos
+        self.nomes = nomes
+
+    @classmethod
+    def de_produtos(cls, itens: Iterable[Tuple["Produto", int]]) -> "LinhasPedido":
+        return cls.de_tuplas((p.id_produto, q, p.preco, p.nome) for p, q in itens)
+
+    @classmethod
+    def de_tuplas(cls, linhas: Iterable[Iterable[Any]]) -> "LinhasPedido":
+        """
+        Constrói a partir de (id_produto, quantidade, preco_unitario, nome).
+        """
+        ids, quantidades, precos = array("q"), array("q"), array("d")
+        nomes = []
+        for id_produto, quantidade, preco, nome in linhas:
+            ids.append(id_produto)
+            quantidades.append(quantidade)
+            precos.append(preco)
+            nomes.append(nome)
+        return cls(ids, quantidades, precos, tuple(nomes))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, indice: int) -> ItemPedido:
+        return ItemPedido(
+            self.ids[indice], self.quantidades[indice], self.precos[indice], self.nomes[indice]
+        )
+
+    def __iter__(self) -> Iterator[ItemPedido]:
+        return map(ItemPedido, self.ids, self.quantidades, self.precos, self.nomes)
+
+    def pares(self) -> Iterator[Tuple[int, int]]:
+        """
+        Pares (id_produto, quantidade), no formato usado nas operações de estoque.
+        """
+        return zip(self.ids, self.quantidades)
+
+    def subtotal(self) -> float:
+        return sum(p * q for p, q in zip(self.precos, self.quantidades))
+
+
+def _maquina_pedidos() -> MaquinaEstados:
+    """
+    Ciclo de vida padrão de um pedido, com o campo de data de cada status.
+    """
+    maquina = MaquinaEstados()
+    for estado, campo_data in (
+        ("pendente", None),
+        ("pago", "pagamento"),
+        ("enviado", "envio"),
+        ("entregue", "entrega"),
+        ("cancelado", "cancelamento"),
+    ):
+        maquina.adicionar_estado(estado, campo_data)
+    maquina.permitir("pendente", "pago", "cancelado")
+    maquina.permitir("pago", "enviado", "cancelado")
+    maquina.permitir("enviado", "entregue", "cancelado")
+    maquina.permitir("entregue", "cancelado")
+    return maquina
+
+
 # ==============================================================================
 # CLASSE PEDIDO
 # ==============================================================================
@@ -418,14 +746,16 @@ class Pedido:
     Classe que representa uma compra finalizada.
     """
 
-    ESTADOS_VALIDOS = ["pendente", "pago", "enviado", "entregue", "cancelado"]
-    TRANSICOES_PERMITIDAS = {
-        "pendente": ["pago", "cancelado"],
-        "pago": ["enviado", "cancelado"],
-        "enviado": ["entregue", "cancelado"],
-        "entregue": ["cancelado"],
-        "cancelado": [],
-    }
+    # Novos status (ex.: "em_separacao", "devolvido") e ganchos são
+    # acrescentados na máquina; para não afetar todos os pedidos, estenda
+    # uma cópia (`MAQUINA_ESTADOS.copiar()`) numa subclasse. Os status novos
+    # não contam como venda (STATUS_FATURADOS) nem devolvem estoque ao
+    # serem cancelados.
+    MAQUINA_ESTADOS = _maquina_pedidos()
+    # Visões por nome da máquina padrão, atualizadas junto com ela.
+    ESTADOS_VALIDOS = MAQUINA_ESTADOS.estados
+    TRANSICOES_PERMITIDAS = MAQUINA_ESTADOS.transicoes
+    FRETE_PADRAO = 25.0
 
     def __init__(
         self,
@@ -448,7 +778,7 @@ class Pedido:
 
         self.id_pedido = id_pedido
         self.cliente_id = cliente_id
-        self.itens_comprados: List[Tuple[Produto, int]] = list(carrinho.get_itens())
+        self.linhas = LinhasPedido.de_produtos(carrinho.get_itens())
         self.valor_total_pedido = carrinho.calcular_valor_total()
         self.endereco_entrega = endereco_entrega
         self.metodo_pagamento_escolhido = metodo_pagamento_escolhido
@@ -462,46 +792,89 @@ class Pedido:
         }
         self.id_transacao_pagamento: Optional[str] = None
         self.valor_final_pago: Optional[float] = None
-
-    def _atualizar_data(self, evento: str):
-        if evento in self.datas:
-            self.datas[evento] = datetime.now()
-        else:
-            raise ValueError(
-                f"Evento '{evento}' desconhecido para atualização de data."
-            )
+        # Notificado a cada mudança efetiva de status: observador(pedido, status_anterior)
+        self.observador: Optional[Callable[["Pedido", str], None]] = None
+        # Armazéns de onde sai o pedido, quando o sistema tem um motor de
+        # alocação; define o frete.
+        self.alocacao: Optional[Alocacao] = None
+
+    @classmethod
+    def restaurar(
+        cls,
+        id_pedido: int,
+        cliente_id: str,
+        linhas: LinhasPedido,
+        valor_total_pedido: float,
+        endereco_entrega: Dict,
+        metodo_pagamento_escolhido: str,
+        data_criacao: datetime,
+    ) -> "Pedido":
+        """
+        Reconstrói um pedido pendente a partir de dados persistidos, sem
+        passar por um Carrinho.
+        """
+        pedido = cls.__new__(cls)
+        pedido.id_pedido = id_pedido
+        pedido.cliente_id = cliente_id
+        pedido.linhas = linhas
+        pedido.valor_total_pedido = valor_total_pedido
+        pedido.endereco_entrega = endereco_entrega
+        pedido.metodo_pagamento_escolhido = metodo_pagamento_escolhido
+        pedido.status_pedido = "pendente"
+        pedido.datas = {
+            "criacao": data_criacao,
+            "pagamento": None,
+            "envio": None,
+            "entrega": None,
+            "cancelamento": None,
+        }
+        pedido.id_transacao_pagamento = None
+        pedido.valor_final_pago = None
+        pedido.observador = None
+        pedido.alocacao = None
+        return pedido
+
+    @property
+    def itens_comprados(self) -> List[Tuple[ItemPedido, int]]:
+        """
+        Itens no formato (item, quantidade). Cada item traz `id_produto`,
+        `nome` e `preco` da época da compra.
+        """
+        return [(item, item.quantidade) for item in self.linhas]
 
     def atualizar_status(self, novo_status: str) -> bool:
-        if novo_status not in self.ESTADOS_VALIDOS:
+        """
+        Leva o pedido a `novo_status` se a máquina de estados permitir,
+        preenchendo a data do status. Pedir o status atual não muda nada e
+        retorna True.
+        """
+        maquina = self.MAQUINA_ESTADOS
+        destino = maquina.codigos.get(novo_status)
+        if destino is None:
+            return False
+        status_anterior = self.status_pedido
+        if status_anterior == novo_status:
+            return True
+        origem = maquina.codigos.get(status_anterior)
+        if origem is None or not maquina.mascaras[origem] >> destino & 1:
             return False
-
-        transicoes_possiveis = self.TRANSICOES_PERMITIDAS.get(self.status_pedido, [])
-        if (
-            novo_status not in transicoes_possiveis
-            and self.status_pedido != novo_status
-        ):
-            if self.status_pedido == "entregue" and novo_status == "cancelado":
-                pass
-            elif self.status_pedido == "cancelado" and novo_status == "cancelado":
-                pass
-            else:
-                return False
 
         self.status_pedido = novo_status
-        if novo_status == "pago":
-            self._atualizar_data("pagamento")
-        elif novo_status == "enviado":
-            self._atualizar_data("envio")
-        elif novo_status == "entregue":
-            self._atualizar_data("entrega")
-        elif novo_status == "cancelado":
-            self._atualizar_data("cancelamento")
+        campo_data = maquina.campos_data[destino]
+        if campo_data is not None:
+            self.datas[campo_data] = datetime.now()
+        if self.observador is not None:
+            self.observador(self, status_anterior)
+        for gancho in maquina.ganchos[destino]:
+            gancho(self, status_anterior)
         return True
 
     def calcular_frete(self) -> float:
         if self.valor_total_pedido > 200:
             return 0.0
-        return 25.0
+        if self.alocacao is not None:
+            return self.alocacao.frete
+        return self.FRETE_PADRAO
 
     def gerar_nota_fiscal(self) -> str:
         if self.status_pedido not in ["pago", "enviado", "entregue"]:
@@ -523,9 +896,9 @@ class Pedido:
             )
             nota += f"Data do Pagamento: {data_pagamento_str}\n"
         nota += "Itens:\n"
-        for produto_item, qtd in self.itens_comprados:
-            nota += f"  - {produto_item.nome}: {qtd} x R${produto_item.preco:.2f} = R${produto_item.preco * qtd:.2f}\n"
-        subtotal = sum(p.preco * q for p, q in self.itens_comprados)
+        for item in self.linhas:
+            nota += f"  - {item.nome}: {item.quantidade} x R${item.preco_unitario:.2f} = R${item.preco_unitario * item.quantidade:.2f}\n"
+        subtotal = self.linhas.subtotal()
         nota += f"Subtotal: R${subtotal:.2f}\n"
         frete = self.calcular_frete()
         nota += f"Frete: R${frete:.2f}\n"
@@ -557,13 +930,288 @@ class Pedido:
 # CLASSE SISTEMA ECOMMERCE
 # ==============================================================================
 class SistemaEcommerce:
-    def __init__(self):
+    """
+    Classe principal que integra catálogo, carrinhos, pedidos e pagamentos.
+
+    Segura para uso concorrente: o status de cada pedido é protegido por locks
+    listrados por id de pedido, os ids são alocados atomicamente e o estoque
+    é atualizado de forma otimista, por compare-and-set sobre a versão do
+    estoque de cada produto, com no máximo `MAX_TENTATIVAS_CAS` tentativas.
+    Nenhum lock de estoque é mantido enquanto o pedido é processado, então
+    produtos muito disputados não serializam as compras.
+    """
+
+    NUM_LISTRAS_LOCKS = 64
+    MAX_TENTATIVAS_CAS = 16
+
+    def __init__(self, gerador_ids: Optional[GeradorIds] = None):
         self.produtos_catalogo: Dict[int, Produto] = {}
         self.pedidos_registrados: Dict[int, Pedido] = {}
         self.usuarios: Dict[str, Dict] = {}
-        self.sistema_pagamento = SistemaPagamento()
-        self._proximo_id_produto = 1
-        self._proximo_id_pedido = 1
+        # Gerador de ids de transação compartilhado com o sistema de pagamento
+        self.gerador_ids = gerador_ids or obter_gerador_padrao()
+        self.sistema_pagamento = SistemaPagamento(gerador_ids=self.gerador_ids)
+        self.limite_pedidos_cliente: Optional[LimiteVelocidade] = None
+        self._contador_produtos = ContadorAtomico(1)
+        self._contador_pedidos = ContadorAtomico(1)
+        self._locks_pedidos = LocksListrados(self.NUM_LISTRAS_LOCKS)
+        # Pedidos com chamada ao gateway em andamento (ver processar_pagamento_pedido).
+        self._pagamentos_em_andamento: Set[int] = set()
+        self._lock_pagamentos = threading.Lock()
+        # Conflitos de versão observados nas atualizações otimistas de estoque
+        self._conflitos_estoque = ContadorAtomico(0)
+        # Ouvintes de eventos de domínio: ouvinte(tipo_evento, dados)
+        self._ouvintes: List[Callable[[str, Dict[str, Any]], None]] = []
+        # Ouvintes chamados só depois da operação: fora dos locks de pedido
+        # e depois de confirmada a transação do armazenamento.
+        self._ouvintes_confirmados: List[Callable[[str, Dict[str, Any]], None]] = []
+        self._ha_ouvintes = False
+        self._eventos_confirmados = EntregaOrdenada(self._entregar_confirmado)
+        # Eventos adiados pela operação em andamento em cada thread.
+        self._adiados = threading.local()
+        # Armazenamento opcional (ex.: ArmazenamentoSQLite); se presente, seu
+        # `transacao()` agrupa os eventos de uma operação numa única transação.
+        self.armazenamento: Optional[Any] = None
+        # Totais de vendas por status, método de pagamento e dia, mantidos a
+        # cada criação e mudança de status de pedido.
+        self.agregados_vendas = AgregadosVendas()
+        # Vendas em baldes de hora/dia/mês do pagamento, por produto e categoria.
+        self.rollups_vendas = RollupsVendas(self._categoria_do_produto)
+        # Índices secundários de pedidos: por cliente, por status e por data.
+        self.indices_pedidos = IndicesPedidos()
+        # Estoque por armazém; cada mudança vira um evento
+        # estoque_armazem_alterado, como o estoque dos produtos.
+        self.estoque_armazens = EstoqueArmazens()
+        self.estoque_armazens.observador = self._observar_estoque_armazem
+        # Motor opcional (estoque_armazens.MotorAlocacao) que escolhe os
+        # armazéns de cada pedido e retira deles o estoque no pagamento.
+        self.motor_alocacao: Optional[Any] = None
+        # Snapshot binário (snapshot_binario.SnapshotBinario) do qual o
+        # sistema foi carregado; seus registros são lidos sob demanda.
+        self.snapshot_origem: Optional[Any] = None
+
+    def adicionar_ouvinte(
+        self, ouvinte: Callable[[str, Dict[str, Any]], None], apos_confirmacao: bool = False
+    ) -> None:
+        """
+        Registra um ouvinte para os eventos de domínio do sistema:
+        produto_adicionado, estoque_alterado, estoque_armazem_alterado,
+        preco_alterado, usuario_registrado, pedido_criado, pedido_pago,
+        pedido_cancelado e pedido_status_alterado.
+
+        Por padrão o ouvinte é chamado na hora, dentro da operação (é assim
+        que o armazenamento grava cada mudança). Com `apos_confirmacao`, ele
+        recebe os eventos de uma operação só quando ela termina: depois de
+        liberados os locks de pedido e de confirmada a transação do
+        armazenamento; os eventos de uma transação que falhou não chegam a
+        ele. A ordem dos eventos é mantida entre threads.
+        """
+        if apos_confirmacao:
+            self._ouvintes_confirmados.append(ouvinte)
+        else:
+            self._ouvintes.append(ouvinte)
+        self._ha_ouvintes = True
+
+    def remover_ouvinte(self, ouvinte: Callable[[str, Dict[str, Any]], None]) -> None:
+        if ouvinte in self._ouvintes:
+            self._ouvintes.remove(ouvinte)
+        else:
+            self._ouvintes_confirmados.remove(ouvinte)
+        self._ha_ouvintes = bool(self._ouvintes or self._ouvintes_confirmados)
+
+    def _emitir(self, tipo: str, dados: Dict[str, Any]) -> None:
+        for ouvinte in self._ouvintes:
+            ouvinte(tipo, dados)
+        if self._ouvintes_confirmados:
+            # O número é reservado aqui, ainda dentro dos locks da operação,
+            # e fixa a ordem de entrega.
+            numero = self._eventos_confirmados.reservar()
+            adiados = getattr(self._adiados, "eventos", None)
+            if adiados is None:
+                self._eventos_confirmados.concluir([(numero, (tipo, dados))])
+            else:
+                adiados.append((numero, (tipo, dados)))
+
+    def _entregar_confirmado(self, evento: Tuple[str, Dict[str, Any]]) -> None:
+        for ouvinte in self._ouvintes_confirmados:
+            ouvinte(*evento)
+
+    @contextlib.contextmanager
+    def _adiar_eventos(self) -> Iterator[None]:
+        """
+        Segura até o fim do bloco mais externo da thread os eventos para os
+        ouvintes `apos_confirmacao`. Deve envolver os locks de pedido, para
+        que esses ouvintes sejam chamados já sem eles.
+        """
+        if getattr(self._adiados, "eventos", None) is not None:
+            yield
+            return
+        self._adiados.eventos = adiados = []
+        try:
+            yield
+        finally:
+            self._adiados.eventos = None
+            if adiados:
+                self._eventos_confirmados.concluir(adiados)
+
+    def _observar_estoque(self, produto: Produto, variacao: int) -> None:
+        if self._ha_ouvintes:
+            self._emitir(
+                "estoque_alterado",
+                {"id_produto": produto.id_produto, "variacao": variacao},
+            )
+
+    def _observar_estoque_armazem(self, id_produto: int, id_armazem: str, variacao: int) -> None:
+        if self._ha_ouvintes:
+            self._emitir(
+                "estoque_armazem_alterado",
+                {"id_produto": id_produto, "id_armazem": id_armazem, "variacao": variacao},
+            )
+
+    def _contabilizar_transicao(self, pedido: Pedido, status_anterior: str) -> None:
+        """
+        Atualiza os totais, os baldes de vendas e o índice por status com
+        uma mudança de status.
+        """
+        self.agregados_vendas.registrar_transicao(pedido, status_anterior)
+        self.rollups_vendas.registrar_transicao(pedido, status_anterior)
+        self.indices_pedidos.registrar_transicao(pedido, status_anterior)
+
+    def _contabilizar_transicoes(self, transicoes: List[Tuple[Pedido, str]]) -> None:
+        """
+        `_contabilizar_transicao` para um lote, com um lock por estrutura.
+        """
+        self.agregados_vendas.registrar_transicoes(transicoes)
+        for pedido, status_anterior in transicoes:
+            self.rollups_vendas.registrar_transicao(pedido, status_anterior)
+        self.indices_pedidos.registrar_transicoes(transicoes)
+
+    def _observar_pedido(self, pedido: Pedido, status_anterior: str) -> None:
+        self._contabilizar_transicao(pedido, status_anterior)
+        if self._ha_ouvintes:
+            self._emitir_transicao(pedido, status_anterior)
+
+    def _emitir_transicao(self, pedido: Pedido, status_anterior: str) -> None:
+        dados: Dict[str, Any] = {
+            "id_pedido": pedido.id_pedido,
+            "status_anterior": status_anterior,
+            "status": pedido.status_pedido,
+        }
+        if pedido.status_pedido == "pago":
+            dados["id_transacao"] = pedido.id_transacao_pagamento
+            dados["valor_pago"] = pedido.valor_final_pago
+            dados["data"] = pedido.datas["pagamento"].timestamp()
+            dados["alocacao"] = alocacao_para_dados(pedido.alocacao)
+            self._emitir("pedido_pago", dados)
+        elif pedido.status_pedido == "cancelado":
+            dados["data"] = pedido.datas["cancelamento"].timestamp()
+            self._emitir("pedido_cancelado", dados)
+        else:
+            campo = pedido.MAQUINA_ESTADOS.campo_data(pedido.status_pedido)
+            dados["campo_data"] = campo
+            dados["data"] = pedido.datas[campo].timestamp() if campo else None
+            self._emitir("pedido_status_alterado", dados)
+
+    def _categoria_do_produto(self, id_produto: int) -> Optional[str]:
+        produto = self.produtos_catalogo.get(id_produto)
+        return produto.categoria if produto else None
+
+    @contextlib.contextmanager
+    def _transacao(self) -> Iterator[None]:
+        """
+        Agrupa os eventos do bloco numa transação do armazenamento, se houver,
+        e adia os dos ouvintes `apos_confirmacao` até a confirmação. Se a
+        gravação falhar, esses eventos são descartados.
+        """
+        with self._adiar_eventos():
+            if self.armazenamento is None:
+                yield
+                return
+            adiados = self._adiados.eventos
+            marca = len(adiados)
+            erro_bloco: Optional[BaseException] = None
+            try:
+                with self.armazenamento.transacao():
+                    try:
+                        yield
+                    except BaseException as erro:
+                        erro_bloco = erro
+                        raise
+            except BaseException as erro:
+                if erro is not erro_bloco:
+                    adiados[marca:] = [(numero, None) for numero, _ in adiados[marca:]]
+                raise
+
+    def _vincular_produto(self, produto: Produto) -> None:
+        produto.observador_estoque = self._observar_estoque
+
+    def _vincular_pedido(self, pedido: Pedido) -> None:
+        pedido.observador = self._observar_pedido
+
+    @property
+    def conflitos_estoque(self) -> int:
+        return self._conflitos_estoque.proximo
+
+    @property
+    def _proximo_id_produto(self) -> int:
+        return self._contador_produtos.proximo
+
+    @_proximo_id_produto.setter
+    def _proximo_id_produto(self, valor: int) -> None:
+        self._contador_produtos.ajustar(valor)
+
+    @property
+    def _proximo_id_pedido(self) -> int:
+        return self._contador_pedidos.proximo
+
+    @_proximo_id_pedido.setter
+    def _proximo_id_pedido(self, valor: int) -> None:
+        self._contador_pedidos.ajustar(valor)
+
+    def configurar_limite_pedidos(
+        self, limite_pedidos_cliente: Optional[LimiteVelocidade]
+    ) -> None:
+        """
+        Define (ou remove, com None) o limite de pedidos por cliente em `criar_pedido`.
+        """
+        self.limite_pedidos_cliente = limite_pedidos_cliente
+
+    def configurar_alocacao(self, motor_alocacao: Optional[Any]) -> None:
+        """
+        Define (ou remove, com None) o motor de alocação por armazém. Com ele,
+        cada pedido criado recebe uma alocação planejada para o CEP de entrega
+        (que define o frete), e o pagamento retira o estoque dos armazéns
+        escolhidos, refazendo a escolha se o estoque mudou. O total de
+        `Produto.quantidade_em_estoque` continua sendo mantido à parte.
+
+        O motor passa a usar o estoque por armazém do sistema
+        (`estoque_armazens`), que é o gravado pela persistência. Um motor
+        montado sobre outro estoque só é aceito enquanto o do sistema está
+        vazio: o estoque dele é adotado, e suas quantidades são emitidas como
+        eventos. Levanta ValueError caso contrário.
+        """
+        if motor_alocacao is not None and motor_alocacao.estoque is not self.estoque_armazens:
+            if self.estoque_armazens.quantidades():
+                raise ValueError(
+                    "O motor de alocação deve usar o estoque por armazém do sistema (estoque_armazens)."
+                )
+            estoque = motor_alocacao.estoque
+            estoque.observador = self._observar_estoque_armazem
+            self.estoque_armazens = estoque
+            for id_produto, id_armazem, quantidade in estoque.quantidades():
+                self._observar_estoque_armazem(id_produto, id_armazem, quantidade)
+        self.motor_alocacao = motor_alocacao
+
+    def _planejar_alocacao(self, pedido: Pedido) -> None:
+        cep = pedido.endereco_entrega.get("cep")
+        if cep is None:
+            return
+        try:
+            pedido.alocacao = self.motor_alocacao.planejar(pedido.linhas.pares(), cep)
+        except ValueError:
+            # Sem armazém que atenda agora: o frete fica o padrão e o
+            # pagamento tenta alocar de novo.
+            pedido.alocacao = None
 
     def configurar_sistema_pagamento(
         self,
@@ -581,7 +1229,12 @@ class SistemaEcommerce:
             else desconto_pix
         )
         self.sistema_pagamento = SistemaPagamento(
-            taxa_juros_parcelamento=current_juros, desconto_pix=current_pix
+            taxa_juros_parcelamento=current_juros,
+            desconto_pix=current_pix,
+            limite_velocidade=self.sistema_pagamento.limite_velocidade,
+            resiliencia=self.sistema_pagamento.resiliencia,
+            gerador_ids=self.gerador_ids,
+            livro_razao=self.sistema_pagamento.livro_razao,
         )
 
     def adicionar_produto_catalogo(
@@ -592,7 +1245,7 @@ class SistemaEcommerce:
         quantidade_em_estoque: int,
         categoria: str,
     ) -> Produto:
-        novo_id = self._proximo_id_produto
+        novo_id = self._contador_produtos.alocar()
         produto = Produto(
             id_produto=novo_id,
             nome=nome,
@@ -601,14 +1254,56 @@ class SistemaEcommerce:
             quantidade_em_estoque=quantidade_em_estoque,
             categoria=categoria,
         )
+        self._vincular_produto(produto)
+        if self._ha_ouvintes:
+            self._emitir("produto_adicionado", produto.obter_informacoes_detalhadas())
         self.produtos_catalogo[novo_id] = produto
-        self._proximo_id_produto += 1
         print(f"Produto '{nome}' adicionado ao catálogo com ID {novo_id}.")
         return produto
 
+    def iniciar_venda_relampago(self, id_produto: int, num_fragmentos: int = 8) -> bool:
+        """
+        Coloca o produto em modo de venda relâmpago, com o estoque dividido em
+        `num_fragmentos` sub-contadores. Retorna False se o produto não existir.
+        """
+        produto = self.produtos_catalogo.get(id_produto)
+        if not produto:
+            return False
+        produto.iniciar_venda_relampago(num_fragmentos)
+        print(
+            f"Venda relâmpago iniciada para '{produto.nome}' com {num_fragmentos} fragmentos de estoque."
+        )
+        return True
+
+    def encerrar_venda_relampago(self, id_produto: int) -> Optional[int]:
+        """
+        Encerra a venda relâmpago e retorna o estoque restante, já unificado.
+        """
+        produto = self.produtos_catalogo.get(id_produto)
+        if not produto:
+            return None
+        restante = produto.encerrar_venda_relampago()
+        print(f"Venda relâmpago de '{produto.nome}' encerrada. Estoque restante: {restante}.")
+        return restante
+
     def recuperar_produto_por_id(self, id_produto: int) -> Optional[Produto]:
         return self.produtos_catalogo.get(id_produto)
 
+    def atualizar_preco(self, id_produto: int, novo_preco: float) -> bool:
+        """
+        Altera o preço de um produto do catálogo. Retorna False se o produto
+        não existir. O valor total de pedidos já criados não muda.
+        """
+        if not isinstance(novo_preco, (int, float)) or novo_preco <= 0:
+            raise ValueError("Preço deve ser um número positivo.")
+        produto = self.produtos_catalogo.get(id_produto)
+        if not produto:
+            return False
+        produto.preco = float(novo_preco)
+        if self._ha_ouvintes:
+            self._emitir("preco_alterado", {"id_produto": id_produto, "preco": produto.preco})
+        return True
+
     def buscar_produtos(
         self, termo_busca: str, categoria: Optional[str] = None
     ) -> List[Produto]:
@@ -628,6 +1323,10 @@ class SistemaEcommerce:
         if user_id in self.usuarios:
             raise ValueError(f"Usuário com ID '{user_id}' já existe.")
         self.usuarios[user_id] = dados_usuario
+        if self._ha_ouvintes:
+            self._emitir(
+                "usuario_registrado", {"user_id": user_id, "dados": dados_usuario}
+            )
         print(f"Usuário '{user_id}' registrado com sucesso.")
 
     def criar_pedido(
@@ -641,8 +1340,15 @@ class SistemaEcommerce:
             return None
         if not carrinho.get_itens():
             return None
+        if self.limite_pedidos_cliente is not None and not (
+            self.limite_pedidos_cliente.permitir(f"cliente:{cliente_id}")
+        ):
+            print(
+                f"Limite de pedidos excedido para o cliente '{cliente_id}'. Tente novamente mais tarde."
+            )
+            return None
 
-        novo_id_pedido = self._proximo_id_pedido
+        novo_id_pedido = self._contador_pedidos.alocar()
         try:
             pedido = Pedido(
                 id_pedido=novo_id_pedido,
@@ -651,8 +1357,19 @@ class SistemaEcommerce:
                 endereco_entrega=endereco_entrega,
                 metodo_pagamento_escolhido=metodo_pagamento_escolhido,
             )
+            if self.motor_alocacao is not None:
+                self._planejar_alocacao(pedido)
+            self._vincular_pedido(pedido)
+            # Totais e índices recebem o pedido antes de ele ficar visível:
+            # uma transição feita por outra thread logo após a publicação
+            # já encontra o pedido contado como pendente.
+            self.agregados_vendas.registrar_pedido(pedido)
+            self.indices_pedidos.registrar_pedido(pedido)
+            # Emitido antes de publicar o pedido, para que nenhum evento de
+            # status dele chegue aos ouvintes antes do evento de criação.
+            if self._ha_ouvintes:
+                self._emitir_pedido_criado(pedido)
             self.pedidos_registrados[novo_id_pedido] = pedido
-            self._proximo_id_pedido += 1
             print(
                 f"Pedido {novo_id_pedido} criado com sucesso para o cliente '{cliente_id}'."
             )
@@ -661,6 +1378,103 @@ class SistemaEcommerce:
             print(f"Erro ao criar pedido: {e}")
             return None
 
+    def _emitir_pedido_criado(self, pedido: Pedido) -> None:
+        self._emitir(
+            "pedido_criado",
+            {
+                "id_pedido": pedido.id_pedido,
+                "cliente_id": pedido.cliente_id,
+                "itens": [list(item) for item in pedido.linhas],
+                "valor_total": pedido.valor_total_pedido,
+                "endereco_entrega": pedido.endereco_entrega,
+                "metodo_pagamento": pedido.metodo_pagamento_escolhido,
+                "data": pedido.datas["criacao"].timestamp(),
+                "alocacao": alocacao_para_dados(pedido.alocacao),
+            },
+        )
+
+    def criar_pedidos_em_lote(
+        self, solicitacoes: List[Tuple[str, Carrinho, Dict, str]], validar_estoque: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Cria vários pedidos (cliente_id, carrinho, endereco_entrega,
+        metodo_pagamento) de uma vez, na ordem recebida.
+
+        O estoque de cada produto é lido uma única vez para o lote inteiro:
+        uma solicitação é recusada se o seu carrinho, somado aos das
+        solicitações anteriores aceitas no mesmo lote, excede o estoque
+        atual (a menos que `validar_estoque` seja False). O estoque continua
+        sendo reduzido só no pagamento. Os ids dos pedidos aceitos são
+        alocados num único bloco e os eventos de criação vão numa única
+        transação do armazenamento. Retorna
+        `{"criados": {indice: Pedido}, "recusados": {indice: motivo}}`, com
+        os índices das solicitações.
+        """
+        criados: Dict[int, Pedido] = {}
+        recusados: Dict[int, str] = {}
+        aceitas: List[int] = []
+        estoque: Dict[int, int] = {}
+        demanda: Dict[int, int] = {}
+
+        for indice, (cliente_id, carrinho, _, _) in enumerate(solicitacoes):
+            if cliente_id not in self.usuarios:
+                recusados[indice] = "Cliente não encontrado."
+                continue
+            itens = carrinho.get_itens()
+            if not itens:
+                recusados[indice] = "Carrinho vazio."
+                continue
+            if self.limite_pedidos_cliente is not None and not (
+                self.limite_pedidos_cliente.permitir(f"cliente:{cliente_id}")
+            ):
+                recusados[indice] = "Limite de pedidos excedido para o cliente."
+                continue
+            if not validar_estoque:
+                aceitas.append(indice)
+                continue
+            for produto, quantidade in itens:
+                id_produto = produto.id_produto
+                if id_produto not in estoque:
+                    estoque[id_produto] = produto.quantidade_em_estoque
+                if demanda.get(id_produto, 0) + quantidade > estoque[id_produto]:
+                    recusados[indice] = f"Estoque insuficiente para o produto '{produto.nome}'."
+                    break
+            else:
+                for produto, quantidade in itens:
+                    demanda[produto.id_produto] = demanda.get(produto.id_produto, 0) + quantidade
+                aceitas.append(indice)
+
+        if aceitas:
+            primeiro_id = self._contador_pedidos.alocar(len(aceitas))
+            for deslocamento, indice in enumerate(aceitas):
+                cliente_id, carrinho, endereco_entrega, metodo_pagamento = solicitacoes[indice]
+                try:
+                    criados[indice] = Pedido(
+                        id_pedido=primeiro_id + deslocamento,
+                        cliente_id=cliente_id,
+                        carrinho=carrinho,
+                        endereco_entrega=endereco_entrega,
+                        metodo_pagamento_escolhido=metodo_pagamento,
+                    )
+                except ValueError as e:
+                    recusados[indice] = str(e)
+                    continue
+                if self.motor_alocacao is not None:
+                    self._planejar_alocacao(criados[indice])
+            # Totais e índices recebem o lote antes de os pedidos ficarem
+            # visíveis, enquanto todos ainda estão pendentes.
+            pedidos = list(criados.values())
+            self.agregados_vendas.registrar_pedidos(pedidos)
+            self.indices_pedidos.registrar_pedidos(pedidos)
+            with self._transacao():
+                for pedido in pedidos:
+                    self._vincular_pedido(pedido)
+                    if self._ha_ouvintes:
+                        self._emitir_pedido_criado(pedido)
+                    self.pedidos_registrados[pedido.id_pedido] = pedido
+        print(f"{len(criados)} pedidos criados em lote; {len(recusados)} recusados.")
+        return {"criados": criados, "recusados": recusados}
+
     def processar_pagamento_pedido(
         self, id_pedido: int, detalhes_pagamento_cliente: Dict
     ) -> Dict[str, Any]:
@@ -670,12 +1484,70 @@ class SistemaEcommerce:
                 "status": "erro",
                 "mensagem": f"Pedido ID {id_pedido} não encontrado.",
             }
+        # O lock do pedido não fica preso durante a chamada ao gateway, que
+        # pode levar segundos com retentativas e esperas. Sob o lock, o pedido
+        # é conferido e marcado como em pagamento, o que recusa um segundo
+        # pagamento simultâneo; depois da chamada, o resultado é registrado
+        # sob o lock de novo, se o pedido continuar pendente.
+        with self._locks_pedidos.adquirir([id_pedido]):
+            erro = self._iniciar_pagamento(pedido)
+        if erro is not None:
+            return erro
+        try:
+            valor_a_pagar, resultado_pagamento = self._cobrar_pedido(
+                pedido, detalhes_pagamento_cliente
+            )
+        except BaseException:
+            with self._locks_pedidos.adquirir([id_pedido]):
+                self._encerrar_pagamento(id_pedido)
+            raise
+        with self._adiar_eventos(), self._locks_pedidos.adquirir([id_pedido]):
+            self._encerrar_pagamento(id_pedido)
+            status_atual = pedido.status_pedido
+            if status_atual == "pendente":
+                self._registrar_resultado_pagamento(pedido, valor_a_pagar, resultado_pagamento)
+                return resultado_pagamento
+        # O pedido mudou de status durante a chamada (ex.: foi cancelado): uma
+        # cobrança aprovada é estornada, em vez de paga num pedido que não a espera.
+        mensagem = f"Pedido ID {id_pedido} mudou para '{status_atual}' durante o pagamento."
+        if resultado_pagamento["status"] == "aprovado":
+            self.sistema_pagamento.processar_reembolso(
+                resultado_pagamento["id_transacao"], valor_a_pagar
+            )
+            mensagem += " A cobrança aprovada foi estornada."
+        print(mensagem)
+        return {"status": "erro", "mensagem": mensagem}
+
+    def _iniciar_pagamento(self, pedido: Pedido) -> Optional[Dict[str, Any]]:
+        """
+        Com o lock do pedido: confere que ele pode ser pago e o marca como em
+        pagamento. Retorna o erro, se não puder.
+        """
+        id_pedido = pedido.id_pedido
         if pedido.status_pedido != "pendente":
             return {
                 "status": "erro",
                 "mensagem": f"Pedido ID {id_pedido} não está pendente de pagamento (status: {pedido.status_pedido}).",
             }
+        with self._lock_pagamentos:
+            if id_pedido in self._pagamentos_em_andamento:
+                return {
+                    "status": "erro",
+                    "mensagem": f"Pagamento do pedido ID {id_pedido} já está em andamento.",
+                }
+            self._pagamentos_em_andamento.add(id_pedido)
+        return None
+
+    def _encerrar_pagamento(self, id_pedido: int) -> None:
+        with self._lock_pagamentos:
+            self._pagamentos_em_andamento.discard(id_pedido)
 
+    def _cobrar_pedido(
+        self, pedido: Pedido, detalhes_pagamento_cliente: Dict
+    ) -> Tuple[float, Dict[str, Any]]:
+        """
+        Calcula o valor a pagar e chama o gateway, sem lock. Retorna (valor, resultado).
+        """
         valor_a_pagar = pedido.valor_total_pedido
 
         if pedido.metodo_pagamento_escolhido == "pix":
@@ -696,6 +1568,8 @@ class SistemaEcommerce:
         detalhes_pagamento_cliente_com_valor = {
             **detalhes_pagamento_cliente,
             "valor_compra_calculado": valor_a_pagar,
+            "cliente_id": pedido.cliente_id,
+            "id_pedido": pedido.id_pedido,
         }
 
         resultado_pagamento = self.sistema_pagamento.processar_pagamento(
@@ -703,33 +1577,67 @@ class SistemaEcommerce:
             pedido.metodo_pagamento_escolhido,
             detalhes_pagamento_cliente_com_valor,
         )
+        return valor_a_pagar, resultado_pagamento
 
+    def _registrar_resultado_pagamento(
+        self, pedido: Pedido, valor_a_pagar: float, resultado_pagamento: Dict[str, Any]
+    ) -> None:
+        """
+        Com o lock do pedido pendente: baixa o estoque e registra o pagamento
+        aprovado, numa única transação do armazenamento.
+        """
+        id_pedido = pedido.id_pedido
         if resultado_pagamento["status"] == "aprovado":
             print(f"Pagamento do pedido {id_pedido} aprovado.")
-            pedido.registrar_pagamento(
-                resultado_pagamento["id_transacao"], valor_a_pagar
-            )
-            try:
-                for produto_no_pedido, quantidade_comprada in pedido.itens_comprados:
-                    produto_catalogo = self.produtos_catalogo.get(
-                        produto_no_pedido.id_produto
+            with self._transacao():
+                # O estoque sai antes de registrar o pagamento, para que o
+                # evento pedido_pago já leve a alocação reservada.
+                try:
+                    self._reduzir_estoque_itens(pedido.linhas.pares())
+                    if self.motor_alocacao is not None or pedido.alocacao is not None:
+                        self._reservar_alocacao(pedido)
+                except ValueError as e:
+                    # Sem estoque retirado dos armazéns, não há o que devolver
+                    # num cancelamento.
+                    pedido.alocacao = None
+                    resultado_pagamento["status"] = "aprovado_com_erro_estoque"
+                    resultado_pagamento["mensagem"] = (
+                        f"{resultado_pagamento['mensagem']} Erro ao reduzir estoque: {e}"
                     )
-                    if produto_catalogo:
-                        produto_catalogo.reduzir_estoque(quantidade_comprada)
-                    else:
-                        raise Exception(
-                            f"Produto ID {produto_no_pedido.id_produto} do pedido não encontrado no catálogo para reduzir estoque."
-                        )
-            except ValueError as e:
-                resultado_pagamento["status"] = "aprovado_com_erro_estoque"
-                resultado_pagamento["mensagem"] = (
-                    f"{resultado_pagamento['mensagem']} Erro ao reduzir estoque: {e}"
+                pedido.registrar_pagamento(
+                    resultado_pagamento["id_transacao"], valor_a_pagar
                 )
         elif resultado_pagamento["status"] in ["rejeitado", "erro"]:
             print(
                 f"Pagamento do pedido {id_pedido} falhou: {resultado_pagamento['mensagem']}"
             )
-        return resultado_pagamento
+
+    def _reservar_alocacao(self, pedido: Pedido) -> None:
+        """
+        Retira dos armazéns o estoque do pedido pago; se não houver, devolve
+        o total já reduzido dos produtos e levanta ValueError. Sem motor (ex.:
+        pedido restaurado antes de configurar a alocação), só o plano do
+        pedido pode ser usado.
+
+        Se o plano precisar ser refeito, os armazéns mudam, mas o frete do
+        pedido continua o cotado na criação (o do plano, ou o padrão se não
+        havia plano): o cliente já pagou por ele.
+        """
+        itens = list(pedido.linhas.pares())
+        try:
+            if self.motor_alocacao is not None:
+                plano = pedido.alocacao
+                alocacao = self.motor_alocacao.reservar(itens, pedido.endereco_entrega.get("cep", ""), plano)
+                if alocacao is not plano:
+                    alocacao = alocacao._replace(
+                        frete=plano.frete if plano is not None else Pedido.FRETE_PADRAO
+                    )
+                pedido.alocacao = alocacao
+            elif not self.estoque_armazens.retirar(pedido.alocacao.remessas):
+                raise ValueError("Os armazéns planejados não têm mais o estoque do pedido.")
+        except ValueError:
+            self._reabastecer(itens)
+            raise
 
     def cancelar_pedido(
         self, id_pedido: int, motivo: str = "Cancelado pelo sistema"
@@ -739,36 +1647,331 @@ class SistemaEcommerce:
             print(f"Pedido {id_pedido} não encontrado para cancelamento.")
             return False
 
-        status_anterior = pedido.status_pedido
-        if pedido.atualizar_status("cancelado"):
-            if status_anterior in ["pago", "enviado"]:
-                for produto_no_pedido, quantidade_comprada in pedido.itens_comprados:
-                    produto_catalogo = self.produtos_catalogo.get(
-                        produto_no_pedido.id_produto
-                    )
-                    if produto_catalogo:
-                        produto_catalogo.adicionar_estoque(quantidade_comprada)
-            print(f"Pedido {id_pedido} cancelado com sucesso. Motivo: {motivo}")
-            return True
+        with self._adiar_eventos(), self._locks_pedidos.adquirir([id_pedido]), self._transacao():
+            status_anterior = pedido.status_pedido
+            if pedido.atualizar_status("cancelado"):
+                if status_anterior in ["pago", "enviado"]:
+                    self._reabastecer(pedido.linhas.pares())
+                    self._devolver_alocacao(pedido)
+                print(f"Pedido {id_pedido} cancelado com sucesso. Motivo: {motivo}")
+                return True
         print(f"Não foi possível cancelar o pedido {id_pedido}.")
         return False
 
-    def gerar_relatorio_vendas(self, status_filtro: Optional[str] = None) -> Dict:
-        total_vendas = 0.0
-        num_pedidos = 0
-        pedidos_filtrados = []
+    def _devolver_alocacao(self, pedido: Pedido) -> None:
+        if pedido.alocacao is not None:
+            self.estoque_armazens.devolver(pedido.alocacao.remessas)
 
-        for pedido_obj in self.pedidos_registrados.values():
-            if status_filtro and pedido_obj.status_pedido != status_filtro:
+    def _reabastecer(self, itens: Iterable[Tuple[int, int]]) -> None:
+        """
+        Devolve ao estoque as quantidades (id_produto, quantidade) informadas.
+        """
+        for id_produto, quantidade in itens:
+            produto_catalogo = self.produtos_catalogo.get(id_produto)
+            if not produto_catalogo:
                 continue
+            if produto_catalogo.em_venda_relampago:
+                produto_catalogo.adicionar_estoque(quantidade)
+                continue
+            for _ in range(self.MAX_TENTATIVAS_CAS):
+                atual, versao = produto_catalogo.ler_estoque()
+                if produto_catalogo.comparar_e_definir_estoque(versao, atual + quantidade):
+                    break
+                self._conflitos_estoque.alocar()
+            else:
+                # Somar é comutativo: sob contenção extrema, o incremento
+                # atômico garante a devolução sem depender de novas tentativas.
+                produto_catalogo.adicionar_estoque(quantidade)
 
-            if pedido_obj.status_pedido in ["pago", "enviado", "entregue"]:
-                if pedido_obj.valor_final_pago is not None:
-                    total_vendas += pedido_obj.valor_final_pago
-                num_pedidos += 1
-            pedidos_filtrados.append(str(pedido_obj))
+    def _reduzir_estoque_itens(self, itens: Iterable[Tuple[int, int]]) -> None:
+        """
+        Reduz o estoque de todos os itens (id_produto, quantidade) ou de nenhum.
+
+        Cada tentativa lê quantidade e versão de todos os produtos, valida a
+        disponibilidade e aplica os decrementos por compare-and-set, em ordem
+        crescente de id. Se algum produto mudou desde a leitura, os decrementos
+        já aplicados são desfeitos e a operação é repetida, até
+        `MAX_TENTATIVAS_CAS` vezes. Produtos em venda relâmpago não usam
+        compare-and-set: são reservados nos seus fragmentos antes dos demais e
+        devolvidos se o restante falhar. Levanta ValueError se faltar estoque
+        ou se as tentativas se esgotarem.
+        """
+        quantidades: Dict[int, int] = {}
+        for id_produto, quantidade in itens:
+            quantidades[id_produto] = quantidades.get(id_produto, 0) + quantidade
+
+        produtos: List[Tuple[Produto, int]] = []
+        em_venda_relampago: List[Tuple[Produto, int]] = []
+        for id_produto in sorted(quantidades):
+            produto_catalogo = self.produtos_catalogo.get(id_produto)
+            if not produto_catalogo:
+                raise Exception(
+                    f"Produto ID {id_produto} do pedido não encontrado no catálogo para reduzir estoque."
+                )
+            if produto_catalogo.em_venda_relampago:
+                em_venda_relampago.append((produto_catalogo, quantidades[id_produto]))
+            else:
+                produtos.append((produto_catalogo, quantidades[id_produto]))
+
+        # Produtos em venda relâmpago são reservados nos seus fragmentos; se
+        # algo falhar depois, as reservas são devolvidas.
+        reservados: List[Tuple[Produto, int]] = []
+        try:
+            for produto_catalogo, quantidade in em_venda_relampago:
+                produto_catalogo.reduzir_estoque(quantidade)
+                reservados.append((produto_catalogo, quantidade))
+            self._reduzir_estoque_cas(produtos)
+        except Exception:
+            for produto_catalogo, quantidade in reservados:
+                produto_catalogo.adicionar_estoque(quantidade)
+            raise
+
+    def _reduzir_estoque_cas(self, produtos: List[Tuple[Produto, int]]) -> None:
+        for _ in range(self.MAX_TENTATIVAS_CAS):
+            leituras = []
+            for produto_catalogo, quantidade in produtos:
+                disponivel, versao = produto_catalogo.ler_estoque()
+                if quantidade > disponivel:
+                    raise ValueError(
+                        f"Não há estoque suficiente para esta venda do produto '{produto_catalogo.nome}'. "
+                        f"Solicitado: {quantidade}, Disponível: {disponivel}."
+                    )
+                leituras.append((produto_catalogo, versao, disponivel - quantidade))
+
+            aplicados: List[Tuple[Produto, int]] = []
+            for (produto_catalogo, versao, nova_quantidade), (_, quantidade) in zip(
+                leituras, produtos
+            ):
+                if not produto_catalogo.comparar_e_definir_estoque(versao, nova_quantidade):
+                    break
+                aplicados.append((produto_catalogo, quantidade))
+            else:
+                return
+
+            self._conflitos_estoque.alocar()
+            for produto_catalogo, quantidade in aplicados:
+                produto_catalogo.adicionar_estoque(quantidade)
+
+        raise ValueError(
+            f"Conflito de concorrência ao atualizar o estoque após {self.MAX_TENTATIVAS_CAS} tentativas."
+        )
+
+    def cancelar_pedidos_em_lote(
+        self,
+        ids_pedidos: List[int],
+        motivo: str = "Cancelamento em lote",
+        reembolsar: bool = True,
+        max_reembolsos_paralelos: int = 8,
+    ) -> Dict[str, Any]:
+        """
+        Cancela vários pedidos de uma vez (ex.: recall de fornecedor).
+
+        O reabastecimento é agrupado por produto, com uma única atualização de
+        estoque por produto, e os reembolsos dos pedidos já pagos são emitidos
+        em paralelo, limitados a `max_reembolsos_paralelos` simultâneos.
+        Retorna um relatório consolidado da operação.
+        """
+        if not isinstance(max_reembolsos_paralelos, int) or max_reembolsos_paralelos <= 0:
+            raise ValueError("Número de reembolsos paralelos deve ser um inteiro positivo.")
+
+        cancelados: List[int] = []
+        nao_cancelados: Dict[int, str] = {}
+        reabastecimento: Dict[int, int] = {}
+        pedidos_a_reembolsar: List[Pedido] = []
+
+        # Status e reabastecimento vão numa única transação do armazenamento,
+        # como em `cancelar_pedido`.
+        with self._transacao():
+            for id_pedido in dict.fromkeys(ids_pedidos):
+                pedido = self.pedidos_registrados.get(id_pedido)
+                if not pedido:
+                    nao_cancelados[id_pedido] = "Pedido não encontrado."
+                    continue
+                with self._locks_pedidos.adquirir([id_pedido]):
+                    status_anterior = pedido.status_pedido
+                    if status_anterior == "cancelado":
+                        nao_cancelados[id_pedido] = "Pedido já está cancelado."
+                        continue
+                    if not pedido.atualizar_status("cancelado"):
+                        nao_cancelados[id_pedido] = (
+                            f"Transição de '{status_anterior}' para 'cancelado' não permitida."
+                        )
+                        continue
+                cancelados.append(id_pedido)
+                if status_anterior in ["pago", "enviado"]:
+                    for id_produto, quantidade_comprada in pedido.linhas.pares():
+                        reabastecimento[id_produto] = (
+                            reabastecimento.get(id_produto, 0) + quantidade_comprada
+                        )
+                    self._devolver_alocacao(pedido)
+                if reembolsar and pedido.id_transacao_pagamento and pedido.valor_final_pago:
+                    pedidos_a_reembolsar.append(pedido)
+
+            self._reabastecer(reabastecimento.items())
+
+        reembolsos: Dict[int, Dict[str, Any]] = {}
+        if pedidos_a_reembolsar:
+            with ThreadPoolExecutor(max_workers=max_reembolsos_paralelos) as executor:
+                resultados = executor.map(
+                    lambda p: self.sistema_pagamento.processar_reembolso(
+                        p.id_transacao_pagamento, p.valor_final_pago
+                    ),
+                    pedidos_a_reembolsar,
+                )
+                for pedido, resultado in zip(pedidos_a_reembolsar, resultados):
+                    reembolsos[pedido.id_pedido] = resultado
 
+        total_reembolsado = sum(
+            pedido.valor_final_pago
+            for pedido in pedidos_a_reembolsar
+            if reembolsos[pedido.id_pedido]["status"] == "sucesso"
+        )
+        falhas_reembolso = {
+            id_pedido: resultado["mensagem"]
+            for id_pedido, resultado in reembolsos.items()
+            if resultado["status"] != "sucesso"
+        }
+        print(
+            f"Cancelamento em lote: {len(cancelados)} pedidos cancelados, "
+            f"{len(nao_cancelados)} não cancelados. Motivo: {motivo}"
+        )
         return {
+            "pedidos_cancelados": cancelados,
+            "pedidos_nao_cancelados": nao_cancelados,
+            "estoque_reabastecido": reabastecimento,
+            "reembolsos": reembolsos,
+            "falhas_reembolso": falhas_reembolso,
+            "total_reembolsado": round(total_reembolsado, 2),
+        }
+
+    def atualizar_status_em_lote(
+        self, ids_pedidos: Iterable[int], novo_status: str, tamanho_bloco: int = 1024
+    ) -> Dict[str, Any]:
+        """
+        Leva vários pedidos ao mesmo status (ex.: um lote do armazém marcado
+        como "enviado" ou "entregue"). Retorna os ids aceitos e, para cada
+        rejeitado, o motivo.
+
+        Cada transição é validada pela máquina de estados do pedido. As
+        válidas recebem a mesma data, capturada uma vez, e entram nos
+        agregados e índices de uma vez por bloco. Os pedidos são bloqueados
+        por blocos de `tamanho_bloco` ids, uma vez por listra de lock, e os
+        eventos de cada bloco são gravados numa única transação do
+        armazenamento. Pagamento e cancelamento têm efeitos além do status
+        e continuam em `processar_pagamento_pedido` e `cancelar_pedidos_em_lote`.
+        """
+        if novo_status in ("pago", "cancelado"):
+            raise ValueError(
+                f"Transição em lote para '{novo_status}' não suportada; use "
+                + ("processar_pagamento_pedido." if novo_status == "pago" else "cancelar_pedidos_em_lote.")
+            )
+        if not isinstance(tamanho_bloco, int) or tamanho_bloco <= 0:
+            raise ValueError("Tamanho do bloco deve ser um inteiro positivo.")
+
+        agora = datetime.now()
+        aceitos: List[int] = []
+        rejeitados: Dict[int, str] = {}
+        ids = list(dict.fromkeys(ids_pedidos))
+        for inicio in range(0, len(ids), tamanho_bloco):
+            bloco = ids[inicio : inicio + tamanho_bloco]
+            transicoes: List[Tuple[Pedido, str]] = []
+            with self._adiar_eventos(), self._locks_pedidos.adquirir(bloco), self._transacao():
+                for id_pedido in bloco:
+                    pedido = self.pedidos_registrados.get(id_pedido)
+                    if pedido is None:
+                        rejeitados[id_pedido] = "Pedido não encontrado."
+                        continue
+                    status_anterior = pedido.status_pedido
+                    maquina = pedido.MAQUINA_ESTADOS
+                    if not maquina.permite(status_anterior, novo_status):
+                        if novo_status not in maquina.codigos:
+                            rejeitados[id_pedido] = f"Status '{novo_status}' inválido."
+                        elif status_anterior == novo_status:
+                            rejeitados[id_pedido] = f"Pedido já está '{novo_status}'."
+                        else:
+                            rejeitados[id_pedido] = (
+                                f"Transição de '{status_anterior}' para '{novo_status}' não permitida."
+                            )
+                        continue
+                    pedido.status_pedido = novo_status
+                    campo_data = maquina.campo_data(novo_status)
+                    if campo_data is not None:
+                        pedido.datas[campo_data] = agora
+                    transicoes.append((pedido, status_anterior))
+                    aceitos.append(id_pedido)
+                self._contabilizar_transicoes(transicoes)
+                for pedido, status_anterior in transicoes:
+                    if self._ha_ouvintes:
+                        self._emitir_transicao(pedido, status_anterior)
+                    maquina = pedido.MAQUINA_ESTADOS
+                    for gancho in maquina.ganchos[maquina.codigos[novo_status]]:
+                        gancho(pedido, status_anterior)
+        return {"aceitos": aceitos, "rejeitados": rejeitados}
+
+    def _pedidos_dos_ids(self, ids: List[int]) -> List[Pedido]:
+        return [self.pedidos_registrados[id_pedido] for id_pedido in ids]
+
+    def pedidos_do_cliente(
+        self, cliente_id: str, pagina: int = 1, tamanho_pagina: int = 50
+    ) -> List[Pedido]:
+        """
+        Pedidos do cliente em ordem de id, uma página por vez, via índice.
+        """
+        return self._pedidos_dos_ids(
+            self.indices_pedidos.do_cliente(cliente_id, pagina, tamanho_pagina)
+        )
+
+    def pedidos_por_status(
+        self, status: str, pagina: int = 1, tamanho_pagina: int = 50
+    ) -> List[Pedido]:
+        """
+        Pedidos num status, na ordem em que entraram nele, via índice.
+        """
+        return self._pedidos_dos_ids(
+            self.indices_pedidos.por_status(status, pagina, tamanho_pagina)
+        )
+
+    def pedidos_aguardando_envio(self, pagina: int = 1, tamanho_pagina: int = 50) -> List[Pedido]:
+        """
+        Pedidos pagos e ainda não enviados, os pagos há mais tempo primeiro.
+        """
+        return self.pedidos_por_status("pago", pagina, tamanho_pagina)
+
+    def pedidos_por_data(
+        self,
+        inicio: Optional[datetime] = None,
+        fim: Optional[datetime] = None,
+        pagina: int = 1,
+        tamanho_pagina: int = 50,
+    ) -> List[Pedido]:
+        """
+        Pedidos criados em [inicio, fim), do mais antigo ao mais novo.
+        """
+        return self._pedidos_dos_ids(
+            self.indices_pedidos.por_data(inicio, fim, pagina, tamanho_pagina)
+        )
+
+    def gerar_relatorio_vendas(
+        self,
+        status_filtro: Optional[str] = None,
+        listar_pedidos: bool = True,
+        pagina: int = 1,
+        tamanho_pagina: Optional[int] = None,
+    ) -> Dict:
+        """
+        Totais de vendas (pedidos pagos/enviados/entregues, opcionalmente só
+        os de `status_filtro`), lidos dos agregados em O(1).
+
+        Como antes, o relatório traz a lista dos pedidos (todos, ou só os de
+        `status_filtro`). Com `tamanho_pagina` ela vem uma página por vez; com
+        `listar_pedidos=False` não é montada e o relatório custa só os totais.
+        """
+        status_contabilizados = [
+            s for s in STATUS_FATURADOS if not status_filtro or s == status_filtro
+        ]
+        num_pedidos, total_vendas = self.agregados_vendas.totais(status_contabilizados)
+
+        relatorio = {
             "total_vendas_apuradas": round(total_vendas, 2),
             "numero_de_pedidos_contabilizados": num_pedidos,
             "filtro_status_aplicado": (
@@ -776,9 +1979,37 @@ class SistemaEcommerce:
                 if status_filtro
                 else "Nenhum (considerados pagos/enviados/entregues)"
             ),
-            "lista_pedidos_no_relatorio": pedidos_filtrados,
+            "vendas_por_metodo_pagamento": self.agregados_vendas.por_metodo_pagamento(
+                status_contabilizados
+            ),
         }
-
+        if listar_pedidos:
+            relatorio["pagina"] = pagina
+            relatorio["lista_pedidos_no_relatorio"] = [
+                str(p) for p in self._listar_pedidos(status_filtro, pagina, tamanho_pagina)
+            ]
+        return relatorio
+
+    def _listar_pedidos(
+        self, status_filtro: Optional[str], pagina: int, tamanho_pagina: Optional[int]
+    ) -> List[Pedido]:
+        if not isinstance(pagina, int) or pagina < 1:
+            raise ValueError("Página deve ser um inteiro maior ou igual a 1.")
+        if tamanho_pagina is None:
+            if pagina != 1:
+                raise ValueError("Sem tamanho de página, só existe a página 1.")
+        elif not isinstance(tamanho_pagina, int) or tamanho_pagina <= 0:
+            raise ValueError("Tamanho da página deve ser um inteiro positivo.")
+        if status_filtro:
+            if tamanho_pagina is None:
+                tamanho_pagina = max(1, self.indices_pedidos.contar_por_status(status_filtro))
+            return self.pedidos_por_status(status_filtro, pagina, tamanho_pagina)
+        if tamanho_pagina is None:
+            return list(self.pedidos_registrados.values())
+        inicio = (pagina - 1) * tamanho_pagina
+        return list(
+            itertools.islice(self.pedidos_registrados.values(), inicio, inicio + tamanho_pagina)
+        )
 
 if __name__ == "__main__":
     print("==== Demonstração do Sistema de E-commerce ====\n")
@@ -0,0 +1,253 @@
+import collections
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.ecommerce_sistema import Carrinho, SistemaEcommerce
+
+
+class _Solicitacao:
+    __slots__ = ("tipo", "argumentos", "futuro", "instante")
+
+    def __init__(self, tipo: str, argumentos: Tuple[Any, ...]):
+        self.tipo = tipo
+        self.argumentos = argumentos
+        self.futuro: Future = Future()
+        self.instante = time.perf_counter()
+
+
+# ==============================================================================
+# CLASSE FILA ENTRADA PEDIDOS
+# ==============================================================================
+class FilaEntradaPedidos:
+    """
+    Fila de entrada de pedidos e pagamentos para horários de pico.
+
+    `enviar_pedido` e `enviar_pagamento` enfileiram a solicitação e retornam
+    na hora um `Future`. Uma thread de fundo junta as solicitações em
+    microlotes, que fecham ao atingir `tamanho_lote` ou `janela` segundos
+    depois da primeira solicitação. Os pedidos de cada microlote são criados
+    com `SistemaEcommerce.criar_pedidos_em_lote`, que valida o estoque do lote
+    com uma leitura por produto e aloca os ids num único bloco. Os pagamentos
+    são entregues, depois dos pedidos do mesmo lote, a um pool de até
+    `max_pagamentos_paralelos` threads: a chamada ao gateway de um pagamento
+    não segura os lotes seguintes. Até `capacidade` pagamentos podem estar
+    no pool sem resposta; atingido esse limite, a thread de fundo espera uma
+    vaga antes de entregar o próximo.
+
+    O `Future` de um pedido resolve com o `Pedido` criado, ou None se ele foi
+    recusado, como em `criar_pedido`. O de um pagamento resolve com o mesmo
+    dicionário de `processar_pagamento_pedido`.
+
+    A fila comporta `capacidade` solicitações. Com a fila cheia, `politica`
+    decide:
+        "rejeitar": a solicitação é recusada na hora.
+        "enfileirar": o envio espera haver espaço, até `espera_maxima`
+            segundos se informado, e então a solicitação é recusada.
+    """
+
+    POLITICAS = ("rejeitar", "enfileirar")
+    AMOSTRAS_LATENCIA = 4096
+
+    def __init__(
+        self,
+        sistema: SistemaEcommerce,
+        capacidade: int = 1024,
+        tamanho_lote: int = 64,
+        janela: float = 0.002,
+        politica: str = "enfileirar",
+        espera_maxima: Optional[float] = None,
+        max_pagamentos_paralelos: int = 8,
+    ):
+        if politica not in self.POLITICAS:
+            raise ValueError(f"Política deve ser uma de {', '.join(self.POLITICAS)}.")
+        if not isinstance(capacidade, int) or capacidade <= 0:
+            raise ValueError("Capacidade deve ser um inteiro positivo.")
+        if not isinstance(tamanho_lote, int) or tamanho_lote <= 0:
+            raise ValueError("Tamanho do lote deve ser um inteiro positivo.")
+        if janela < 0:
+            raise ValueError("Janela do lote não pode ser negativa.")
+        if not isinstance(max_pagamentos_paralelos, int) or max_pagamentos_paralelos <= 0:
+            raise ValueError("Número de pagamentos paralelos deve ser um inteiro positivo.")
+
+        self.sistema = sistema
+        self.capacidade = capacidade
+        self.tamanho_lote = tamanho_lote
+        self.janela = janela
+        self.politica = politica
+        self.espera_maxima = espera_maxima
+        self._fila: Deque[_Solicitacao] = collections.deque()
+        self._cond = threading.Condition()
+        self._fechado = False
+        self.recebidos = 0
+        self.rejeitados = 0
+        self.concluidos = 0
+        self.lotes = 0
+        self.maior_profundidade = 0
+        # Latências (envio até a resposta) das últimas solicitações.
+        self._latencias: Deque[float] = collections.deque(maxlen=self.AMOSTRAS_LATENCIA)
+        self._executor_pagamentos = ThreadPoolExecutor(
+            max_workers=max_pagamentos_paralelos, thread_name_prefix="pagamentos"
+        )
+        self._vagas_pagamentos = threading.BoundedSemaphore(capacidade)
+        self._thread = threading.Thread(target=self._processar, daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------ envio
+    def enviar_pedido(
+        self,
+        cliente_id: str,
+        carrinho: Carrinho,
+        endereco_entrega: Dict,
+        metodo_pagamento_escolhido: str,
+    ) -> Future:
+        """
+        Enfileira a criação de um pedido; o `Future` resolve com o `Pedido`
+        ou None.
+        """
+        solicitacao = _Solicitacao(
+            "pedido", (cliente_id, carrinho, endereco_entrega, metodo_pagamento_escolhido)
+        )
+        if not self._enfileirar(solicitacao):
+            print(f"Fila de pedidos cheia. Pedido do cliente '{cliente_id}' recusado.")
+            solicitacao.futuro.set_result(None)
+        return solicitacao.futuro
+
+    def enviar_pagamento(self, id_pedido: int, detalhes_pagamento_cliente: Dict) -> Future:
+        """
+        Enfileira o pagamento de um pedido; o `Future` resolve com o
+        resultado de `processar_pagamento_pedido`.
+        """
+        solicitacao = _Solicitacao("pagamento", (id_pedido, detalhes_pagamento_cliente))
+        if not self._enfileirar(solicitacao):
+            solicitacao.futuro.set_result(
+                {
+                    "status": "erro",
+                    "mensagem": f"Fila de pedidos cheia. Pagamento do pedido ID {id_pedido} recusado.",
+                }
+            )
+        return solicitacao.futuro
+
+    def _enfileirar(self, solicitacao: _Solicitacao) -> bool:
+        with self._cond:
+            if self._fechado:
+                raise ValueError("Fila de entrada de pedidos já foi fechada.")
+            self.recebidos += 1
+            if len(self._fila) >= self.capacidade:
+                if self.politica == "enfileirar":
+                    self._cond.wait_for(
+                        lambda: len(self._fila) < self.capacidade or self._fechado,
+                        self.espera_maxima,
+                    )
+                if len(self._fila) >= self.capacidade or self._fechado:
+                    self.rejeitados += 1
+                    return False
+            self._fila.append(solicitacao)
+            profundidade = len(self._fila)
+            if profundidade > self.maior_profundidade:
+                self.maior_profundidade = profundidade
+            # A thread de processamento só precisa acordar quando um lote
+            # começa ou fica cheio; no meio da janela ela dorme até o prazo.
+            if profundidade == 1 or profundidade == self.tamanho_lote:
+                self._cond.notify_all()
+            return True
+
+    # ------------------------------------------------------------------ processamento
+    def _proximo_lote(self) -> Optional[List[_Solicitacao]]:
+        with self._cond:
+            self._cond.wait_for(lambda: self._fila or self._fechado)
+            if not self._fila:
+                return None
+            # O lote fecha cheio ou `janela` segundos depois da primeira
+            # solicitação, o que vier antes.
+            prazo = self._fila[0].instante + self.janela
+            while len(self._fila) < self.tamanho_lote and not self._fechado:
+                restante = prazo - time.perf_counter()
+                if restante <= 0:
+                    break
+                self._cond.wait(restante)
+            lote = [self._fila.popleft() for _ in range(min(self.tamanho_lote, len(self._fila)))]
+            self._cond.notify_all()
+            return lote
+
+    def _processar(self) -> None:
+        while True:
+            lote = self._proximo_lote()
+            if lote is None:
+                return
+            pedidos = [s for s in lote if s.tipo == "pedido"]
+            pagamentos = [s for s in lote if s.tipo == "pagamento"]
+            if pedidos:
+                try:
+                    resultado = self.sistema.criar_pedidos_em_lote([s.argumentos for s in pedidos])
+                except Exception as e:
+                    for solicitacao in pedidos:
+                        solicitacao.futuro.set_exception(e)
+                else:
+                    criados = resultado["criados"]
+                    for indice, solicitacao in enumerate(pedidos):
+                        self._responder(solicitacao, criados.get(indice))
+            with self._cond:
+                self.lotes += 1
+                self.concluidos += len(pedidos)
+            for solicitacao in pagamentos:
+                self._vagas_pagamentos.acquire()
+                self._executor_pagamentos.submit(self._pagar, solicitacao)
+
+    def _pagar(self, solicitacao: _Solicitacao) -> None:
+        try:
+            resposta = self.sistema.processar_pagamento_pedido(*solicitacao.argumentos)
+        except Exception as e:
+            solicitacao.futuro.set_exception(e)
+        else:
+            self._responder(solicitacao, resposta)
+        finally:
+            with self._cond:
+                self.concluidos += 1
+            self._vagas_pagamentos.release()
+
+    def _responder(self, solicitacao: _Solicitacao, resultado: Any) -> None:
+        with self._cond:
+            self._latencias.append(time.perf_counter() - solicitacao.instante)
+        solicitacao.futuro.set_result(resultado)
+
+    # ------------------------------------------------------------------ métricas
+    @property
+    def profundidade(self) -> int:
+        return len(self._fila)
+
+    def metricas(self) -> Dict[str, Any]:
+        """
+        Profundidade da fila, contadores e latências (em segundos, do envio
+        até a resposta) das últimas solicitações atendidas.
+        """
+        with self._cond:
+            latencias = sorted(self._latencias)
+            metricas: Dict[str, Any] = {
+                "profundidade": len(self._fila),
+                "maior_profundidade": self.maior_profundidade,
+                "capacidade": self.capacidade,
+                "recebidos": self.recebidos,
+                "rejeitados": self.rejeitados,
+                "concluidos": self.concluidos,
+                "lotes": self.lotes,
+                "tamanho_medio_lote": self.concluidos / self.lotes if self.lotes else 0.0,
+            }
+        if latencias:
+            metricas["latencia_media"] = sum(latencias) / len(latencias)
+            metricas["latencia_p50"] = latencias[len(latencias) // 2]
+            metricas["latencia_p99"] = latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))]
+            metricas["latencia_maxima"] = latencias[-1]
+        return metricas
+
+    def fechar(self) -> None:
+        """
+        Para de aceitar solicitações e espera as já enfileiradas serem
+        atendidas, inclusive os pagamentos em andamento no pool.
+        """
+        with self._cond:
+            self._fechado = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._executor_pagamentos.shutdown(wait=True)
@@ -0,0 +1,405 @@
+import bisect
+import threading
+from array import array
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+CRITERIOS_ALOCACAO = ("custo", "prazo")
+
+
+def normalizar_cep(cep) -> int:
+    """
+    Converte um CEP ("01310-100", "01310100" ou 1310100) no inteiro de 8
+    dígitos usado nas faixas. Levanta ValueError se ele não tiver 8 dígitos.
+    """
+    if isinstance(cep, int):
+        numero = cep
+    else:
+        digitos = "".join(c for c in str(cep) if c.isdigit())
+        if len(digitos) != 8:
+            raise ValueError(f"CEP inválido: '{cep}'.")
+        numero = int(digitos)
+    if not 0 <= numero <= 99_999_999:
+        raise ValueError(f"CEP inválido: '{cep}'.")
+    return numero
+
+
+class Remessa(NamedTuple):
+    id_armazem: str
+    itens: Tuple[Tuple[int, int], ...]
+    frete: float
+    prazo_dias: int
+
+
+class Alocacao(NamedTuple):
+    """
+    Armazéns escolhidos para um pedido: uma remessa por armazém, com o frete
+    somado e o prazo da remessa mais demorada.
+
+    No SistemaEcommerce, `frete` é o cobrado do cliente: se a alocação é
+    refeita no pagamento, ele continua o cotado na criação do pedido, e o
+    custo real de cada remessa fica em `Remessa.frete`.
+    """
+
+    remessas: Tuple[Remessa, ...]
+    frete: float
+    prazo_dias: int
+
+    @property
+    def dividida(self) -> bool:
+        return len(self.remessas) > 1
+
+
+def alocacao_para_dados(alocacao: Optional[Alocacao]) -> Optional[List[Any]]:
+    """
+    Converte uma alocação (ou None) em listas serializáveis em JSON:
+    [[[id_armazem, [[id_produto, quantidade], ...], frete, prazo_dias], ...], frete, prazo_dias].
+    """
+    if alocacao is None:
+        return None
+    remessas = [
+        [r.id_armazem, [list(item) for item in r.itens], r.frete, r.prazo_dias] for r in alocacao.remessas
+    ]
+    return [remessas, alocacao.frete, alocacao.prazo_dias]
+
+
+def alocacao_de_dados(dados: Optional[List[Any]]) -> Optional[Alocacao]:
+    """
+    Reconstrói a alocação gravada por `alocacao_para_dados`.
+    """
+    if dados is None:
+        return None
+    remessas, frete, prazo_dias = dados
+    return Alocacao(
+        tuple(
+            Remessa(id_armazem, tuple((p, q) for p, q in itens), frete_remessa, prazo_remessa)
+            for id_armazem, itens, frete_remessa, prazo_remessa in remessas
+        ),
+        frete,
+        prazo_dias,
+    )
+
+
+class _Zona(NamedTuple):
+    # Opções (id_armazem, frete, prazo_dias) pré-ordenadas por critério, e a
+    # posição de cada armazém nessas ordens.
+    por_custo: Tuple[Tuple[str, float, int], ...]
+    por_prazo: Tuple[Tuple[str, float, int], ...]
+    posicao_custo: Dict[str, int]
+    posicao_prazo: Dict[str, int]
+    opcoes: Dict[str, Tuple[float, int]]
+
+
+# ==============================================================================
+# CLASSE TABELA ZONAS
+# ==============================================================================
+class TabelaZonas:
+    """
+    Faixas de CEP → armazéns que atendem a faixa, com frete e prazo de cada um.
+
+    As faixas são compiladas em vetores ordenados pelo CEP inicial, e as
+    opções de cada faixa já ficam ordenadas por custo e por prazo; `zona(cep)`
+    é uma busca binária, sem percorrer faixas nem ordenar armazéns.
+    """
+
+    def __init__(self):
+        self._faixas: List[Tuple[int, int, Dict[str, Tuple[float, int]]]] = []
+        self._inicios = array("q")
+        self._fins = array("q")
+        self._zonas: List[_Zona] = []
+        self._compilada = True
+
+    def adicionar_faixa(self, cep_inicial, cep_final, opcoes: Dict[str, Tuple[float, int]]) -> None:
+        """
+        Associa os CEPs de `cep_inicial` a `cep_final` (inclusive) às opções
+        {id_armazem: (frete, prazo_dias)}.
+        """
+        inicio, fim = normalizar_cep(cep_inicial), normalizar_cep(cep_final)
+        if fim < inicio:
+            raise ValueError("CEP final não pode ser anterior ao inicial.")
+        if not opcoes:
+            raise ValueError("A faixa precisa de pelo menos um armazém.")
+        for id_armazem, (frete, prazo_dias) in opcoes.items():
+            if frete < 0 or not isinstance(prazo_dias, int) or prazo_dias < 0:
+                raise ValueError(f"Frete e prazo do armazém '{id_armazem}' devem ser não negativos.")
+        self._faixas.append((inicio, fim, dict(opcoes)))
+        self._compilada = False
+
+    def _compilar(self) -> None:
+        faixas = sorted(self._faixas, key=lambda faixa: faixa[0])
+        for anterior, atual in zip(faixas, faixas[1:]):
+            if atual[0] <= anterior[1]:
+                raise ValueError(f"Faixas de CEP sobrepostas: {anterior[0]:08d}-{anterior[1]:08d} e {atual[0]:08d}-{atual[1]:08d}.")
+        self._inicios = array("q", (faixa[0] for faixa in faixas))
+        self._fins = array("q", (faixa[1] for faixa in faixas))
+        self._zonas = []
+        for _, _, opcoes in faixas:
+            lista = [(id_armazem, frete, prazo) for id_armazem, (frete, prazo) in opcoes.items()]
+            por_custo = tuple(sorted(lista, key=lambda o: (o[1], o[2])))
+            por_prazo = tuple(sorted(lista, key=lambda o: (o[2], o[1])))
+            self._zonas.append(
+                _Zona(
+                    por_custo,
+                    por_prazo,
+                    {opcao[0]: posicao for posicao, opcao in enumerate(por_custo)},
+                    {opcao[0]: posicao for posicao, opcao in enumerate(por_prazo)},
+                    opcoes,
+                )
+            )
+        self._compilada = True
+
+    def zona(self, cep) -> Optional[_Zona]:
+        """
+        Opções de armazéns para o CEP, ou None se ele não está em nenhuma faixa.
+        """
+        if not self._compilada:
+            self._compilar()
+        numero = normalizar_cep(cep)
+        posicao = bisect.bisect_right(self._inicios, numero) - 1
+        if posicao < 0 or numero > self._fins[posicao]:
+            return None
+        return self._zonas[posicao]
+
+
+# ==============================================================================
+# CLASSE ESTOQUE ARMAZENS
+# ==============================================================================
+class EstoqueArmazens:
+    """
+    Estoque de cada produto por armazém (centro de distribuição).
+
+    Cada mudança de quantidade é notificada ao `observador`, se houver,
+    como observador(id_produto, id_armazem, variacao), depois de liberado
+    o lock; é assim que o SistemaEcommerce grava o estoque dos armazéns.
+    """
+
+    def __init__(self):
+        self._estoque: Dict[int, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self.observador: Optional[Callable[[int, str, int], None]] = None
+
+    def _notificar(self, variacoes: Iterable[Tuple[Tuple[int, str], int]]) -> None:
+        observador = self.observador
+        if observador is not None:
+            for (id_produto, id_armazem), variacao in variacoes:
+                if variacao:
+                    observador(id_produto, id_armazem, variacao)
+
+    def definir(self, id_produto: int, id_armazem: str, quantidade: int) -> None:
+        if not isinstance(quantidade, int) or quantidade < 0:
+            raise ValueError("Quantidade em estoque deve ser um inteiro não negativo.")
+        with self._lock:
+            por_armazem = self._estoque.setdefault(id_produto, {})
+            variacao = quantidade - por_armazem.get(id_armazem, 0)
+            por_armazem[id_armazem] = quantidade
+        self._notificar([((id_produto, id_armazem), variacao)])
+
+    def ajustar(self, id_produto: int, id_armazem: str, variacao: int) -> None:
+        """
+        Soma `variacao` ao estoque do produto no armazém, sem validar o
+        resultado. Usado ao restaurar o estoque gravado.
+        """
+        with self._lock:
+            por_armazem = self._estoque.setdefault(id_produto, {})
+            por_armazem[id_armazem] = por_armazem.get(id_armazem, 0) + variacao
+        self._notificar([((id_produto, id_armazem), variacao)])
+
+    def quantidade(self, id_produto: int, id_armazem: str) -> int:
+        return self._estoque.get(id_produto, {}).get(id_armazem, 0)
+
+    def por_armazem(self, id_produto: int) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._estoque.get(id_produto, {}))
+
+    def total(self, id_produto: int) -> int:
+        with self._lock:
+            return sum(self._estoque.get(id_produto, {}).values())
+
+    def quantidades(self) -> List[Tuple[int, str, int]]:
+        """
+        Todo o estoque, como (id_produto, id_armazem, quantidade).
+        """
+        with self._lock:
+            return [
+                (id_produto, id_armazem, quantidade)
+                for id_produto, por_armazem in self._estoque.items()
+                for id_armazem, quantidade in por_armazem.items()
+            ]
+
+    def disponiveis(self, ids_produtos: Iterable[int]) -> Dict[int, Dict[str, int]]:
+        """
+        Cópia consistente do estoque por armazém dos produtos, lida de uma
+        vez sob o lock.
+        """
+        with self._lock:
+            return {id_produto: dict(self._estoque.get(id_produto, {})) for id_produto in ids_produtos}
+
+    def retirar(self, remessas: Iterable[Remessa]) -> bool:
+        """
+        Retira de uma vez o estoque das remessas. Retorna False, sem
+        retirar nada, se algum armazém não tiver mais a quantidade.
+        """
+        necessario: Dict[Tuple[int, str], int] = {}
+        for remessa in remessas:
+            for id_produto, quantidade in remessa.itens:
+                chave = (id_produto, remessa.id_armazem)
+                necessario[chave] = necessario.get(chave, 0) + quantidade
+        with self._lock:
+            estoque = self._estoque
+            if not all(estoque.get(p, {}).get(a, 0) >= q for (p, a), q in necessario.items()):
+                return False
+            for (id_produto, id_armazem), quantidade in necessario.items():
+                estoque[id_produto][id_armazem] -= quantidade
+        self._notificar((chave, -quantidade) for chave, quantidade in necessario.items())
+        return True
+
+    def devolver(self, remessas: Iterable[Remessa]) -> None:
+        """
+        Devolve aos armazéns o estoque das remessas.
+        """
+        devolvido: Dict[Tuple[int, str], int] = {}
+        for remessa in remessas:
+            for id_produto, quantidade in remessa.itens:
+                chave = (id_produto, remessa.id_armazem)
+                devolvido[chave] = devolvido.get(chave, 0) + quantidade
+        with self._lock:
+            for (id_produto, id_armazem), quantidade in devolvido.items():
+                por_armazem = self._estoque.setdefault(id_produto, {})
+                por_armazem[id_armazem] = por_armazem.get(id_armazem, 0) + quantidade
+        self._notificar(devolvido.items())
+
+
+# ==============================================================================
+# CLASSE MOTOR ALOCACAO
+# ==============================================================================
+class MotorAlocacao:
+    """
+    Escolhe de quais armazéns sai cada pedido.
+
+    Com `criterio="custo"`, os armazéns que atendem o CEP são tentados do
+    menor para o maior frete; com `"prazo"`, do menor para o maior prazo.
+    Primeiro procura um único armazém com todos os itens. Se nenhum tiver e
+    a divisão for permitida, cada item sai dos armazéns preferidos que têm
+    estoque, reaproveitando os já escolhidos para não abrir remessas à toa.
+    Cada remessa paga o frete do seu armazém para a zona do CEP.
+    """
+
+    def __init__(
+        self,
+        tabela_zonas: TabelaZonas,
+        estoque: EstoqueArmazens,
+        criterio: str = "custo",
+        permitir_divisao: bool = True,
+    ):
+        if criterio not in CRITERIOS_ALOCACAO:
+            raise ValueError(f"Critério deve ser um de {', '.join(CRITERIOS_ALOCACAO)}.")
+        self.tabela_zonas = tabela_zonas
+        self.estoque = estoque
+        self.criterio = criterio
+        self.permitir_divisao = permitir_divisao
+
+    def _planejar(
+        self, itens: Iterable[Tuple[int, int]], cep, criterio: Optional[str], permitir_divisao: Optional[bool]
+    ) -> Alocacao:
+        criterio = criterio or self.criterio
+        if criterio not in CRITERIOS_ALOCACAO:
+            raise ValueError(f"Critério deve ser um de {', '.join(CRITERIOS_ALOCACAO)}.")
+        if permitir_divisao is None:
+            permitir_divisao = self.permitir_divisao
+        zona = self.tabela_zonas.zona(cep)
+        if zona is None:
+            raise ValueError(f"CEP {cep} fora da área de entrega.")
+        posicao = zona.posicao_custo if criterio == "custo" else zona.posicao_prazo
+
+        quantidades: Dict[int, int] = {}
+        for id_produto, quantidade in itens:
+            quantidades[id_produto] = quantidades.get(id_produto, 0) + quantidade
+        estoque = self.estoque.disponiveis(quantidades)
+        vazio: Dict[str, int] = {}
+
+        # Armazéns da zona com todos os itens: interseção dos que têm cada um.
+        candidatos = set(posicao)
+        for id_produto, quantidade in quantidades.items():
+            candidatos.intersection_update(
+                [a for a, d in estoque.get(id_produto, vazio).items() if d >= quantidade]
+            )
+            if not candidatos:
+                break
+        if candidatos:
+            id_armazem = min(candidatos, key=posicao.__getitem__)
+            frete, prazo = zona.opcoes[id_armazem]
+            return Alocacao(
+                (Remessa(id_armazem, tuple(quantidades.items()), frete, prazo),), frete, prazo
+            )
+        if not permitir_divisao:
+            raise ValueError("Nenhum armazém que atende o CEP tem o pedido inteiro.")
+
+        escolhidos: Dict[str, List[Tuple[int, int]]] = {}
+        for id_produto, quantidade in quantidades.items():
+            # Armazéns já escolhidos primeiro, depois os demais, na ordem
+            # de preferência.
+            ordem = sorted(
+                (a not in escolhidos, posicao[a], a, d)
+                for a, d in estoque.get(id_produto, vazio).items()
+                if d and a in posicao
+            )
+            restante = quantidade
+            for _, _, id_armazem, disponivel in ordem:
+                retirar = min(disponivel, restante)
+                escolhidos.setdefault(id_armazem, []).append((id_produto, retirar))
+                restante -= retirar
+                if not restante:
+                    break
+            if restante:
+                raise ValueError(
+                    f"Estoque insuficiente nos armazéns que atendem o CEP para o produto ID {id_produto}."
+                )
+        remessas = tuple(
+            Remessa(id_armazem, tuple(escolhidos[id_armazem]), *zona.opcoes[id_armazem])
+            for id_armazem in sorted(escolhidos, key=posicao.__getitem__)
+        )
+        return Alocacao(
+            remessas, round(sum(r.frete for r in remessas), 2), max(r.prazo_dias for r in remessas)
+        )
+
+    def planejar(
+        self,
+        itens: Iterable[Tuple[int, int]],
+        cep,
+        criterio: Optional[str] = None,
+        permitir_divisao: Optional[bool] = None,
+    ) -> Alocacao:
+        """
+        Escolhe os armazéns para os itens (id_produto, quantidade) sem
+        retirar estoque (ex.: para cotar o frete). Levanta ValueError se o
+        CEP não é atendido ou falta estoque.
+        """
+        return self._planejar(itens, cep, criterio, permitir_divisao)
+
+    def reservar(
+        self,
+        itens: Iterable[Tuple[int, int]],
+        cep,
+        plano: Optional[Alocacao] = None,
+        criterio: Optional[str] = None,
+        permitir_divisao: Optional[bool] = None,
+    ) -> Alocacao:
+        """
+        Retira o estoque dos armazéns escolhidos e retorna a alocação. Um
+        `plano` de `planejar` é usado se os armazéns ainda tiverem o estoque;
+        senão a alocação é refeita.
+        """
+        itens = list(itens)
+        if plano is not None and self.estoque.retirar(plano.remessas):
+            return plano
+        # Outro pedido pode levar o estoque entre o plano e a retirada:
+        # replaneja até retirar ou faltar estoque (ValueError de _planejar).
+        while True:
+            plano = self._planejar(itens, cep, criterio, permitir_divisao)
+            if self.estoque.retirar(plano.remessas):
+                return plano
+
+    def devolver(self, alocacao: Alocacao) -> None:
+        """
+        Devolve aos armazéns o estoque de uma alocação reservada.
+        """
+        self.estoque.devolver(alocacao.remessas)
@@ -0,0 +1,191 @@
+import csv
+import gzip
+import io
+import json
+import os
+from datetime import datetime
+from typing import IO, Any, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+from app.ecommerce_sistema import Pedido, SistemaEcommerce
+
+
+FORMATOS_EXPORTACAO = ("csv", "jsonl")
+CAMPOS_DATA = ("criacao", "pagamento", "envio", "entrega", "cancelamento")
+
+# Uma linha por item de pedido, com os dados do pedido repetidos.
+COLUNAS_CSV = (
+    "id_pedido",
+    "cliente_id",
+    "status",
+    "metodo_pagamento",
+    "data_criacao",
+    "data_pagamento",
+    "valor_total",
+    "valor_pago",
+    "id_produto",
+    "nome_produto",
+    "quantidade",
+    "preco_unitario",
+)
+
+
+def _iso(data: Optional[datetime]) -> Optional[str]:
+    return None if data is None else data.isoformat()
+
+
+def iterar_pedidos(
+    sistema: SistemaEcommerce,
+    status: Union[str, Iterable[str], None] = None,
+    inicio: Optional[datetime] = None,
+    fim: Optional[datetime] = None,
+    campo_data: str = "criacao",
+) -> Iterator[Pedido]:
+    """
+    Percorre os pedidos em ordem de id, um por vez, opcionalmente só os de
+    `status` (um status ou vários) com `campo_data` em [inicio, fim).
+
+    Os ids são visitados de 1 até o próximo id a ser alocado, sem copiar as
+    chaves. Em catálogos apoiados em snapshot ou banco, pedidos que ainda
+    não estão em memória são lidos sem ficar retidos, então a memória usada
+    não cresce com o número de pedidos exportados.
+    """
+    if campo_data not in CAMPOS_DATA:
+        raise ValueError(f"Campo de data deve ser um de {', '.join(CAMPOS_DATA)}.")
+    if inicio is not None and fim is not None and fim < inicio:
+        raise ValueError("Fim do intervalo não pode ser anterior ao início.")
+    if isinstance(status, str):
+        status = (status,)
+    aceitos = None if status is None else frozenset(status)
+    pedidos = sistema.pedidos_registrados
+    ler = getattr(pedidos, "ler_sem_reter", pedidos.get)
+    filtrar_datas = inicio is not None or fim is not None
+    for id_pedido in range(1, sistema._proximo_id_pedido):
+        pedido = ler(id_pedido)
+        if pedido is None:
+            continue
+        if aceitos is not None and pedido.status_pedido not in aceitos:
+            continue
+        if filtrar_datas:
+            data = pedido.datas.get(campo_data)
+            if data is None or (inicio is not None and data < inicio) or (fim is not None and data >= fim):
+                continue
+        yield pedido
+
+
+def linhas_csv(pedidos: Iterable[Pedido]) -> Iterator[Tuple[Any, ...]]:
+    """
+    Linhas no formato de `COLUNAS_CSV`: uma por item de cada pedido.
+    """
+    for pedido in pedidos:
+        cabeca = (
+            pedido.id_pedido,
+            pedido.cliente_id,
+            pedido.status_pedido,
+            pedido.metodo_pagamento_escolhido,
+            _iso(pedido.datas.get("criacao")),
+            _iso(pedido.datas.get("pagamento")),
+            f"{pedido.valor_total_pedido:.2f}",
+            "" if pedido.valor_final_pago is None else f"{pedido.valor_final_pago:.2f}",
+        )
+        for item in pedido.linhas:
+            yield cabeca + (item.id_produto, item.nome, item.quantidade, f"{item.preco_unitario:.2f}")
+
+
+def registros_jsonl(pedidos: Iterable[Pedido]) -> Iterator[Dict[str, Any]]:
+    """
+    Um registro por pedido, com todas as datas e a lista de itens.
+    """
+    for pedido in pedidos:
+        yield {
+            "id_pedido": pedido.id_pedido,
+            "cliente_id": pedido.cliente_id,
+            "status": pedido.status_pedido,
+            "metodo_pagamento": pedido.metodo_pagamento_escolhido,
+            "datas": {chave: _iso(pedido.datas.get(chave)) for chave in CAMPOS_DATA},
+            "valor_total": pedido.valor_total_pedido,
+            "valor_pago": pedido.valor_final_pago,
+            "itens": [
+                {
+                    "id_produto": item.id_produto,
+                    "nome": item.nome,
+                    "quantidade": item.quantidade,
+                    "preco_unitario": item.preco_unitario,
+                }
+                for item in pedido.linhas
+            ],
+        }
+
+
+def _inferir_formato(caminho: str) -> Tuple[str, bool]:
+    nome = caminho[:-3] if caminho.endswith(".gz") else caminho
+    extensao = os.path.splitext(nome)[1].lstrip(".")
+    return extensao, caminho.endswith(".gz")
+
+
+def _abrir_texto(caminho: str, compactar: bool, tamanho_buffer: int) -> IO[str]:
+    if compactar:
+        # GzipFile comprime a cada write: o buffer agrupa as linhas antes.
+        bruto = gzip.GzipFile(caminho, "wb", compresslevel=6)
+        binario = io.BufferedWriter(bruto, buffer_size=tamanho_buffer)
+        return io.TextIOWrapper(binario, encoding="utf-8", newline="")
+    return open(caminho, "w", encoding="utf-8", newline="", buffering=tamanho_buffer)
+
+
+def exportar_pedidos(
+    sistema: SistemaEcommerce,
+    caminho: str,
+    formato: Optional[str] = None,
+    compactar: Optional[bool] = None,
+    status: Union[str, Iterable[str], None] = None,
+    inicio: Optional[datetime] = None,
+    fim: Optional[datetime] = None,
+    campo_data: str = "criacao",
+    tamanho_buffer: int = 1 << 20,
+) -> int:
+    """
+    Exporta os pedidos (com seus itens) para CSV ou JSON Lines e retorna
+    quantos pedidos foram gravados.
+
+    `formato` e `compactar` são deduzidos do nome do arquivo quando omitidos
+    ("vendas.csv", "vendas.jsonl.gz"). Os filtros são os de
+    `iterar_pedidos`. Os pedidos passam por geradores e são gravados em
+    blocos de `tamanho_buffer` bytes, então a memória usada não depende do
+    tamanho da exportação. A gravação é atômica: o arquivo só aparece
+    completo.
+    """
+    formato_deduzido, compactado = _inferir_formato(caminho)
+    formato = formato or formato_deduzido
+    if formato not in FORMATOS_EXPORTACAO:
+        raise ValueError(f"Formato de exportação deve ser um de {', '.join(FORMATOS_EXPORTACAO)}.")
+    if compactar is None:
+        compactar = compactado
+    if not isinstance(tamanho_buffer, int) or tamanho_buffer <= 0:
+        raise ValueError("Tamanho do buffer deve ser um inteiro positivo.")
+
+    num_pedidos = 0
+
+    def contar(pedidos: Iterable[Pedido]) -> Iterator[Pedido]:
+        nonlocal num_pedidos
+        for pedido in pedidos:
+            num_pedidos += 1
+            yield pedido
+
+    pedidos = contar(iterar_pedidos(sistema, status, inicio, fim, campo_data))
+    temporario = caminho + ".tmp"
+    try:
+        with _abrir_texto(temporario, compactar, tamanho_buffer) as arquivo:
+            if formato == "csv":
+                escritor = csv.writer(arquivo)
+                escritor.writerow(COLUNAS_CSV)
+                escritor.writerows(linhas_csv(pedidos))
+            else:
+                codificar = json.JSONEncoder(ensure_ascii=False).encode
+                for registro in registros_jsonl(pedidos):
+                    arquivo.write(codificar(registro))
+                    arquivo.write("\n")
+        os.replace(temporario, caminho)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+    return num_pedidos
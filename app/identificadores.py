@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+
+# Incrementado em cada processo filho após fork, para que geradores com nó
+# derivado do PID recalculem o nó sem precisar consultar o PID a cada id.
+_geracao_fork = 0
+
+
+def _registrar_fork() -> None:
+    global _geracao_fork
+    _geracao_fork += 1
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_registrar_fork)
+
+
+# ==============================================================================
+# CLASSE GERADOR IDS
+# ==============================================================================
+class GeradorIds:
+    """
+    Gerador de identificadores monotônicos e ordenáveis no estilo "snowflake".
+
+    Cada id é um inteiro de 63 bits composto por:
+        41 bits: milissegundos desde `EPOCA_MS` (cerca de 69 anos);
+        10 bits: identificador do nó (processo/worker), de 0 a 1023;
+        12 bits: sequência dentro do mesmo milissegundo (até 4096 ids/ms).
+
+    Ids gerados por um mesmo gerador são estritamente crescentes, mesmo que o
+    relógio do sistema retroceda: o gerador nunca volta para um milissegundo
+    anterior e, se a sequência esgotar, avança logicamente para o próximo.
+    Ids de nós diferentes nunca colidem, então em implantações com vários
+    processos cada worker deve receber seu próprio `id_no`. Sem `id_no`
+    explícito, ele é derivado do PID e recalculado após `fork`; como PIDs
+    podem coincidir módulo 1024, o nó explícito é o recomendado.
+    """
+
+    EPOCA_MS = 1_704_067_200_000  # 2024-01-01T00:00:00Z
+    BITS_NO = 10
+    BITS_SEQUENCIA = 12
+    MAX_NO = (1 << BITS_NO) - 1
+    MAX_SEQUENCIA = (1 << BITS_SEQUENCIA) - 1
+    DESLOCAMENTO_NO = BITS_SEQUENCIA
+    DESLOCAMENTO_TEMPO = BITS_SEQUENCIA + BITS_NO
+
+    def __init__(
+        self,
+        id_no: Optional[int] = None,
+        relogio_ms: Optional[Callable[[], int]] = None,
+    ):
+        if id_no is not None and (
+            not isinstance(id_no, int) or not 0 <= id_no <= self.MAX_NO
+        ):
+            raise ValueError(f"ID do nó deve ser um inteiro entre 0 e {self.MAX_NO}.")
+
+        self._no_explicito = id_no is not None
+        self.id_no = id_no if id_no is not None else os.getpid() & self.MAX_NO
+        self.relogio_ms = relogio_ms or (lambda: time.time_ns() // 1_000_000)
+        self._ultimo_ms = -1
+        self._sequencia = 0
+        self._lock = threading.Lock()
+        self._geracao = _geracao_fork
+
+    def _apos_fork(self) -> None:
+        self._geracao = _geracao_fork
+        self._lock = threading.Lock()
+        if not self._no_explicito:
+            self.id_no = os.getpid() & self.MAX_NO
+
+    def proximo(self) -> int:
+        """
+        Retorna o próximo id numérico.
+        """
+        if self._geracao != _geracao_fork:
+            self._apos_fork()
+        agora_ms = self.relogio_ms() - self.EPOCA_MS
+        with self._lock:
+            if agora_ms > self._ultimo_ms:
+                self._ultimo_ms = agora_ms
+                self._sequencia = 0
+            else:
+                self._sequencia += 1
+                if self._sequencia > self.MAX_SEQUENCIA:
+                    self._ultimo_ms += 1
+                    self._sequencia = 0
+            return (
+                (self._ultimo_ms << self.DESLOCAMENTO_TEMPO)
+                | (self.id_no << self.DESLOCAMENTO_NO)
+                | self._sequencia
+            )
+
+    def proximo_com_prefixo(self, prefixo: str) -> str:
+        """
+        Retorna o próximo id formatado como `PREFIXO_<16 dígitos hexadecimais>`.
+        A largura fixa mantém a ordenação lexicográfica igual à numérica.
+        """
+        return formatar_id(prefixo, self.proximo())
+
+
+def formatar_id(prefixo: str, valor: int) -> str:
+    return f"{prefixo}_{valor:016X}"
+
+
+def extrair_valor(id_formatado: str) -> int:
+    """
+    Converte um id formatado por `formatar_id` de volta para o valor numérico.
+    """
+    try:
+        return int(id_formatado.rsplit("_", 1)[1], 16)
+    except (IndexError, ValueError):
+        raise ValueError(f"Identificador '{id_formatado}' em formato inválido.")
+
+
+def decompor_id(valor: int) -> Tuple[int, int, int]:
+    """
+    Retorna (timestamp_ms_unix, id_no, sequencia) de um id numérico.
+    """
+    tempo = (valor >> GeradorIds.DESLOCAMENTO_TEMPO) + GeradorIds.EPOCA_MS
+    no = (valor >> GeradorIds.DESLOCAMENTO_NO) & GeradorIds.MAX_NO
+    sequencia = valor & GeradorIds.MAX_SEQUENCIA
+    return tempo, no, sequencia
+
+
+def intervalo_ids(inicio_ms: int, fim_ms: int) -> Tuple[int, int]:
+    """
+    Retorna o menor e o maior id possíveis para o intervalo de tempo
+    [inicio_ms, fim_ms] (milissegundos Unix), para buscas por faixa em
+    índices ordenados por id.
+    """
+    if fim_ms < inicio_ms:
+        raise ValueError("Fim do intervalo deve ser maior ou igual ao início.")
+    menor = max(inicio_ms - GeradorIds.EPOCA_MS, 0) << GeradorIds.DESLOCAMENTO_TEMPO
+    maior = ((max(fim_ms - GeradorIds.EPOCA_MS, 0) + 1) << GeradorIds.DESLOCAMENTO_TEMPO) - 1
+    return menor, maior
+
+
+_gerador_padrao: Optional[GeradorIds] = None
+_lock_gerador_padrao = threading.Lock()
+
+
+def obter_gerador_padrao() -> GeradorIds:
+    """
+    Retorna o gerador compartilhado pelo processo. Usar uma única instância
+    por processo evita que dois geradores com o mesmo nó colidam.
+    """
+    global _gerador_padrao
+    if _gerador_padrao is None:
+        with _lock_gerador_padrao:
+            if _gerador_padrao is None:
+                _gerador_padrao = GeradorIds()
+    return _gerador_padrao
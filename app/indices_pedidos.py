@@ -0,0 +1,169 @@
+import bisect
+import itertools
+import threading
+from array import array
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.concorrencia import BasePreguicosa
+
+
+def _fatia(pagina: int, tamanho_pagina: int) -> slice:
+    if not isinstance(pagina, int) or pagina < 1:
+        raise ValueError("Página deve ser um inteiro maior ou igual a 1.")
+    if not isinstance(tamanho_pagina, int) or tamanho_pagina <= 0:
+        raise ValueError("Tamanho da página deve ser um inteiro positivo.")
+    inicio = (pagina - 1) * tamanho_pagina
+    return slice(inicio, inicio + tamanho_pagina)
+
+
+# ==============================================================================
+# CLASSE INDICES PEDIDOS
+# ==============================================================================
+class IndicesPedidos(BasePreguicosa):
+    """
+    Índices secundários dos pedidos, mantidos a cada criação e mudança de
+    status: cliente -> ids (em ordem de id), status -> ids (na ordem em que
+    os pedidos entraram no status, então a primeira página de "pago" traz
+    os pagos há mais tempo) e data de criação -> ids (ordenado pela data).
+
+    Consultas devolvem ids, uma página por vez: por cliente e por data a
+    página é achada por posição ou busca binária; por status, percorrendo
+    o status até a página pedida.
+
+    Os pedidos de uma base existente podem ser carregados sob demanda com
+    `definir_base` (ver `BasePreguicosa`). Aqui a carga acontece sempre
+    antes da primeira consulta ou alteração, porque índices, ao contrário de
+    somas, não podem receber uma transição antes do estado que ela altera.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._por_cliente: Dict[str, List[int]] = {}
+        # status -> {id: None}: dict preserva a ordem de inclusão e remove em O(1).
+        self._por_status: Dict[str, Dict[int, None]] = {}
+        # Datas de criação (timestamps) e ids na mesma ordem, ordenados pela data.
+        self._datas = array("d")
+        self._ids_por_data = array("q")
+
+    def _incluir(self, id_pedido: int, cliente_id: str, status: str, data_criacao: Optional[float]) -> None:
+        ids = self._por_cliente.get(cliente_id)
+        if ids is None:
+            self._por_cliente[cliente_id] = [id_pedido]
+        elif ids[-1] < id_pedido:
+            ids.append(id_pedido)
+        else:
+            bisect.insort(ids, id_pedido)
+        self._por_status.setdefault(status, {})[id_pedido] = None
+        if data_criacao is not None:
+            if not self._datas or self._datas[-1] <= data_criacao:
+                self._datas.append(data_criacao)
+                self._ids_por_data.append(id_pedido)
+            else:
+                posicao = bisect.bisect_right(self._datas, data_criacao)
+                self._datas.insert(posicao, data_criacao)
+                self._ids_por_data.insert(posicao, id_pedido)
+
+    def registrar(
+        self, id_pedido: int, cliente_id: str, status: str, data_criacao: Optional[float]
+    ) -> None:
+        """
+        Inclui um pedido a partir dos seus campos (timestamp de criação).
+        Usado pelas cargas de `definir_base`.
+        """
+        with self._lock:
+            self._incluir(id_pedido, cliente_id, status, data_criacao)
+
+    def registrar_pedido(self, pedido: Any) -> None:
+        """
+        Inclui um pedido recém-criado (ou restaurado) no seu status atual.
+        """
+        self._garantir_base()
+        criacao = pedido.datas.get("criacao")
+        with self._lock:
+            # Status lido sob o lock: uma transição concorrente ou já foi
+            # aplicada ao pedido, ou ainda vai movê-lo a partir daqui.
+            self._incluir(
+                pedido.id_pedido,
+                pedido.cliente_id,
+                pedido.status_pedido,
+                None if criacao is None else criacao.timestamp(),
+            )
+
+    def registrar_pedidos(self, pedidos: Iterable[Any]) -> None:
+        """
+        `registrar_pedido` para vários pedidos, com uma única aquisição do lock.
+        """
+        self._garantir_base()
+        with self._lock:
+            for pedido in pedidos:
+                criacao = pedido.datas.get("criacao")
+                self._incluir(
+                    pedido.id_pedido,
+                    pedido.cliente_id,
+                    pedido.status_pedido,
+                    None if criacao is None else criacao.timestamp(),
+                )
+
+    def registrar_transicao(self, pedido: Any, status_anterior: str) -> None:
+        """
+        Move o pedido de `status_anterior` para o status atual.
+        """
+        self.registrar_transicoes(((pedido, status_anterior),))
+
+    def registrar_transicoes(self, transicoes: Iterable[Tuple[Any, str]]) -> None:
+        """
+        `registrar_transicao` para vários (pedido, status_anterior) de uma
+        vez, com uma única aquisição do lock.
+        """
+        self._garantir_base()
+        with self._lock:
+            for pedido, status_anterior in transicoes:
+                anteriores = self._por_status.get(status_anterior)
+                if anteriores is not None:
+                    anteriores.pop(pedido.id_pedido, None)
+                self._por_status.setdefault(pedido.status_pedido, {})[pedido.id_pedido] = None
+
+    # ------------------------------------------------------------------ consultas
+    def do_cliente(self, cliente_id: str, pagina: int = 1, tamanho_pagina: int = 50) -> List[int]:
+        fatia = _fatia(pagina, tamanho_pagina)
+        self._garantir_base()
+        with self._lock:
+            return self._por_cliente.get(cliente_id, [])[fatia]
+
+    def por_status(self, status: str, pagina: int = 1, tamanho_pagina: int = 50) -> List[int]:
+        fatia = _fatia(pagina, tamanho_pagina)
+        self._garantir_base()
+        with self._lock:
+            return list(itertools.islice(self._por_status.get(status, {}), fatia.start, fatia.stop))
+
+    def por_data(
+        self,
+        inicio: Optional[datetime] = None,
+        fim: Optional[datetime] = None,
+        pagina: int = 1,
+        tamanho_pagina: int = 50,
+    ) -> List[int]:
+        """
+        Ids dos pedidos criados em [inicio, fim), do mais antigo ao mais novo.
+        """
+        if inicio is not None and fim is not None and fim < inicio:
+            raise ValueError("Fim do intervalo não pode ser anterior ao início.")
+        fatia = _fatia(pagina, tamanho_pagina)
+        self._garantir_base()
+        with self._lock:
+            primeiro = 0 if inicio is None else bisect.bisect_left(self._datas, inicio.timestamp())
+            ultimo = len(self._datas) if fim is None else bisect.bisect_left(self._datas, fim.timestamp())
+            inicio_pagina = min(primeiro + fatia.start, ultimo)
+            return self._ids_por_data[inicio_pagina : min(primeiro + fatia.stop, ultimo)].tolist()
+
+    def contar_por_status(self, status: str) -> int:
+        self._garantir_base()
+        with self._lock:
+            return len(self._por_status.get(status, ()))
+
+    def contar_do_cliente(self, cliente_id: str) -> int:
+        self._garantir_base()
+        with self._lock:
+            return len(self._por_cliente.get(cliente_id, ()))
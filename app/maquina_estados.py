@@ -0,0 +1,120 @@
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+
+Gancho = Callable[[Any, str], None]
+
+
+# ==============================================================================
+# CLASSE MAQUINA ESTADOS
+# ==============================================================================
+class MaquinaEstados:
+    """
+    Máquina de estados com a tabela de transições pré-compilada: cada estado
+    tem um código inteiro pequeno, as transições permitidas a partir dele
+    são uma máscara de bits dos códigos de destino e cada estado aponta
+    direto para o campo de data que registra a entrada nele.
+
+    Verificar uma transição custa duas consultas a dicionário e um teste de
+    bit, sem percorrer listas. Estados, transições e ganchos podem ser
+    acrescentados depois (`adicionar_estado`, `permitir`, `adicionar_gancho`);
+    cada alteração recompila as tabelas, e `copiar` cria uma máquina
+    independente para estender sem afetar a original.
+
+    Ganchos são chamados como gancho(objeto, estado_anterior) depois de cada
+    transição efetiva para o estado em que foram registrados (ou para
+    qualquer estado, se registrados sem estado).
+    """
+
+    def __init__(self):
+        self.codigos: Dict[str, int] = {}
+        self.estados: List[str] = []
+        self.campos_data: List[Optional[str]] = []
+        self.mascaras: List[int] = []
+        self.ganchos: List[Tuple[Gancho, ...]] = []
+        # Ganchos como registrados: estado (ou None, para todos) -> ganchos.
+        self._ganchos_registrados: Dict[Optional[str], List[Gancho]] = {}
+        # Visão por nome das transições, no formato de TRANSICOES_PERMITIDAS.
+        self.transicoes: Dict[str, List[str]] = {}
+
+    def _codigo(self, estado: str) -> int:
+        try:
+            return self.codigos[estado]
+        except KeyError:
+            raise ValueError(f"Estado '{estado}' desconhecido.") from None
+
+    def _compilar(self) -> None:
+        todos = tuple(self._ganchos_registrados.get(None, ()))
+        self.ganchos = [
+            tuple(self._ganchos_registrados.get(estado, ())) + todos for estado in self.estados
+        ]
+        self.transicoes.clear()
+        for estado, mascara in zip(self.estados, self.mascaras):
+            self.transicoes[estado] = [
+                destino for destino in self.estados if mascara >> self.codigos[destino] & 1
+            ]
+
+    def adicionar_estado(self, estado: str, campo_data: Optional[str] = None) -> int:
+        """
+        Acrescenta um estado (sem transições) e retorna o seu código.
+        `campo_data` é a chave em `datas` preenchida ao entrar no estado.
+        """
+        if not estado or not isinstance(estado, str):
+            raise ValueError("Nome do estado deve ser um texto não vazio.")
+        if estado in self.codigos:
+            raise ValueError(f"Estado '{estado}' já existe.")
+        codigo = self.codigos[estado] = len(self.estados)
+        self.estados.append(estado)
+        self.campos_data.append(campo_data)
+        self.mascaras.append(0)
+        self._compilar()
+        return codigo
+
+    def permitir(self, origem: str, *destinos: str) -> None:
+        """
+        Permite as transições de `origem` para cada um dos `destinos`.
+        """
+        mascara = 0
+        for destino in destinos:
+            mascara |= 1 << self._codigo(destino)
+        self.mascaras[self._codigo(origem)] |= mascara
+        self._compilar()
+
+    def adicionar_gancho(self, gancho: Gancho, estado: Optional[str] = None) -> None:
+        if estado is not None:
+            self._codigo(estado)
+        self._ganchos_registrados.setdefault(estado, []).append(gancho)
+        self._compilar()
+
+    def remover_gancho(self, gancho: Gancho, estado: Optional[str] = None) -> None:
+        self._ganchos_registrados.get(estado, []).remove(gancho)
+        self._compilar()
+
+    def permite(self, origem: str, destino: str) -> bool:
+        codigo_origem = self.codigos.get(origem)
+        codigo_destino = self.codigos.get(destino)
+        if codigo_origem is None or codigo_destino is None:
+            return False
+        return bool(self.mascaras[codigo_origem] >> codigo_destino & 1)
+
+    def origens(self, destino: str) -> FrozenSet[str]:
+        """
+        Estados a partir dos quais `destino` pode ser alcançado.
+        """
+        bit = 1 << self._codigo(destino)
+        return frozenset(e for e, mascara in zip(self.estados, self.mascaras) if mascara & bit)
+
+    def campo_data(self, estado: str) -> Optional[str]:
+        codigo = self.codigos.get(estado)
+        return None if codigo is None else self.campos_data[codigo]
+
+    def copiar(self) -> "MaquinaEstados":
+        copia = MaquinaEstados()
+        copia.codigos = dict(self.codigos)
+        copia.estados = list(self.estados)
+        copia.campos_data = list(self.campos_data)
+        copia.mascaras = list(self.mascaras)
+        copia._ganchos_registrados = {
+            estado: list(ganchos) for estado, ganchos in self._ganchos_registrados.items()
+        }
+        copia._compilar()
+        return copia
@@ -0,0 +1,725 @@
+import contextlib
+import gc
+import gzip
+import json
+import os
+import struct
+import threading
+import zlib
+from datetime import datetime
+from typing import Any, Dict, IO, Iterable, Iterator, List, Optional, Tuple
+
+from app.concorrencia import ContadorAtomico
+from app.ecommerce_sistema import SistemaEcommerce, Produto, Pedido, LinhasPedido
+from app.estoque_armazens import alocacao_de_dados, alocacao_para_dados
+from app.razao_transacoes import LivroRazaoTransacoes
+from app.snapshot_binario import carregar_snapshot_binario, salvar_snapshot_binario, snapshots_mapeados
+
+
+# Cabeçalho de cada registro do log: tamanho do conteúdo, CRC32 e LSN.
+_CABECALHO = struct.Struct("<IIQ")
+_PREFIXO_SEGMENTO = "wal-"
+_SUFIXO_SEGMENTO = ".log"
+_PREFIXO_SNAPSHOT = "snapshot-"
+_SUFIXO_SNAPSHOT = ".json.gz"
+_SUFIXO_SNAPSHOT_BINARIO = ".bin"
+FORMATOS_SNAPSHOT = ("json", "binario")
+# Versão do snapshot JSON: 2 guarda as datas do pedido num dicionário, as
+# linhas completas (id, quantidade, preço, nome) e a alocação por armazém.
+VERSAO_SNAPSHOT = 2
+_ARQUIVO_RAZAO = "razao.log"
+
+
+def _nome_segmento(lsn_inicial: int) -> str:
+    return f"{_PREFIXO_SEGMENTO}{lsn_inicial:020d}{_SUFIXO_SEGMENTO}"
+
+
+def _listar(diretorio: str, prefixo: str, sufixo: str) -> List[Tuple[int, str]]:
+    """
+    Lista (lsn, caminho) dos arquivos `prefixo<lsn>sufixo`, em ordem de LSN.
+    """
+    encontrados = []
+    for nome in os.listdir(diretorio):
+        if nome.startswith(prefixo) and nome.endswith(sufixo):
+            try:
+                lsn = int(nome[len(prefixo) : -len(sufixo)])
+            except ValueError:
+                continue
+            encontrados.append((lsn, os.path.join(diretorio, nome)))
+    return sorted(encontrados)
+
+
+def codificar_registro(lsn: int, tipo: str, dados: Dict[str, Any]) -> bytes:
+    conteudo = json.dumps([tipo, dados], separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    crc = zlib.crc32(conteudo, zlib.crc32(struct.pack("<Q", lsn)))
+    return _CABECALHO.pack(len(conteudo), crc, lsn) + conteudo
+
+
+_decodificador = json.JSONDecoder()
+
+
+def _ler_segmento(caminho: str) -> Iterator[Tuple[int, int, bytes]]:
+    """
+    Lê os registros válidos de um segmento, retornando (posição_final, lsn,
+    conteúdo). Para no primeiro registro incompleto ou corrompido (escrita
+    interrompida).
+    """
+    with open(caminho, "rb") as arquivo:
+        dados_arquivo = arquivo.read()
+    posicao = 0
+    tamanho_cabecalho = _CABECALHO.size
+    while posicao + tamanho_cabecalho <= len(dados_arquivo):
+        tamanho, crc, lsn = _CABECALHO.unpack_from(dados_arquivo, posicao)
+        inicio = posicao + tamanho_cabecalho
+        fim = inicio + tamanho
+        if fim > len(dados_arquivo):
+            return
+        conteudo = dados_arquivo[inicio:fim]
+        if zlib.crc32(conteudo, zlib.crc32(dados_arquivo[inicio - 8 : inicio])) != crc:
+            return
+        posicao = fim
+        yield posicao, lsn, conteudo
+
+
+# ==============================================================================
+# CLASSE REGISTRO ESCRITA ANTECIPADA (WAL)
+# ==============================================================================
+class RegistroEscritaAntecipada:
+    """
+    Log de escrita antecipada (write-ahead log), somente de inclusão, dividido
+    em segmentos `wal-<lsn inicial>.log` dentro de `diretorio`.
+
+    Cada evento recebe um LSN (número de sequência) crescente. As gravações
+    são agrupadas (group commit): os registros se acumulam num buffer e são
+    escritos juntos quando o grupo atinge `tamanho_grupo` registros, a cada
+    `intervalo_grupo` segundos (thread de fundo) ou quando alguém precisa de
+    durabilidade imediata. Políticas de fsync:
+        "sempre": `registrar` só retorna após o fsync do grupo que contém o
+            evento; chamadas concorrentes compartilham o mesmo fsync.
+        "lote": cada grupo escrito é sincronizado com fsync.
+        "nunca": os grupos são escritos, e o sistema operacional decide
+            quando levá-los ao disco.
+    """
+
+    POLITICAS_FSYNC = ("sempre", "lote", "nunca")
+
+    def __init__(
+        self,
+        diretorio: str,
+        politica_fsync: str = "lote",
+        tamanho_grupo: int = 256,
+        intervalo_grupo: Optional[float] = 0.01,
+    ):
+        if politica_fsync not in self.POLITICAS_FSYNC:
+            raise ValueError(
+                f"Política de fsync deve ser uma de {', '.join(self.POLITICAS_FSYNC)}."
+            )
+        if not isinstance(tamanho_grupo, int) or tamanho_grupo <= 0:
+            raise ValueError("Tamanho do grupo deve ser um inteiro positivo.")
+
+        os.makedirs(diretorio, exist_ok=True)
+        self.diretorio = diretorio
+        self.politica_fsync = politica_fsync
+        self.tamanho_grupo = tamanho_grupo
+        self.intervalo_grupo = intervalo_grupo
+        self._cond = threading.Condition()
+        self._buffer: List[bytes] = []
+        self._escrevendo = False
+        self._fechado = False
+        self.ultimo_lsn = self._reparar_ultimo_segmento()
+        self.lsn_duravel = self.ultimo_lsn
+        self.grupos_escritos = 0
+        self._arquivo: IO[bytes] = self._abrir_segmento(self.ultimo_lsn + 1)
+
+        self._thread: Optional[threading.Thread] = None
+        if intervalo_grupo:
+            self._thread = threading.Thread(target=self._descarregar_periodicamente, daemon=True)
+            self._thread.start()
+
+    def _reparar_ultimo_segmento(self) -> int:
+        """
+        Retorna o último LSN válido e trunca um eventual registro incompleto no
+        fim do último segmento.
+        """
+        segmentos = _listar(self.diretorio, _PREFIXO_SEGMENTO, _SUFIXO_SEGMENTO)
+        if not segmentos:
+            return 0
+        lsn_inicial, caminho = segmentos[-1]
+        ultimo_lsn, posicao_valida = lsn_inicial - 1, 0
+        for posicao, lsn, _ in _ler_segmento(caminho):
+            ultimo_lsn, posicao_valida = lsn, posicao
+        if os.path.getsize(caminho) != posicao_valida:
+            with open(caminho, "r+b") as arquivo:
+                arquivo.truncate(posicao_valida)
+        return ultimo_lsn
+
+    def _abrir_segmento(self, lsn_inicial: int) -> IO[bytes]:
+        caminho = os.path.join(self.diretorio, _nome_segmento(lsn_inicial))
+        return open(caminho, "ab")
+
+    # ------------------------------------------------------------------ escrita
+    def registrar(self, tipo: str, dados: Dict[str, Any], aguardar: bool = True) -> int:
+        """
+        Acrescenta um evento ao log e retorna seu LSN. Com `aguardar=False`,
+        a política "sempre" não espera o fsync aqui: quem chama espera depois
+        com `aguardar_durabilidade` (ex.: fora de um lock seu).
+        """
+        with self._cond:
+            if self._fechado:
+                raise ValueError("Log de escrita antecipada já foi fechado.")
+            self.ultimo_lsn += 1
+            lsn = self.ultimo_lsn
+            self._buffer.append(codificar_registro(lsn, tipo, dados))
+            if self.politica_fsync == "sempre":
+                if aguardar:
+                    self._aguardar_durabilidade(lsn)
+            elif len(self._buffer) >= self.tamanho_grupo:
+                self._descarregar_grupo()
+            return lsn
+
+    def aguardar_durabilidade(self, lsn: int) -> None:
+        """
+        Espera até que o evento `lsn` esteja gravado (com fsync, salvo na
+        política "nunca"), gravando o grupo pendente se preciso.
+        """
+        with self._cond:
+            self._aguardar_durabilidade(lsn)
+
+    def _aguardar_durabilidade(self, lsn: int) -> None:
+        # Chamado com self._cond adquirido. Quem encontra o log ocioso vira
+        # "líder" e grava o grupo inteiro; os demais esperam esse fsync.
+        while self.lsn_duravel < lsn:
+            if self._escrevendo:
+                self._cond.wait()
+            else:
+                self._descarregar_grupo()
+
+    def _descarregar_grupo(self) -> None:
+        # Chamado com self._cond adquirido; libera-o durante a E/S.
+        while self._escrevendo:
+            self._cond.wait()
+        if not self._buffer:
+            return
+        grupo, self._buffer = self._buffer, []
+        ate_lsn = self.ultimo_lsn
+        self._escrevendo = True
+        self._cond.release()
+        try:
+            self._arquivo.write(b"".join(grupo))
+            self._arquivo.flush()
+            if self.politica_fsync != "nunca":
+                os.fsync(self._arquivo.fileno())
+        finally:
+            self._cond.acquire()
+            self._escrevendo = False
+            self.lsn_duravel = max(self.lsn_duravel, ate_lsn)
+            self.grupos_escritos += 1
+            self._cond.notify_all()
+
+    def _descarregar_periodicamente(self) -> None:
+        with self._cond:
+            while not self._fechado:
+                self._cond.wait(self.intervalo_grupo)
+                if self._buffer and not self._fechado:
+                    self._descarregar_grupo()
+
+    def descarregar(self) -> int:
+        """
+        Grava todos os eventos pendentes e retorna o último LSN gravado.
+        """
+        with self._cond:
+            self._descarregar_grupo()
+            return self.lsn_duravel
+
+    def rotacionar(self) -> int:
+        """
+        Fecha o segmento atual e inicia um novo. Retorna o último LSN do
+        segmento fechado, que passa a poder ser compactado num snapshot.
+        """
+        with self._cond:
+            self._descarregar_grupo()
+            while self._escrevendo:
+                self._cond.wait()
+            self._arquivo.close()
+            self._arquivo = self._abrir_segmento(self.ultimo_lsn + 1)
+            return self.ultimo_lsn
+
+    def remover_segmentos_ate(self, lsn: int) -> int:
+        """
+        Remove os segmentos cujos eventos têm todos LSN <= `lsn`. Retorna
+        quantos segmentos foram removidos.
+        """
+        segmentos = _listar(self.diretorio, _PREFIXO_SEGMENTO, _SUFIXO_SEGMENTO)
+        removidos = 0
+        for (_, caminho), (inicio_seguinte, _) in zip(segmentos, segmentos[1:]):
+            if inicio_seguinte <= lsn + 1:
+                os.remove(caminho)
+                removidos += 1
+        return removidos
+
+    def fechar(self) -> None:
+        with self._cond:
+            if self._fechado:
+                return
+            self._descarregar_grupo()
+            self._fechado = True
+            self._cond.notify_all()
+            self._arquivo.close()
+        if self._thread is not None:
+            self._thread.join()
+
+    # ------------------------------------------------------------------ leitura
+    @staticmethod
+    def ler_eventos(
+        diretorio: str, apos_lsn: int = 0, ate_lsn: Optional[int] = None
+    ) -> Iterator[Tuple[int, str, Dict[str, Any]]]:
+        """
+        Lê (lsn, tipo, dados) dos eventos com `apos_lsn < lsn <= ate_lsn`, em
+        ordem. Um registro incompleto no fim do último segmento é ignorado.
+        """
+        segmentos = _listar(diretorio, _PREFIXO_SEGMENTO, _SUFIXO_SEGMENTO)
+        for indice, (lsn_inicial, caminho) in enumerate(segmentos):
+            if indice + 1 < len(segmentos) and segmentos[indice + 1][0] <= apos_lsn + 1:
+                continue
+            if ate_lsn is not None and lsn_inicial > ate_lsn:
+                return
+            for _, lsn, conteudo in _ler_segmento(caminho):
+                if lsn <= apos_lsn:
+                    continue
+                if ate_lsn is not None and lsn > ate_lsn:
+                    return
+                tipo, dados = _decodificador.decode(conteudo.decode("utf-8"))
+                yield lsn, tipo, dados
+
+
+# ==============================================================================
+# ESTADO, SNAPSHOTS E REPRODUÇÃO DE EVENTOS
+# ==============================================================================
+def _data_para_ts(data: Optional[datetime]) -> Optional[float]:
+    return data.timestamp() if data is not None else None
+
+
+def _ts_para_data(ts: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(ts) if ts is not None else None
+
+
+def capturar_estado(sistema: SistemaEcommerce) -> Dict[str, Any]:
+    """
+    Converte o estado do sistema num dicionário serializável em JSON.
+    """
+    produtos = [
+        [p.id_produto, p.nome, p.descricao, p.preco, p.quantidade_em_estoque, p.categoria]
+        for p in sistema.produtos_catalogo.values()
+    ]
+    # Pedidos em listas posicionais (ver aplicar_estado), bem
+    # mais rápidas de decodificar que um objeto JSON por pedido.
+    pedidos = [
+        [
+            pedido.id_pedido,
+            pedido.cliente_id,
+            [list(item) for item in pedido.linhas],
+            pedido.valor_total_pedido,
+            pedido.endereco_entrega,
+            pedido.metodo_pagamento_escolhido,
+            pedido.status_pedido,
+            {chave: _data_para_ts(data) for chave, data in pedido.datas.items()},
+            pedido.id_transacao_pagamento,
+            pedido.valor_final_pago,
+            alocacao_para_dados(pedido.alocacao),
+        ]
+        for pedido in sistema.pedidos_registrados.values()
+    ]
+    return {
+        "produtos": produtos,
+        "usuarios": sistema.usuarios,
+        "pedidos": pedidos,
+        "estoque_armazens": sistema.estoque_armazens.quantidades(),
+        "proximo_id_produto": sistema._proximo_id_produto,
+        "proximo_id_pedido": sistema._proximo_id_pedido,
+    }
+
+
+def _restaurar_produto(sistema: SistemaEcommerce, campos: List[Any]) -> None:
+    id_produto, nome, descricao, preco, estoque, categoria = campos
+    produto = Produto(id_produto, nome, descricao, preco, estoque, categoria)
+    sistema._vincular_produto(produto)
+    sistema.produtos_catalogo[id_produto] = produto
+
+
+def _restaurar_pedido(sistema: SistemaEcommerce, dados: Dict[str, Any]) -> Pedido:
+    pedido = Pedido.restaurar(
+        id_pedido=dados["id_pedido"],
+        cliente_id=dados["cliente_id"],
+        linhas=LinhasPedido.de_tuplas(dados["itens"]),
+        valor_total_pedido=dados["valor_total"],
+        endereco_entrega=dados["endereco_entrega"],
+        metodo_pagamento_escolhido=dados["metodo_pagamento"],
+        data_criacao=_ts_para_data(dados["data"]),
+    )
+    pedido.alocacao = alocacao_de_dados(dados["alocacao"])
+    sistema._vincular_pedido(pedido)
+    sistema.pedidos_registrados[pedido.id_pedido] = pedido
+    sistema.agregados_vendas.registrar_pedido(pedido)
+    sistema.indices_pedidos.registrar_pedido(pedido)
+    return pedido
+
+
+def _ts_em_ms(data: Optional[datetime]) -> Optional[int]:
+    return int(data.timestamp() * 1000) if data is not None else None
+
+
+def _restaurar_capturas(livro: LivroRazaoTransacoes, pedidos: Iterable[Pedido]) -> None:
+    """
+    Inclui no livro razão a captura de cada pedido com pagamento registrado.
+    """
+    for pedido in pedidos:
+        if pedido.id_transacao_pagamento and pedido.valor_final_pago:
+            livro.restaurar_captura(
+                pedido.id_transacao_pagamento,
+                pedido.valor_final_pago,
+                pedido.metodo_pagamento_escolhido,
+                pedido.id_pedido,
+                _ts_em_ms(pedido.datas.get("pagamento")),
+            )
+
+
+def aplicar_estado(sistema: SistemaEcommerce, estado: Dict[str, Any]) -> None:
+    """
+    Carrega num sistema vazio o estado produzido por `capturar_estado`.
+    """
+    for campos in estado["produtos"]:
+        _restaurar_produto(sistema, campos)
+    sistema.usuarios.update(estado["usuarios"])
+    agregados = sistema.agregados_vendas
+    rollups = sistema.rollups_vendas
+    indices = sistema.indices_pedidos
+    for (
+        id_pedido,
+        cliente_id,
+        itens,
+        valor_total,
+        endereco,
+        metodo,
+        status,
+        datas,
+        id_transacao,
+        valor_pago,
+        alocacao,
+    ) in estado["pedidos"]:
+        pedido = Pedido.restaurar(
+            id_pedido,
+            cliente_id,
+            LinhasPedido.de_tuplas(itens),
+            valor_total,
+            endereco,
+            metodo,
+            None,
+        )
+        pedido.status_pedido = status
+        pedido.datas = {chave: _ts_para_data(ts) for chave, ts in datas.items()}
+        pedido.id_transacao_pagamento = id_transacao
+        pedido.valor_final_pago = valor_pago
+        pedido.alocacao = alocacao_de_dados(alocacao)
+        sistema._vincular_pedido(pedido)
+        sistema.pedidos_registrados[id_pedido] = pedido
+        agregados.registrar_pedido(pedido)
+        rollups.registrar_pedido(pedido)
+        indices.registrar_pedido(pedido)
+    for id_produto, id_armazem, quantidade in estado["estoque_armazens"]:
+        sistema.estoque_armazens.ajustar(id_produto, id_armazem, quantidade)
+    sistema._proximo_id_produto = estado["proximo_id_produto"]
+    sistema._proximo_id_pedido = estado["proximo_id_pedido"]
+    # As capturas dos pedidos pagos só entram no livro razão na primeira
+    # consulta a ele (ex.: um reembolso).
+    pedidos = sistema.pedidos_registrados
+    sistema.sistema_pagamento.livro_razao.definir_base(
+        lambda livro: _restaurar_capturas(livro, list(pedidos.values()))
+    )
+
+
+def aplicar_evento(sistema: SistemaEcommerce, tipo: str, dados: Dict[str, Any]) -> None:
+    """
+    Reaplica um evento de domínio ao estado em memória, sem revalidar regras
+    de negócio nem emitir novos eventos. Os contadores de ids não são
+    ajustados aqui; `recuperar_sistema` os ajusta ao final.
+    """
+    if tipo == "estoque_alterado":
+        produto = sistema.produtos_catalogo[dados["id_produto"]]
+        produto._quantidade_em_estoque += dados["variacao"]
+        produto.versao_estoque += 1
+    elif tipo == "estoque_armazem_alterado":
+        sistema.estoque_armazens.ajustar(dados["id_produto"], dados["id_armazem"], dados["variacao"])
+    elif tipo == "preco_alterado":
+        sistema.produtos_catalogo[dados["id_produto"]].preco = dados["preco"]
+    elif tipo == "produto_adicionado":
+        _restaurar_produto(
+            sistema,
+            [
+                dados["id_produto"],
+                dados["nome"],
+                dados["descricao"],
+                dados["preco"],
+                dados["quantidade_em_estoque"],
+                dados["categoria"],
+            ],
+        )
+    elif tipo == "usuario_registrado":
+        sistema.usuarios[dados["user_id"]] = dados["dados"]
+    elif tipo == "pedido_criado":
+        _restaurar_pedido(sistema, dados)
+    elif tipo in ("pedido_pago", "pedido_cancelado", "pedido_status_alterado"):
+        pedido = sistema.pedidos_registrados[dados["id_pedido"]]
+        status_anterior = pedido.status_pedido
+        pedido.status_pedido = dados["status"]
+        campo = pedido.MAQUINA_ESTADOS.campo_data(dados["status"])
+        if campo:
+            pedido.datas[campo] = _ts_para_data(dados["data"])
+        if tipo == "pedido_pago":
+            pedido.id_transacao_pagamento = dados["id_transacao"]
+            pedido.valor_final_pago = dados["valor_pago"]
+            pedido.alocacao = alocacao_de_dados(dados["alocacao"])
+            sistema.sistema_pagamento.livro_razao.restaurar_captura(
+                dados["id_transacao"],
+                dados["valor_pago"],
+                pedido.metodo_pagamento_escolhido,
+                pedido.id_pedido,
+                int(dados["data"] * 1000),
+            )
+        sistema._contabilizar_transicao(pedido, status_anterior)
+    else:
+        raise ValueError(f"Tipo de evento desconhecido no log: '{tipo}'.")
+
+
+def salvar_snapshot(estado: Dict[str, Any], diretorio: str, lsn: int) -> str:
+    """
+    Grava um snapshot compactado (JSON + gzip) do estado até o LSN informado.
+    A gravação é atômica: o arquivo só aparece completo.
+    """
+    caminho = os.path.join(diretorio, f"{_PREFIXO_SNAPSHOT}{lsn:020d}{_SUFIXO_SNAPSHOT}")
+    temporario = caminho + ".tmp"
+    conteudo = json.dumps(
+        {"versao": VERSAO_SNAPSHOT, "lsn": lsn, "estado": estado}, separators=(",", ":"), ensure_ascii=False
+    ).encode("utf-8")
+    with open(temporario, "wb") as arquivo:
+        arquivo.write(gzip.compress(conteudo, compresslevel=1))
+        arquivo.flush()
+        os.fsync(arquivo.fileno())
+    os.replace(temporario, caminho)
+    return caminho
+
+
+def salvar_snapshot_de(sistema: SistemaEcommerce, diretorio: str, lsn: int, formato: str = "json") -> str:
+    """
+    Grava um snapshot do sistema no formato indicado ("json" ou "binario").
+    """
+    if formato == "binario":
+        caminho = os.path.join(diretorio, f"{_PREFIXO_SNAPSHOT}{lsn:020d}{_SUFIXO_SNAPSHOT_BINARIO}")
+        return salvar_snapshot_binario(sistema, caminho, lsn)
+    return salvar_snapshot(capturar_estado(sistema), diretorio, lsn)
+
+
+def _listar_snapshots(diretorio: str) -> List[Tuple[int, str]]:
+    return sorted(
+        _listar(diretorio, _PREFIXO_SNAPSHOT, _SUFIXO_SNAPSHOT)
+        + _listar(diretorio, _PREFIXO_SNAPSHOT, _SUFIXO_SNAPSHOT_BINARIO)
+    )
+
+
+def carregar_snapshot(caminho: str) -> Tuple[SistemaEcommerce, int]:
+    """
+    Carrega um snapshot JSON ou binário e retorna (sistema, lsn). Snapshots
+    binários são abertos via mmap, com materialização sob demanda.
+    """
+    if caminho.endswith(_SUFIXO_SNAPSHOT_BINARIO):
+        return carregar_snapshot_binario(caminho)
+    with open(caminho, "rb") as arquivo:
+        conteudo = json.loads(gzip.decompress(arquivo.read()))
+    if conteudo.get("versao") != VERSAO_SNAPSHOT:
+        raise ValueError(f"Versão de snapshot não suportada: {conteudo.get('versao')}.")
+    sistema = SistemaEcommerce()
+    aplicar_estado(sistema, conteudo["estado"])
+    return sistema, conteudo["lsn"]
+
+
+# O coletor cíclico é global ao processo: recuperações simultâneas (ex.: a
+# compactação em segundo plano e um `abrir`) contam as pausas, e só a última
+# a terminar o religa, se estava ligado quando a primeira começou.
+_lock_coletor = threading.Lock()
+_pausas_coletor = 0
+_coletor_estava_ativo = False
+
+
+@contextlib.contextmanager
+def _coletor_pausado() -> Iterator[None]:
+    global _pausas_coletor, _coletor_estava_ativo
+    with _lock_coletor:
+        if _pausas_coletor == 0:
+            _coletor_estava_ativo = gc.isenabled()
+            gc.disable()
+        _pausas_coletor += 1
+    try:
+        yield
+    finally:
+        with _lock_coletor:
+            _pausas_coletor -= 1
+            if _pausas_coletor == 0 and _coletor_estava_ativo:
+                gc.enable()
+
+
+def recuperar_sistema(
+    diretorio: str, ate_lsn: Optional[int] = None
+) -> Tuple[SistemaEcommerce, int]:
+    """
+    Recupera o sistema a partir do snapshot mais recente e da cauda do log.
+    Retorna o sistema e o último LSN aplicado.
+    """
+    if not os.path.isdir(diretorio):
+        return SistemaEcommerce(), 0
+    # A carga cria milhões de objetos de vida longa; o coletor cíclico só
+    # atrasaria a recuperação sem nada a liberar.
+    with _coletor_pausado():
+        snapshots = _listar_snapshots(diretorio)
+        if snapshots:
+            sistema, lsn = carregar_snapshot(snapshots[-1][1])
+        else:
+            sistema, lsn = SistemaEcommerce(), 0
+        maior_id_produto = maior_id_pedido = 0
+        for lsn_evento, tipo, dados in RegistroEscritaAntecipada.ler_eventos(
+            diretorio, apos_lsn=lsn, ate_lsn=ate_lsn
+        ):
+            aplicar_evento(sistema, tipo, dados)
+            lsn = lsn_evento
+            if tipo == "produto_adicionado":
+                maior_id_produto = max(maior_id_produto, dados["id_produto"])
+            elif tipo == "pedido_criado":
+                maior_id_pedido = max(maior_id_pedido, dados["id_pedido"])
+    # Os contadores de ids só são ajustados ao fim da reprodução.
+    sistema._proximo_id_produto = max(sistema._proximo_id_produto, maior_id_produto + 1)
+    sistema._proximo_id_pedido = max(sistema._proximo_id_pedido, maior_id_pedido + 1)
+    return sistema, lsn
+
+
+# ==============================================================================
+# CLASSE GERENCIADOR PERSISTENCIA
+# ==============================================================================
+class GerenciadorPersistencia:
+    """
+    Liga um SistemaEcommerce ao log de escrita antecipada e mantém snapshots.
+
+    Cada evento de domínio do sistema é gravado no log. A cada
+    `eventos_por_snapshot` eventos, o segmento atual é fechado e compactado
+    em segundo plano: o snapshot anterior e os segmentos fechados são
+    reproduzidos num sistema à parte, o resultado vira o novo snapshot e os
+    segmentos cobertos por ele são removidos. Como o snapshot é construído a
+    partir do próprio log, ele é sempre consistente com o LSN que registra,
+    sem pausar o sistema em uso.
+
+    Com `formato_snapshot="binario"`, os snapshots usam o formato de
+    `app.snapshot_binario`, e a recuperação só materializa os produtos e
+    pedidos efetivamente acessados.
+
+    O livro razão do sistema grava seus lançamentos em `razao.log`, no mesmo
+    diretório, para que os reembolsos continuem validados após reabrir. As
+    capturas que não chegaram ao arquivo antes de uma queda são refeitas a
+    partir dos pedidos pagos recuperados.
+    """
+
+    def __init__(
+        self,
+        diretorio: str,
+        politica_fsync: str = "lote",
+        tamanho_grupo: int = 256,
+        intervalo_grupo: Optional[float] = 0.01,
+        eventos_por_snapshot: Optional[int] = 100_000,
+        formato_snapshot: str = "json",
+    ):
+        if formato_snapshot not in FORMATOS_SNAPSHOT:
+            raise ValueError(
+                f"Formato de snapshot deve ser um de {', '.join(FORMATOS_SNAPSHOT)}."
+            )
+        self.diretorio = diretorio
+        self.formato_snapshot = formato_snapshot
+        self.eventos_por_snapshot = eventos_por_snapshot
+        self.registro = RegistroEscritaAntecipada(
+            diretorio,
+            politica_fsync=politica_fsync,
+            tamanho_grupo=tamanho_grupo,
+            intervalo_grupo=intervalo_grupo,
+        )
+        self.sistema: Optional[SistemaEcommerce] = None
+        self._livro_anexado: Optional[LivroRazaoTransacoes] = None
+        # Conta os eventos registrados, que chegam de várias threads: só a
+        # que registra o N-ésimo evento desde o último snapshot dispara o próximo.
+        self._eventos_registrados = ContadorAtomico()
+        self._trava_compactacao = threading.Lock()
+        self._thread_compactacao: Optional[threading.Thread] = None
+        self.snapshots_criados = 0
+
+    @classmethod
+    def abrir(cls, diretorio: str, **opcoes: Any) -> "GerenciadorPersistencia":
+        """
+        Recupera o sistema salvo em `diretorio` (ou cria um vazio) e passa a
+        registrar seus eventos.
+        """
+        sistema, _ = recuperar_sistema(diretorio)
+        gerenciador = cls(diretorio, **opcoes)
+        gerenciador.anexar(sistema)
+        return gerenciador
+
+    def anexar(self, sistema: SistemaEcommerce) -> None:
+        self.sistema = sistema
+        livro = sistema.sistema_pagamento.livro_razao
+        # Um livro razão que já grava em outro arquivo é mantido como está.
+        if livro.caminho_arquivo is None:
+            livro.anexar_arquivo(
+                os.path.join(self.diretorio, _ARQUIVO_RAZAO),
+                sincronizar=self.registro.politica_fsync == "sempre",
+            )
+            self._livro_anexado = livro
+        sistema.adicionar_ouvinte(self._registrar_evento)
+
+    def _registrar_evento(self, tipo: str, dados: Dict[str, Any]) -> None:
+        self.registro.registrar(tipo, dados)
+        if self.eventos_por_snapshot:
+            if self._eventos_registrados.alocar() % self.eventos_por_snapshot == 0:
+                self.compactar(em_segundo_plano=True)
+
+    def compactar(self, em_segundo_plano: bool = False) -> Optional[int]:
+        """
+        Fecha o segmento atual e gera um snapshot até o seu último LSN.
+        Retorna esse LSN (ou None, se executado em segundo plano).
+        """
+        if em_segundo_plano:
+            if self._thread_compactacao is not None and self._thread_compactacao.is_alive():
+                return None
+            self._thread_compactacao = threading.Thread(target=self.compactar, daemon=True)
+            self._thread_compactacao.start()
+            return None
+        with self._trava_compactacao:
+            ate_lsn = self.registro.rotacionar()
+            estado_sistema, lsn = recuperar_sistema(self.diretorio, ate_lsn=ate_lsn)
+            try:
+                novo = salvar_snapshot_de(estado_sistema, self.diretorio, lsn, self.formato_snapshot)
+            finally:
+                # A cópia usada na compactação não é mais consultada.
+                if estado_sistema.snapshot_origem is not None:
+                    estado_sistema.snapshot_origem.fechar()
+            self.registro.remover_segmentos_ate(lsn)
+            # Um snapshot binário ainda mapeado (ex.: o que o sistema em uso
+            # carrega sob demanda) fica até uma compactação em que já não
+            # esteja em uso.
+            em_uso = snapshots_mapeados()
+            for _, caminho in _listar_snapshots(self.diretorio):
+                if caminho != novo and os.path.abspath(caminho) not in em_uso:
+                    os.remove(caminho)
+            self.snapshots_criados += 1
+            return lsn
+
+    def fechar(self) -> None:
+        if self._thread_compactacao is not None:
+            self._thread_compactacao.join()
+        if self.sistema is not None:
+            self.sistema.remover_ouvinte(self._registrar_evento)
+        if self._livro_anexado is not None:
+            self._livro_anexado.fechar()
+        self.registro.fechar()
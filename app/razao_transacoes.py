@@ -0,0 +1,373 @@
+import os
+import threading
+import time
+from typing import Dict, IO, Iterator, List, Optional
+
+from app.concorrencia import BasePreguicosa
+
+
+# ==============================================================================
+# CLASSE LANCAMENTO
+# ==============================================================================
+class Lancamento:
+    """
+    Lançamento imutável do livro razão: uma captura (pagamento aprovado) ou
+    um reembolso. Valores são guardados em centavos para evitar erros de
+    arredondamento de ponto flutuante nas validações.
+    """
+
+    CAPTURA = "C"
+    REEMBOLSO = "R"
+
+    __slots__ = (
+        "tipo",
+        "id_transacao",
+        "id_referencia",
+        "id_pedido",
+        "valor_centavos",
+        "metodo",
+        "timestamp_ms",
+    )
+
+    def __init__(
+        self,
+        tipo: str,
+        id_transacao: str,
+        valor_centavos: int,
+        id_referencia: str = "",
+        id_pedido: Optional[int] = None,
+        metodo: str = "",
+        timestamp_ms: Optional[int] = None,
+    ):
+        self.tipo = tipo
+        self.id_transacao = id_transacao
+        self.id_referencia = id_referencia
+        self.id_pedido = id_pedido
+        self.valor_centavos = valor_centavos
+        self.metodo = metodo
+        self.timestamp_ms = (
+            timestamp_ms if timestamp_ms is not None else time.time_ns() // 1_000_000
+        )
+
+    @property
+    def valor(self) -> float:
+        return self.valor_centavos / 100
+
+    def serializar(self) -> str:
+        """
+        Formato compacto de uma linha, separado por tabulações:
+        tipo, id, id de referência, id do pedido, centavos, método, timestamp (ms).
+        """
+        return (
+            f"{self.tipo}\t{self.id_transacao}\t{self.id_referencia}\t"
+            f"{'' if self.id_pedido is None else self.id_pedido}\t"
+            f"{self.valor_centavos}\t{self.metodo}\t{self.timestamp_ms}\n"
+        )
+
+    @classmethod
+    def desserializar(cls, linha: str) -> "Lancamento":
+        campos = linha.rstrip("\n").split("\t")
+        if len(campos) != 7 or campos[0] not in (cls.CAPTURA, cls.REEMBOLSO):
+            raise ValueError(f"Linha do livro razão em formato inválido: {linha!r}")
+        tipo, id_transacao, id_referencia, id_pedido, centavos, metodo, timestamp = campos
+        return cls(
+            tipo=tipo,
+            id_transacao=id_transacao,
+            valor_centavos=int(centavos),
+            id_referencia=id_referencia,
+            id_pedido=int(id_pedido) if id_pedido else None,
+            metodo=metodo,
+            timestamp_ms=int(timestamp),
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"Lancamento(tipo={self.tipo!r}, id_transacao={self.id_transacao!r}, "
+            f"id_referencia={self.id_referencia!r}, id_pedido={self.id_pedido!r}, "
+            f"valor_centavos={self.valor_centavos!r})"
+        )
+
+
+def para_centavos(valor: float) -> int:
+    return int(round(valor * 100))
+
+
+# ==============================================================================
+# CLASSE SALDO TRANSACAO
+# ==============================================================================
+class SaldoTransacao:
+    """
+    Entrada do índice por id de transação: valor capturado e total já reembolsado.
+    """
+
+    __slots__ = ("captura", "reembolsado_centavos", "reembolsos")
+
+    def __init__(self, captura: Lancamento):
+        self.captura = captura
+        self.reembolsado_centavos = 0
+        self.reembolsos: List[str] = []
+
+    @property
+    def reembolsavel_centavos(self) -> int:
+        return self.captura.valor_centavos - self.reembolsado_centavos
+
+
+# ==============================================================================
+# CLASSE LIVRO RAZAO TRANSACOES
+# ==============================================================================
+class LivroRazaoTransacoes(BasePreguicosa):
+    """
+    Livro razão de transações, somente de inclusão (append-only).
+
+    Mantém um índice hash por id de transação (capturas, com o saldo já
+    reembolsado) e um índice por id de pedido, permitindo validar reembolsos
+    e conciliar pedidos em O(1). Opcionalmente, cada lançamento é gravado em
+    `caminho_arquivo`, uma linha por lançamento, para a conciliação diária.
+
+    Num sistema recuperado de snapshot ou banco, as capturas dos pedidos já
+    pagos podem ser reconstruídas sob demanda com `definir_base`, antes da
+    primeira consulta.
+    """
+
+    def __init__(self, caminho_arquivo: Optional[str] = None, sincronizar: bool = False):
+        self.lancamentos: List[Lancamento] = []
+        self._por_transacao: Dict[str, SaldoTransacao] = {}
+        self._por_pedido: Dict[int, List[str]] = {}
+        super().__init__()
+        self._lock = threading.Lock()
+        self.caminho_arquivo = caminho_arquivo
+        self.sincronizar = sincronizar
+        self._arquivo: Optional[IO[str]] = None
+        if caminho_arquivo:
+            self._arquivo = open(caminho_arquivo, "a", encoding="utf-8", buffering=64 * 1024)
+
+    # ------------------------------------------------------------------ escrita
+    def registrar_captura(
+        self,
+        id_transacao: str,
+        valor: float,
+        metodo: str = "",
+        id_pedido: Optional[int] = None,
+    ) -> Lancamento:
+        if not id_transacao:
+            raise ValueError("ID da transação não pode ser vazio.")
+        if valor <= 0:
+            raise ValueError("Valor capturado deve ser positivo.")
+        lancamento = Lancamento(
+            Lancamento.CAPTURA,
+            id_transacao,
+            para_centavos(valor),
+            id_pedido=id_pedido,
+            metodo=metodo,
+        )
+        with self._lock:
+            if id_transacao in self._por_transacao:
+                raise ValueError(f"Transação {id_transacao} já registrada no livro razão.")
+            self._aplicar(lancamento)
+            self._gravar(lancamento)
+        return lancamento
+
+    def restaurar_captura(
+        self,
+        id_transacao: str,
+        valor: float,
+        metodo: str = "",
+        id_pedido: Optional[int] = None,
+        timestamp_ms: Optional[int] = None,
+    ) -> bool:
+        """
+        Inclui no índice a captura de um pagamento registrado antes (ex.: de
+        um pedido pago recuperado), sem gravá-la no arquivo. Capturas já
+        presentes são ignoradas. Retorna se a captura foi incluída.
+        """
+        centavos = para_centavos(valor)
+        if not id_transacao or centavos <= 0:
+            return False
+        with self._lock:
+            if id_transacao in self._por_transacao:
+                return False
+            self._aplicar(
+                Lancamento(
+                    Lancamento.CAPTURA,
+                    id_transacao,
+                    centavos,
+                    id_pedido=id_pedido,
+                    metodo=metodo,
+                    timestamp_ms=timestamp_ms,
+                )
+            )
+        return True
+
+    def registrar_reembolso(
+        self, id_reembolso: str, id_transacao_original: str, valor: float
+    ) -> Lancamento:
+        """
+        Registra um reembolso já validado. Levanta ValueError se o reembolso
+        exceder o saldo reembolsável da transação original.
+        """
+        centavos = para_centavos(valor)
+        self._garantir_base()
+        with self._lock:
+            erro = self._validar(id_transacao_original, centavos)
+            if erro:
+                raise ValueError(erro)
+            saldo = self._por_transacao[id_transacao_original]
+            lancamento = Lancamento(
+                Lancamento.REEMBOLSO,
+                id_reembolso,
+                centavos,
+                id_referencia=id_transacao_original,
+                id_pedido=saldo.captura.id_pedido,
+                metodo=saldo.captura.metodo,
+            )
+            self._aplicar(lancamento)
+            self._gravar(lancamento)
+        return lancamento
+
+    def _aplicar(self, lancamento: Lancamento) -> None:
+        self.lancamentos.append(lancamento)
+        if lancamento.tipo == Lancamento.CAPTURA:
+            self._por_transacao[lancamento.id_transacao] = SaldoTransacao(lancamento)
+        else:
+            saldo = self._por_transacao[lancamento.id_referencia]
+            saldo.reembolsado_centavos += lancamento.valor_centavos
+            saldo.reembolsos.append(lancamento.id_transacao)
+        if lancamento.id_pedido is not None:
+            self._por_pedido.setdefault(lancamento.id_pedido, []).append(
+                lancamento.id_transacao
+            )
+
+    def _gravar(self, lancamento: Lancamento) -> None:
+        if self._arquivo is None:
+            return
+        self._arquivo.write(lancamento.serializar())
+        if self.sincronizar:
+            self._arquivo.flush()
+            os.fsync(self._arquivo.fileno())
+
+    # ------------------------------------------------------------------ consultas
+    def _validar(self, id_transacao_original: str, valor_centavos: int) -> Optional[str]:
+        saldo = self._por_transacao.get(id_transacao_original)
+        if saldo is None:
+            return f"Transação original {id_transacao_original} não encontrada no livro razão."
+        if valor_centavos <= 0:
+            return "Valor do reembolso deve ser positivo."
+        if valor_centavos > saldo.reembolsavel_centavos:
+            return (
+                f"Valor do reembolso (R${valor_centavos / 100:.2f}) excede o saldo reembolsável "
+                f"da transação {id_transacao_original} (R${saldo.reembolsavel_centavos / 100:.2f})."
+            )
+        return None
+
+    def validar_reembolso(self, id_transacao_original: str, valor: float) -> Optional[str]:
+        """
+        Retorna None se o reembolso é válido, ou a mensagem de erro caso contrário.
+        """
+        self._garantir_base()
+        with self._lock:
+            return self._validar(id_transacao_original, para_centavos(valor))
+
+    def saldo_reembolsavel(self, id_transacao: str) -> float:
+        self._garantir_base()
+        with self._lock:
+            saldo = self._por_transacao.get(id_transacao)
+            return saldo.reembolsavel_centavos / 100 if saldo else 0.0
+
+    def obter_captura(self, id_transacao: str) -> Optional[Lancamento]:
+        self._garantir_base()
+        saldo = self._por_transacao.get(id_transacao)
+        return saldo.captura if saldo else None
+
+    def transacoes_do_pedido(self, id_pedido: int) -> List[str]:
+        """
+        Ids de capturas e reembolsos associados ao pedido, na ordem de registro.
+        """
+        self._garantir_base()
+        with self._lock:
+            return list(self._por_pedido.get(id_pedido, []))
+
+    def conciliar_pedido(self, id_pedido: int) -> Dict[str, float]:
+        """
+        Retorna os totais capturado, reembolsado e líquido de um pedido.
+        """
+        capturado = reembolsado = 0
+        self._garantir_base()
+        with self._lock:
+            for id_transacao in self._por_pedido.get(id_pedido, []):
+                saldo = self._por_transacao.get(id_transacao)
+                if saldo is not None:
+                    capturado += saldo.captura.valor_centavos
+                    reembolsado += saldo.reembolsado_centavos
+        return {
+            "capturado": capturado / 100,
+            "reembolsado": reembolsado / 100,
+            "liquido": (capturado - reembolsado) / 100,
+        }
+
+    def __len__(self) -> int:
+        self._garantir_base()
+        return len(self.lancamentos)
+
+    # ------------------------------------------------------------------ arquivo
+    def descarregar(self) -> None:
+        """
+        Força a gravação do buffer em disco.
+        """
+        with self._lock:
+            if self._arquivo is not None:
+                self._arquivo.flush()
+                os.fsync(self._arquivo.fileno())
+
+    def fechar(self) -> None:
+        with self._lock:
+            if self._arquivo is not None:
+                self._arquivo.flush()
+                self._arquivo.close()
+                self._arquivo = None
+
+    @staticmethod
+    def ler_lancamentos(caminho_arquivo: str) -> Iterator[Lancamento]:
+        """
+        Lê os lançamentos de um arquivo do livro razão em streaming, linha a linha.
+        """
+        with open(caminho_arquivo, "r", encoding="utf-8") as arquivo:
+            for linha in arquivo:
+                if linha.strip():
+                    yield Lancamento.desserializar(linha)
+
+    def anexar_arquivo(self, caminho_arquivo: str, sincronizar: bool = False) -> None:
+        """
+        Inclui os lançamentos já gravados em `caminho_arquivo` e passa a
+        gravar os novos nele. Capturas já restauradas no índice não são
+        duplicadas; se um reembolso do arquivo se refere a uma captura que
+        não está nele, as capturas de `definir_base` são carregadas antes.
+        """
+        if self._arquivo is not None:
+            raise ValueError("O livro razão já grava num arquivo.")
+        lancamentos: List[Lancamento] = []
+        if os.path.exists(caminho_arquivo):
+            lancamentos = list(self.ler_lancamentos(caminho_arquivo))
+        capturas = {l.id_transacao for l in lancamentos if l.tipo == Lancamento.CAPTURA}
+        if any(l.tipo == Lancamento.REEMBOLSO and l.id_referencia not in capturas for l in lancamentos):
+            self._garantir_base()
+        with self._lock:
+            for lancamento in lancamentos:
+                if lancamento.tipo == Lancamento.CAPTURA:
+                    if lancamento.id_transacao in self._por_transacao:
+                        continue
+                elif lancamento.id_referencia not in self._por_transacao:
+                    continue
+                self._aplicar(lancamento)
+            self.caminho_arquivo = caminho_arquivo
+            self.sincronizar = sincronizar
+            self._arquivo = open(caminho_arquivo, "a", encoding="utf-8", buffering=64 * 1024)
+
+    @classmethod
+    def carregar(cls, caminho_arquivo: str, sincronizar: bool = False) -> "LivroRazaoTransacoes":
+        """
+        Reconstrói o livro razão (e seus índices) a partir do arquivo e
+        continua gravando novos lançamentos nele.
+        """
+        livro = cls()
+        livro.anexar_arquivo(caminho_arquivo, sincronizar)
+        return livro
@@ -0,0 +1,207 @@
+import math
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from app.agregados_vendas import STATUS_FATURADOS
+from app.ecommerce_sistema import SistemaEcommerce
+from app.snapshot_binario import SnapshotBinario, salvar_snapshot_binario
+
+
+# Parcial de uma partição: tabelas pequenas (status/método, dia, produto),
+# nunca pedidos. É só isso que volta dos processos para o pai.
+Parcial = Dict[str, Dict[Any, List[int]]]
+
+# Snapshot aberto uma vez por processo do pool (ver `_abrir_no_processo`).
+_snapshot_do_processo: Optional[SnapshotBinario] = None
+
+
+def _abrir_no_processo(caminho: str) -> None:
+    global _snapshot_do_processo
+    _snapshot_do_processo = SnapshotBinario(caminho)
+
+
+def _somar(tabela: Dict[Any, List[int]], chave: Any, quantidade: int, centavos: int) -> None:
+    totais = tabela.get(chave)
+    if totais is None:
+        totais = tabela[chave] = [0, 0]
+    totais[0] += quantidade
+    totais[1] += centavos
+
+
+def _agregar_faixa(
+    snapshot: SnapshotBinario,
+    primeiro: int,
+    ultimo: int,
+    inicio_ts: float,
+    fim_ts: float,
+    status_aceitos: Tuple[str, ...],
+) -> Parcial:
+    """
+    Soma as vendas dos pedidos nas posições [primeiro, ultimo) da tabela de
+    pedidos do snapshot, pagas em [inicio_ts, fim_ts).
+    """
+    textos: Dict[Tuple[int, int], Optional[str]] = {}
+    # Dia local por fração de 15 minutos: todos os fusos têm deslocamento
+    # múltiplo de 15 minutos, então a fração não atravessa a meia-noite e
+    # cada uma só passa por datetime.fromtimestamp uma vez.
+    dias: Dict[int, int] = {}
+    vendas: Dict[Tuple[str, str], List[int]] = {}
+    por_dia: Dict[int, List[int]] = {}
+    por_produto: Dict[int, List[int]] = {}
+    for campos in snapshot.registros_pedidos(primeiro, ultimo):
+        ts = campos[12]
+        # NaN falha nas duas comparações: pedidos nunca pagos ficam de fora.
+        if not inicio_ts <= ts < fim_ts:
+            continue
+        referencia = (campos[7], campos[8])
+        status = textos.get(referencia)
+        if status is None:
+            status = textos[referencia] = snapshot.texto(*referencia)
+        if status not in status_aceitos:
+            continue
+        referencia = (campos[5], campos[6])
+        metodo = textos.get(referencia)
+        if metodo is None:
+            metodo = textos[referencia] = snapshot.texto(*referencia)
+        centavos = 0 if math.isnan(campos[17]) else round(campos[17] * 100)
+        _somar(vendas, (status, metodo), 1, centavos)
+        fracao = int(ts // 900)
+        dia = dias.get(fracao)
+        if dia is None:
+            dia = dias[fracao] = datetime.fromtimestamp(ts).toordinal()
+        _somar(por_dia, dia, 1, centavos)
+        for id_produto, quantidade, preco in snapshot.itens_do_registro(campos):
+            _somar(por_produto, id_produto, quantidade, round(preco * quantidade * 100))
+    return {"vendas": vendas, "por_dia": por_dia, "por_produto": por_produto}
+
+
+def _agregar_particao(
+    primeiro: int, ultimo: int, inicio_ts: float, fim_ts: float, status_aceitos: Tuple[str, ...]
+) -> Parcial:
+    return _agregar_faixa(_snapshot_do_processo, primeiro, ultimo, inicio_ts, fim_ts, status_aceitos)
+
+
+def _mesclar(parciais: List[Parcial]) -> Parcial:
+    resultado: Parcial = {"vendas": {}, "por_dia": {}, "por_produto": {}}
+    for parcial in parciais:
+        for nome, tabela in parcial.items():
+            destino = resultado[nome]
+            for chave, (quantidade, centavos) in tabela.items():
+                _somar(destino, chave, quantidade, centavos)
+    return resultado
+
+
+def _faixas(num_pedidos: int, particoes: int) -> List[Tuple[int, int]]:
+    """
+    Divide as posições [0, num_pedidos) em até `particoes` faixas contíguas
+    de tamanhos quase iguais. Os pedidos do snapshot estão ordenados por id,
+    então cada faixa é uma faixa de ids.
+    """
+    particoes = max(1, min(particoes, num_pedidos))
+    return [
+        (num_pedidos * i // particoes, num_pedidos * (i + 1) // particoes)
+        for i in range(particoes)
+    ]
+
+
+def _timestamp(momento: Optional[datetime], padrao: float) -> float:
+    return padrao if momento is None else momento.timestamp()
+
+
+def gerar_relatorio_paralelo(
+    origem: Union[SistemaEcommerce, str],
+    inicio: Optional[datetime] = None,
+    fim: Optional[datetime] = None,
+    status_filtro: Optional[str] = None,
+    processos: Optional[int] = None,
+    particoes: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Relatório de vendas histórico recalculado a partir dos pedidos, com as
+    partições agregadas em paralelo num ProcessPoolExecutor.
+
+    `origem` é um SistemaEcommerce ou o caminho de um snapshot binário. Um
+    sistema é gravado antes num snapshot binário temporário: os processos
+    recebem só o caminho e as posições da sua faixa de pedidos, e leem os
+    registros direto do arquivo mapeado em memória (as páginas ficam no
+    cache do sistema operacional, compartilhadas entre os processos), sem
+    serializar objetos Pedido. Cada processo devolve totais parciais por
+    status/método, dia e produto, que são somados aqui.
+
+    Considera os pedidos pagos/enviados/entregues (ou só os de
+    `status_filtro`) com pagamento em [inicio, fim). `processos` padrão é o
+    número de CPUs; com `processos=1` tudo roda neste processo. `particoes`
+    (padrão: 4 por processo) são faixas contíguas de ids, menores que o
+    total por processo para equilibrar a carga.
+    """
+    if processos is None:
+        processos = os.cpu_count() or 1
+    if not isinstance(processos, int) or processos < 1:
+        raise ValueError("Número de processos deve ser um inteiro positivo.")
+    if particoes is None:
+        particoes = processos * 4
+    if not isinstance(particoes, int) or particoes < 1:
+        raise ValueError("Número de partições deve ser um inteiro positivo.")
+    if inicio is not None and fim is not None and fim < inicio:
+        raise ValueError("Fim do intervalo não pode ser anterior ao início.")
+
+    if isinstance(origem, SistemaEcommerce):
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = salvar_snapshot_binario(origem, os.path.join(diretorio, "relatorio.bin"))
+            return gerar_relatorio_paralelo(caminho, inicio, fim, status_filtro, processos, particoes)
+
+    status_aceitos = tuple(s for s in STATUS_FATURADOS if not status_filtro or s == status_filtro)
+    filtros = (_timestamp(inicio, -math.inf), _timestamp(fim, math.inf), status_aceitos)
+    snapshot = SnapshotBinario(origem)
+    try:
+        faixas = _faixas(snapshot.num_pedidos, particoes)
+        if processos == 1 or len(faixas) == 1:
+            parciais = [_agregar_faixa(snapshot, a, b, *filtros) for a, b in faixas]
+        else:
+            with ProcessPoolExecutor(
+                max_workers=min(processos, len(faixas)),
+                initializer=_abrir_no_processo,
+                initargs=(origem,),
+            ) as executor:
+                futuros = [executor.submit(_agregar_particao, a, b, *filtros) for a, b in faixas]
+                parciais = [futuro.result() for futuro in futuros]
+        total = _mesclar(parciais)
+
+        por_metodo: Dict[str, List[int]] = {}
+        for (_, metodo), (quantidade, centavos) in total["vendas"].items():
+            _somar(por_metodo, metodo, quantidade, centavos)
+        por_categoria: Dict[Optional[str], List[int]] = {}
+        for id_produto, (unidades, centavos) in total["por_produto"].items():
+            _somar(por_categoria, snapshot.categoria_produto(id_produto), unidades, centavos)
+    finally:
+        snapshot.fechar()
+
+    num_pedidos = sum(quantidade for quantidade, _ in total["vendas"].values())
+    centavos_vendas = sum(centavos for _, centavos in total["vendas"].values())
+    return {
+        "total_vendas_apuradas": round(centavos_vendas / 100, 2),
+        "numero_de_pedidos_contabilizados": num_pedidos,
+        "filtro_status_aplicado": (
+            status_filtro if status_filtro else "Nenhum (considerados pagos/enviados/entregues)"
+        ),
+        "vendas_por_metodo_pagamento": {
+            metodo: {"quantidade": quantidade, "receita": centavos / 100}
+            for metodo, (quantidade, centavos) in por_metodo.items()
+        },
+        "vendas_por_dia": {
+            date.fromordinal(dia): {"quantidade": quantidade, "receita": centavos / 100}
+            for dia, (quantidade, centavos) in sorted(total["por_dia"].items())
+        },
+        "vendas_por_produto": {
+            id_produto: {"unidades": unidades, "valor": centavos / 100}
+            for id_produto, (unidades, centavos) in sorted(total["por_produto"].items())
+        },
+        "vendas_por_categoria": {
+            categoria: {"unidades": unidades, "valor": centavos / 100}
+            for categoria, (unidades, centavos) in por_categoria.items()
+        },
+        "particoes": len(faixas),
+    }
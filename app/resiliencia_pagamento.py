@@ -0,0 +1,309 @@
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+# ==============================================================================
+# RELOGIOS
+# ==============================================================================
+class RelogioSistema:
+    """
+    Relógio real, baseado em `time.monotonic` e `time.sleep`.
+    """
+
+    def agora(self) -> float:
+        return time.monotonic()
+
+    def dormir(self, segundos: float) -> None:
+        if segundos > 0:
+            time.sleep(segundos)
+
+
+class RelogioSimulado:
+    """
+    Relógio determinístico para testes: o tempo só avança quando `dormir` ou
+    `avancar` são chamados.
+    """
+
+    def __init__(self, instante_inicial: float = 0.0):
+        self.instante = float(instante_inicial)
+        self.total_dormido = 0.0
+
+    def agora(self) -> float:
+        return self.instante
+
+    def dormir(self, segundos: float) -> None:
+        if segundos > 0:
+            self.instante += segundos
+            self.total_dormido += segundos
+
+    def avancar(self, segundos: float) -> None:
+        self.instante += segundos
+
+
+# ==============================================================================
+# CLASSE DISJUNTOR (CIRCUIT BREAKER)
+# ==============================================================================
+class Disjuntor:
+    """
+    Disjuntor (circuit breaker) para o gateway de pagamento.
+
+    Estados:
+        fechado: chamadas passam normalmente; falhas consecutivas são contadas.
+        aberto: chamadas falham imediatamente até `tempo_abertura` segundos.
+        meio_aberto: permite até `chamadas_teste` chamadas de teste; sucesso
+            fecha o disjuntor e falha o reabre.
+    """
+
+    FECHADO = "fechado"
+    ABERTO = "aberto"
+    MEIO_ABERTO = "meio_aberto"
+
+    def __init__(
+        self,
+        limiar_falhas: int = 5,
+        tempo_abertura: float = 30.0,
+        chamadas_teste: int = 1,
+        relogio: Optional[Any] = None,
+    ):
+        if not isinstance(limiar_falhas, int) or limiar_falhas <= 0:
+            raise ValueError("Limiar de falhas deve ser um inteiro positivo.")
+        if tempo_abertura <= 0:
+            raise ValueError("Tempo de abertura deve ser positivo.")
+        if not isinstance(chamadas_teste, int) or chamadas_teste <= 0:
+            raise ValueError("Chamadas de teste deve ser um inteiro positivo.")
+
+        self.limiar_falhas = limiar_falhas
+        self.tempo_abertura = float(tempo_abertura)
+        self.chamadas_teste = chamadas_teste
+        self.relogio = relogio or RelogioSistema()
+        self._estado = self.FECHADO
+        self._falhas_consecutivas = 0
+        self._aberto_em = 0.0
+        self._testes_em_andamento = 0
+        self._lock = threading.Lock()
+        self.aberturas = 0
+
+    @property
+    def estado(self) -> str:
+        with self._lock:
+            self._atualizar_estado()
+            return self._estado
+
+    def _atualizar_estado(self) -> None:
+        if (
+            self._estado == self.ABERTO
+            and self.relogio.agora() - self._aberto_em >= self.tempo_abertura
+        ):
+            self._estado = self.MEIO_ABERTO
+            self._testes_em_andamento = 0
+
+    def permitir_chamada(self) -> bool:
+        with self._lock:
+            self._atualizar_estado()
+            if self._estado == self.FECHADO:
+                return True
+            if self._estado == self.MEIO_ABERTO:
+                if self._testes_em_andamento < self.chamadas_teste:
+                    self._testes_em_andamento += 1
+                    return True
+            return False
+
+    def registrar_sucesso(self) -> None:
+        with self._lock:
+            self._falhas_consecutivas = 0
+            if self._estado == self.MEIO_ABERTO:
+                self._estado = self.FECHADO
+                self._testes_em_andamento = 0
+
+    def registrar_falha(self) -> None:
+        with self._lock:
+            self._falhas_consecutivas += 1
+            if self._estado == self.MEIO_ABERTO or (
+                self._falhas_consecutivas >= self.limiar_falhas
+            ):
+                self._abrir()
+
+    def _abrir(self) -> None:
+        self._estado = self.ABERTO
+        self._aberto_em = self.relogio.agora()
+        self._testes_em_andamento = 0
+        self.aberturas += 1
+
+
+# ==============================================================================
+# CLASSE POLITICA RETENTATIVA
+# ==============================================================================
+class PoliticaRetentativa:
+    """
+    Retentativas com backoff exponencial e jitter completo (full jitter):
+    a espera antes da tentativa n é um valor aleatório entre 0 e
+    min(espera_maxima, espera_base * fator ** (n - 1)).
+    """
+
+    def __init__(
+        self,
+        max_tentativas: int = 3,
+        espera_base: float = 0.1,
+        fator: float = 2.0,
+        espera_maxima: float = 2.0,
+        aleatorio: Optional[random.Random] = None,
+    ):
+        if not isinstance(max_tentativas, int) or max_tentativas <= 0:
+            raise ValueError("Número máximo de tentativas deve ser um inteiro positivo.")
+        if espera_base < 0 or espera_maxima < 0:
+            raise ValueError("Tempos de espera não podem ser negativos.")
+        if fator < 1:
+            raise ValueError("Fator de crescimento deve ser maior ou igual a 1.")
+
+        self.max_tentativas = max_tentativas
+        self.espera_base = float(espera_base)
+        self.fator = float(fator)
+        self.espera_maxima = float(espera_maxima)
+        self.aleatorio = aleatorio or random.Random()
+
+    def calcular_espera(self, numero_retentativa: int) -> float:
+        teto = min(
+            self.espera_maxima, self.espera_base * self.fator ** (numero_retentativa - 1)
+        )
+        return self.aleatorio.uniform(0, teto)
+
+
+def resultado_retentavel(resultado: Dict[str, Any]) -> bool:
+    """
+    Apenas erros de comunicação (ex.: timeout) são retentáveis; rejeições de
+    negócio (fraude, falha de autorização) não devem ser repetidas.
+    """
+    return resultado.get("status") == "erro" and resultado.get("codigo_erro") in (
+        "timeout",
+        "prazo_excedido",
+    )
+
+
+# ==============================================================================
+# CLASSE RESILIENCIA GATEWAY
+# ==============================================================================
+class ResilienciaGateway:
+    """
+    Camada de resiliência em volta das chamadas ao gateway de pagamento:
+    prazo por chamada, retentativas com backoff e disjuntor.
+
+    O prazo de cada tentativa (`prazo_tentativa`) é verificado ao fim da
+    chamada: respostas que chegam depois do prazo são descartadas e tratadas
+    como timeout, exceto aprovações. Uma aprovação tardia já capturou o
+    valor, então repetir a tentativa cobraria o cliente de novo; ela é
+    devolvida com `"aprovado_apos_prazo": True`, para conciliação.
+
+    O prazo total (`prazo_total`) limita a soma das tentativas e esperas;
+    nenhuma nova tentativa é feita se não couber no prazo. Uma exceção
+    levantada pela chamada conta como falha no disjuntor e é propagada, sem
+    retentativa.
+    """
+
+    def __init__(
+        self,
+        politica: Optional[PoliticaRetentativa] = None,
+        disjuntor: Optional[Disjuntor] = None,
+        prazo_tentativa: Optional[float] = 5.0,
+        prazo_total: Optional[float] = 15.0,
+        relogio: Optional[Any] = None,
+        eh_retentavel: Callable[[Dict[str, Any]], bool] = resultado_retentavel,
+    ):
+        self.relogio = relogio or RelogioSistema()
+        self.politica = politica or PoliticaRetentativa()
+        self.disjuntor = disjuntor or Disjuntor(relogio=self.relogio)
+        self.prazo_tentativa = prazo_tentativa
+        self.prazo_total = prazo_total
+        self.eh_retentavel = eh_retentavel
+        self._lock = threading.Lock()
+        self.metricas: Dict[str, int] = {
+            "chamadas": 0,
+            "tentativas": 0,
+            "retentativas": 0,
+            "sucessos": 0,
+            "falhas_retentaveis": 0,
+            "prazos_excedidos": 0,
+            "aprovacoes_tardias": 0,
+            "rejeitadas_circuito_aberto": 0,
+        }
+
+    def _incrementar(self, metrica: str) -> None:
+        with self._lock:
+            self.metricas[metrica] += 1
+
+    def executar(self, chamada: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Executa a chamada ao gateway aplicando prazo, retentativas e disjuntor.
+        """
+        self._incrementar("chamadas")
+        inicio = self.relogio.agora()
+        resultado: Dict[str, Any] = {}
+
+        for tentativa in range(1, self.politica.max_tentativas + 1):
+            if not self.disjuntor.permitir_chamada():
+                self._incrementar("rejeitadas_circuito_aberto")
+                return {
+                    "status": "erro",
+                    "mensagem": "Gateway de pagamento indisponível (circuito aberto). Tente novamente mais tarde.",
+                    "id_transacao": None,
+                    "codigo_erro": "circuito_aberto",
+                }
+
+            self._incrementar("tentativas")
+            inicio_tentativa = self.relogio.agora()
+            try:
+                resultado = chamada()
+            except BaseException:
+                # Sem isso, a vaga de teste do disjuntor meio aberto ficaria
+                # ocupada para sempre.
+                self.disjuntor.registrar_falha()
+                raise
+            duracao = self.relogio.agora() - inicio_tentativa
+            if self.prazo_tentativa is not None and duracao > self.prazo_tentativa:
+                self._incrementar("prazos_excedidos")
+                if resultado.get("status") == "aprovado":
+                    self._incrementar("aprovacoes_tardias")
+                    resultado = dict(resultado, aprovado_apos_prazo=True)
+                else:
+                    resultado = {
+                        "status": "erro",
+                        "mensagem": f"Prazo de {self.prazo_tentativa:.2f}s excedido na comunicação com o gateway de pagamento.",
+                        "id_transacao": None,
+                        "codigo_erro": "prazo_excedido",
+                    }
+
+            if not self.eh_retentavel(resultado):
+                self.disjuntor.registrar_sucesso()
+                if resultado.get("status") == "aprovado":
+                    self._incrementar("sucessos")
+                return resultado
+
+            self._incrementar("falhas_retentaveis")
+            self.disjuntor.registrar_falha()
+            if tentativa == self.politica.max_tentativas:
+                break
+
+            espera = self.politica.calcular_espera(tentativa)
+            if self.prazo_total is not None:
+                decorrido = self.relogio.agora() - inicio
+                if decorrido + espera >= self.prazo_total:
+                    break
+            self._incrementar("retentativas")
+            self.relogio.dormir(espera)
+
+        resultado = dict(resultado)
+        resultado["tentativas"] = tentativa
+        return resultado
+
+    def obter_estado(self) -> Dict[str, Any]:
+        """
+        Retorna o estado do disjuntor e uma cópia das métricas acumuladas.
+        """
+        with self._lock:
+            metricas = dict(self.metricas)
+        return {
+            "estado_disjuntor": self.disjuntor.estado,
+            "aberturas_disjuntor": self.disjuntor.aberturas,
+            "metricas": metricas,
+        }
@@ -0,0 +1,271 @@
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.agregados_vendas import STATUS_FATURADOS
+from app.concorrencia import BasePreguicosa
+
+
+GRANULARIDADES = ("hora", "dia", "mes")
+
+# Chaves dos baldes: horas e dias contados a partir do dia ordinal 1
+# (date.toordinal), meses como ano * 12 + mês - 1. Chaves inteiras em hora
+# local, então não há ambiguidade nas mudanças de horário de verão.
+
+
+def _chave_hora(momento: datetime) -> int:
+    return momento.toordinal() * 24 + momento.hour
+
+
+def _chave_mes(dia: date) -> int:
+    return dia.year * 12 + dia.month - 1
+
+
+def _inicio_do_mes(chave: int) -> date:
+    return date(chave // 12, chave % 12 + 1, 1)
+
+
+def _inicio_do_balde(granularidade: str, chave: int) -> datetime:
+    if granularidade == "hora":
+        return datetime.combine(date.fromordinal(chave // 24), datetime.min.time()) + timedelta(
+            hours=chave % 24
+        )
+    if granularidade == "dia":
+        return datetime.combine(date.fromordinal(chave), datetime.min.time())
+    return datetime.combine(_inicio_do_mes(chave), datetime.min.time())
+
+
+def _decompor_dias(d0: int, d1: int) -> Iterator[Tuple[str, int]]:
+    """
+    Cobre os dias [d0, d1) com o menor número de baldes: dias soltos até o
+    início de um mês, meses inteiros e dias soltos no fim.
+    """
+    d = d0
+    while d < d1 and date.fromordinal(d).day != 1:
+        yield "dia", d
+        d += 1
+    while d < d1:
+        mes = _chave_mes(date.fromordinal(d))
+        proximo = _inicio_do_mes(mes + 1).toordinal()
+        if proximo > d1:
+            break
+        yield "mes", mes
+        d = proximo
+    while d < d1:
+        yield "dia", d
+        d += 1
+
+
+def _decompor_horas(h0: int, h1: int) -> Iterator[Tuple[str, int]]:
+    """
+    Cobre as horas [h0, h1) com horas soltas nas pontas e dias/meses no meio.
+    """
+    if h1 <= h0:
+        return
+    if h0 // 24 == (h1 - 1) // 24:
+        yield from (("hora", h) for h in range(h0, h1))
+        return
+    d0 = -(-h0 // 24)
+    d1 = h1 // 24
+    yield from (("hora", h) for h in range(h0, d0 * 24))
+    yield from _decompor_dias(d0, d1)
+    yield from (("hora", h) for h in range(d1 * 24, h1))
+
+
+# ==============================================================================
+# CLASSE ROLLUPS VENDAS
+# ==============================================================================
+class RollupsVendas(BasePreguicosa):
+    """
+    Vendas pré-agregadas em baldes de tempo (hora, dia e mês do pagamento):
+    quantidade de pedidos e receita por balde, e unidades e valor dos itens
+    por produto e por categoria em baldes de dia e mês.
+
+    Um pedido entra nos baldes ao ser pago e sai deles se for cancelado
+    depois (a saída usa a mesma data de pagamento, então os baldes refletem
+    as vendas líquidas de cada período). Consultas por intervalo combinam
+    baldes grossos e finos: um intervalo de anos custa alguns meses, dias e
+    horas, não uma varredura dos pedidos. As quebras por produto e categoria
+    têm resolução de um dia.
+
+    `categoria_de(id_produto)` resolve a categoria na primeira venda de cada
+    produto; a mesma categoria é usada depois nas saídas.
+    """
+
+    def __init__(self, categoria_de: Callable[[int], Optional[str]]):
+        super().__init__()
+        self._categoria_de = categoria_de
+        self._categorias: Dict[int, Optional[str]] = {}
+        self._lock = threading.Lock()
+        # granularidade -> chave do balde -> [pedidos, centavos]
+        self._totais: Dict[str, Dict[int, List[int]]] = {g: {} for g in GRANULARIDADES}
+        # granularidade ("dia"/"mes") -> chave -> id_produto -> [unidades, centavos]
+        self._produtos: Dict[str, Dict[int, Dict[int, List[int]]]] = {"dia": {}, "mes": {}}
+        self._categorias_baldes: Dict[str, Dict[int, Dict[Optional[str], List[int]]]] = {
+            "dia": {},
+            "mes": {},
+        }
+
+    @staticmethod
+    def _somar(tabela: Dict[Any, List[int]], chave: Any, quantidade: int, centavos: int) -> None:
+        totais = tabela.get(chave)
+        if totais is None:
+            totais = tabela[chave] = [0, 0]
+        totais[0] += quantidade
+        totais[1] += centavos
+
+    def definir_categoria(self, id_produto: int, categoria: Optional[str]) -> None:
+        """
+        Informa a categoria de um produto antes da primeira venda, para que
+        cargas em massa não precisem consultar o catálogo.
+        """
+        self._categorias.setdefault(id_produto, categoria)
+
+    def _categoria(self, id_produto: int) -> Optional[str]:
+        try:
+            return self._categorias[id_produto]
+        except KeyError:
+            categoria = self._categorias[id_produto] = self._categoria_de(id_produto)
+            return categoria
+
+    def registrar_venda(
+        self,
+        data_pagamento: datetime,
+        valor_pago: Optional[float],
+        itens: Iterable[Tuple[int, int, float]],
+        sinal: int = 1,
+    ) -> None:
+        """
+        Soma (sinal=1) ou subtrai (sinal=-1) uma venda paga em
+        `data_pagamento`, com itens (id_produto, quantidade, preço unitário).
+        """
+        dia = data_pagamento.toordinal()
+        chaves = {"hora": _chave_hora(data_pagamento), "dia": dia, "mes": _chave_mes(data_pagamento)}
+        centavos = 0 if valor_pago is None else round(valor_pago * 100)
+        # Categorias resolvidas fora do lock: a consulta ao catálogo pode
+        # materializar o produto.
+        itens = [(i, self._categoria(i), q, round(p * q * 100)) for i, q, p in itens]
+        with self._lock:
+            for granularidade, chave in chaves.items():
+                self._somar(self._totais[granularidade], chave, sinal, sinal * centavos)
+            for granularidade in ("dia", "mes"):
+                chave = chaves[granularidade]
+                produtos = self._produtos[granularidade].setdefault(chave, {})
+                categorias = self._categorias_baldes[granularidade].setdefault(chave, {})
+                for id_produto, categoria, quantidade, valor in itens:
+                    self._somar(produtos, id_produto, sinal * quantidade, sinal * valor)
+                    self._somar(categorias, categoria, sinal * quantidade, sinal * valor)
+
+    def registrar_transicao(self, pedido: Any, status_anterior: str) -> None:
+        """
+        Soma o pedido ao entrar num status faturado e o subtrai ao sair dele.
+        """
+        self._garantir_base_para_alterar()
+        antes = status_anterior in STATUS_FATURADOS
+        depois = pedido.status_pedido in STATUS_FATURADOS
+        data_pagamento = pedido.datas.get("pagamento")
+        if antes == depois or data_pagamento is None:
+            return
+        self.registrar_venda(
+            data_pagamento,
+            pedido.valor_final_pago,
+            ((i.id_produto, i.quantidade, i.preco_unitario) for i in pedido.linhas),
+            1 if depois else -1,
+        )
+
+    def registrar_pedido(self, pedido: Any) -> None:
+        """
+        Soma um pedido restaurado que já esteja num status faturado.
+        """
+        self._garantir_base_para_alterar()
+        if pedido.status_pedido in STATUS_FATURADOS and pedido.datas.get("pagamento"):
+            self.registrar_venda(
+                pedido.datas["pagamento"],
+                pedido.valor_final_pago,
+                ((i.id_produto, i.quantidade, i.preco_unitario) for i in pedido.linhas),
+            )
+
+    # ------------------------------------------------------------------ consultas
+    @staticmethod
+    def _horas(inicio: datetime, fim: datetime) -> Tuple[int, int]:
+        if fim < inicio:
+            raise ValueError("Fim do intervalo não pode ser anterior ao início.")
+        return _chave_hora(inicio), _chave_hora(fim)
+
+    @staticmethod
+    def _dias(inicio: datetime, fim: datetime) -> Tuple[int, int]:
+        if fim < inicio:
+            raise ValueError("Fim do intervalo não pode ser anterior ao início.")
+        return inicio.toordinal(), fim.toordinal()
+
+    def totais(self, inicio: datetime, fim: datetime) -> Dict[str, Any]:
+        """
+        Pedidos e receita pagos em [inicio, fim), com resolução de uma hora.
+        """
+        h0, h1 = self._horas(inicio, fim)
+        self._garantir_base()
+        pedidos = centavos = 0
+        with self._lock:
+            for granularidade, chave in _decompor_horas(h0, h1):
+                balde = self._totais[granularidade].get(chave)
+                if balde is not None:
+                    pedidos += balde[0]
+                    centavos += balde[1]
+        return {"pedidos": pedidos, "receita": centavos / 100}
+
+    def _quebra(
+        self,
+        tabelas: Dict[str, Dict[int, Dict[Any, List[int]]]],
+        inicio: datetime,
+        fim: datetime,
+    ) -> Dict[Any, Dict[str, Any]]:
+        d0, d1 = self._dias(inicio, fim)
+        self._garantir_base()
+        resultado: Dict[Any, List[int]] = {}
+        with self._lock:
+            for granularidade, chave in _decompor_dias(d0, d1):
+                for item, (unidades, centavos) in tabelas[granularidade].get(chave, {}).items():
+                    self._somar(resultado, item, unidades, centavos)
+        return {
+            chave: {"unidades": unidades, "valor": centavos / 100}
+            for chave, (unidades, centavos) in resultado.items()
+            if unidades
+        }
+
+    def por_produto(self, inicio: datetime, fim: datetime) -> Dict[int, Dict[str, Any]]:
+        """
+        Unidades e valor vendidos por produto nos dias [inicio, fim).
+        """
+        return self._quebra(self._produtos, inicio, fim)
+
+    def por_categoria(self, inicio: datetime, fim: datetime) -> Dict[Optional[str], Dict[str, Any]]:
+        """
+        Unidades e valor vendidos por categoria nos dias [inicio, fim).
+        """
+        return self._quebra(self._categorias_baldes, inicio, fim)
+
+    def serie(
+        self, granularidade: str, inicio: datetime, fim: datetime
+    ) -> List[Tuple[datetime, int, float]]:
+        """
+        (início do balde, pedidos, receita) de cada balde com vendas, em
+        ordem, do balde que contém `inicio` até o anterior ao que contém `fim`.
+        """
+        if granularidade not in GRANULARIDADES:
+            raise ValueError(f"Granularidade deve ser uma de {', '.join(GRANULARIDADES)}.")
+        if granularidade == "hora":
+            chaves = range(*self._horas(inicio, fim))
+        elif granularidade == "dia":
+            chaves = range(*self._dias(inicio, fim))
+        else:
+            self._dias(inicio, fim)
+            chaves = range(_chave_mes(inicio), _chave_mes(fim))
+        self._garantir_base()
+        tabela = self._totais[granularidade]
+        with self._lock:
+            baldes = [(chave, tabela[chave]) for chave in chaves if chave in tabela]
+        return [
+            (_inicio_do_balde(granularidade, chave), pedidos, centavos / 100)
+            for chave, (pedidos, centavos) in baldes
+            if pedidos
+        ]
@@ -0,0 +1,484 @@
+import contextlib
+import multiprocessing
+import os
+import threading
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from app.ecommerce_sistema import Carrinho, SistemaEcommerce
+from app.identificadores import GeradorIds
+
+
+def particao_do_cliente(cliente_id: str, num_particoes: int) -> int:
+    """
+    Partição dona dos pedidos e carrinhos de um cliente (hash estável entre
+    processos, ao contrário de `hash()` em strings).
+    """
+    return zlib.crc32(cliente_id.encode("utf-8")) % num_particoes
+
+
+def particao_do_produto(id_produto: int, num_particoes: int) -> int:
+    """
+    Partição dona do estoque de um produto.
+    """
+    return id_produto % num_particoes
+
+
+# ==============================================================================
+# PROCESSO DE UMA PARTIÇÃO
+# ==============================================================================
+class _SistemaParticao(SistemaEcommerce):
+    """
+    SistemaEcommerce de uma partição. O estoque não é mexido pelo pagamento
+    nem pelo cancelamento: o coordenador o move nas partições donas dos
+    produtos, com reserva em duas fases.
+    """
+
+    def _reduzir_estoque_itens(self, itens) -> None:
+        pass
+
+    def _reabastecer(self, itens) -> None:
+        pass
+
+
+class _Particao:
+    """
+    Operações atendidas pelo processo de uma partição. Pedidos são
+    identificados pelo id local; produtos do catálogo existem em todas as
+    partições (réplica de nome, preço e categoria), mas só a dona de cada
+    produto tem o estoque real.
+    """
+
+    def __init__(self, indice: int):
+        self.indice = indice
+        # Nó explícito por partição: derivado do PID, dois processos podem
+        # cair no mesmo nó e gerar ids de transação iguais.
+        self.sistema = _SistemaParticao(gerador_ids=GeradorIds(id_no=indice))
+        self.reservas: Dict[Any, List[Tuple[int, int]]] = {}
+
+    def adicionar_produto(self, nome, descricao, preco, estoque, categoria) -> int:
+        return self.sistema.adicionar_produto_catalogo(nome, descricao, preco, estoque, categoria).id_produto
+
+    def registrar_usuarios(self, usuarios: List[Tuple[str, Dict]]) -> List[Optional[str]]:
+        erros: List[Optional[str]] = []
+        for cliente_id, dados in usuarios:
+            try:
+                self.sistema.registrar_usuario(cliente_id, dados)
+                erros.append(None)
+            except ValueError as e:
+                erros.append(str(e))
+        return erros
+
+    def criar_pedidos(self, solicitacoes: List[Tuple[str, List[Tuple[int, int]], Dict, str]]) -> List[Optional[int]]:
+        catalogo = self.sistema.produtos_catalogo
+        convertidas = []
+        for cliente_id, itens, endereco_entrega, metodo_pagamento in solicitacoes:
+            # Montado sem `adicionar_item` e criado sem validar estoque: o
+            # estoque das réplicas não é o real, e o pedido só o consome no
+            # pagamento, com reserva na partição dona.
+            carrinho = Carrinho()
+            for id_produto, quantidade in itens:
+                produto = catalogo.get(id_produto)
+                if produto is not None:
+                    carrinho.itens[produto] = carrinho.itens.get(produto, 0) + quantidade
+            convertidas.append((cliente_id, carrinho, endereco_entrega, metodo_pagamento))
+        criados = self.sistema.criar_pedidos_em_lote(convertidas, validar_estoque=False)["criados"]
+        return [criados[i].id_pedido if i in criados else None for i in range(len(convertidas))]
+
+    def itens_pendentes(self, ids_pedidos: List[int]) -> List[Optional[List[Tuple[int, int]]]]:
+        itens = []
+        for id_pedido in ids_pedidos:
+            pedido = self.sistema.pedidos_registrados.get(id_pedido)
+            ok = pedido is not None and pedido.status_pedido == "pendente"
+            itens.append(list(pedido.linhas.pares()) if ok else None)
+        return itens
+
+    def reservar(self, reservas: List[Tuple[Any, List[Tuple[int, int]]]]) -> List[bool]:
+        """
+        Fase 1: retira o estoque de cada reserva (tudo ou nada por reserva).
+        """
+        resultados = []
+        for id_reserva, itens in reservas:
+            try:
+                SistemaEcommerce._reduzir_estoque_itens(self.sistema, itens)
+            except Exception:
+                resultados.append(False)
+                continue
+            self.reservas[id_reserva] = itens
+            resultados.append(True)
+        return resultados
+
+    def concluir(self, confirmadas: List[Any], liberadas: List[Any]) -> None:
+        """
+        Fase 2: o estoque das reservas confirmadas fica consumido; o das
+        liberadas volta ao estoque.
+        """
+        for id_reserva in confirmadas:
+            self.reservas.pop(id_reserva, None)
+        for id_reserva in liberadas:
+            itens = self.reservas.pop(id_reserva, None)
+            if itens is not None:
+                SistemaEcommerce._reabastecer(self.sistema, itens)
+
+    def devolver(self, itens: List[Tuple[int, int]]) -> None:
+        SistemaEcommerce._reabastecer(self.sistema, itens)
+
+    def pagar(self, pagamentos: List[Tuple[int, Dict]]) -> List[Dict[str, Any]]:
+        # Um pagamento que falha não descarta os resultados dos demais, que
+        # o coordenador precisa para confirmar as reservas.
+        resultados = []
+        for id_pedido, detalhes in pagamentos:
+            try:
+                resultados.append(self.sistema.processar_pagamento_pedido(id_pedido, detalhes))
+            except Exception as e:
+                resultados.append({"status": "erro", "mensagem": f"Erro ao processar o pagamento: {e}"})
+        return resultados
+
+    def cancelar(self, ids_pedidos: List[int]) -> List[Tuple[bool, List[Tuple[int, int]]]]:
+        resultados = []
+        for id_pedido in ids_pedidos:
+            pedido = self.sistema.pedidos_registrados.get(id_pedido)
+            status_anterior = pedido.status_pedido if pedido else None
+            cancelado = self.sistema.cancelar_pedido(id_pedido)
+            devolver = cancelado and status_anterior in ("pago", "enviado")
+            resultados.append((cancelado, list(pedido.linhas.pares()) if devolver else []))
+        return resultados
+
+    def pedido(self, id_pedido: int) -> Optional[Dict[str, Any]]:
+        pedido = self.sistema.pedidos_registrados.get(id_pedido)
+        if pedido is None:
+            return None
+        return {
+            "cliente_id": pedido.cliente_id,
+            "status": pedido.status_pedido,
+            "itens": list(pedido.linhas.pares()),
+            "valor_total": pedido.valor_total_pedido,
+            "valor_pago": pedido.valor_final_pago,
+        }
+
+    def estoque(self, id_produto: int) -> int:
+        return self.sistema.produtos_catalogo[id_produto].quantidade_em_estoque
+
+    def vendas_por_status(self) -> Dict[str, Dict[str, Any]]:
+        return self.sistema.agregados_vendas.por_status()
+
+
+def _executar_particao(indice: int, conexao) -> None:
+    particao = _Particao(indice)
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        while True:
+            mensagem = conexao.recv()
+            if mensagem is None:
+                break
+            operacao, argumentos = mensagem
+            try:
+                conexao.send((True, getattr(particao, operacao)(*argumentos)))
+            except Exception as e:
+                conexao.send((False, e))
+    conexao.close()
+
+
+# ==============================================================================
+# CLASSE SISTEMA PARTICIONADO
+# ==============================================================================
+class SistemaParticionado:
+    """
+    SistemaEcommerce dividido entre `num_particoes` processos.
+
+    Usuários, carrinhos e pedidos ficam na partição do cliente
+    (`particao_do_cliente`). O catálogo é replicado em todas as partições,
+    só para leitura de nome, preço e categoria; o estoque de cada produto
+    fica só na partição dona dele (`particao_do_produto`). O id global de um
+    pedido codifica a partição: `id_local * num_particoes + particao`.
+
+    O pagamento consome estoque em duas fases. Primeiro, as partições donas
+    dos produtos reservam os itens (tudo ou nada). Depois, a partição do
+    cliente processa o pagamento. As reservas são então confirmadas, se o
+    pagamento foi aprovado, ou liberadas. Cancelar um pedido pago devolve o
+    estoque às partições donas.
+
+    Os métodos em lote (`criar_pedidos`, `processar_pagamentos`) mandam cada
+    etapa a todas as partições envolvidas antes de esperar as respostas, então
+    as partições trabalham em paralelo. Os métodos unitários são atalhos
+    para eles. A saída impressa pelos sistemas das partições é descartada.
+    """
+
+    def __init__(self, num_particoes: Optional[int] = None):
+        if num_particoes is None:
+            num_particoes = os.cpu_count() or 1
+        if not isinstance(num_particoes, int) or num_particoes < 1:
+            raise ValueError("Número de partições deve ser um inteiro positivo.")
+        if num_particoes > GeradorIds.MAX_NO + 1:
+            raise ValueError(f"Número de partições não pode passar de {GeradorIds.MAX_NO + 1}.")
+        self.num_particoes = num_particoes
+        self._num_produtos = 0
+        self._lock = threading.Lock()
+        # Mantido da alocação do id de produto até o envio às partições (ver
+        # adicionar_produto_catalogo); adquirido sempre antes de `_lock`.
+        self._lock_produtos = threading.Lock()
+        self._conexoes = []
+        self._processos = []
+        for indice in range(num_particoes):
+            local, remota = multiprocessing.Pipe()
+            processo = multiprocessing.Process(target=_executar_particao, args=(indice, remota), daemon=True)
+            processo.start()
+            remota.close()
+            self._conexoes.append(local)
+            self._processos.append(processo)
+
+    # ------------------------------------------------------------------ comunicação
+    def _chamar_todas(
+        self, chamadas: Dict[int, Tuple[str, Tuple[Any, ...]]], parciais: Optional[Dict[int, Any]] = None
+    ) -> Dict[int, Any]:
+        """
+        Envia uma operação a cada partição de `chamadas` e depois recolhe as
+        respostas, na mesma ordem. Levanta a primeira exceção recebida; as
+        respostas das partições que tiveram sucesso ficam antes em `parciais`.
+        """
+        enviadas: List[int] = []
+        with self._lock:
+            try:
+                for particao, mensagem in chamadas.items():
+                    self._conexoes[particao].send(mensagem)
+                    enviadas.append(particao)
+            finally:
+                # Se um envio falhar, as partições que já receberam a operação
+                # ainda respondem: as respostas são lidas para não deixar o
+                # canal fora de sincronia.
+                respostas = {particao: self._conexoes[particao].recv() for particao in enviadas}
+                resultados = {particao: resultado for particao, (ok, resultado) in respostas.items() if ok}
+                if parciais is not None:
+                    parciais.update(resultados)
+        for ok, resultado in respostas.values():
+            if not ok:
+                raise resultado
+        return resultados
+
+    def _chamar(self, particao: int, operacao: str, *argumentos: Any) -> Any:
+        return self._chamar_todas({particao: (operacao, argumentos)})[particao]
+
+    def _id_global(self, particao: int, id_local: int) -> int:
+        return id_local * self.num_particoes + particao
+
+    def _decompor(self, id_pedido: int) -> Tuple[int, int]:
+        return id_pedido % self.num_particoes, id_pedido // self.num_particoes
+
+    def _por_particao(self, itens: Sequence[Tuple[int, int]]) -> Dict[int, List[Tuple[int, int]]]:
+        grupos: Dict[int, List[Tuple[int, int]]] = {}
+        for id_produto, quantidade in itens:
+            grupos.setdefault(particao_do_produto(id_produto, self.num_particoes), []).append(
+                (id_produto, quantidade)
+            )
+        return grupos
+
+    # ------------------------------------------------------------------ catálogo e usuários
+    def adicionar_produto_catalogo(
+        self, nome: str, descricao: str, preco: float, quantidade_em_estoque: int, categoria: str
+    ) -> int:
+        """
+        Adiciona o produto em todas as partições (com o mesmo id) e retorna
+        o id. Só a partição dona recebe o estoque.
+        """
+        # As partições alocam ids de produto na mesma sequência, mesmo quando
+        # a criação falha, então o próximo id é conhecido aqui. O id e o
+        # envio ficam sob o mesmo lock: outra thread não pode alocar o id
+        # seguinte e chegar antes às partições, que dariam a ela este id.
+        with self._lock_produtos:
+            self._num_produtos += 1
+            id_produto = self._num_produtos
+            dono = particao_do_produto(id_produto, self.num_particoes)
+            self._chamar_todas(
+                {
+                    particao: (
+                        "adicionar_produto",
+                        (nome, descricao, preco, quantidade_em_estoque if particao == dono else 0, categoria),
+                    )
+                    for particao in range(self.num_particoes)
+                }
+            )
+        return id_produto
+
+    def estoque(self, id_produto: int) -> int:
+        return self._chamar(particao_do_produto(id_produto, self.num_particoes), "estoque", id_produto)
+
+    def registrar_usuario(self, cliente_id: str, dados_usuario: Dict) -> None:
+        erro = self._chamar(
+            particao_do_cliente(cliente_id, self.num_particoes), "registrar_usuarios", [(cliente_id, dados_usuario)]
+        )[0]
+        if erro is not None:
+            raise ValueError(erro)
+
+    # ------------------------------------------------------------------ pedidos
+    def criar_pedidos(
+        self, solicitacoes: Sequence[Tuple[str, Sequence[Tuple[int, int]], Dict, str]]
+    ) -> List[Optional[int]]:
+        """
+        Cria pedidos (cliente_id, [(id_produto, quantidade)], endereco,
+        metodo_pagamento) nas partições dos clientes. Retorna os ids globais,
+        com None para os recusados.
+        """
+        grupos: Dict[int, List[int]] = {}
+        for indice, solicitacao in enumerate(solicitacoes):
+            grupos.setdefault(particao_do_cliente(solicitacao[0], self.num_particoes), []).append(indice)
+        respostas = self._chamar_todas(
+            {
+                particao: ("criar_pedidos", ([tuple(solicitacoes[i]) for i in indices],))
+                for particao, indices in grupos.items()
+            }
+        )
+        ids: List[Optional[int]] = [None] * len(solicitacoes)
+        for particao, indices in grupos.items():
+            for indice, id_local in zip(indices, respostas[particao]):
+                if id_local is not None:
+                    ids[indice] = self._id_global(particao, id_local)
+        return ids
+
+    def criar_pedido(
+        self, cliente_id: str, itens: Sequence[Tuple[int, int]], endereco_entrega: Dict, metodo_pagamento: str
+    ) -> Optional[int]:
+        return self.criar_pedidos([(cliente_id, itens, endereco_entrega, metodo_pagamento)])[0]
+
+    def processar_pagamentos(self, pagamentos: Sequence[Tuple[int, Dict]]) -> List[Dict[str, Any]]:
+        """
+        Paga vários pedidos (id_pedido, detalhes_pagamento) com reserva de
+        estoque em duas fases. Retorna os resultados de
+        `processar_pagamento_pedido`, na ordem recebida; pedidos sem estoque
+        não chegam ao gateway.
+        """
+        resultados: List[Optional[Dict[str, Any]]] = [None] * len(pagamentos)
+        por_cliente: Dict[int, List[int]] = {}
+        for indice, (id_pedido, _) in enumerate(pagamentos):
+            por_cliente.setdefault(self._decompor(id_pedido)[0], []).append(indice)
+
+        # Itens dos pedidos pendentes, lidos nas partições dos clientes.
+        itens = self._chamar_todas(
+            {
+                particao: ("itens_pendentes", ([self._decompor(pagamentos[i][0])[1] for i in indices],))
+                for particao, indices in por_cliente.items()
+            }
+        )
+        # Fase 1: reservas nas partições donas dos produtos.
+        reservas: Dict[int, List[Tuple[int, List[Tuple[int, int]]]]] = {}
+        participantes: Dict[int, List[int]] = {}
+        for particao, indices in por_cliente.items():
+            for indice, itens_pedido in zip(indices, itens[particao]):
+                if itens_pedido is None:
+                    resultados[indice] = {
+                        "status": "erro",
+                        "mensagem": f"Pedido ID {pagamentos[indice][0]} não encontrado ou não está pendente.",
+                    }
+                    continue
+                for dono, itens_dono in self._por_particao(itens_pedido).items():
+                    reservas.setdefault(dono, []).append((indice, itens_dono))
+                    participantes.setdefault(indice, []).append(dono)
+        # Ids de reserva enviados a cada partição dona. Se algo falhar antes
+        # da fase 2, todas as reservas não confirmadas são liberadas, mesmo
+        # as de partições cuja resposta se perdeu (liberar é idempotente).
+        enviadas: Dict[int, List[Tuple[int, int]]] = {
+            dono: [(pagamentos[i][0], i) for i, _ in lista] for dono, lista in reservas.items()
+        }
+        confirmadas: Dict[int, Set[Tuple[int, int]]] = {}
+        try:
+            aceitas = self._chamar_todas(
+                {
+                    dono: ("reservar", (list(zip(enviadas[dono], (itens for _, itens in lista))),))
+                    for dono, lista in reservas.items()
+                }
+            )
+            reservados: Dict[int, List[int]] = {}
+            negados = set()
+            for dono, lista in reservas.items():
+                for (indice, _), aceita in zip(lista, aceitas[dono]):
+                    if aceita:
+                        reservados.setdefault(indice, []).append(dono)
+                    else:
+                        negados.add(indice)
+
+            # Pagamento nas partições dos clientes, só com o estoque reservado.
+            a_pagar: Dict[int, List[int]] = {}
+            for indice in participantes:
+                if indice in negados:
+                    resultados[indice] = {
+                        "status": "erro",
+                        "mensagem": f"Estoque insuficiente para o pedido ID {pagamentos[indice][0]}.",
+                    }
+                else:
+                    a_pagar.setdefault(self._decompor(pagamentos[indice][0])[0], []).append(indice)
+            pagos: Dict[int, Any] = {}
+            try:
+                self._chamar_todas(
+                    {
+                        particao: (
+                            "pagar",
+                            ([(self._decompor(pagamentos[i][0])[1], pagamentos[i][1]) for i in indices],),
+                        )
+                        for particao, indices in a_pagar.items()
+                    },
+                    parciais=pagos,
+                )
+            finally:
+                # Os pagamentos das partições que responderam valem mesmo se
+                # outra falhou.
+                for particao, resposta in pagos.items():
+                    for indice, resultado in zip(a_pagar[particao], resposta):
+                        resultados[indice] = resultado
+                        if resultado["status"] == "aprovado":
+                            for dono in reservados.get(indice, ()):
+                                confirmadas.setdefault(dono, set()).add((pagamentos[indice][0], indice))
+        finally:
+            # Fase 2: confirma as reservas dos aprovados e libera as demais.
+            self._chamar_todas(
+                {
+                    dono: (
+                        "concluir",
+                        (
+                            sorted(confirmadas.get(dono, ())),
+                            [r for r in ids if r not in confirmadas.get(dono, ())],
+                        ),
+                    )
+                    for dono, ids in enviadas.items()
+                }
+            )
+        return resultados
+
+    def processar_pagamento_pedido(self, id_pedido: int, detalhes_pagamento_cliente: Dict) -> Dict[str, Any]:
+        return self.processar_pagamentos([(id_pedido, detalhes_pagamento_cliente)])[0]
+
+    def cancelar_pedido(self, id_pedido: int) -> bool:
+        """
+        Cancela o pedido na partição do cliente e, se ele estava pago ou
+        enviado, devolve o estoque às partições donas dos produtos.
+        """
+        particao, id_local = self._decompor(id_pedido)
+        cancelado, devolver = self._chamar(particao, "cancelar", [id_local])[0]
+        if devolver:
+            self._chamar_todas(
+                {dono: ("devolver", (itens,)) for dono, itens in self._por_particao(devolver).items()}
+            )
+        return cancelado
+
+    def consultar_pedido(self, id_pedido: int) -> Optional[Dict[str, Any]]:
+        particao, id_local = self._decompor(id_pedido)
+        return self._chamar(particao, "pedido", id_local)
+
+    def vendas_por_status(self) -> Dict[str, Dict[str, Any]]:
+        """
+        `AgregadosVendas.por_status` somado entre as partições.
+        """
+        total: Dict[str, Dict[str, Any]] = {}
+        respostas = self._chamar_todas({p: ("vendas_por_status", ()) for p in range(self.num_particoes)})
+        for parcial in respostas.values():
+            for status, valores in parcial.items():
+                acumulado = total.setdefault(status, {"quantidade": 0, "receita": 0.0})
+                acumulado["quantidade"] += valores["quantidade"]
+                acumulado["receita"] = round(acumulado["receita"] + valores["receita"], 2)
+        return total
+
+    def fechar(self) -> None:
+        for conexao in self._conexoes:
+            conexao.send(None)
+            conexao.close()
+        for processo in self._processos:
+            processo.join()
+        self._conexoes.clear()
+        self._processos.clear()
@@ -0,0 +1,614 @@
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import weakref
+from collections.abc import MutableMapping
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from app.ecommerce_sistema import SistemaEcommerce, Produto, Pedido, LinhasPedido
+from app.estoque_armazens import alocacao_de_dados, alocacao_para_dados
+from app.agregados_vendas import AgregadosVendas, STATUS_FATURADOS
+from app.rollups_vendas import RollupsVendas
+from app.indices_pedidos import IndicesPedidos
+from app.razao_transacoes import LivroRazaoTransacoes
+
+
+# ==============================================================================
+# FORMATO
+# ==============================================================================
+# Arquivo = cabeçalho + tabela de produtos + tabela de pedidos + tabela de
+# itens + tabela de strings. Todas as tabelas têm registros de largura fixa,
+# ordenados por id, então o registro de um id é achado sem ler o resto do
+# arquivo. Textos ficam na tabela de strings (UTF-8, sem repetição) e são
+# referenciados por (deslocamento, tamanho); tamanho SEM_VALOR indica None.
+# Datas e valores opcionais ausentes são gravados como NaN. Cada item guarda
+# id do produto, quantidade, preço unitário e nome da época da compra. A
+# alocação por armazém de cada pedido e o estoque dos armazéns vão como JSON
+# na tabela de strings. As datas dos estados padrão ocupam posições fixas do
+# registro do pedido (lidas nas varreduras de vendas); as de estados
+# acrescentados à máquina de estados vão num mapa JSON campo -> timestamp.
+MAGICO = b"ECSB"
+VERSAO_FORMATO = 4
+SEM_VALOR = 0xFFFFFFFF
+
+_CABECALHO = struct.Struct("<4sHHQqqQQQQQQQ")
+_PRODUTO = struct.Struct("<qIIIIdqII")
+_PEDIDO = struct.Struct("<qIIIIIIIIII5dddQIIIII")
+_ITEM = struct.Struct("<qqdII")
+_ID = struct.Struct("<q")
+# Referências, logo após o cabeçalho, aos JSONs de usuários e de estoque
+# por armazém.
+_REFERENCIAS = struct.Struct("<IIII")
+
+_CHAVES_DATAS = ("criacao", "pagamento", "envio", "entrega", "cancelamento")
+
+# Snapshots com o arquivo mapeado em memória, para que a compactação não
+# apague um arquivo ainda em uso.
+_snapshots_abertos: "weakref.WeakSet[SnapshotBinario]" = weakref.WeakSet()
+_trava_abertos = threading.Lock()
+
+
+def snapshots_mapeados() -> Set[str]:
+    """
+    Caminhos absolutos dos snapshots binários ainda mapeados em memória.
+    """
+    with _trava_abertos:
+        return {os.path.abspath(snapshot.caminho) for snapshot in _snapshots_abertos}
+
+
+class _TabelaStrings:
+    """
+    Acumula os textos do snapshot, gravando cada texto distinto uma única vez.
+    """
+
+    def __init__(self):
+        self._deslocamentos: Dict[str, Tuple[int, int]] = {}
+        self._partes: List[bytes] = []
+        self._tamanho = 0
+
+    def referenciar(self, texto: Optional[str]) -> Tuple[int, int]:
+        if texto is None:
+            return 0, SEM_VALOR
+        referencia = self._deslocamentos.get(texto)
+        if referencia is None:
+            codificado = texto.encode("utf-8")
+            referencia = (self._tamanho, len(codificado))
+            self._deslocamentos[texto] = referencia
+            self._partes.append(codificado)
+            self._tamanho += len(codificado)
+        return referencia
+
+    def conteudo(self) -> bytes:
+        return b"".join(self._partes)
+
+
+def _opcional(valor: Optional[float]) -> float:
+    return math.nan if valor is None else valor
+
+
+def _datas_extras(datas: Dict[str, Optional[datetime]]) -> Optional[str]:
+    extras = {
+        chave: data.timestamp()
+        for chave, data in datas.items()
+        if chave not in _CHAVES_DATAS and data is not None
+    }
+    return json.dumps(extras, ensure_ascii=False) if extras else None
+
+
+def salvar_snapshot_binario(sistema: SistemaEcommerce, caminho: str, lsn: int = 0) -> str:
+    """
+    Grava catálogo, usuários e histórico de pedidos no formato binário.
+    A gravação é atômica: o arquivo só aparece completo.
+    """
+    strings = _TabelaStrings()
+    produtos = bytearray()
+    for id_produto in sorted(sistema.produtos_catalogo):
+        p = sistema.produtos_catalogo[id_produto]
+        produtos += _PRODUTO.pack(
+            p.id_produto,
+            *strings.referenciar(p.nome),
+            *strings.referenciar(p.descricao),
+            p.preco,
+            p.quantidade_em_estoque,
+            *strings.referenciar(p.categoria),
+        )
+
+    pedidos = bytearray()
+    itens = bytearray()
+    num_itens = 0
+    for id_pedido in sorted(sistema.pedidos_registrados):
+        pedido = sistema.pedidos_registrados[id_pedido]
+        pedidos += _PEDIDO.pack(
+            pedido.id_pedido,
+            *strings.referenciar(pedido.cliente_id),
+            *strings.referenciar(json.dumps(pedido.endereco_entrega, ensure_ascii=False)),
+            *strings.referenciar(pedido.metodo_pagamento_escolhido),
+            *strings.referenciar(pedido.status_pedido),
+            *strings.referenciar(pedido.id_transacao_pagamento),
+            *(
+                math.nan if pedido.datas.get(chave) is None else pedido.datas[chave].timestamp()
+                for chave in _CHAVES_DATAS
+            ),
+            pedido.valor_total_pedido,
+            _opcional(pedido.valor_final_pago),
+            num_itens,
+            len(pedido.linhas),
+            *strings.referenciar(
+                None if pedido.alocacao is None else json.dumps(alocacao_para_dados(pedido.alocacao))
+            ),
+            *strings.referenciar(_datas_extras(pedido.datas)),
+        )
+        for id_produto, quantidade, preco, nome in pedido.linhas:
+            itens += _ITEM.pack(id_produto, quantidade, preco, *strings.referenciar(nome))
+        num_itens += len(pedido.linhas)
+
+    # Usuários são poucos e acessados por chave de texto: vão num único JSON,
+    # assim como o estoque por armazém.
+    ref_usuarios = strings.referenciar(json.dumps(sistema.usuarios, ensure_ascii=False))
+    ref_estoque_armazens = strings.referenciar(
+        json.dumps(sistema.estoque_armazens.quantidades(), ensure_ascii=False)
+    )
+
+    deslocamento_produtos = _CABECALHO.size + _REFERENCIAS.size
+    deslocamento_pedidos = deslocamento_produtos + len(produtos)
+    deslocamento_itens = deslocamento_pedidos + len(pedidos)
+    deslocamento_strings = deslocamento_itens + len(itens)
+    cabecalho = _CABECALHO.pack(
+        MAGICO,
+        VERSAO_FORMATO,
+        0,
+        lsn,
+        sistema._proximo_id_produto,
+        sistema._proximo_id_pedido,
+        len(sistema.produtos_catalogo),
+        deslocamento_produtos,
+        len(pedidos) // _PEDIDO.size,
+        deslocamento_pedidos,
+        num_itens,
+        deslocamento_itens,
+        deslocamento_strings,
+    ) + _REFERENCIAS.pack(*ref_usuarios, *ref_estoque_armazens)
+
+    temporario = caminho + ".tmp"
+    with open(temporario, "wb") as arquivo:
+        for parte in (cabecalho, produtos, pedidos, itens, strings.conteudo()):
+            arquivo.write(parte)
+        arquivo.flush()
+        os.fsync(arquivo.fileno())
+    os.replace(temporario, caminho)
+    return caminho
+
+
+# ==============================================================================
+# CLASSE SNAPSHOT BINARIO
+# ==============================================================================
+class SnapshotBinario:
+    """
+    Snapshot binário mapeado em memória (mmap). Abrir o snapshot só lê o
+    cabeçalho; cada registro é decodificado quando pedido, e as páginas do
+    arquivo só são carregadas pelo sistema operacional quando tocadas.
+    """
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        with open(caminho, "rb") as arquivo:
+            tamanho = os.fstat(arquivo.fileno()).st_size
+            if tamanho < _CABECALHO.size + _REFERENCIAS.size:
+                raise ValueError(f"Snapshot binário '{caminho}' truncado.")
+            self._mm = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magico,
+            versao,
+            _,
+            self.lsn,
+            self.proximo_id_produto,
+            self.proximo_id_pedido,
+            self.num_produtos,
+            self._deslocamento_produtos,
+            self.num_pedidos,
+            self._deslocamento_pedidos,
+            self.num_itens,
+            self._deslocamento_itens,
+            self._deslocamento_strings,
+        ) = _CABECALHO.unpack_from(self._mm, 0)
+        if magico != MAGICO:
+            raise ValueError(f"Arquivo '{caminho}' não é um snapshot binário.")
+        if versao != VERSAO_FORMATO:
+            raise ValueError(f"Versão de snapshot binário não suportada: {versao}.")
+        referencias = _REFERENCIAS.unpack_from(self._mm, _CABECALHO.size)
+        self._ref_usuarios = referencias[:2]
+        self._ref_estoque_armazens = referencias[2:]
+        with _trava_abertos:
+            _snapshots_abertos.add(self)
+        # Nomes de produto dos itens, por deslocamento: pedidos do mesmo
+        # produto compartilham o mesmo texto em vez de decodificar cópias.
+        self._nomes_itens: Dict[int, str] = {}
+
+    def texto(self, deslocamento: int, tamanho: int) -> Optional[str]:
+        if tamanho == SEM_VALOR:
+            return None
+        inicio = self._deslocamento_strings + deslocamento
+        return self._mm[inicio : inicio + tamanho].decode("utf-8")
+
+    def _indice_de(self, chave: int, inicio_tabela: int, tamanho_registro: int, total: int) -> Optional[int]:
+        if total == 0 or not isinstance(chave, int):
+            return None
+        # Ids normalmente são densos: tenta a posição direta antes da busca binária.
+        primeiro = _ID.unpack_from(self._mm, inicio_tabela)[0]
+        palpite = chave - primeiro
+        if 0 <= palpite < total and _ID.unpack_from(self._mm, inicio_tabela + palpite * tamanho_registro)[0] == chave:
+            return palpite
+        baixo, alto = 0, total
+        while baixo < alto:
+            meio = (baixo + alto) // 2
+            valor = _ID.unpack_from(self._mm, inicio_tabela + meio * tamanho_registro)[0]
+            if valor < chave:
+                baixo = meio + 1
+            else:
+                alto = meio
+        if baixo < total and _ID.unpack_from(self._mm, inicio_tabela + baixo * tamanho_registro)[0] == chave:
+            return baixo
+        return None
+
+    def _ids(self, inicio_tabela: int, tamanho_registro: int, total: int) -> Iterator[int]:
+        for indice in range(total):
+            yield _ID.unpack_from(self._mm, inicio_tabela + indice * tamanho_registro)[0]
+
+    # ------------------------------------------------------------------ produtos
+    def indice_produto(self, id_produto: int) -> Optional[int]:
+        return self._indice_de(id_produto, self._deslocamento_produtos, _PRODUTO.size, self.num_produtos)
+
+    def ids_produtos(self) -> Iterator[int]:
+        return self._ids(self._deslocamento_produtos, _PRODUTO.size, self.num_produtos)
+
+    def ler_produto(self, indice: int) -> Produto:
+        (
+            id_produto,
+            nome_d, nome_t,
+            descricao_d, descricao_t,
+            preco,
+            estoque,
+            categoria_d, categoria_t,
+        ) = _PRODUTO.unpack_from(self._mm, self._deslocamento_produtos + indice * _PRODUTO.size)
+        return Produto(
+            id_produto,
+            self.texto(nome_d, nome_t),
+            self.texto(descricao_d, descricao_t),
+            preco,
+            estoque,
+            self.texto(categoria_d, categoria_t),
+        )
+
+    def categoria_produto(self, id_produto: int) -> Optional[str]:
+        indice = self.indice_produto(id_produto)
+        if indice is None:
+            return None
+        campos = _PRODUTO.unpack_from(self._mm, self._deslocamento_produtos + indice * _PRODUTO.size)
+        return self.texto(campos[7], campos[8])
+
+    # ------------------------------------------------------------------ pedidos
+    def indice_pedido(self, id_pedido: int) -> Optional[int]:
+        return self._indice_de(id_pedido, self._deslocamento_pedidos, _PEDIDO.size, self.num_pedidos)
+
+    def ids_pedidos(self) -> Iterator[int]:
+        return self._ids(self._deslocamento_pedidos, _PEDIDO.size, self.num_pedidos)
+
+    def registros_pedidos(self, primeiro: int = 0, ultimo: Optional[int] = None) -> Iterator[Tuple]:
+        """
+        Registros brutos dos pedidos nas posições [primeiro, ultimo), sem
+        materializar objetos Pedido. Cada registro é uma tupla com: id (0);
+        referências de texto (deslocamento, tamanho) de cliente (1, 2),
+        endereço (3, 4), método (5, 6), status (7, 8) e transação (9, 10),
+        lidas com `texto`; timestamps de criação, pagamento, envio, entrega
+        e cancelamento (11 a 15, NaN quando ausentes); valor total (16);
+        valor pago (17, NaN quando ausente); primeiro item e número de
+        itens (18, 19), lidos com `itens_do_registro`; referência ao JSON
+        da alocação por armazém (20, 21).
+
+        O iterador deve ser esgotado (ou fechado) antes de `fechar`.
+        """
+        if ultimo is None:
+            ultimo = self.num_pedidos
+        inicio = self._deslocamento_pedidos + primeiro * _PEDIDO.size
+        fim = self._deslocamento_pedidos + ultimo * _PEDIDO.size
+        with memoryview(self._mm) as visao, visao[inicio:fim] as tabela:
+            registros = _PEDIDO.iter_unpack(tabela)
+            yield from registros
+            del registros
+
+    def itens_do_registro(self, campos: Tuple) -> Iterator[Tuple[int, int, float]]:
+        """(id_produto, quantidade, preço) dos itens de um registro de `registros_pedidos`."""
+        primeiro_item, num_itens = campos[18:20]
+        for i in range(primeiro_item, primeiro_item + num_itens):
+            yield _ITEM.unpack_from(self._mm, self._deslocamento_itens + i * _ITEM.size)[:3]
+
+    def ler_pedido(self, indice: int) -> Pedido:
+        campos = _PEDIDO.unpack_from(self._mm, self._deslocamento_pedidos + indice * _PEDIDO.size)
+        id_pedido = campos[0]
+        textos = [self.texto(campos[i], campos[i + 1]) for i in range(1, 11, 2)]
+        cliente_id, endereco, metodo, status, id_transacao = textos
+        datas = campos[11:16]
+        valor_total, valor_pago, primeiro_item, num_itens = campos[16:20]
+        alocacao = self.texto(campos[20], campos[21])
+        datas_extras = self.texto(campos[22], campos[23])
+        itens = []
+        nomes = self._nomes_itens
+        for i in range(primeiro_item, primeiro_item + num_itens):
+            id_produto, quantidade, preco, nome_d, nome_t = _ITEM.unpack_from(
+                self._mm, self._deslocamento_itens + i * _ITEM.size
+            )
+            nome = nomes.get(nome_d)
+            if nome is None:
+                nome = nomes[nome_d] = self.texto(nome_d, nome_t)
+            itens.append((id_produto, quantidade, preco, nome))
+
+        pedido = Pedido.restaurar(
+            id_pedido,
+            cliente_id,
+            LinhasPedido.de_tuplas(itens),
+            valor_total,
+            json.loads(endereco),
+            metodo,
+            None,
+        )
+        pedido.status_pedido = status
+        pedido.datas = {
+            chave: None if math.isnan(ts) else datetime.fromtimestamp(ts)
+            for chave, ts in zip(_CHAVES_DATAS, datas)
+        }
+        if datas_extras is not None:
+            for chave, ts in json.loads(datas_extras).items():
+                pedido.datas[chave] = datetime.fromtimestamp(ts)
+        pedido.id_transacao_pagamento = id_transacao
+        pedido.valor_final_pago = None if math.isnan(valor_pago) else valor_pago
+        if alocacao is not None:
+            pedido.alocacao = alocacao_de_dados(json.loads(alocacao))
+        return pedido
+
+    def agregar_vendas(self, agregados: AgregadosVendas) -> None:
+        """
+        Soma os pedidos do snapshot nos agregados de vendas lendo só os
+        campos de status, método, valor pago e data de pagamento, sem
+        materializar os pedidos.
+        """
+        textos: Dict[Tuple[int, int], Optional[str]] = {}
+        grupos: Dict[Tuple[Any, ...], List[int]] = {}
+        for campos in self.registros_pedidos():
+            chave = (campos[5], campos[6], campos[7], campos[8], campos[12])
+            grupo = grupos.get(chave)
+            if grupo is None:
+                grupo = grupos[chave] = [0, 0]
+            grupo[0] += 1
+            if not math.isnan(campos[17]):
+                grupo[1] += round(campos[17] * 100)
+        dias: Dict[float, Any] = {}
+        for (metodo_d, metodo_t, status_d, status_t, ts), (quantidade, centavos) in grupos.items():
+            for referencia in ((metodo_d, metodo_t), (status_d, status_t)):
+                if referencia not in textos:
+                    textos[referencia] = self.texto(*referencia)
+            if math.isnan(ts):
+                dia = None
+            elif ts in dias:
+                dia = dias[ts]
+            else:
+                dia = dias[ts] = datetime.fromtimestamp(ts).date()
+            agregados.registrar(
+                textos[(status_d, status_t)], textos[(metodo_d, metodo_t)], centavos / 100, dia, quantidade
+            )
+
+    def agregar_rollups(self, rollups: RollupsVendas) -> None:
+        """
+        Soma as vendas do snapshot (pedidos pagos, enviados ou entregues)
+        nos baldes de tempo, lendo os registros sem materializar os pedidos.
+        """
+        status_texto: Dict[Tuple[int, int], Optional[str]] = {}
+        categorias: Dict[int, Optional[str]] = {}
+        for indice in range(self.num_pedidos):
+            campos = _PEDIDO.unpack_from(self._mm, self._deslocamento_pedidos + indice * _PEDIDO.size)
+            referencia = (campos[7], campos[8])
+            if referencia not in status_texto:
+                status_texto[referencia] = self.texto(*referencia)
+            ts = campos[12]
+            if status_texto[referencia] not in STATUS_FATURADOS or math.isnan(ts):
+                continue
+            itens = list(self.itens_do_registro(campos))
+            for id_produto, _, _ in itens:
+                if id_produto not in categorias:
+                    categorias[id_produto] = self.categoria_produto(id_produto)
+                    rollups.definir_categoria(id_produto, categorias[id_produto])
+            rollups.registrar_venda(
+                datetime.fromtimestamp(ts), None if math.isnan(campos[17]) else campos[17], itens
+            )
+
+    def indexar_pedidos(self, indices: IndicesPedidos) -> None:
+        """
+        Inclui os pedidos do snapshot nos índices secundários lendo só id,
+        cliente, status e data de criação de cada registro.
+        """
+        textos: Dict[Tuple[int, int], Optional[str]] = {}
+        for campos in self.registros_pedidos():
+            cliente = textos.get((campos[1], campos[2]))
+            if cliente is None:
+                cliente = textos[(campos[1], campos[2])] = self.texto(campos[1], campos[2])
+            status = textos.get((campos[7], campos[8]))
+            if status is None:
+                status = textos[(campos[7], campos[8])] = self.texto(campos[7], campos[8])
+            criacao = campos[11]
+            indices.registrar(campos[0], cliente, status, None if math.isnan(criacao) else criacao)
+
+    def restaurar_capturas(self, livro: LivroRazaoTransacoes) -> None:
+        """
+        Inclui no livro razão a captura de cada pedido pago do snapshot,
+        lendo só transação, método, valor pago e data de pagamento.
+        """
+        textos: Dict[Tuple[int, int], Optional[str]] = {}
+        for campos in self.registros_pedidos():
+            valor_pago = campos[17]
+            if campos[10] == SEM_VALOR or math.isnan(valor_pago):
+                continue
+            metodo = textos.get((campos[5], campos[6]))
+            if metodo is None:
+                metodo = textos[(campos[5], campos[6])] = self.texto(campos[5], campos[6])
+            ts = campos[12]
+            livro.restaurar_captura(
+                self.texto(campos[9], campos[10]),
+                valor_pago,
+                metodo,
+                campos[0],
+                None if math.isnan(ts) else int(ts * 1000),
+            )
+
+    def ler_usuarios(self) -> Dict[str, Dict]:
+        return json.loads(self.texto(*self._ref_usuarios))
+
+    def ler_estoque_armazens(self) -> List[Tuple[int, str, int]]:
+        """(id_produto, id_armazem, quantidade) do estoque por armazém."""
+        return [tuple(linha) for linha in json.loads(self.texto(*self._ref_estoque_armazens))]
+
+    def fechar(self) -> None:
+        with _trava_abertos:
+            _snapshots_abertos.discard(self)
+        self._mm.close()
+
+
+# ==============================================================================
+# CLASSE MAPA PREGUICOSO
+# ==============================================================================
+class MapaPreguicoso(MutableMapping):
+    """
+    Dicionário id -> objeto apoiado num snapshot: os registros do snapshot
+    só viram objetos Python no primeiro acesso, e a partir daí a mesma
+    instância é devolvida sempre. Inclusões e remoções ficam em memória.
+
+    `localizar(chave)` retorna a posição do registro no snapshot (ou None),
+    `materializar(posicao)` constrói o objeto e `ids()` percorre as chaves
+    do snapshot sem materializar nada.
+    """
+
+    def __init__(
+        self,
+        localizar: Callable[[int], Optional[int]],
+        materializar: Callable[[int], Any],
+        ids: Callable[[], Iterator[int]],
+        num_registros: int,
+    ):
+        self._localizar = localizar
+        self._materializar = materializar
+        self._ids = ids
+        self._num_registros = num_registros
+        self._objetos: Dict[int, Any] = {}
+        self._chaves_novas: Set[int] = set()
+        self._removidos: Set[int] = set()
+        self._trava = threading.Lock()
+
+    def _no_snapshot(self, chave: int) -> bool:
+        return chave not in self._removidos and self._localizar(chave) is not None
+
+    def __getitem__(self, chave: int) -> Any:
+        try:
+            return self._objetos[chave]
+        except KeyError:
+            pass
+        if chave in self._removidos:
+            raise KeyError(chave)
+        posicao = self._localizar(chave)
+        if posicao is None:
+            raise KeyError(chave)
+        objeto = self._materializar(posicao)
+        with self._trava:
+            # Se outra thread materializou o mesmo registro, fica a dela.
+            return self._objetos.setdefault(chave, objeto)
+
+    def get(self, chave: int, padrao: Any = None) -> Any:
+        try:
+            return self[chave]
+        except KeyError:
+            return padrao
+
+    def ler_sem_reter(self, chave: int) -> Optional[Any]:
+        """
+        O objeto já materializado do id ou, se não houver, uma cópia lida do
+        snapshot que não fica guardada. Para varreduras só de leitura.
+        """
+        objeto = self._objetos.get(chave)
+        if objeto is not None or chave in self._removidos:
+            return objeto
+        posicao = self._localizar(chave)
+        return None if posicao is None else self._materializar(posicao)
+
+    def __contains__(self, chave: object) -> bool:
+        return chave in self._objetos or self._no_snapshot(chave)
+
+    def __setitem__(self, chave: int, objeto: Any) -> None:
+        with self._trava:
+            if chave in self._removidos:
+                self._removidos.discard(chave)
+            elif chave not in self._objetos and self._localizar(chave) is None:
+                self._chaves_novas.add(chave)
+            self._objetos[chave] = objeto
+
+    def __delitem__(self, chave: int) -> None:
+        with self._trava:
+            if chave in self._chaves_novas:
+                self._chaves_novas.discard(chave)
+            elif self._no_snapshot(chave):
+                self._removidos.add(chave)
+            else:
+                raise KeyError(chave)
+            self._objetos.pop(chave, None)
+
+    def __iter__(self) -> Iterator[int]:
+        for chave in self._ids():
+            if chave not in self._removidos:
+                yield chave
+        yield from sorted(self._chaves_novas)
+
+    def __len__(self) -> int:
+        return self._num_registros - len(self._removidos) + len(self._chaves_novas)
+
+    @property
+    def num_materializados(self) -> int:
+        return len(self._objetos)
+
+
+def carregar_snapshot_binario(caminho: str) -> Tuple[SistemaEcommerce, int]:
+    """
+    Abre um snapshot binário e retorna (sistema, lsn). Produtos e pedidos
+    são materializados sob demanda, no primeiro acesso a cada id.
+    """
+    snapshot = SnapshotBinario(caminho)
+    sistema = SistemaEcommerce()
+
+    def materializar_produto(indice: int) -> Produto:
+        produto = snapshot.ler_produto(indice)
+        sistema._vincular_produto(produto)
+        return produto
+
+    def materializar_pedido(indice: int) -> Pedido:
+        pedido = snapshot.ler_pedido(indice)
+        sistema._vincular_pedido(pedido)
+        return pedido
+
+    sistema.produtos_catalogo = MapaPreguicoso(
+        snapshot.indice_produto, materializar_produto, snapshot.ids_produtos, snapshot.num_produtos
+    )
+    sistema.pedidos_registrados = MapaPreguicoso(
+        snapshot.indice_pedido, materializar_pedido, snapshot.ids_pedidos, snapshot.num_pedidos
+    )
+    # O arquivo não muda, então os totais de vendas dele podem ser somados
+    # só na primeira consulta, sem atrasar a abertura.
+    sistema.agregados_vendas.definir_base(snapshot.agregar_vendas)
+    sistema.rollups_vendas.definir_base(snapshot.agregar_rollups)
+    sistema.indices_pedidos.definir_base(snapshot.indexar_pedidos)
+    sistema.sistema_pagamento.livro_razao.definir_base(snapshot.restaurar_capturas)
+    sistema.usuarios.update(snapshot.ler_usuarios())
+    for id_produto, id_armazem, quantidade in snapshot.ler_estoque_armazens():
+        sistema.estoque_armazens.ajustar(id_produto, id_armazem, quantidade)
+    sistema._proximo_id_produto = snapshot.proximo_id_produto
+    sistema._proximo_id_pedido = snapshot.proximo_id_pedido
+    sistema.snapshot_origem = snapshot
+    return sistema, snapshot.lsn
@@ -0,0 +1,159 @@
+import threading
+from typing import Callable, List, Optional
+
+from app.concorrencia import ContadorAtomico
+
+
+# ==============================================================================
+# CLASSE ESTOQUE FRAGMENTADO
+# ==============================================================================
+class EstoqueFragmentado:
+    """
+    Estoque de um produto dividido em `num_fragmentos` sub-contadores, cada um
+    com seu próprio lock, para vendas relâmpago com altíssima concorrência.
+
+    Cada worker (thread) tem um fragmento preferido e, no caso comum, só toca
+    nele. Quando o fragmento se esgota, o worker "rouba" unidades dos demais,
+    levando também metade do excedente da vítima para reabastecer o próprio
+    fragmento (rebalanceamento gradual). Cada unidade pertence sempre a
+    exatamente um fragmento ou a uma única operação em andamento, e nenhum
+    fragmento fica negativo, então é impossível vender acima do estoque.
+
+    `drenar` encerra o estoque fragmentado: zera os fragmentos e devolve o
+    total. Unidades devolvidas depois disso (ex.: sobra de uma reserva que
+    estava em andamento) são repassadas a `destino_apos_encerramento`.
+    """
+
+    def __init__(
+        self,
+        quantidade_total: int,
+        num_fragmentos: int,
+        destino_apos_encerramento: Optional[Callable[[int], None]] = None,
+    ):
+        if not isinstance(num_fragmentos, int) or num_fragmentos <= 0:
+            raise ValueError("Número de fragmentos deve ser um inteiro positivo.")
+        if not isinstance(quantidade_total, int) or quantidade_total < 0:
+            raise ValueError("Quantidade em estoque deve ser um inteiro não negativo.")
+
+        self.num_fragmentos = num_fragmentos
+        base, resto = divmod(quantidade_total, num_fragmentos)
+        self._fragmentos: List[int] = [
+            base + (1 if i < resto else 0) for i in range(num_fragmentos)
+        ]
+        self._locks = [threading.Lock() for _ in range(num_fragmentos)]
+        self.destino_apos_encerramento = destino_apos_encerramento
+        self.encerrado = False
+        # Roubos acontecem fora de qualquer lock de fragmento.
+        self._roubos = ContadorAtomico(0)
+
+    @property
+    def roubos(self) -> int:
+        return self._roubos.proximo
+
+    def fragmento_preferido(self) -> int:
+        return threading.get_ident() % self.num_fragmentos
+
+    def _retirar(self, indice: int, maximo: int) -> int:
+        with self._locks[indice]:
+            retirado = min(maximo, self._fragmentos[indice])
+            self._fragmentos[indice] -= retirado
+            return retirado
+
+    def _depositar(self, indice: int, quantidade: int) -> None:
+        if quantidade <= 0:
+            return
+        with self._locks[indice]:
+            if not self.encerrado:
+                self._fragmentos[indice] += quantidade
+                return
+        if self.destino_apos_encerramento is not None:
+            self.destino_apos_encerramento(quantidade)
+
+    def reservar(self, quantidade: int, indice: Optional[int] = None) -> bool:
+        """
+        Retira `quantidade` unidades, preferencialmente do fragmento `indice`.
+        Retorna False, sem alterar o total, se não houver unidades suficientes.
+        """
+        if not isinstance(quantidade, int) or quantidade <= 0:
+            raise ValueError("Quantidade deve ser um inteiro positivo.")
+        proprio = self.fragmento_preferido() if indice is None else indice % self.num_fragmentos
+
+        obtidos = self._retirar(proprio, quantidade)
+        if obtidos == quantidade:
+            return True
+
+        for deslocamento in range(1, self.num_fragmentos):
+            vitima = (proprio + deslocamento) % self.num_fragmentos
+            faltam = quantidade - obtidos
+            with self._locks[vitima]:
+                disponivel = self._fragmentos[vitima]
+                # Leva o que falta e, se possível, metade do excedente da vítima.
+                levado = min(disponivel, faltam + max(0, disponivel - faltam) // 2)
+                self._fragmentos[vitima] -= levado
+            if levado:
+                self._roubos.alocar()
+            obtidos += levado
+            if obtidos >= quantidade:
+                self._depositar(proprio, obtidos - quantidade)
+                return True
+
+        self._depositar(proprio, obtidos)
+        return False
+
+    def devolver(self, quantidade: int, indice: Optional[int] = None) -> None:
+        if not isinstance(quantidade, int) or quantidade <= 0:
+            raise ValueError("Quantidade deve ser um inteiro positivo.")
+        proprio = self.fragmento_preferido() if indice is None else indice % self.num_fragmentos
+        self._depositar(proprio, quantidade)
+
+    def total(self) -> int:
+        """
+        Total consistente: bloqueia todos os fragmentos (em ordem) e soma.
+        Unidades em trânsito numa reserva em andamento não são contadas, o
+        que torna o valor conservador.
+        """
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            return sum(self._fragmentos)
+        finally:
+            for lock in reversed(self._locks):
+                lock.release()
+
+    def fragmentos(self) -> List[int]:
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            return list(self._fragmentos)
+        finally:
+            for lock in reversed(self._locks):
+                lock.release()
+
+    def drenar(self) -> int:
+        """
+        Zera todos os fragmentos, marca o estoque como encerrado e retorna o total.
+        """
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            total = sum(self._fragmentos)
+            self._fragmentos = [0] * self.num_fragmentos
+            self.encerrado = True
+            return total
+        finally:
+            for lock in reversed(self._locks):
+                lock.release()
+
+    def rebalancear(self) -> None:
+        """
+        Redistribui as unidades igualmente entre os fragmentos.
+        """
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            base, resto = divmod(sum(self._fragmentos), self.num_fragmentos)
+            for i in range(self.num_fragmentos):
+                self._fragmentos[i] = base + (1 if i < resto else 0)
+        finally:
+            for lock in reversed(self._locks):
+                lock.release()
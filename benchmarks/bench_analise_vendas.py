@@ -0,0 +1,160 @@
+"""
+Benchmark das análises colunares (NumPy) contra laços Python equivalentes.
+
+Gera `--pedidos` pedidos sintéticos (status, método de pagamento, valores e
+tamanho da cesta) e calcula ticket médio por método, distribuição do tamanho
+da cesta, percentis, custo dos descontos do PIX e receita de juros do
+parcelamento de duas formas: com `AnaliseVendas` e com um laço Python sobre
+os mesmos dados, no estilo de `gerar_relatorio_vendas` (já convertidos em
+listas, o que favorece o laço: sobre objetos Pedido ele seria mais lento).
+A primeira consulta inclui a seleção dos pedidos faturados; as seguintes a
+reaproveitam até a próxima atualização. Depois mede a exportação inicial e
+a atualização incremental a partir de um SistemaEcommerce real com
+`--pedidos-sistema` pedidos.
+
+Requer NumPy.
+
+Uso:
+    python -m benchmarks.bench_analise_vendas --pedidos 5000000
+"""
+
+import argparse
+import contextlib
+import os
+import time
+
+import numpy as np
+
+from app.analise_vendas import AnaliseVendas
+from app.ecommerce_sistema import Carrinho, SistemaEcommerce
+
+STATUS = ["pendente", "pago", "enviado", "entregue", "cancelado"]
+METODOS = ["pix", "cartao_credito"]
+
+
+def gerar_colunas(num_pedidos: int) -> dict:
+    aleatorio = np.random.default_rng(42)
+    valor_total = np.round(aleatorio.uniform(10, 1000, num_pedidos), 2)
+    metodo = aleatorio.integers(0, len(METODOS), num_pedidos)
+    parcelado = (metodo == 1) & (aleatorio.random(num_pedidos) < 0.5)
+    valor_pago = np.where(metodo == 0, valor_total * 0.9, np.where(parcelado, valor_total * 1.05, valor_total))
+    return {
+        "id": np.arange(1, num_pedidos + 1),
+        "status": aleatorio.choice(len(STATUS), num_pedidos, p=[0.1, 0.4, 0.2, 0.2, 0.1]),
+        "metodo": metodo,
+        "valor_total": valor_total,
+        "valor_pago": np.round(valor_pago, 2),
+        "criacao": np.zeros(num_pedidos),
+        "pagamento": np.zeros(num_pedidos),
+        "num_itens": aleatorio.integers(1, 5, num_pedidos),
+        "unidades": aleatorio.integers(1, 12, num_pedidos),
+    }
+
+
+def analisar_com_lacos(colunas: dict) -> dict:
+    """
+    As mesmas análises de `analisar_vetorizado`, percorrendo pedido a pedido.
+    """
+    status = colunas["status"].tolist()
+    metodo = colunas["metodo"].tolist()
+    valor_total = colunas["valor_total"].tolist()
+    valor_pago = colunas["valor_pago"].tolist()
+    unidades = colunas["unidades"].tolist()
+
+    inicio = time.perf_counter()
+    faturados = {STATUS.index(s) for s in ("pago", "enviado", "entregue")}
+    somas = {}
+    cestas = {}
+    tamanhos = []
+    custo_pix = juros = 0.0
+    for s, m, total, pago, u in zip(status, metodo, valor_total, valor_pago, unidades):
+        if s not in faturados:
+            continue
+        soma, quantidade = somas.get(m, (0.0, 0))
+        somas[m] = (soma + pago, quantidade + 1)
+        cestas[u] = cestas.get(u, 0) + 1
+        tamanhos.append(u)
+        if m == 0:
+            custo_pix += total - pago
+        elif pago > total:
+            juros += pago - total
+    tamanhos.sort()
+    resultado = {
+        "ticket": {METODOS[m]: soma / q for m, (soma, q) in somas.items()},
+        "cestas": cestas,
+        "p90": tamanhos[int(0.9 * (len(tamanhos) - 1))],
+        "pix": custo_pix,
+        "juros": juros,
+    }
+    resultado["segundos"] = time.perf_counter() - inicio
+    return resultado
+
+
+def analisar_vetorizado(analise: AnaliseVendas) -> dict:
+    inicio = time.perf_counter()
+    resultado = {
+        "ticket": analise.ticket_medio_por_metodo(),
+        "cestas": analise.distribuicao_tamanho_cesta(),
+        "p90": analise.percentis("unidades", (90,))[90],
+        "pix": analise.custo_desconto_pix(),
+        "juros": analise.receita_juros_parcelamento(),
+    }
+    resultado["segundos"] = time.perf_counter() - inicio
+    return resultado
+
+
+def medir_sistema(num_pedidos: int) -> None:
+    sistema = SistemaEcommerce()
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        sistema.registrar_usuario("bench", {"nome": "Bench"})
+        produto = sistema.adicionar_produto_catalogo("P", "bench", 10.0, num_pedidos * 10, "Bench")
+
+    def comprar() -> None:
+        carrinho = Carrinho()
+        carrinho.adicionar_item(produto, 1)
+        pedido = sistema.criar_pedido("bench", carrinho, {"rua": "Bench"}, "pix")
+        sistema.processar_pagamento_pedido(pedido.id_pedido, {"chave_pix": "bench@pix"})
+
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        for _ in range(num_pedidos):
+            comprar()
+    inicio = time.perf_counter()
+    analise = AnaliseVendas(sistema)
+    print(f"Exportação inicial de {num_pedidos} pedidos: {time.perf_counter() - inicio:.2f}s")
+    novos = max(1, num_pedidos // 100)
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        for _ in range(novos):
+            comprar()
+    inicio = time.perf_counter()
+    analise.atualizar()
+    print(f"Atualização incremental com {novos} pedidos novos: {(time.perf_counter() - inicio) * 1e3:.1f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pedidos", type=int, default=5_000_000)
+    parser.add_argument("--pedidos-sistema", type=int, default=100_000)
+    args = parser.parse_args()
+
+    colunas = gerar_colunas(args.pedidos)
+    analise = AnaliseVendas.de_colunas(colunas, STATUS, METODOS)
+    vetorizado = analisar_vetorizado(analise)
+    # Consultas repetidas (painel) reaproveitam as colunas já filtradas.
+    repetido = analisar_vetorizado(analise)
+    lacos = analisar_com_lacos(colunas)
+    for chave in ("pix", "juros"):
+        assert abs(vetorizado[chave] - lacos[chave]) < 0.01 * max(1.0, lacos[chave]), chave
+    assert vetorizado["cestas"] == lacos["cestas"]
+    print(f"{args.pedidos} pedidos sintéticos:")
+    print(f"  laços Python:             {lacos['segundos']:.2f}s")
+    print(f"  NumPy, primeira consulta: {vetorizado['segundos']:.3f}s "
+          f"({lacos['segundos'] / vetorizado['segundos']:.0f}x mais rápido)")
+    print(f"  NumPy, consulta repetida: {repetido['segundos'] * 1e3:.1f}ms "
+          f"({lacos['segundos'] / repetido['segundos']:.0f}x mais rápido)")
+
+    if args.pedidos_sistema:
+        medir_sistema(args.pedidos_sistema)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark da latência de criar e pagar pedidos com o barramento de eventos.
+
+Cria e paga `--pedidos` pedidos de três formas: sem ouvintes, com um ouvinte
+que faz o efeito colateral na hora (um `--atraso` em segundos por evento,
+simulando e-mail ou integração externa) e com o mesmo efeito colateral num
+consumidor do `BarramentoEventos`. Mostra a latência média e o p99 de
+`criar_pedido` + `processar_pagamento_pedido` e, no caso do barramento,
+quanto tempo os consumidores levaram para alcançar os pedidos.
+
+Uso:
+    python -m benchmarks.bench_barramento_eventos --pedidos 2000 --atraso 0.0002
+"""
+
+import argparse
+import contextlib
+import os
+import statistics
+import tempfile
+import time
+
+from app.barramento_eventos import BarramentoEventos
+from app.ecommerce_sistema import Carrinho, SistemaEcommerce
+
+
+def montar_sistema():
+    sistema = SistemaEcommerce()
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        sistema.registrar_usuario("bench", {"nome": "Bench"})
+        produto = sistema.adicionar_produto_catalogo("P", "bench", 10.0, 1_000_000, "Bench")
+    return sistema, produto
+
+
+def medir(sistema: SistemaEcommerce, produto, num_pedidos: int) -> list:
+    latencias = []
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        for _ in range(num_pedidos):
+            carrinho = Carrinho()
+            carrinho.adicionar_item(produto, 1)
+            inicio = time.perf_counter()
+            pedido = sistema.criar_pedido("bench", carrinho, {"rua": "Bench"}, "pix")
+            sistema.processar_pagamento_pedido(pedido.id_pedido, {"chave_pix": "bench@pix.com"})
+            latencias.append(time.perf_counter() - inicio)
+    return latencias
+
+
+def resumir(nome: str, latencias: list) -> None:
+    p99 = statistics.quantiles(latencias, n=100)[98]
+    print(f"{nome:>12}: média {statistics.mean(latencias) * 1e6:8.1f} µs, p99 {p99 * 1e6:8.1f} µs")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pedidos", type=int, default=2_000)
+    parser.add_argument("--atraso", type=float, default=0.0002)
+    args = parser.parse_args()
+
+    def efeito_colateral(*_):
+        time.sleep(args.atraso)
+
+    sistema, produto = montar_sistema()
+    resumir("sem ouvintes", medir(sistema, produto, args.pedidos))
+
+    sistema, produto = montar_sistema()
+    sistema.adicionar_ouvinte(efeito_colateral)
+    resumir("na hora", medir(sistema, produto, args.pedidos))
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        sistema, produto = montar_sistema()
+        barramento = BarramentoEventos(diretorio)
+        barramento.assinar(lambda lote: [efeito_colateral() for _ in lote])
+        barramento.anexar(sistema)
+        inicio = time.perf_counter()
+        resumir("barramento", medir(sistema, produto, args.pedidos))
+        barramento.aguardar_entrega()
+        print(f"{'':>12}  consumidores alcançaram em {time.perf_counter() - inicio:.2f} s")
+        barramento.fechar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark de estresse do SistemaEcommerce com várias threads.
+
+Cada thread cria e paga pedidos sobre um catálogo compartilhado e o script
+mede a vazão (pedidos pagos por segundo) para 1, 2, 4, ... threads. Em
+builds com GIL a vazão tende a ficar estável; no build free-threaded
+(`python3.13t`), os locks listrados permitem que ela cresça com as threads.
+
+Uso:
+    python -m benchmarks.bench_concorrencia --pedidos 20000 --produtos 256
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import sysconfig
+import threading
+import time
+
+from app.ecommerce_sistema import SistemaEcommerce, Carrinho
+
+
+def executar(num_threads: int, num_pedidos: int, num_produtos: int) -> float:
+    sistema = SistemaEcommerce()
+    sistema.registrar_usuario("bench", {"nome": "Benchmark"})
+    produtos = [
+        sistema.adicionar_produto_catalogo(f"P{i}", "bench", 10.0, num_pedidos, "Bench")
+        for i in range(num_produtos)
+    ]
+    por_thread = num_pedidos // num_threads
+    barreira = threading.Barrier(num_threads + 1)
+
+    def trabalhar(indice: int) -> None:
+        barreira.wait()
+        for i in range(por_thread):
+            carrinho = Carrinho()
+            carrinho.adicionar_item(produtos[(indice * por_thread + i) % num_produtos], 1)
+            pedido = sistema.criar_pedido("bench", carrinho, {"rua": "Bench"}, "pix")
+            sistema.processar_pagamento_pedido(pedido.id_pedido, {"chave_pix": "bench@pix"})
+
+    threads = [threading.Thread(target=trabalhar, args=(i,)) for i in range(num_threads)]
+    for t in threads:
+        t.start()
+    inicio = time.perf_counter()
+    barreira.wait()
+    for t in threads:
+        t.join()
+    return por_thread * num_threads / (time.perf_counter() - inicio)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pedidos", type=int, default=20_000)
+    parser.add_argument("--produtos", type=int, default=256)
+    parser.add_argument("--max-threads", type=int, default=os.cpu_count() or 4)
+    args = parser.parse_args()
+
+    gil = "desativado" if sysconfig.get_config_var("Py_GIL_DISABLED") else "ativo"
+    print(f"Python {sys.version.split()[0]} (GIL {gil})")
+    num_threads = 1
+    base = None
+    while num_threads <= args.max_threads:
+        with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+            vazao = executar(num_threads, args.pedidos, args.produtos)
+        base = base or vazao
+        print(f"{num_threads:>3} threads: {vazao:>10.0f} pedidos/s  ({vazao / base:.2f}x)")
+        num_threads *= 2
+
+
+if __name__ == "__main__":
+    main()
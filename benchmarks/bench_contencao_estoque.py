@@ -0,0 +1,68 @@
+"""
+Benchmark de contenção: um único produto "quente" e vários compradores simultâneos.
+
+Cada comprador paga pedidos de 1 unidade do mesmo produto até o estoque
+acabar. O script mede a vazão de pagamentos, o número de conflitos de versão
+(tentativas repetidas do compare-and-set) e confere que nunca se vende mais
+do que o estoque.
+
+Uso:
+    python -m benchmarks.bench_contencao_estoque --compradores 32 --estoque 20000
+"""
+
+import argparse
+import contextlib
+import os
+import threading
+import time
+
+from app.ecommerce_sistema import SistemaEcommerce, Carrinho
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--compradores", type=int, default=32)
+    parser.add_argument("--estoque", type=int, default=20_000)
+    parser.add_argument("--excesso", type=float, default=0.25, help="fração de pedidos além do estoque")
+    args = parser.parse_args()
+
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        sistema = SistemaEcommerce()
+        sistema.registrar_usuario("bench", {"nome": "Benchmark"})
+        quente = sistema.adicionar_produto_catalogo("Quente", "bench", 10.0, args.estoque, "Bench")
+        num_pedidos = int(args.estoque * (1 + args.excesso))
+        pedidos = []
+        for _ in range(num_pedidos):
+            carrinho = Carrinho()
+            carrinho.adicionar_item(quente, 1)
+            pedidos.append(sistema.criar_pedido("bench", carrinho, {"rua": "Bench"}, "pix").id_pedido)
+
+        aprovados = [0] * args.compradores
+        barreira = threading.Barrier(args.compradores + 1)
+
+        def comprar(indice: int) -> None:
+            barreira.wait()
+            for id_pedido in pedidos[indice :: args.compradores]:
+                resultado = sistema.processar_pagamento_pedido(id_pedido, {"chave_pix": "bench@pix"})
+                if resultado["status"] == "aprovado":
+                    aprovados[indice] += 1
+
+        threads = [threading.Thread(target=comprar, args=(i,)) for i in range(args.compradores)]
+        for t in threads:
+            t.start()
+        inicio = time.perf_counter()
+        barreira.wait()
+        for t in threads:
+            t.join()
+        duracao = time.perf_counter() - inicio
+
+    vendidos = sum(aprovados)
+    print(f"Compradores: {args.compradores}, pedidos: {num_pedidos}, estoque inicial: {args.estoque}")
+    print(f"Vazão: {num_pedidos / duracao:.0f} pagamentos/s em {duracao:.2f}s")
+    print(f"Conflitos de versão (tentativas repetidas): {sistema.conflitos_estoque}")
+    print(f"Vendidos: {vendidos}, estoque final: {quente.quantidade_em_estoque}")
+    assert vendidos + quente.quantidade_em_estoque == args.estoque, "venda acima do estoque!"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark da fila de entrada de pedidos com microlotes.
+
+`--threads` clientes criam `--pedidos` pedidos no total de duas formas:
+chamando `criar_pedido` direto e enviando à `FilaEntradaPedidos` (esperando
+todos os `Future`s no fim). Mostra os pedidos por segundo de cada forma e,
+para a fila, o tamanho médio dos lotes, a maior profundidade e as latências.
+
+Uso:
+    python -m benchmarks.bench_entrada_pedidos --pedidos 50000 --threads 8
+"""
+
+import argparse
+import contextlib
+import os
+import threading
+import time
+
+from app.ecommerce_sistema import Carrinho, SistemaEcommerce
+from app.entrada_pedidos import FilaEntradaPedidos
+
+
+def montar_sistema(num_pedidos: int):
+    sistema = SistemaEcommerce()
+    sistema.registrar_usuario("bench", {"nome": "Bench"})
+    produto = sistema.adicionar_produto_catalogo("P", "bench", 10.0, num_pedidos, "Bench")
+    carrinho = Carrinho()
+    carrinho.adicionar_item(produto, 1)
+    return sistema, carrinho
+
+
+def em_threads(num_threads: int, num_pedidos: int, enviar) -> float:
+    por_thread = num_pedidos // num_threads
+
+    def cliente():
+        for _ in range(por_thread):
+            enviar()
+
+    threads = [threading.Thread(target=cliente) for _ in range(num_threads)]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - inicio
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pedidos", type=int, default=50_000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--lote", type=int, default=64)
+    args = parser.parse_args()
+    total = args.pedidos // args.threads * args.threads
+
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        sistema, carrinho = montar_sistema(total)
+        direto = em_threads(
+            args.threads, total, lambda: sistema.criar_pedido("bench", carrinho, {"rua": "Bench"}, "pix")
+        )
+
+        sistema, carrinho = montar_sistema(total)
+        fila = FilaEntradaPedidos(sistema, capacidade=4 * args.lote, tamanho_lote=args.lote)
+        futuros = []
+        inicio = time.perf_counter()
+        em_threads(
+            args.threads,
+            total,
+            lambda: futuros.append(fila.enviar_pedido("bench", carrinho, {"rua": "Bench"}, "pix")),
+        )
+        assert all(futuro.result() is not None for futuro in futuros)
+        com_fila = time.perf_counter() - inicio
+        fila.fechar()
+
+    metricas = fila.metricas()
+    print(f"    direto: {total / direto:,.0f} pedidos/s")
+    print(f"  com fila: {total / com_fila:,.0f} pedidos/s ({direto / com_fila:.2f}x)")
+    print(
+        f"            lote médio {metricas['tamanho_medio_lote']:.1f}, "
+        f"maior profundidade {metricas['maior_profundidade']}, "
+        f"latência p50 {metricas['latencia_p50'] * 1e3:.2f} ms, "
+        f"p99 {metricas['latencia_p99'] * 1e3:.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
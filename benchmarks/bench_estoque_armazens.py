@@ -0,0 +1,70 @@
+"""
+Benchmark da alocação de pedidos por armazém.
+
+Monta `--armazens` armazéns, uma tabela com `--faixas` faixas de CEP (cada
+uma atendida por todos os armazéns, com frete e prazo sorteados) e
+`--produtos` produtos com estoque espalhado entre os armazéns. Planeja
+`--pedidos` pedidos de 1 a 5 linhas para CEPs sorteados e mostra o tempo
+médio por pedido e por linha, e a fração de pedidos divididos.
+
+Uso:
+    python -m benchmarks.bench_estoque_armazens --pedidos 200000
+"""
+
+import argparse
+import random
+import time
+
+from app.estoque_armazens import EstoqueArmazens, MotorAlocacao, TabelaZonas
+
+
+def montar(num_armazens: int, num_faixas: int, num_produtos: int, aleatorio: random.Random) -> MotorAlocacao:
+    armazens = [f"CD{i}" for i in range(num_armazens)]
+    tabela = TabelaZonas()
+    largura = 100_000_000 // num_faixas
+    for faixa in range(num_faixas):
+        inicio = faixa * largura
+        tabela.adicionar_faixa(
+            inicio,
+            inicio + largura - 1,
+            {a: (round(aleatorio.uniform(8, 60), 2), aleatorio.randint(1, 10)) for a in armazens},
+        )
+    estoque = EstoqueArmazens()
+    for id_produto in range(1, num_produtos + 1):
+        for armazem in aleatorio.sample(armazens, max(1, num_armazens // 3)):
+            estoque.definir(id_produto, armazem, aleatorio.randint(0, 1_000_000))
+    return MotorAlocacao(tabela, estoque)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pedidos", type=int, default=200_000)
+    parser.add_argument("--armazens", type=int, default=12)
+    parser.add_argument("--faixas", type=int, default=5_000)
+    parser.add_argument("--produtos", type=int, default=20_000)
+    args = parser.parse_args()
+
+    aleatorio = random.Random(42)
+    motor = montar(args.armazens, args.faixas, args.produtos, aleatorio)
+    pedidos = [
+        (
+            [(aleatorio.randint(1, args.produtos), aleatorio.randint(1, 3)) for _ in range(aleatorio.randint(1, 5))],
+            aleatorio.randrange(100_000_000),
+        )
+        for _ in range(args.pedidos)
+    ]
+    linhas = sum(len(itens) for itens, _ in pedidos)
+    for criterio in ("custo", "prazo"):
+        divididos = 0
+        inicio = time.perf_counter()
+        for itens, cep in pedidos:
+            divididos += motor.planejar(itens, cep, criterio=criterio).dividida
+        segundos = time.perf_counter() - inicio
+        print(
+            f"{criterio:>6}: {segundos / args.pedidos * 1e6:.2f} µs/pedido, "
+            f"{segundos / linhas * 1e6:.2f} µs/linha, {divididos / args.pedidos:.1%} divididos"
+        )
+
+
+if __name__ == "__main__":
+    main()
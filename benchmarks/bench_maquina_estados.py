@@ -0,0 +1,98 @@
+"""
+Microbenchmark das transições de status de pedidos.
+
+Leva `--pedidos` pedidos por pendente -> pago -> enviado -> entregue e tenta
+uma transição proibida (entregue -> pago) em cada um, com
+`Pedido.atualizar_status` (máquina de estados pré-compilada) e com a
+implementação anterior, que consultava listas e escolhia o campo de data
+numa cadeia de if/elif. Os pedidos não têm observador, então só a
+transição em si é medida.
+
+Uso:
+    python -m benchmarks.bench_maquina_estados --pedidos 200000
+"""
+
+import argparse
+import time
+from datetime import datetime
+
+from app.ecommerce_sistema import LinhasPedido, Pedido
+
+ESTADOS_VALIDOS = ["pendente", "pago", "enviado", "entregue", "cancelado"]
+TRANSICOES_PERMITIDAS = {
+    "pendente": ["pago", "cancelado"],
+    "pago": ["enviado", "cancelado"],
+    "enviado": ["entregue", "cancelado"],
+    "entregue": ["cancelado"],
+    "cancelado": [],
+}
+
+
+class PedidoListas(Pedido):
+    """
+    `atualizar_status` como era antes da máquina de estados.
+    """
+
+    def _atualizar_data(self, evento: str):
+        if evento in self.datas:
+            self.datas[evento] = datetime.now()
+        else:
+            raise ValueError(f"Evento '{evento}' desconhecido para atualização de data.")
+
+    def atualizar_status(self, novo_status: str) -> bool:
+        if novo_status not in ESTADOS_VALIDOS:
+            return False
+        transicoes_possiveis = TRANSICOES_PERMITIDAS.get(self.status_pedido, [])
+        if novo_status not in transicoes_possiveis and self.status_pedido != novo_status:
+            if self.status_pedido == "entregue" and novo_status == "cancelado":
+                pass
+            elif self.status_pedido == "cancelado" and novo_status == "cancelado":
+                pass
+            else:
+                return False
+        status_anterior = self.status_pedido
+        self.status_pedido = novo_status
+        if novo_status == "pago":
+            self._atualizar_data("pagamento")
+        elif novo_status == "enviado":
+            self._atualizar_data("envio")
+        elif novo_status == "entregue":
+            self._atualizar_data("entrega")
+        elif novo_status == "cancelado":
+            self._atualizar_data("cancelamento")
+        if self.observador is not None and status_anterior != novo_status:
+            self.observador(self, status_anterior)
+        return True
+
+
+def medir(classe: type, num_pedidos: int) -> float:
+    linhas = LinhasPedido.de_tuplas([(1, 1, 10.0, "Bench")])
+    pedidos = [
+        classe.restaurar(i, "bench", linhas, 10.0, {}, "pix", None) for i in range(num_pedidos)
+    ]
+    inicio = time.perf_counter()
+    for pedido in pedidos:
+        atualizar = pedido.atualizar_status
+        atualizar("pago")
+        atualizar("enviado")
+        atualizar("entregue")
+        atualizar("pago")
+    segundos = time.perf_counter() - inicio
+    assert all(p.status_pedido == "entregue" for p in pedidos)
+    return segundos
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pedidos", type=int, default=200_000)
+    args = parser.parse_args()
+
+    transicoes = 4 * args.pedidos
+    listas = medir(PedidoListas, args.pedidos)
+    maquina = medir(Pedido, args.pedidos)
+    print(f"listas e if/elif:      {transicoes / listas:,.0f} transições/s")
+    print(f"máquina pré-compilada: {transicoes / maquina:,.0f} transições/s ({listas / maquina:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
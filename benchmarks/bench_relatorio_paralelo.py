@@ -0,0 +1,90 @@
+"""
+Benchmark do relatório de vendas histórico com partições em processos.
+
+Monta um sistema sintético com `--pedidos` pedidos (1 a 4 itens, pagos em
+datas espalhadas por dois anos, parte pendente ou cancelada), grava-o num
+snapshot binário e mede `gerar_relatorio_paralelo` sobre esse snapshot com
+1, 2, 4, ... processos, até o número de CPUs. Mostra o tempo e o ganho
+sobre um processo; o ganho fica perto do linear enquanto houver núcleos
+livres, já que os processos só trocam o caminho do arquivo e os totais
+parciais.
+
+Uso:
+    python -m benchmarks.bench_relatorio_paralelo --pedidos 2000000
+"""
+
+import argparse
+import contextlib
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from app.ecommerce_sistema import LinhasPedido, Pedido, SistemaEcommerce
+from app.relatorio_paralelo import gerar_relatorio_paralelo
+from app.snapshot_binario import salvar_snapshot_binario
+
+STATUS = ["pendente", "pago", "enviado", "entregue", "cancelado"]
+
+
+def montar_sistema(num_pedidos: int, num_produtos: int) -> SistemaEcommerce:
+    aleatorio = random.Random(42)
+    sistema = SistemaEcommerce()
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        for i in range(num_produtos):
+            sistema.adicionar_produto_catalogo(f"P{i}", "bench", 10.0 + i % 90, 1_000_000, f"C{i % 12}")
+    produtos = list(sistema.produtos_catalogo.values())
+    inicio = datetime(2023, 1, 1)
+    for id_pedido in range(1, num_pedidos + 1):
+        escolhidos = aleatorio.sample(produtos, aleatorio.randint(1, 4))
+        linhas = LinhasPedido.de_tuplas(
+            (p.id_produto, aleatorio.randint(1, 3), p.preco, p.nome) for p in escolhidos
+        )
+        criacao = inicio + timedelta(minutes=aleatorio.randint(0, 2 * 365 * 24 * 60))
+        pedido = Pedido.restaurar(
+            id_pedido, "bench", linhas, linhas.subtotal(), {"rua": "Bench"},
+            aleatorio.choice(("pix", "cartao_credito")), criacao,
+        )
+        pedido.status_pedido = aleatorio.choices(STATUS, (1, 4, 2, 2, 1))[0]
+        if pedido.status_pedido != "pendente":
+            pedido.datas["pagamento"] = criacao + timedelta(minutes=5)
+            pedido.valor_final_pago = round(pedido.valor_total_pedido * 0.9, 2)
+        sistema.pedidos_registrados[id_pedido] = pedido
+    sistema._proximo_id_pedido = num_pedidos + 1
+    return sistema
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pedidos", type=int, default=1_000_000)
+    parser.add_argument("--produtos", type=int, default=1_000)
+    parser.add_argument("--max-processos", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    sistema = montar_sistema(args.pedidos, args.produtos)
+    with tempfile.TemporaryDirectory() as diretorio:
+        inicio = time.perf_counter()
+        caminho = salvar_snapshot_binario(sistema, os.path.join(diretorio, "bench.bin"))
+        print(f"Snapshot de {args.pedidos} pedidos gravado em {time.perf_counter() - inicio:.2f}s")
+        del sistema
+
+        contagens = [1]
+        while contagens[-1] * 2 <= args.max_processos:
+            contagens.append(contagens[-1] * 2)
+        if contagens[-1] != args.max_processos:
+            contagens.append(args.max_processos)
+        base = referencia = None
+        for processos in contagens:
+            inicio = time.perf_counter()
+            relatorio = gerar_relatorio_paralelo(caminho, processos=processos)
+            segundos = time.perf_counter() - inicio
+            if referencia is None:
+                base, referencia = segundos, relatorio
+            assert relatorio["vendas_por_produto"] == referencia["vendas_por_produto"]
+            print(f"  {processos:>3} processo(s): {segundos:.2f}s ({base / segundos:.1f}x)")
+        print(f"({os.cpu_count()} CPUs disponíveis)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark de escala do sistema particionado entre processos.
+
+Para 1, 2, 4, ... partições (até `--particoes`, padrão o número de CPUs),
+cria `--pedidos` pedidos de `--clientes` clientes e os paga em lotes de
+`--lote`, com produtos espalhados entre as partições (a maioria dos
+pagamentos reserva estoque em mais de uma). Mostra pedidos criados e pagos
+por segundo e o ganho sobre uma partição. O ganho só aparece com mais de um
+núcleo disponível.
+
+Uso:
+    python -m benchmarks.bench_sistema_particionado --pedidos 40000 --particoes 8
+"""
+
+import argparse
+import os
+import random
+import time
+
+from app.sistema_particionado import SistemaParticionado
+
+
+def medir(num_particoes: int, num_pedidos: int, num_clientes: int, tamanho_lote: int) -> float:
+    sistema = SistemaParticionado(num_particoes)
+    try:
+        produtos = [
+            sistema.adicionar_produto_catalogo(f"P{i}", "bench", 10.0, num_pedidos * 2, "Bench")
+            for i in range(32)
+        ]
+        clientes = [f"cliente{i}" for i in range(num_clientes)]
+        for cliente in clientes:
+            sistema.registrar_usuario(cliente, {"nome": cliente})
+        aleatorio = random.Random(42)
+        solicitacoes = [
+            (aleatorio.choice(clientes), [(p, 1) for p in aleatorio.sample(produtos, 2)], {"rua": "Bench"}, "pix")
+            for _ in range(num_pedidos)
+        ]
+        inicio = time.perf_counter()
+        for posicao in range(0, num_pedidos, tamanho_lote):
+            ids = sistema.criar_pedidos(solicitacoes[posicao:posicao + tamanho_lote])
+            resultados = sistema.processar_pagamentos([(i, {"chave_pix": "bench@pix.com"}) for i in ids])
+            assert all(r["status"] == "aprovado" for r in resultados)
+        return time.perf_counter() - inicio
+    finally:
+        sistema.fechar()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pedidos", type=int, default=40_000)
+    parser.add_argument("--clientes", type=int, default=1_000)
+    parser.add_argument("--lote", type=int, default=512)
+    parser.add_argument("--particoes", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    base = None
+    num_particoes = 1
+    while True:
+        segundos = medir(num_particoes, args.pedidos, args.clientes, args.lote)
+        base = base or segundos
+        print(
+            f"{num_particoes:>3} partições: {args.pedidos / segundos:,.0f} pedidos/s "
+            f"({base / segundos:.2f}x)"
+        )
+        if num_particoes >= args.particoes:
+            break
+        num_particoes = min(num_particoes * 2, args.particoes)
+
+
+if __name__ == "__main__":
+    main()
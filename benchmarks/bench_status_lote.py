@@ -0,0 +1,78 @@
+"""
+Benchmark das transições de status em lote.
+
+Monta um sistema com `--pedidos` pedidos pagos e os leva a "enviado" e
+depois a "entregue" de duas formas: um `Pedido.atualizar_status` por pedido
+(com o lock de cada pedido, como faz a aplicação hoje) e
+`SistemaEcommerce.atualizar_status_em_lote`. Mostra as transições por
+segundo de cada forma.
+
+Uso:
+    python -m benchmarks.bench_status_lote --pedidos 200000
+"""
+
+import argparse
+import contextlib
+import os
+import time
+from datetime import datetime
+
+from app.ecommerce_sistema import LinhasPedido, Pedido, SistemaEcommerce
+
+
+def montar_sistema(num_pedidos: int) -> SistemaEcommerce:
+    sistema = SistemaEcommerce()
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        sistema.registrar_usuario("bench", {"nome": "Bench"})
+        produto = sistema.adicionar_produto_catalogo("P", "bench", 10.0, 1_000_000, "Bench")
+    agora = datetime.now()
+    for id_pedido in range(1, num_pedidos + 1):
+        linhas = LinhasPedido.de_produtos([(produto, 1)])
+        pedido = Pedido.restaurar(id_pedido, "bench", linhas, 10.0, {"rua": "Bench"}, "pix", agora)
+        pedido.status_pedido = "pago"
+        pedido.datas["pagamento"] = agora
+        pedido.valor_final_pago = 9.0
+        sistema._vincular_pedido(pedido)
+        sistema.pedidos_registrados[id_pedido] = pedido
+        sistema.agregados_vendas.registrar_pedido(pedido)
+        sistema.rollups_vendas.registrar_pedido(pedido)
+        sistema.indices_pedidos.registrar_pedido(pedido)
+    sistema._proximo_id_pedido = num_pedidos + 1
+    return sistema
+
+
+def um_a_um(sistema: SistemaEcommerce, ids: list, status: str) -> float:
+    inicio = time.perf_counter()
+    for id_pedido in ids:
+        with sistema._locks_pedidos.adquirir([id_pedido]):
+            sistema.pedidos_registrados[id_pedido].atualizar_status(status)
+    return time.perf_counter() - inicio
+
+
+def em_lote(sistema: SistemaEcommerce, ids: list, status: str) -> float:
+    inicio = time.perf_counter()
+    resultado = sistema.atualizar_status_em_lote(ids, status)
+    segundos = time.perf_counter() - inicio
+    assert len(resultado["aceitos"]) == len(ids)
+    return segundos
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pedidos", type=int, default=200_000)
+    args = parser.parse_args()
+
+    ids = list(range(1, args.pedidos + 1))
+    for nome, transicionar in (("um a um", um_a_um), ("em lote", em_lote)):
+        sistema = montar_sistema(args.pedidos)
+        enviado = transicionar(sistema, ids, "enviado")
+        entregue = transicionar(sistema, ids, "entregue")
+        assert sistema.indices_pedidos.contar_por_status("entregue") == args.pedidos
+        print(
+            f"{nome:>8}: enviado {args.pedidos / enviado:,.0f}/s, "
+            f"entregue {args.pedidos / entregue:,.0f}/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import pytest
+from datetime import date
+from app.ecommerce_sistema import SistemaEcommerce, Carrinho
+from app.agregados_vendas import AgregadosVendas
+from app.persistencia import aplicar_estado, capturar_estado
+from app.snapshot_binario import carregar_snapshot_binario, salvar_snapshot_binario
+from app.armazenamento_sqlite import abrir_sistema_sqlite
+
+
+def _popular(sistema):
+    sistema.registrar_usuario("ana", {"nome": "Ana"})
+    livro = sistema.adicionar_produto_catalogo("Livro", "Romance", 100.0, 100, "Livros")
+    pedidos = []
+    for i in range(8):
+        carrinho = Carrinho()
+        carrinho.adicionar_item(livro, 1)
+        metodo = "pix" if i % 2 == 0 else "cartao_credito"
+        pedidos.append(sistema.criar_pedido("ana", carrinho, {"rua": "A"}, metodo))
+    detalhes = {
+        "pix": {"chave_pix": "ana@pix.com"},
+        "cartao_credito": {
+            "numero_cartao": "1234567812345678",
+            "validade": "12/30",
+            "cvv": "123",
+            "numero_parcelas": 1,
+        },
+    }
+    for pedido in pedidos[:6]:
+        sistema.processar_pagamento_pedido(
+            pedido.id_pedido, dict(detalhes[pedido.metodo_pagamento_escolhido])
+        )
+    pedidos[0].atualizar_status("enviado")
+    pedidos[1].atualizar_status("enviado")
+    pedidos[1].atualizar_status("entregue")
+    sistema.cancelar_pedido(pedidos[2].id_pedido)
+    sistema.cancelar_pedido(pedidos[7].id_pedido)
+    return pedidos
+
+
+def _relatorio_por_varredura(sistema, status_filtro=None):
+    pedidos = [
+        p
+        for p in sistema.pedidos_registrados.values()
+        if p.status_pedido in ("pago", "enviado", "entregue")
+        and (not status_filtro or p.status_pedido == status_filtro)
+    ]
+    return round(sum(p.valor_final_pago for p in pedidos), 2), len(pedidos)
+
+
+class TestAgregadosVendas:
+    """
+    Testes para os totais de vendas incrementais e o relatório paginado.
+    """
+
+    def test_totais_batem_com_a_varredura(self):
+        sistema = SistemaEcommerce()
+        _popular(sistema)
+        for filtro in (None, "pago", "enviado", "entregue", "cancelado"):
+            relatorio = sistema.gerar_relatorio_vendas(filtro)
+            assert (
+                relatorio["total_vendas_apuradas"],
+                relatorio["numero_de_pedidos_contabilizados"],
+            ) == _relatorio_por_varredura(sistema, filtro)
+        assert "lista_pedidos_no_relatorio" not in sistema.gerar_relatorio_vendas(
+            listar_pedidos=False
+        )
+
+    def test_metodos_de_pagamento_respeitam_o_filtro(self):
+        sistema = SistemaEcommerce()
+        pedidos = _popular(sistema)
+        todos = sistema.gerar_relatorio_vendas()["vendas_por_metodo_pagamento"]
+        assert {m: t["quantidade"] for m, t in todos.items()} == {"pix": 2, "cartao_credito": 3}
+        enviados = sistema.gerar_relatorio_vendas("enviado")["vendas_por_metodo_pagamento"]
+        assert enviados == {"pix": {"quantidade": 1, "receita": pedidos[0].valor_final_pago}}
+        assert sistema.gerar_relatorio_vendas("cancelado")["vendas_por_metodo_pagamento"] == {}
+
+    def test_totais_por_status_metodo_e_dia(self):
+        sistema = SistemaEcommerce()
+        pedidos = _popular(sistema)
+        agregados = sistema.agregados_vendas
+        por_status = agregados.por_status()
+        assert {s: t["quantidade"] for s, t in por_status.items()} == {
+            "pendente": 1,
+            "pago": 3,
+            "enviado": 1,
+            "entregue": 1,
+            "cancelado": 2,
+        }
+        # O cancelado depois de pago mantém a receita no status, não nas vendas.
+        assert por_status["cancelado"]["receita"] == pedidos[2].valor_final_pago
+        por_metodo = agregados.por_metodo_pagamento()
+        assert por_metodo["pix"]["quantidade"] == 2
+        assert por_metodo["cartao_credito"]["quantidade"] == 3
+        hoje = date.today()
+        assert agregados.por_dia(hoje, hoje)[hoje]["quantidade"] == 5
+        assert agregados.por_dia(fim=date(2000, 1, 1)) == {}
+
+    def test_listagem_paginada(self):
+        sistema = SistemaEcommerce()
+        pedidos = _popular(sistema)
+        # Sem página, a lista traz todos os pedidos, como antes da paginação.
+        assert sistema.gerar_relatorio_vendas()["lista_pedidos_no_relatorio"] == [
+            str(p) for p in pedidos
+        ]
+        assert sistema.gerar_relatorio_vendas("pago")["lista_pedidos_no_relatorio"] == [
+            str(p) for p in pedidos[3:6]
+        ]
+        pagina = sistema.gerar_relatorio_vendas(listar_pedidos=True, pagina=2, tamanho_pagina=3)
+        assert pagina["lista_pedidos_no_relatorio"] == [str(p) for p in pedidos[3:6]]
+        ultima = sistema.gerar_relatorio_vendas("cancelado", listar_pedidos=True, tamanho_pagina=5)
+        assert ultima["lista_pedidos_no_relatorio"] == [str(pedidos[2]), str(pedidos[7])]
+        with pytest.raises(ValueError):
+            sistema.gerar_relatorio_vendas(listar_pedidos=True, pagina=0)
+        with pytest.raises(ValueError):
+            sistema.gerar_relatorio_vendas(listar_pedidos=True, tamanho_pagina=0)
+        with pytest.raises(ValueError):
+            sistema.gerar_relatorio_vendas(pagina=2)
+
+    def test_sistemas_restaurados_tem_os_mesmos_totais(self, tmp_path):
+        sistema = SistemaEcommerce()
+        _popular(sistema)
+        esperado = sistema.agregados_vendas.por_status()
+
+        restaurado = SistemaEcommerce()
+        aplicar_estado(restaurado, capturar_estado(sistema))
+        assert restaurado.agregados_vendas.por_status() == esperado
+
+        caminho = str(tmp_path / "loja.bin")
+        salvar_snapshot_binario(sistema, caminho)
+        carregado, _ = carregar_snapshot_binario(caminho)
+        # Transição antes da primeira consulta: somada à base do snapshot.
+        carregado.pedidos_registrados[4].atualizar_status("enviado")
+        assert carregado.pedidos_registrados.num_materializados == 1
+        totais = carregado.agregados_vendas.por_status()
+        assert totais["enviado"]["quantidade"] == esperado["enviado"]["quantidade"] + 1
+        assert totais["pago"]["quantidade"] == esperado["pago"]["quantidade"] - 1
+        assert carregado.agregados_vendas.por_metodo_pagamento() == (
+            sistema.agregados_vendas.por_metodo_pagamento()
+        )
+
+        banco = str(tmp_path / "loja.db")
+        original = abrir_sistema_sqlite(banco)
+        _popular(original)
+        original.armazenamento.fechar()
+        reaberto = abrir_sistema_sqlite(banco)
+        assert reaberto.agregados_vendas.por_status() == esperado
+        assert reaberto.agregados_vendas.por_dia() == sistema.agregados_vendas.por_dia()
+
+    def test_registro_em_grupo(self):
+        agregados = AgregadosVendas()
+        agregados.registrar("pago", "pix", 30.0, date(2024, 1, 2), quantidade=3)
+        agregados.registrar("pendente", "pix", 99.0, None)
+        assert agregados.totais(["pago", "pendente"]) == (4, 30.0)
+        assert agregados.por_dia() == {date(2024, 1, 2): {"quantidade": 3, "receita": 30.0}}
+
+    def test_pedido_pago_logo_apos_ser_publicado(self):
+        sistema = SistemaEcommerce()
+
+        class PagarAoPublicar(dict):
+            # Simula outra thread pagando o pedido assim que ele fica visível.
+            def __setitem__(self, id_pedido, pedido):
+                super().__setitem__(id_pedido, pedido)
+                sistema.processar_pagamento_pedido(id_pedido, {"chave_pix": "ana@pix.com"})
+
+        sistema.pedidos_registrados = PagarAoPublicar()
+        sistema.registrar_usuario("ana", {"nome": "Ana"})
+        livro = sistema.adicionar_produto_catalogo("Livro", "Romance", 100.0, 10, "Livros")
+        carrinho = Carrinho()
+        carrinho.adicionar_item(livro, 1)
+        pedido = sistema.criar_pedido("ana", carrinho, {"rua": "A"}, "pix")
+        assert pedido.status_pedido == "pago"
+        assert sistema.agregados_vendas.por_status() == {"pago": {"quantidade": 1, "receita": 90.0}}
+        assert sistema.indices_pedidos.contar_por_status("pago") == 1
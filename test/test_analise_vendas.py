@@ -0,0 +1,107 @@
+import pytest
+from app.ecommerce_sistema import SistemaEcommerce, Carrinho
+
+np = pytest.importorskip("numpy")
+from app.analise_vendas import AnaliseVendas  # noqa: E402
+
+
+_CARTAO = {"numero_cartao": "1234567812345678", "validade": "12/30", "cvv": "123"}
+
+
+def _comprar(sistema, itens, metodo, parcelas=1, pagar=True):
+    carrinho = Carrinho()
+    for produto, quantidade in itens:
+        carrinho.adicionar_item(produto, quantidade)
+    pedido = sistema.criar_pedido("ana", carrinho, {"rua": "A"}, metodo)
+    if pagar:
+        detalhes = (
+            {"chave_pix": "ana@pix.com"}
+            if metodo == "pix"
+            else dict(_CARTAO, numero_parcelas=parcelas)
+        )
+        sistema.processar_pagamento_pedido(pedido.id_pedido, detalhes)
+    return pedido
+
+
+@pytest.fixture
+def sistema():
+    sistema = SistemaEcommerce()
+    sistema.registrar_usuario("ana", {"nome": "Ana"})
+    livro = sistema.adicionar_produto_catalogo("Livro", "Romance", 100.0, 1000, "Livros")
+    caneta = sistema.adicionar_produto_catalogo("Caneta", "Azul", 2.5, 1000, "Papelaria")
+    _comprar(sistema, [(livro, 1)], "pix")
+    _comprar(sistema, [(livro, 2), (caneta, 4)], "cartao_credito", parcelas=3)
+    _comprar(sistema, [(caneta, 2)], "cartao_credito")
+    _comprar(sistema, [(livro, 1)], "pix", pagar=False)
+    return sistema
+
+
+def _ticket_por_varredura(sistema):
+    somas = {}
+    for pedido in sistema.pedidos_registrados.values():
+        if pedido.status_pedido in ("pago", "enviado", "entregue"):
+            soma, quantidade = somas.get(pedido.metodo_pagamento_escolhido, (0.0, 0))
+            somas[pedido.metodo_pagamento_escolhido] = (soma + pedido.valor_final_pago, quantidade + 1)
+    return {metodo: soma / quantidade for metodo, (soma, quantidade) in somas.items()}
+
+
+class TestAnaliseVendas:
+    """
+    Testes para as análises colunares (NumPy) de vendas.
+    """
+
+    def test_consultas_batem_com_a_varredura(self, sistema):
+        analise = AnaliseVendas(sistema)
+        assert analise.ticket_medio_por_metodo() == pytest.approx(_ticket_por_varredura(sistema))
+        assert analise.distribuicao_tamanho_cesta() == {1: 1, 2: 1, 6: 1}
+        assert analise.custo_desconto_pix() == pytest.approx(100.0 - 90.0)
+        juros = sistema.pedidos_registrados[2].valor_final_pago - 210.0
+        assert juros > 0
+        assert analise.receita_juros_parcelamento() == pytest.approx(juros)
+        assert analise.unidades_por_produto() == {1: 3, 2: 6}
+        assert analise.unidades_por_produto(["pendente"]) == {1: 1}
+        assert analise.percentis("unidades", (0, 100)) == {0: 1.0, 100: 6.0}
+        por_status = analise.agrupar("status", "valor_total", ["pago", "pendente"])
+        assert por_status["pendente"] == {"quantidade": 1, "soma": 100.0, "media": 100.0}
+
+    def test_atualizacao_incremental(self, sistema):
+        analise = AnaliseVendas(sistema)
+        livro = sistema.recuperar_produto_por_id(1)
+        novo = _comprar(sistema, [(livro, 5)], "pix")
+        sistema.processar_pagamento_pedido(4, {"chave_pix": "ana@pix.com"})
+        sistema.cancelar_pedido(1)
+        assert analise.pedidos.tamanho == 4
+        assert analise.atualizar() == (1, 2)
+        assert analise.pedidos.tamanho == 5
+        assert list(analise.pedidos["id"]) == [1, 2, 3, 4, 5]
+        assert analise.ticket_medio_por_metodo() == pytest.approx(_ticket_por_varredura(sistema))
+        assert analise.unidades_por_produto()[1] == 2 + 1 + 5
+        assert novo.id_pedido == 5
+        assert analise.atualizar() == (0, 0)
+
+        analise.fechar()
+        _comprar(sistema, [(livro, 1)], "pix")
+        assert analise.atualizar() == (0, 0)
+
+    def test_colunas_prontas_e_validacao(self):
+        analise = AnaliseVendas.de_colunas(
+            {
+                "id": np.arange(1, 5),
+                "status": np.array([1, 1, 0, 1]),
+                "metodo": np.array([0, 1, 0, 0]),
+                "valor_total": np.array([10.0, 20.0, 30.0, 40.0]),
+                "valor_pago": np.array([9.0, 21.0, np.nan, 36.0]),
+                "criacao": np.zeros(4),
+                "pagamento": np.zeros(4),
+                "num_itens": np.ones(4),
+                "unidades": np.array([1, 2, 3, 4]),
+            },
+            status=["pendente", "pago"],
+            metodos=["pix", "cartao_credito"],
+        )
+        assert analise.ticket_medio_por_metodo() == {"pix": 22.5, "cartao_credito": 21.0}
+        assert analise.custo_desconto_pix() == 5.0
+        with pytest.raises(ValueError):
+            analise.agrupar("cliente")
+        with pytest.raises(ValueError):
+            analise.agrupar("metodo", "endereco")
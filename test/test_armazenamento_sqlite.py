@@ -0,0 +1,211 @@
+import threading
+import pytest
+from datetime import datetime, timedelta
+from app.ecommerce_sistema import Carrinho, Pedido
+from app.armazenamento_sqlite import ArmazenamentoSQLite, abrir_sistema_sqlite
+from app.estoque_armazens import MotorAlocacao, TabelaZonas
+
+
+@pytest.fixture
+def caminho(tmp_path):
+    return str(tmp_path / "loja.db")
+
+
+def _comprar(sistema, itens, metodo="pix"):
+    carrinho = Carrinho()
+    for produto, quantidade in itens:
+        carrinho.adicionar_item(produto, quantidade)
+    return sistema.criar_pedido("ana", carrinho, {"rua": "A", "cep": "1"}, metodo)
+
+
+class TestArmazenamentoSQLite:
+    """
+    Testes para o armazenamento SQLite com cache de leitura.
+    """
+
+    def test_estado_sobrevive_a_reabertura(self, caminho):
+        sistema = abrir_sistema_sqlite(caminho)
+        livro = sistema.adicionar_produto_catalogo("Livro", "Romance", 50.0, 10, "Livros")
+        caneta = sistema.adicionar_produto_catalogo("Caneta", "Azul", 2.5, 100, "Papelaria")
+        sistema.registrar_usuario("ana", {"nome": "Ana"})
+        pago = _comprar(sistema, [(livro, 2), (caneta, 4)])
+        sistema.processar_pagamento_pedido(pago.id_pedido, {"chave_pix": "ana@pix.com"})
+        cancelado = _comprar(sistema, [(livro, 1)])
+        sistema.processar_pagamento_pedido(cancelado.id_pedido, {"chave_pix": "ana@pix.com"})
+        sistema.cancelar_pedido(cancelado.id_pedido)
+        sistema.armazenamento.fechar()
+
+        reaberto = abrir_sistema_sqlite(caminho)
+        assert reaberto.usuarios == {"ana": {"nome": "Ana"}}
+        assert reaberto.produtos_catalogo.num_em_cache == 0
+        assert reaberto.recuperar_produto_por_id(1).quantidade_em_estoque == 8
+        assert reaberto.recuperar_produto_por_id(2).quantidade_em_estoque == 96
+        assert reaberto.produtos_catalogo.num_em_cache == 2
+        assert reaberto.recuperar_produto_por_id(99) is None
+
+        pedido = reaberto.pedidos_registrados[pago.id_pedido]
+        assert pedido.status_pedido == "pago"
+        assert pedido.valor_final_pago == pago.valor_final_pago
+        assert pedido.id_transacao_pagamento == pago.id_transacao_pagamento
+        assert pedido.datas == pago.datas
+        assert [tuple(item) for item in pedido.linhas] == [(1, 2, 50.0, "Livro"), (2, 4, 2.5, "Caneta")]
+        assert reaberto.pedidos_registrados[cancelado.id_pedido].status_pedido == "cancelado"
+        assert len(reaberto.pedidos_registrados) == 2
+        assert list(reaberto.produtos_catalogo) == [1, 2]
+        assert reaberto._proximo_id_pedido == 3
+
+    def test_pagamento_grava_pedido_e_estoque_numa_transacao(self, caminho):
+        sistema = abrir_sistema_sqlite(caminho)
+        livro = sistema.adicionar_produto_catalogo("Livro", "Romance", 50.0, 10, "Livros")
+        caneta = sistema.adicionar_produto_catalogo("Caneta", "Azul", 2.5, 100, "Papelaria")
+        sistema.registrar_usuario("ana", {"nome": "Ana"})
+        pedido = _comprar(sistema, [(livro, 2), (caneta, 4)])
+
+        antes = sistema.armazenamento.transacoes_gravadas
+        sistema.processar_pagamento_pedido(pedido.id_pedido, {"chave_pix": "ana@pix.com"})
+        assert sistema.armazenamento.transacoes_gravadas == antes + 1
+
+    def test_cancelamento_em_lote_numa_transacao(self, caminho):
+        sistema = abrir_sistema_sqlite(caminho)
+        livro = sistema.adicionar_produto_catalogo("Livro", "Romance", 50.0, 10, "Livros")
+        sistema.registrar_usuario("ana", {"nome": "Ana"})
+        pedidos = [_comprar(sistema, [(livro, 2)]) for _ in range(3)]
+        for pedido in pedidos[:2]:
+            sistema.processar_pagamento_pedido(pedido.id_pedido, {"chave_pix": "ana@pix.com"})
+
+        antes = sistema.armazenamento.transacoes_gravadas
+        sistema.cancelar_pedidos_em_lote([p.id_pedido for p in pedidos], reembolsar=False)
+        assert sistema.armazenamento.transacoes_gravadas == antes + 1
+        sistema.armazenamento.fechar()
+        reaberto = abrir_sistema_sqlite(caminho)
+        assert reaberto.recuperar_produto_por_id(1).quantidade_em_estoque == 10
+        assert {reaberto.pedidos_registrados[p.id_pedido].status_pedido for p in pedidos} == {"cancelado"}
+
+    def test_reembolso_de_pedido_pago_antes_de_reabrir(self, caminho):
+        sistema = abrir_sistema_sqlite(caminho)
+        livro = sistema.adicionar_produto_catalogo("Livro", "Romance", 50.0, 10, "Livros")
+        sistema.registrar_usuario("ana", {"nome": "Ana"})
+        antigo = _comprar(sistema, [(livro, 2)])
+        sistema.processar_pagamento_pedido(antigo.id_pedido, {"chave_pix": "ana@pix.com"})
+        sistema.armazenamento.fechar()
+
+        reaberto = abrir_sistema_sqlite(caminho)
+        novo = _comprar(reaberto, [(reaberto.recuperar_produto_por_id(1), 1)])
+        reaberto.processar_pagamento_pedido(novo.id_pedido, {"chave_pix": "ana@pix.com"})
+        relatorio = reaberto.cancelar_pedidos_em_lote([antigo.id_pedido, novo.id_pedido])
+        assert relatorio["falhas_reembolso"] == {}
+        assert relatorio["total_reembolsado"] == round(antigo.valor_final_pago + novo.valor_final_pago, 2)
+        assert reaberto.recuperar_produto_por_id(1).quantidade_em_estoque == 10
+        reaberto.armazenamento.fechar()
+
+    def test_alocacao_e_estoque_por_armazem_sobrevivem_a_reabertura(self, caminho):
+        sistema = abrir_sistema_sqlite(caminho)
+        caneta = sistema.adicionar_produto_catalogo("Caneta", "Azul", 5.0, 10, "Papelaria")
+        sistema.registrar_usuario("ana", {"nome": "Ana"})
+        tabela = TabelaZonas()
+        tabela.adicionar_faixa("01000-000", "09999-999", {"SP": (7.5, 1), "RJ": (20.0, 2)})
+        sistema.configurar_alocacao(MotorAlocacao(tabela, sistema.estoque_armazens))
+        sistema.estoque_armazens.definir(caneta.id_produto, "SP", 10)
+        carrinho = Carrinho()
+        carrinho.adicionar_item(caneta, 2)
+        pedido = sistema.criar_pedido("ana", carrinho, {"rua": "A", "cep": "01310-100"}, "pix")
+        sistema.processar_pagamento_pedido(pedido.id_pedido, {"chave_pix": "ana@pix.com"})
+        sistema.armazenamento.fechar()
+
+        reaberto = abrir_sistema_sqlite(caminho)
+        copia = reaberto.pedidos_registrados[pedido.id_pedido]
+        assert copia.alocacao == pedido.alocacao and copia.calcular_frete() == 7.5
+        assert reaberto.estoque_armazens.por_armazem(caneta.id_produto) == {"SP": 8}
+        assert reaberto.cancelar_pedido(pedido.id_pedido)
+        reaberto.armazenamento.fechar()
+        assert abrir_sistema_sqlite(caminho).estoque_armazens.por_armazem(caneta.id_produto) == {"SP": 10}
+
+    def test_datas_de_estados_extras_sobrevivem_a_reabertura(self, caminho):
+        sistema = abrir_sistema_sqlite(caminho)
+        livro = sistema.adicionar_produto_catalogo("Livro", "Romance", 50.0, 10, "Livros")
+        sistema.registrar_usuario("ana", {"nome": "Ana"})
+        pedido = _comprar(sistema, [(livro, 1)])
+        sistema.processar_pagamento_pedido(pedido.id_pedido, {"chave_pix": "ana@pix.com"})
+        maquina = Pedido.MAQUINA_ESTADOS.copiar()
+        maquina.adicionar_estado("em_separacao", "separacao")
+        maquina.permitir("pago", "em_separacao")
+        maquina.permitir("em_separacao", "enviado")
+        pedido.MAQUINA_ESTADOS = maquina
+        pedido.atualizar_status("em_separacao")
+        pedido.atualizar_status("enviado")
+        sistema.armazenamento.fechar()
+
+        copia = abrir_sistema_sqlite(caminho).pedidos_registrados[pedido.id_pedido]
+        assert copia.status_pedido == "enviado"
+        assert copia.datas == pedido.datas and "separacao" in copia.datas
+
+    def test_totais_carregados_sob_demanda_sem_contar_duas_vezes(self, caminho):
+        sistema = abrir_sistema_sqlite(caminho)
+        livro = sistema.adicionar_produto_catalogo("Livro", "Romance", 50.0, 10, "Livros")
+        sistema.registrar_usuario("ana", {"nome": "Ana"})
+        pago = _comprar(sistema, [(livro, 1)])
+        sistema.processar_pagamento_pedido(pago.id_pedido, {"chave_pix": "ana@pix.com"})
+        sistema.armazenamento.fechar()
+
+        reaberto = abrir_sistema_sqlite(caminho)
+        # Nada é lido do banco na abertura.
+        assert reaberto.agregados_vendas._carregar_base is not None
+        assert reaberto.rollups_vendas._carregar_base is not None
+        assert reaberto.indices_pedidos._carregar_base is not None
+        # A primeira alteração carrega a base antes de somar a sua transição,
+        # que o banco já terá quando uma consulta vier depois.
+        outro = _comprar(reaberto, [(livro, 2)])
+        reaberto.processar_pagamento_pedido(outro.id_pedido, {"chave_pix": "ana@pix.com"})
+        reaberto.pedidos_registrados[pago.id_pedido].atualizar_status("enviado")
+        relatorio = reaberto.gerar_relatorio_vendas(listar_pedidos=False)
+        assert relatorio["numero_de_pedidos_contabilizados"] == 2
+        assert relatorio["total_vendas_apuradas"] == round(pago.valor_final_pago + outro.valor_final_pago, 2)
+        agora = datetime.now()
+        totais = reaberto.rollups_vendas.totais(agora - timedelta(days=1), agora + timedelta(days=1))
+        assert totais["pedidos"] == 2
+        assert reaberto.indices_pedidos.por_status("enviado") == [pago.id_pedido]
+
+    def test_importacao_em_lote(self, caminho):
+        sistema = abrir_sistema_sqlite(caminho, tamanho_lote=3)
+        importados = sistema.armazenamento.importar_produtos(
+            sistema, ((f"Produto {i}", "Desc", 1.0 + i, 5, "Cat") for i in range(10))
+        )
+        assert importados == 10
+        assert len(sistema.produtos_catalogo) == 10
+        assert sistema.recuperar_produto_por_id(10).nome == "Produto 9"
+        novo = sistema.adicionar_produto_catalogo("Novo", "Desc", 5.0, 1, "Cat")
+        assert novo.id_produto == 11
+
+        with pytest.raises(ValueError, match="Produto inválido"):
+            sistema.armazenamento.importar_produtos(sistema, [("", "Desc", 1.0, 1, "Cat")])
+
+    def test_leitores_concorrentes(self, caminho):
+        sistema = abrir_sistema_sqlite(caminho, tamanho_pool_leitura=2)
+        sistema.armazenamento.importar_produtos(
+            sistema, ((f"Produto {i}", "Desc", 1.0, 5, "Cat") for i in range(200))
+        )
+        erros = []
+
+        def ler(inicio):
+            armazenamento = sistema.armazenamento
+            for id_produto in range(inicio, 201, 8):
+                if armazenamento.ler_produto(id_produto) is None:
+                    erros.append(id_produto)
+
+        threads = [threading.Thread(target=ler, args=(i,)) for i in range(1, 9)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert erros == []
+        assert sistema.armazenamento._leitores_criados <= 2
+
+    def test_remocao_nao_suportada(self, caminho):
+        sistema = abrir_sistema_sqlite(caminho)
+        sistema.adicionar_produto_catalogo("Livro", "Romance", 50.0, 10, "Livros")
+        with pytest.raises(TypeError):
+            del sistema.produtos_catalogo[1]
+
+    def test_pool_de_leitura_invalido(self, caminho):
+        with pytest.raises(ValueError):
+            ArmazenamentoSQLite(caminho, tamanho_pool_leitura=0)
@@ -0,0 +1,167 @@
+import contextlib
+import threading
+
+import pytest
+from app.ecommerce_sistema import SistemaEcommerce, Carrinho
+from app.barramento_eventos import (
+    BarramentoEventos,
+    EstoqueAlterado,
+    PagamentoAprovado,
+    PedidoCancelado,
+    PedidoCriado,
+)
+
+
+def _sistema_com_pedidos():
+    sistema = SistemaEcommerce()
+    sistema.registrar_usuario("ana", {"nome": "Ana"})
+    livro = sistema.adicionar_produto_catalogo("Livro", "Romance", 100.0, 50, "Livros")
+    return sistema, livro
+
+
+class _ArmazenamentoQueFalha:
+    @contextlib.contextmanager
+    def transacao(self):
+        yield
+        raise OSError("falha ao gravar")
+
+
+def _comprar(sistema, livro):
+    carrinho = Carrinho()
+    carrinho.adicionar_item(livro, 2)
+    return sistema.criar_pedido("ana", carrinho, {"rua": "A"}, "pix")
+
+
+class TestBarramentoEventos:
+    """
+    Testes para o barramento de eventos com caixa de saída persistente.
+    """
+
+    def test_eventos_tipados_entregues_em_lotes(self, tmp_path):
+        sistema, livro = _sistema_com_pedidos()
+        barramento = BarramentoEventos(str(tmp_path), tamanho_lote=2)
+        lotes, pedidos = [], []
+        barramento.assinar(lotes.append)
+        barramento.assinar(lambda lote: pedidos.extend(e.evento for e in lote), tipos=[PedidoCriado])
+        barramento.anexar(sistema)
+        pedido = _comprar(sistema, livro)
+        sistema.processar_pagamento_pedido(pedido.id_pedido, {"chave_pix": "ana@pix.com"})
+        sistema.cancelar_pedido(pedido.id_pedido)
+        assert barramento.aguardar_entrega(timeout=5)
+        barramento.fechar()
+
+        envelopes = [envelope for lote in lotes for envelope in lote]
+        assert all(len(lote) <= 2 for lote in lotes)
+        assert [e.id_evento for e in envelopes] == list(range(1, len(envelopes) + 1))
+        assert [type(e.evento) for e in envelopes] == [
+            PedidoCriado, EstoqueAlterado, PagamentoAprovado, PedidoCancelado, EstoqueAlterado
+        ]
+        # A baixa de estoque vem antes do pagamento, que já leva a alocação.
+        assert envelopes[1].evento == EstoqueAlterado(livro.id_produto, -2)
+        assert envelopes[2].evento.valor_pago == pedido.valor_final_pago
+        assert envelopes[3].evento.status_anterior == "pago"
+        assert envelopes[4].evento == EstoqueAlterado(livro.id_produto, 2)
+        assert [p.id_pedido for p in pedidos] == [pedido.id_pedido]
+        assert barramento.entregues == 5 and barramento.pendentes == 0
+        # Depois de fechar, o sistema não publica mais no barramento.
+        _comprar(sistema, livro)
+        with pytest.raises(ValueError, match="fechado"):
+            barramento.publicar(EstoqueAlterado(1, 1))
+
+    def test_eventos_chegam_depois_da_operacao(self, tmp_path):
+        sistema, livro = _sistema_com_pedidos()
+        recebidos = []
+
+        def ouvinte(tipo, dados):
+            lock = sistema._locks_pedidos.lock_de(dados.get("id_pedido", 0))
+            recebidos.append((tipo, lock.locked()))
+
+        sistema.adicionar_ouvinte(ouvinte, apos_confirmacao=True)
+        pedido = _comprar(sistema, livro)
+        sistema.processar_pagamento_pedido(pedido.id_pedido, {"chave_pix": "ana@pix.com"})
+        assert recebidos == [("pedido_criado", False), ("estoque_alterado", False), ("pedido_pago", False)]
+
+        # Uma transação que falha ao gravar não chega a esses ouvintes.
+        sistema.armazenamento = _ArmazenamentoQueFalha()
+        with pytest.raises(OSError):
+            sistema.cancelar_pedido(pedido.id_pedido)
+        assert len(recebidos) == 3
+        sistema.armazenamento = None
+        sistema.atualizar_preco(livro.id_produto, 90.0)
+        assert recebidos[-1] == ("preco_alterado", False)
+
+        # Por padrão, publicar só retorna com o evento em disco.
+        barramento = BarramentoEventos(str(tmp_path))
+        id_evento = barramento.publicar(EstoqueAlterado(1, 1))
+        assert barramento._caixa.lsn_duravel >= id_evento
+        barramento.fechar()
+
+    def test_entrega_pelo_menos_uma_vez(self, tmp_path):
+        barramento = BarramentoEventos(str(tmp_path), espera_retentativa=0.01)
+        recebidos, tentativas = [], []
+
+        def instavel(lote):
+            tentativas.append(len(lote))
+            if len(tentativas) == 1:
+                raise RuntimeError("indisponível")
+            recebidos.extend(e.id_evento for e in lote)
+
+        barramento.assinar(instavel)
+        barramento.publicar(EstoqueAlterado(1, -1))
+        assert barramento.aguardar_entrega(timeout=5)
+        assert recebidos == [1] and barramento.falhas == 1
+
+        # Um consumidor que nunca confirma deixa os eventos na caixa de saída.
+        barramento.assinar(lambda lote: 1 / 0)
+        barramento.publicar(EstoqueAlterado(1, -2))
+        barramento.publicar(PedidoCancelado(7, "pago", 0.0))
+        barramento.fechar(timeout=0.2)
+
+        reaberto = BarramentoEventos(str(tmp_path))
+        reentregues = []
+        reaberto.assinar(reentregues.extend)
+        assert reaberto.aguardar_entrega(timeout=5)
+        assert reentregues == [(2, EstoqueAlterado(1, -2)), (3, PedidoCancelado(7, "pago", 0.0))]
+        reaberto.fechar()
+        terceiro = BarramentoEventos(str(tmp_path))
+        assert terceiro.pendentes == 0
+        terceiro.fechar()
+
+    @pytest.mark.parametrize("politica", ["bloquear", "descartar", "derramar"])
+    def test_politicas_com_fila_cheia(self, tmp_path, politica):
+        liberar = threading.Event()
+        recebidos = []
+
+        def lento(lote):
+            liberar.wait(5)
+            recebidos.extend(e.evento.variacao for e in lote)
+
+        barramento = BarramentoEventos(
+            str(tmp_path), capacidade=2, politica=politica, tamanho_lote=1, espera_maxima=0.1
+        )
+        barramento.assinar(lento)
+        barramento.publicar(EstoqueAlterado(1, 0))
+        # O consumidor segura o primeiro evento; a fila comporta mais dois.
+        barramento.aguardar_entrega(timeout=0.1)
+        resultados = []
+        for variacao in range(1, 6):
+            try:
+                resultados.append(barramento.publicar(EstoqueAlterado(1, variacao)))
+            except TimeoutError:
+                resultados.append("cheia")
+        liberar.set()
+        assert barramento.aguardar_entrega(timeout=5)
+        barramento.fechar()
+
+        if politica == "bloquear":
+            assert resultados == [2, 3, "cheia", "cheia", "cheia"]
+            assert recebidos == [0, 1, 2]
+        elif politica == "descartar":
+            assert resultados == [2, 3, None, None, None]
+            assert barramento.descartados == 3 and recebidos == [0, 1, 2]
+        else:
+            assert resultados == [2, 3, 4, 5, 6]
+            assert barramento.derramados == 3 and recebidos == [0, 1, 2, 3, 4, 5]
+
+        with pytest.raises(ValueError, match="Política"):
+            BarramentoEventos(str(tmp_path), politica="ignorar")
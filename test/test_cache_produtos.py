@@ -0,0 +1,109 @@
+import gc
+import pytest
+from app.ecommerce_sistema import Produto
+from app.cache_produtos import CacheProdutos, estimar_bytes_produto
+from app.armazenamento_sqlite import abrir_sistema_sqlite
+
+
+def _produto(id_produto, nome="Produto"):
+    return Produto(id_produto, nome, "Desc", 10.0, 5, "Cat")
+
+
+class TestCacheProdutos:
+    """
+    Testes para o cache limitado de produtos (LRU/LFU, cache negativo, contadores).
+    """
+
+    def test_lru_descarta_o_menos_recente(self):
+        cache = CacheProdutos(max_entradas=2)
+        cache.guardar(1, _produto(1))
+        cache.guardar(2, _produto(2))
+        cache.obter(1)
+        cache.guardar(3, _produto(3))
+        assert 2 not in cache and 1 in cache and 3 in cache
+        assert cache.descartes == 1
+
+    def test_lfu_preserva_o_mais_frequente(self):
+        cache = CacheProdutos(max_entradas=2, politica="lfu")
+        cache.guardar(1, _produto(1))
+        cache.guardar(2, _produto(2))
+        for _ in range(3):
+            cache.obter(1)
+        cache.obter(2)
+        cache.guardar(3, _produto(3))
+        assert 2 not in cache and 1 in cache and 3 in cache
+        # O recém-chegado tem frequência 1 e é o próximo a sair.
+        cache.guardar(4, _produto(4))
+        assert 3 not in cache and 1 in cache
+
+    def test_limite_por_bytes(self):
+        tamanho = estimar_bytes_produto(_produto(1))
+        cache = CacheProdutos(max_bytes=tamanho * 3)
+        for i in range(1, 11):
+            cache.guardar(i, _produto(i))
+        assert len(cache) == 3
+        assert cache.bytes_estimados <= tamanho * 3
+        assert cache.descartes == 7
+
+    def test_cache_negativo_e_invalidacao(self):
+        cache = CacheProdutos(max_entradas=10)
+        cache.guardar_ausente(99)
+        assert cache.obter(99) == (True, None)
+        assert cache.invalidar(99) is True
+        assert cache.obter(99) == (False, None)
+        assert cache.invalidar(99) is False
+        estatisticas = cache.estatisticas()
+        assert estatisticas["acertos_negativos"] == 1
+        assert estatisticas["falhas"] == 1
+        assert estatisticas["invalidacoes"] == 1
+
+    def test_configuracao_invalida(self):
+        with pytest.raises(ValueError, match="limite"):
+            CacheProdutos()
+        with pytest.raises(ValueError):
+            CacheProdutos(max_entradas=0)
+        with pytest.raises(ValueError, match="Política"):
+            CacheProdutos(max_entradas=1, politica="fifo")
+
+    def test_catalogo_sqlite_com_cache_limitado(self, tmp_path):
+        cache = CacheProdutos(max_entradas=3)
+        sistema = abrir_sistema_sqlite(str(tmp_path / "loja.db"), cache_produtos=cache)
+        sistema.armazenamento.importar_produtos(
+            sistema, ((f"Produto {i}", "Desc", 10.0, 5, "Cat") for i in range(10))
+        )
+        produto = sistema.recuperar_produto_por_id(1)
+        assert sistema.recuperar_produto_por_id(1) is produto
+        for id_produto in range(2, 11):
+            sistema.recuperar_produto_por_id(id_produto)
+        assert len(cache) == 3
+        assert cache.descartes == 7
+        # Descartado do cache, mas ainda referenciado: mesma instância.
+        assert sistema.recuperar_produto_por_id(1) is produto
+
+        assert sistema.recuperar_produto_por_id(11) is None
+        falhas = cache.falhas
+        assert sistema.recuperar_produto_por_id(11) is None
+        assert cache.falhas == falhas and cache.acertos_negativos == 1
+        # A importação invalida a entrada negativa do id criado.
+        sistema.armazenamento.importar_produtos(sistema, [("Novo", "Desc", 1.0, 1, "Cat")])
+        assert sistema.recuperar_produto_por_id(11).nome == "Novo"
+
+    def test_escrita_direta_no_banco_invalida_o_cache(self, tmp_path):
+        cache = CacheProdutos(max_entradas=10)
+        sistema = abrir_sistema_sqlite(str(tmp_path / "loja.db"), cache_produtos=cache)
+        sistema.adicionar_produto_catalogo("Livro", "Romance", 50.0, 10, "Livros")
+        assert sistema.recuperar_produto_por_id(1).preco == 50.0
+
+        sistema.armazenamento.atualizar_precos({1: 45.0})
+        sistema.armazenamento.ajustar_estoques({1: 5})
+        gc.collect()
+        produto = sistema.recuperar_produto_por_id(1)
+        assert (produto.preco, produto.quantidade_em_estoque) == (45.0, 15)
+
+        # Alterações feitas pelo sistema atualizam o objeto em cache e o banco.
+        assert sistema.atualizar_preco(1, 40.0)
+        produto.reduzir_estoque(3)
+        sistema.armazenamento.fechar()
+        reaberto = abrir_sistema_sqlite(str(tmp_path / "loja.db"))
+        copia = reaberto.recuperar_produto_por_id(1)
+        assert (copia.preco, copia.quantidade_em_estoque) == (40.0, 12)
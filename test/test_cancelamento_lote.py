@@ -0,0 +1,77 @@
+import pytest
+from app.ecommerce_sistema import SistemaEcommerce, Carrinho
+
+
+@pytest.fixture
+def sistema_com_pedidos():
+    sistema = SistemaEcommerce()
+    sistema.registrar_usuario("cliente_recall", {"nome": "Recall"})
+    fone = sistema.adicionar_produto_catalogo("Fone", "Bluetooth", 100.0, 50, "Áudio")
+    cabo = sistema.adicionar_produto_catalogo("Cabo", "USB-C", 20.0, 50, "Acessórios")
+    ids = []
+    for i in range(6):
+        carrinho = Carrinho()
+        carrinho.adicionar_item(fone, 2)
+        carrinho.adicionar_item(cabo, 1)
+        pedido = sistema.criar_pedido("cliente_recall", carrinho, {"rua": "Rua C"}, "pix")
+        if i < 4:
+            sistema.processar_pagamento_pedido(pedido.id_pedido, {"chave_pix": f"c{i}@pix.com"})
+        ids.append(pedido.id_pedido)
+    return sistema, fone, cabo, ids
+
+
+class TestCancelamentoLote:
+    """
+    Testes para o cancelamento e reembolso de pedidos em lote.
+    """
+
+    def test_cancela_reabastece_por_produto_e_reembolsa(self, sistema_com_pedidos):
+        sistema, fone, cabo, ids = sistema_com_pedidos
+        assert fone.quantidade_em_estoque == 42
+        assert cabo.quantidade_em_estoque == 46
+
+        relatorio = sistema.cancelar_pedidos_em_lote(ids, max_reembolsos_paralelos=3)
+
+        assert relatorio["pedidos_cancelados"] == ids
+        assert relatorio["estoque_reabastecido"] == {fone.id_produto: 8, cabo.id_produto: 4}
+        assert fone.quantidade_em_estoque == 50
+        assert cabo.quantidade_em_estoque == 50
+        assert len(relatorio["reembolsos"]) == 4  # apenas os pedidos pagos
+        assert relatorio["falhas_reembolso"] == {}
+        assert relatorio["total_reembolsado"] == pytest.approx(4 * 220.0 * 0.9)
+        assert all(sistema.pedidos_registrados[i].status_pedido == "cancelado" for i in ids)
+
+    def test_uma_atualizacao_de_estoque_por_produto(self, sistema_com_pedidos, monkeypatch):
+        sistema, fone, _, ids = sistema_com_pedidos
+        chamadas = []
+        original = type(fone).comparar_e_definir_estoque
+
+        def contar(produto, versao, quantidade):
+            chamadas.append(produto.id_produto)
+            return original(produto, versao, quantidade)
+
+        monkeypatch.setattr(type(fone), "comparar_e_definir_estoque", contar)
+        sistema.cancelar_pedidos_em_lote(ids)
+        assert sorted(chamadas) == sorted(set(chamadas)) and len(chamadas) == 2
+
+    def test_ids_invalidos_repetidos_e_ja_cancelados(self, sistema_com_pedidos):
+        sistema, fone, _, ids = sistema_com_pedidos
+        sistema.cancelar_pedido(ids[0])
+        estoque_antes = fone.quantidade_em_estoque
+
+        relatorio = sistema.cancelar_pedidos_em_lote([ids[0], ids[1], ids[1], 9999])
+
+        assert relatorio["pedidos_cancelados"] == [ids[1]]
+        assert set(relatorio["pedidos_nao_cancelados"]) == {ids[0], 9999}
+        assert fone.quantidade_em_estoque == estoque_antes + 2
+
+    def test_sem_reembolso(self, sistema_com_pedidos):
+        sistema, _, _, ids = sistema_com_pedidos
+        relatorio = sistema.cancelar_pedidos_em_lote(ids, reembolsar=False)
+        assert relatorio["reembolsos"] == {}
+        assert relatorio["total_reembolsado"] == 0
+
+    def test_paralelismo_invalido(self, sistema_com_pedidos):
+        sistema, _, _, ids = sistema_com_pedidos
+        with pytest.raises(ValueError):
+            sistema.cancelar_pedidos_em_lote(ids, max_reembolsos_paralelos=0)
@@ -0,0 +1,167 @@
+import threading
+
+import pytest
+from app.concorrencia import BasePreguicosa, ContadorAtomico, EntregaOrdenada, LocksListrados
+from app.ecommerce_sistema import SistemaEcommerce, Carrinho
+
+NUM_THREADS = 8
+
+
+def executar_em_threads(alvo, num_threads=NUM_THREADS):
+    barreira = threading.Barrier(num_threads)
+
+    def executar(indice):
+        barreira.wait()
+        alvo(indice)
+
+    threads = [threading.Thread(target=executar, args=(i,)) for i in range(num_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+@pytest.fixture
+def sistema():
+    sistema = SistemaEcommerce()
+    sistema.registrar_usuario("cliente_concorrente", {"nome": "Concorrente"})
+    return sistema
+
+
+def criar_pedido(sistema, produto, quantidade=1):
+    carrinho = Carrinho()
+    carrinho.adicionar_item(produto, quantidade)
+    return sistema.criar_pedido("cliente_concorrente", carrinho, {"rua": "Rua D"}, "pix")
+
+
+class TestConcorrencia:
+    """
+    Testes de segurança do SistemaEcommerce sob acesso concorrente.
+    """
+
+    def test_locks_listrados_adquirem_em_ordem_e_sem_duplicar(self):
+        locks = LocksListrados(4)
+        assert locks.indices([9, 1, 6, 5]) == [1, 2]
+        with locks.adquirir([9, 1, 6, 5]):
+            assert locks.lock_de(1).locked() and locks.lock_de(6).locked()
+        assert not locks.lock_de(1).locked()
+
+    def test_contador_atomico_aloca_faixas(self):
+        contador = ContadorAtomico(10)
+        assert contador.alocar(5) == 10
+        assert contador.alocar() == 15
+        assert contador.proximo == 16
+
+    def test_entrega_ordenada_segue_os_numeros_reservados(self):
+        entregues = []
+        entrega = EntregaOrdenada(entregues.append)
+        primeiro, segundo, terceiro = (entrega.reservar() for _ in range(3))
+        entrega.concluir([(terceiro, "c")])
+        entrega.concluir([(segundo, None)])
+        assert entregues == []
+        # Quem completa a sequência entrega também os itens dos outros.
+        entrega.concluir([(primeiro, "a")])
+        assert entregues == ["a", "c"]
+
+    def test_base_preguicosa_carrega_uma_unica_vez(self):
+        cargas = []
+        estrutura = BasePreguicosa()
+        estrutura.definir_base(cargas.append)
+        # Sem `antes_de_alterar`, só a consulta carrega a base.
+        estrutura._garantir_base_para_alterar()
+        assert cargas == []
+        executar_em_threads(lambda _: estrutura._garantir_base())
+        assert cargas == [estrutura]
+
+        estrutura.definir_base(cargas.append, antes_de_alterar=True)
+        estrutura._garantir_base_para_alterar()
+        estrutura._garantir_base()
+        assert cargas == [estrutura, estrutura]
+
+    def test_ids_unicos_sob_concorrencia(self, sistema):
+        produto = sistema.adicionar_produto_catalogo("Base", "Base", 1.0, 10_000, "Teste")
+        ids = []
+
+        def alvo(_):
+            for _ in range(50):
+                ids.append(criar_pedido(sistema, produto).id_pedido)
+                ids_produto.append(
+                    sistema.adicionar_produto_catalogo("P", "P", 1.0, 1, "Teste").id_produto
+                )
+
+        ids_produto = []
+        executar_em_threads(alvo)
+        assert len(set(ids)) == len(ids) == NUM_THREADS * 50
+        assert len(set(ids_produto)) == len(ids_produto)
+        assert sistema._proximo_id_pedido == len(ids) + 1
+
+    def test_estoque_nunca_negativo_com_pagamentos_concorrentes(self, sistema):
+        produto = sistema.adicionar_produto_catalogo("Raro", "Poucas unidades", 10.0, 40, "Teste")
+        pedidos = [criar_pedido(sistema, produto) for _ in range(40)]
+        produto.reduzir_estoque(15)  # estoque encolhe após os pedidos serem criados
+        resultados = []
+
+        def alvo(indice):
+            for pedido in pedidos[indice::NUM_THREADS]:
+                resultados.append(
+                    sistema.processar_pagamento_pedido(pedido.id_pedido, {"chave_pix": "x@pix"})
+                )
+
+        executar_em_threads(alvo)
+        aprovados = [r for r in resultados if r["status"] == "aprovado"]
+        assert len(aprovados) == 25
+        assert produto.quantidade_em_estoque == 0
+
+    def test_mesmo_pedido_pago_uma_unica_vez(self, sistema):
+        produto = sistema.adicionar_produto_catalogo("Item", "Item", 10.0, 10, "Teste")
+        pedido = criar_pedido(sistema, produto)
+        resultados = []
+
+        executar_em_threads(
+            lambda _: resultados.append(
+                sistema.processar_pagamento_pedido(pedido.id_pedido, {"chave_pix": "x@pix"})
+            )
+        )
+        assert [r["status"] for r in resultados].count("aprovado") == 1
+        assert produto.quantidade_em_estoque == 9
+
+    def test_chamada_ao_gateway_nao_prende_o_lock_do_pedido(self, sistema):
+        produto = sistema.adicionar_produto_catalogo("Item", "Item", 10.0, 10, "Teste")
+        pedido = criar_pedido(sistema, produto)
+        original = sistema.sistema_pagamento.processar_pagamento
+        durante_a_chamada = {}
+
+        def gateway_lento(*argumentos):
+            # Outra thread cancela o pedido e tenta pagá-lo de novo enquanto
+            # o gateway responde; com o lock preso, ela ficaria bloqueada.
+            def concorrente():
+                durante_a_chamada["pagamento"] = sistema.processar_pagamento_pedido(
+                    pedido.id_pedido, {"chave_pix": "x@pix"}
+                )
+                durante_a_chamada["cancelado"] = sistema.cancelar_pedido(pedido.id_pedido)
+
+            thread = threading.Thread(target=concorrente)
+            thread.start()
+            thread.join(timeout=5)
+            assert not thread.is_alive()
+            return original(*argumentos)
+
+        sistema.sistema_pagamento.processar_pagamento = gateway_lento
+        resultado = sistema.processar_pagamento_pedido(pedido.id_pedido, {"chave_pix": "x@pix"})
+        assert "já está em andamento" in durante_a_chamada["pagamento"]["mensagem"]
+        assert durante_a_chamada["cancelado"]
+        # O pedido foi cancelado durante a chamada: nada é registrado e a
+        # cobrança aprovada é estornada.
+        assert resultado["status"] == "erro" and "estornada" in resultado["mensagem"]
+        assert pedido.status_pedido == "cancelado" and pedido.id_transacao_pagamento is None
+        assert produto.quantidade_em_estoque == 10
+        conciliacao = sistema.sistema_pagamento.livro_razao.conciliar_pedido(pedido.id_pedido)
+        assert conciliacao["capturado"] > 0 and conciliacao["liquido"] == 0
+
+    def test_cancelamentos_concorrentes_reabastecem_uma_vez(self, sistema):
+        produto = sistema.adicionar_produto_catalogo("Item", "Item", 10.0, 10, "Teste")
+        pedido = criar_pedido(sistema, produto, 3)
+        sistema.processar_pagamento_pedido(pedido.id_pedido, {"chave_pix": "x@pix"})
+
+        executar_em_threads(lambda _: sistema.cancelar_pedido(pedido.id_pedido))
+        assert produto.quantidade_em_estoque == 10
@@ -0,0 +1,104 @@
+import pytest
+from app.contadores_velocidade import (
+    ArmazemContadoresVelocidade,
+    ContadorJanelaDeslizante,
+    LimiteVelocidade,
+)
+from app.ecommerce_sistema import SistemaEcommerce, SistemaPagamento, Carrinho
+
+
+class RelogioFalso:
+    def __init__(self, instante: float = 1000.0):
+        self.instante = instante
+
+    def __call__(self) -> float:
+        return self.instante
+
+    def avancar(self, segundos: float) -> None:
+        self.instante += segundos
+
+
+@pytest.fixture
+def relogio():
+    return RelogioFalso()
+
+
+class TestContadoresVelocidade:
+    """
+    Testes para os contadores de janela deslizante e sua integração com
+    pagamentos e criação de pedidos.
+    """
+
+    def test_contador_expira_eventos_fora_da_janela(self):
+        contador = ContadorJanelaDeslizante(janela_segundos=10, num_baldes=10)
+        assert contador.registrar(100.0) == 1
+        assert contador.registrar(105.0) == 2
+        assert contador.contar(109.5) == 2
+        assert contador.contar(110.5) == 1  # evento do instante 100 saiu da janela
+        assert contador.contar(130.0) == 0
+
+    def test_contador_parametros_invalidos(self):
+        with pytest.raises(ValueError):
+            ContadorJanelaDeslizante(janela_segundos=0)
+        with pytest.raises(ValueError):
+            ContadorJanelaDeslizante(janela_segundos=10, num_baldes=0)
+
+    def test_armazem_descarta_chaves_lru(self, relogio):
+        armazem = ArmazemContadoresVelocidade(10, max_chaves=2, relogio=relogio)
+        armazem.registrar("a")
+        armazem.registrar("b")
+        armazem.registrar("a")  # "b" passa a ser a menos usada
+        armazem.registrar("c")
+        assert len(armazem) == 2
+        assert armazem.contar("b") == 0
+        assert armazem.contar("a") == 2
+        assert armazem.chaves_descartadas == 1
+
+    def test_armazem_descarta_chaves_ociosas(self, relogio):
+        armazem = ArmazemContadoresVelocidade(10, relogio=relogio)
+        armazem.registrar("ociosa")
+        relogio.avancar(11)
+        armazem.registrar("ativa")
+        assert len(armazem) == 1
+        assert armazem.contar("ociosa") == 0
+
+    def test_pagamento_rejeitado_apos_exceder_limite_do_cartao(self, relogio):
+        limite = LimiteVelocidade.criar(maximo=2, janela_segundos=60, relogio=relogio)
+        pagamento = SistemaPagamento(limite_velocidade=limite)
+        detalhes = {"numero_cartao": "4111-1111", "numero_parcelas": 1}
+
+        assert pagamento.processar_pagamento(50.0, "cartao_credito", detalhes)["status"] == "aprovado"
+        assert pagamento.processar_pagamento(50.0, "cartao_credito", detalhes)["status"] == "aprovado"
+        resultado = pagamento.processar_pagamento(50.0, "cartao_credito", detalhes)
+        assert resultado["status"] == "rejeitado"
+        assert "excesso de tentativas" in resultado["mensagem"]
+
+        relogio.avancar(61)
+        assert pagamento.processar_pagamento(50.0, "cartao_credito", detalhes)["status"] == "aprovado"
+
+    def test_limite_preservado_ao_reconfigurar_pagamento(self, relogio):
+        sistema = SistemaEcommerce()
+        limite = LimiteVelocidade.criar(maximo=1, janela_segundos=60, relogio=relogio)
+        sistema.sistema_pagamento.limite_velocidade = limite
+        sistema.configurar_sistema_pagamento(desconto_pix=0.2)
+        assert sistema.sistema_pagamento.limite_velocidade is limite
+
+    def test_criar_pedido_limitado_por_cliente(self, relogio):
+        sistema = SistemaEcommerce()
+        sistema.registrar_usuario("cliente_rapido", {"nome": "Rápido"})
+        produto = sistema.adicionar_produto_catalogo("Caneta", "Azul", 2.0, 100, "Papelaria")
+        sistema.configurar_limite_pedidos(
+            LimiteVelocidade.criar(maximo=2, janela_segundos=30, relogio=relogio)
+        )
+        endereco = {"rua": "Rua A", "cep": "00000-000"}
+
+        def novo_pedido():
+            carrinho = Carrinho()
+            carrinho.adicionar_item(produto, 1)
+            return sistema.criar_pedido("cliente_rapido", carrinho, endereco, "pix")
+
+        assert novo_pedido() is not None
+        assert novo_pedido() is not None
+        assert novo_pedido() is None
+        relogio.avancar(31)
+        assert novo_pedido() is not None
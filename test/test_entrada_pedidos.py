@@ -0,0 +1,121 @@
+import threading
+
+import pytest
+from app.ecommerce_sistema import SistemaEcommerce, Carrinho
+from app.entrada_pedidos import FilaEntradaPedidos
+
+
+def _sistema(estoque=5):
+    sistema = SistemaEcommerce()
+    sistema.registrar_usuario("ana", {"nome": "Ana"})
+    livro = sistema.adicionar_produto_catalogo("Livro", "Romance", 100.0, estoque, "Livros")
+    return sistema, livro
+
+
+def _carrinho(produto, quantidade):
+    carrinho = Carrinho()
+    carrinho.adicionar_item(produto, quantidade)
+    return carrinho
+
+
+class TestEntradaPedidos:
+    """
+    Testes para a fila de entrada de pedidos com microlotes.
+    """
+
+    def test_criar_pedidos_em_lote_valida_estoque_do_lote(self):
+        sistema, livro = _sistema(estoque=5)
+        resultado = sistema.criar_pedidos_em_lote(
+            [
+                ("ana", _carrinho(livro, 2), {"rua": "A"}, "pix"),
+                ("bia", _carrinho(livro, 1), {"rua": "B"}, "pix"),
+                ("ana", _carrinho(livro, 3), {"rua": "A"}, "pix"),
+                ("ana", _carrinho(livro, 1), {"rua": "A"}, "pix"),
+                ("ana", Carrinho(), {"rua": "A"}, "pix"),
+            ]
+        )
+        assert resultado["recusados"] == {
+            1: "Cliente não encontrado.",
+            3: "Estoque insuficiente para o produto 'Livro'.",
+            4: "Carrinho vazio.",
+        }
+        criados = resultado["criados"]
+        assert [criados[i].id_pedido for i in (0, 2)] == [1, 2]
+        assert sistema.pedidos_do_cliente("ana") == [criados[0], criados[2]]
+        # O estoque só é reduzido no pagamento.
+        assert livro.quantidade_em_estoque == 5
+
+    def test_microlotes_respondem_por_futures(self):
+        sistema, livro = _sistema(estoque=50)
+        fila = FilaEntradaPedidos(sistema, tamanho_lote=4, janela=0.05)
+        futuros = [
+            fila.enviar_pedido("ana", _carrinho(livro, 1), {"rua": "A"}, "pix") for _ in range(6)
+        ]
+        futuros.append(fila.enviar_pedido("ninguem", _carrinho(livro, 1), {"rua": "A"}, "pix"))
+        pedidos = [futuro.result(timeout=5) for futuro in futuros]
+        assert [p.id_pedido for p in pedidos[:6]] == [1, 2, 3, 4, 5, 6]
+        assert pedidos[6] is None
+        pagamento = fila.enviar_pagamento(1, {"chave_pix": "ana@pix.com"}).result(timeout=5)
+        assert pagamento["status"] == "aprovado"
+        fila.fechar()
+
+        metricas = fila.metricas()
+        assert metricas["recebidos"] == metricas["concluidos"] == 8
+        assert metricas["lotes"] == 3 and metricas["profundidade"] == 0
+        assert 0 < metricas["latencia_p50"] <= metricas["latencia_p99"] <= metricas["latencia_maxima"]
+        with pytest.raises(ValueError, match="fechada"):
+            fila.enviar_pagamento(1, {})
+
+    def test_pagamento_lento_nao_segura_os_lotes_seguintes(self):
+        sistema, livro = _sistema(estoque=50)
+        liberar = threading.Event()
+        pagar_original = sistema.processar_pagamento_pedido
+
+        def gateway_lento(id_pedido, detalhes):
+            liberar.wait(5)
+            return pagar_original(id_pedido, detalhes)
+
+        fila = FilaEntradaPedidos(sistema, tamanho_lote=1, janela=0, max_pagamentos_paralelos=2)
+        assert fila.enviar_pedido("ana", _carrinho(livro, 1), {"rua": "A"}, "pix").result(timeout=5)
+        sistema.processar_pagamento_pedido = gateway_lento
+        pagamento = fila.enviar_pagamento(1, {"chave_pix": "ana@pix.com"})
+        # O pedido do lote seguinte é criado enquanto o pagamento espera o gateway.
+        assert fila.enviar_pedido("ana", _carrinho(livro, 1), {"rua": "A"}, "pix").result(timeout=5)
+        assert not pagamento.done()
+        liberar.set()
+        fila.fechar()
+        assert pagamento.done() and pagamento.result()["status"] == "aprovado"
+        assert fila.metricas()["concluidos"] == 3
+        with pytest.raises(ValueError, match="pagamentos paralelos"):
+            FilaEntradaPedidos(sistema, max_pagamentos_paralelos=0)
+
+    @pytest.mark.parametrize("politica", ["rejeitar", "enfileirar"])
+    def test_sobrecarga(self, politica):
+        sistema, livro = _sistema(estoque=50)
+        liberar = threading.Event()
+        criar_original = sistema.criar_pedidos_em_lote
+
+        def lento(solicitacoes):
+            liberar.wait(5)
+            return criar_original(solicitacoes)
+
+        sistema.criar_pedidos_em_lote = lento
+        fila = FilaEntradaPedidos(
+            sistema, capacidade=2, tamanho_lote=1, janela=0, politica=politica, espera_maxima=0.05
+        )
+        primeiro = fila.enviar_pedido("ana", _carrinho(livro, 1), {"rua": "A"}, "pix")
+        # O primeiro pedido ocupa a thread; a fila comporta mais dois.
+        while fila.profundidade:
+            pass
+        enviados = [fila.enviar_pedido("ana", _carrinho(livro, 1), {"rua": "A"}, "pix") for _ in range(3)]
+        recusado = fila.enviar_pagamento(1, {"chave_pix": "ana@pix.com"})
+        assert enviados[2].done() and enviados[2].result() is None
+        assert recusado.result()["status"] == "erro"
+        liberar.set()
+        assert [f.result(timeout=5).id_pedido for f in [primeiro] + enviados[:2]] == [1, 2, 3]
+        fila.fechar()
+        assert fila.metricas()["rejeitados"] == 2
+        assert fila.metricas()["maior_profundidade"] == 2
+
+        with pytest.raises(ValueError, match="Política"):
+            FilaEntradaPedidos(sistema, politica="descartar")
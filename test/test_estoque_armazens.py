@@ -0,0 +1,145 @@
+import pytest
+from app.ecommerce_sistema import SistemaEcommerce, Carrinho
+from app.estoque_armazens import EstoqueArmazens, MotorAlocacao, TabelaZonas, normalizar_cep
+
+
+def _tabela():
+    tabela = TabelaZonas()
+    # Grande SP: SP é barato e rápido; RJ mais caro, MG mais caro e lento.
+    tabela.adicionar_faixa("01000-000", "09999-999", {"SP": (10.0, 1), "RJ": (20.0, 2), "MG": (25.0, 4)})
+    # Rio: RJ é rápido; MG é mais barato, porém lento.
+    tabela.adicionar_faixa("20000-000", "28999-999", {"RJ": (18.0, 1), "MG": (12.0, 5), "SP": (22.0, 3)})
+    return tabela
+
+
+def _estoque():
+    estoque = EstoqueArmazens()
+    estoque.definir(1, "SP", 1)
+    estoque.definir(1, "RJ", 5)
+    estoque.definir(1, "MG", 5)
+    estoque.definir(2, "SP", 4)
+    estoque.definir(2, "MG", 2)
+    return estoque
+
+
+class TestEstoqueArmazens:
+    """
+    Testes para o estoque por armazém e a alocação por CEP.
+    """
+
+    def test_tabela_de_zonas(self):
+        tabela = _tabela()
+        assert [o[0] for o in tabela.zona("01310-100").por_custo] == ["SP", "RJ", "MG"]
+        assert [o[0] for o in tabela.zona(20040020).por_custo] == ["MG", "RJ", "SP"]
+        assert [o[0] for o in tabela.zona("20040-020").por_prazo] == ["RJ", "SP", "MG"]
+        assert tabela.zona("10000-000") is None
+        assert tabela.zona("99999-999") is None
+        assert normalizar_cep("01310-100") == 1310100
+        with pytest.raises(ValueError, match="CEP inválido"):
+            tabela.zona("0131")
+        tabela.adicionar_faixa("05000-000", "10999-999", {"SP": (1.0, 1)})
+        with pytest.raises(ValueError, match="sobrepostas"):
+            tabela.zona("01310-100")
+
+    def test_escolha_divisao_reserva_e_devolucao(self):
+        estoque = _estoque()
+        motor = MotorAlocacao(_tabela(), estoque)
+        # Um armazém com tudo vence a divisão, mesmo não sendo o mais barato.
+        alocacao = motor.planejar([(1, 2)], "01310-100")
+        assert [(r.id_armazem, r.itens) for r in alocacao.remessas] == [("RJ", ((1, 2),))]
+        assert (alocacao.frete, alocacao.prazo_dias, alocacao.dividida) == (20.0, 2, False)
+        assert motor.planejar([(1, 2)], "20040-020").remessas[0].id_armazem == "MG"
+        assert motor.planejar([(1, 2)], "20040-020", criterio="prazo").remessas[0].id_armazem == "RJ"
+
+        # Nenhum armazém tem 6 unidades do produto 2 com 1 do produto 1.
+        pedido = [(1, 1), (2, 6)]
+        with pytest.raises(ValueError, match="pedido inteiro"):
+            motor.planejar(pedido, "01310-100", permitir_divisao=False)
+        alocacao = motor.reservar(pedido, "01310-100")
+        assert [(r.id_armazem, r.itens) for r in alocacao.remessas] == [
+            ("SP", ((1, 1), (2, 4))),
+            ("MG", ((2, 2),)),
+        ]
+        assert (alocacao.frete, alocacao.prazo_dias, alocacao.dividida) == (35.0, 4, True)
+        assert estoque.por_armazem(2) == {"SP": 0, "MG": 0}
+        with pytest.raises(ValueError, match="produto ID 2"):
+            motor.planejar([(2, 1)], "01310-100")
+        with pytest.raises(ValueError, match="fora da área"):
+            motor.planejar([(1, 1)], "99999-999")
+        motor.devolver(alocacao)
+        assert (estoque.total(1), estoque.total(2)) == (11, 6)
+
+    def test_frete_e_estoque_no_sistema(self):
+        sistema = SistemaEcommerce()
+        sistema.registrar_usuario("ana", {"nome": "Ana"})
+        caneta = sistema.adicionar_produto_catalogo("Caneta", "Azul", 5.0, 11, "Papelaria")
+        estoque = _estoque()
+        sistema.configurar_alocacao(MotorAlocacao(_tabela(), estoque))
+
+        carrinho = Carrinho()
+        carrinho.adicionar_item(caneta, 2)
+        pedido = sistema.criar_pedido("ana", carrinho, {"rua": "A", "cep": "20040-020"}, "pix")
+        assert pedido.calcular_frete() == 12.0
+        # O estoque dos armazéns só sai no pagamento.
+        assert estoque.por_armazem(caneta.id_produto)["MG"] == 5
+        estoque.definir(caneta.id_produto, "MG", 1)
+        sistema.processar_pagamento_pedido(pedido.id_pedido, {"chave_pix": "ana@pix.com"})
+        # O plano ficou sem estoque e a alocação foi refeita, mantendo o
+        # frete cotado ao cliente; a remessa guarda o custo real.
+        assert pedido.alocacao.remessas[0].id_armazem == "RJ"
+        assert pedido.calcular_frete() == 12.0
+        assert pedido.alocacao.remessas[0].frete == 18.0
+        assert estoque.por_armazem(caneta.id_produto) == {"SP": 1, "RJ": 3, "MG": 1}
+        assert sistema.cancelar_pedido(pedido.id_pedido)
+        assert estoque.por_armazem(caneta.id_produto)["RJ"] == 5
+
+        sem_cep = sistema.criar_pedido("ana", carrinho, {"rua": "A"}, "pix")
+        assert sem_cep.alocacao is None and sem_cep.calcular_frete() == 25.0
+
+    def test_falha_na_reserva_devolve_estoque_do_produto(self):
+        sistema = SistemaEcommerce()
+        sistema.registrar_usuario("ana", {"nome": "Ana"})
+        caneta = sistema.adicionar_produto_catalogo("Caneta", "Azul", 5.0, 5, "Papelaria")
+        estoque = EstoqueArmazens()
+        estoque.definir(caneta.id_produto, "SP", 1)
+        sistema.configurar_alocacao(MotorAlocacao(_tabela(), estoque))
+
+        carrinho = Carrinho()
+        carrinho.adicionar_item(caneta, 3)
+        pedido = sistema.criar_pedido("ana", carrinho, {"rua": "A", "cep": "01310-100"}, "pix")
+        resultado = sistema.processar_pagamento_pedido(pedido.id_pedido, {"chave_pix": "ana@pix.com"})
+        assert resultado["status"] == "aprovado_com_erro_estoque"
+        assert caneta.ler_estoque()[0] == 5
+        assert estoque.por_armazem(caneta.id_produto) == {"SP": 1}
+        assert pedido.alocacao is None
+
+    def test_plano_desatualizado_e_refeito_na_reserva(self):
+        estoque = _estoque()
+        motor = MotorAlocacao(_tabela(), estoque)
+        plano = motor.planejar([(2, 3)], "01310-100")
+        assert [r.id_armazem for r in plano.remessas] == ["SP"]
+        estoque.definir(2, "SP", 1)
+        # Retirada parcial não acontece: o plano inteiro falha e nada muda.
+        assert not estoque.retirar(plano.remessas)
+        assert estoque.por_armazem(2) == {"SP": 1, "MG": 2}
+        alocacao = motor.reservar([(2, 3)], "01310-100", plano=plano)
+        assert [(r.id_armazem, r.itens) for r in alocacao.remessas] == [("SP", ((2, 1),)), ("MG", ((2, 2),))]
+        assert estoque.total(2) == 0
+        motor.devolver(alocacao)
+        assert estoque.por_armazem(2) == {"SP": 1, "MG": 2}
+
+    def test_motor_usa_o_estoque_do_sistema(self):
+        sistema = SistemaEcommerce()
+        eventos = []
+        sistema.adicionar_ouvinte(lambda tipo, dados: eventos.append((tipo, dados)))
+        estoque = _estoque()
+        sistema.configurar_alocacao(MotorAlocacao(_tabela(), estoque))
+        # O estoque do motor é adotado e suas quantidades viram eventos.
+        assert sistema.estoque_armazens is estoque
+        assert len(eventos) == 5 and eventos[0] == (
+            "estoque_armazem_alterado", {"id_produto": 1, "id_armazem": "SP", "variacao": 1}
+        )
+        estoque.definir(1, "SP", 3)
+        assert eventos[-1][1]["variacao"] == 2
+        with pytest.raises(ValueError, match="estoque por armazém do sistema"):
+            sistema.configurar_alocacao(MotorAlocacao(_tabela(), _estoque()))
@@ -0,0 +1,134 @@
+import pickle
+import threading
+
+import pytest
+from app.ecommerce_sistema import SistemaEcommerce, Produto, Carrinho
+
+
+@pytest.fixture
+def sistema():
+    sistema = SistemaEcommerce()
+    sistema.registrar_usuario("cliente_cas", {"nome": "CAS"})
+    return sistema
+
+
+def criar_pedido_pago(sistema, itens):
+    carrinho = Carrinho()
+    for produto, quantidade in itens:
+        carrinho.adicionar_item(produto, quantidade)
+    pedido = sistema.criar_pedido("cliente_cas", carrinho, {"rua": "Rua E"}, "pix")
+    resultado = sistema.processar_pagamento_pedido(pedido.id_pedido, {"chave_pix": "c@pix"})
+    return pedido, resultado
+
+
+class TestEstoqueOtimista:
+    """
+    Testes para as atualizações otimistas (compare-and-set) de estoque.
+    """
+
+    def test_compare_and_set_respeita_versao(self):
+        produto = Produto(1, "Item", "Desc", 10.0, 5, "Cat")
+        quantidade, versao = produto.ler_estoque()
+        assert (quantidade, versao) == (5, 0)
+        assert produto.comparar_e_definir_estoque(versao, 4)
+        assert not produto.comparar_e_definir_estoque(versao, 3)  # versão desatualizada
+        assert produto.ler_estoque() == (4, 1)
+
+    def test_operacoes_diretas_incrementam_versao(self):
+        produto = Produto(1, "Item", "Desc", 10.0, 5, "Cat")
+        produto.reduzir_estoque(2)
+        produto.adicionar_estoque(1)
+        assert produto.ler_estoque() == (4, 2)
+
+    def test_produto_continua_serializavel(self):
+        produto = Produto(1, "Item", "Desc", 10.0, 5, "Cat")
+        copia = pickle.loads(pickle.dumps(produto))
+        assert copia.ler_estoque() == (5, 0)
+        assert copia.comparar_e_definir_estoque(0, 1)
+
+    def test_pedido_com_varias_linhas_tudo_ou_nada(self, sistema):
+        abundante = sistema.adicionar_produto_catalogo("Abundante", "d", 10.0, 10, "Cat")
+        escasso = sistema.adicionar_produto_catalogo("Escasso", "d", 10.0, 2, "Cat")
+        carrinho = Carrinho()
+        carrinho.adicionar_item(abundante, 3)
+        carrinho.adicionar_item(escasso, 2)
+        pedido = sistema.criar_pedido("cliente_cas", carrinho, {"rua": "Rua E"}, "pix")
+        escasso.reduzir_estoque(1)
+
+        resultado = sistema.processar_pagamento_pedido(pedido.id_pedido, {"chave_pix": "c@pix"})
+
+        assert resultado["status"] == "aprovado_com_erro_estoque"
+        assert abundante.quantidade_em_estoque == 10  # nenhuma linha foi aplicada
+        assert escasso.quantidade_em_estoque == 1
+
+    def test_conflito_e_repetido_e_desfaz_linhas_aplicadas(self, sistema, monkeypatch):
+        primeiro = sistema.adicionar_produto_catalogo("Primeiro", "d", 10.0, 10, "Cat")
+        segundo = sistema.adicionar_produto_catalogo("Segundo", "d", 10.0, 10, "Cat")
+        original = Produto.comparar_e_definir_estoque
+        interferencias = []
+
+        def cas_com_interferencia(produto, versao, quantidade):
+            if produto is segundo and not interferencias:
+                interferencias.append(1)
+                segundo.reduzir_estoque(1)  # outra compra chega entre a leitura e o CAS
+            return original(produto, versao, quantidade)
+
+        monkeypatch.setattr(Produto, "comparar_e_definir_estoque", cas_com_interferencia)
+        _, resultado = criar_pedido_pago(sistema, [(primeiro, 2), (segundo, 2)])
+
+        assert resultado["status"] == "aprovado"
+        assert primeiro.quantidade_em_estoque == 8
+        assert segundo.quantidade_em_estoque == 7
+        assert sistema.conflitos_estoque == 1
+
+    def test_tentativas_esgotadas(self, sistema, monkeypatch):
+        produto = sistema.adicionar_produto_catalogo("Disputado", "d", 10.0, 10, "Cat")
+        monkeypatch.setattr(Produto, "comparar_e_definir_estoque", lambda *a: False)
+        _, resultado = criar_pedido_pago(sistema, [(produto, 1)])
+        assert resultado["status"] == "aprovado_com_erro_estoque"
+        assert "Conflito de concorrência" in resultado["mensagem"]
+        assert sistema.conflitos_estoque == SistemaEcommerce.MAX_TENTATIVAS_CAS
+
+    def test_conflitos_contados_sem_perda_entre_threads(self, sistema, monkeypatch):
+        produto = sistema.adicionar_produto_catalogo("Disputado", "d", 10.0, 0, "Cat")
+        monkeypatch.setattr(Produto, "comparar_e_definir_estoque", lambda *a: False)
+        barreira = threading.Barrier(8)
+
+        def devolver():
+            barreira.wait()
+            for _ in range(50):
+                sistema._reabastecer([(produto.id_produto, 1)])
+
+        threads = [threading.Thread(target=devolver) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert sistema.conflitos_estoque == 8 * 50 * SistemaEcommerce.MAX_TENTATIVAS_CAS
+        assert produto.quantidade_em_estoque == 8 * 50
+
+    def test_produto_quente_sem_venda_acima_do_estoque(self, sistema):
+        quente = sistema.adicionar_produto_catalogo("Quente", "Flash sale", 10.0, 100, "Cat")
+        pedidos = []
+        for _ in range(32 * 5):
+            carrinho = Carrinho()
+            carrinho.adicionar_item(quente, 1)
+            pedidos.append(sistema.criar_pedido("cliente_cas", carrinho, {"rua": "R"}, "pix"))
+        resultados = []
+        barreira = threading.Barrier(32)
+
+        def comprar(indice):
+            barreira.wait()
+            for pedido in pedidos[indice::32]:
+                resultados.append(
+                    sistema.processar_pagamento_pedido(pedido.id_pedido, {"chave_pix": "c@pix"})
+                )
+
+        threads = [threading.Thread(target=comprar, args=(i,)) for i in range(32)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert [r["status"] for r in resultados].count("aprovado") == 100
+        assert quente.quantidade_em_estoque == 0
@@ -0,0 +1,85 @@
+import csv
+import gzip
+import json
+import pytest
+from datetime import datetime, timedelta
+from app.ecommerce_sistema import SistemaEcommerce, Carrinho
+from app.exportacao_vendas import COLUNAS_CSV, exportar_pedidos, iterar_pedidos
+from app.snapshot_binario import carregar_snapshot_binario, salvar_snapshot_binario
+
+
+def _comprar(sistema, itens, pagar=True):
+    carrinho = Carrinho()
+    for produto, quantidade in itens:
+        carrinho.adicionar_item(produto, quantidade)
+    pedido = sistema.criar_pedido("ana", carrinho, {"rua": "A"}, "pix")
+    if pagar:
+        sistema.processar_pagamento_pedido(pedido.id_pedido, {"chave_pix": "ana@pix.com"})
+    return pedido
+
+
+@pytest.fixture
+def sistema():
+    sistema = SistemaEcommerce()
+    sistema.registrar_usuario("ana", {"nome": "Ana"})
+    livro = sistema.adicionar_produto_catalogo("Livro", "Romance", 100.0, 100, "Livros")
+    caneta = sistema.adicionar_produto_catalogo("Caneta, azul", "Azul", 2.5, 100, "Papelaria")
+    _comprar(sistema, [(livro, 2), (caneta, 4)])
+    _comprar(sistema, [(caneta, 1)], pagar=False)
+    _comprar(sistema, [(livro, 1)])
+    sistema.cancelar_pedido(3)
+    return sistema
+
+
+class TestExportacaoVendas:
+    """
+    Testes para a exportação de pedidos em CSV e JSON Lines.
+    """
+
+    def test_csv_uma_linha_por_item(self, sistema, tmp_path):
+        caminho = str(tmp_path / "vendas.csv")
+        assert exportar_pedidos(sistema, caminho) == 3
+        with open(caminho, newline="", encoding="utf-8") as arquivo:
+            linhas = list(csv.DictReader(arquivo))
+        assert tuple(linhas[0]) == COLUNAS_CSV
+        assert [(l["id_pedido"], l["nome_produto"], l["quantidade"]) for l in linhas] == [
+            ("1", "Livro", "2"),
+            ("1", "Caneta, azul", "4"),
+            ("2", "Caneta, azul", "1"),
+            ("3", "Livro", "1"),
+        ]
+        assert linhas[2]["valor_pago"] == "" and linhas[2]["data_pagamento"] == ""
+        assert linhas[0]["valor_pago"] == f"{sistema.pedidos_registrados[1].valor_final_pago:.2f}"
+
+    def test_jsonl_compactado_com_filtros(self, sistema, tmp_path):
+        caminho = str(tmp_path / "vendas.jsonl.gz")
+        assert exportar_pedidos(sistema, caminho, status=["pago", "cancelado"]) == 2
+        with gzip.open(caminho, "rt", encoding="utf-8") as arquivo:
+            registros = [json.loads(linha) for linha in arquivo]
+        assert [r["id_pedido"] for r in registros] == [1, 3]
+        assert registros[1]["status"] == "cancelado"
+        assert registros[0]["itens"][1] == {
+            "id_produto": 2, "nome": "Caneta, azul", "quantidade": 4, "preco_unitario": 2.5
+        }
+        assert registros[1]["datas"]["cancelamento"] is not None
+
+        futuro = datetime.now() + timedelta(days=1)
+        assert exportar_pedidos(sistema, caminho, inicio=futuro) == 0
+        pagos_hoje = iterar_pedidos(sistema, inicio=datetime.now() - timedelta(days=1), campo_data="pagamento")
+        assert [p.id_pedido for p in pagos_hoje] == [1, 3]
+        assert not (tmp_path / "vendas.jsonl.gz.tmp").exists()
+
+    def test_snapshot_exportado_sem_reter_pedidos(self, sistema, tmp_path):
+        salvar_snapshot_binario(sistema, str(tmp_path / "loja.bin"))
+        carregado, _ = carregar_snapshot_binario(str(tmp_path / "loja.bin"))
+        assert exportar_pedidos(carregado, str(tmp_path / "vendas.jsonl")) == 3
+        assert carregado.pedidos_registrados.num_materializados == 0
+
+    def test_argumentos_invalidos(self, sistema, tmp_path):
+        with pytest.raises(ValueError, match="Formato"):
+            exportar_pedidos(sistema, str(tmp_path / "vendas.xml"))
+        with pytest.raises(ValueError, match="Campo de data"):
+            exportar_pedidos(sistema, str(tmp_path / "vendas.csv"), campo_data="ontem")
+        with pytest.raises(ValueError):
+            list(iterar_pedidos(sistema, inicio=datetime(2024, 2, 1), fim=datetime(2024, 1, 1)))
+        assert not (tmp_path / "vendas.csv").exists()
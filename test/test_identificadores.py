@@ -0,0 +1,98 @@
+import threading
+
+import pytest
+from app.identificadores import (
+    GeradorIds,
+    decompor_id,
+    extrair_valor,
+    intervalo_ids,
+)
+from app.ecommerce_sistema import SistemaPagamento, SistemaEcommerce
+
+
+class RelogioMsFalso:
+    def __init__(self, instante_ms: int = GeradorIds.EPOCA_MS + 1_000):
+        self.instante_ms = instante_ms
+
+    def __call__(self) -> int:
+        return self.instante_ms
+
+
+class TestIdentificadores:
+    """
+    Testes para o gerador de ids de transação no estilo snowflake.
+    """
+
+    def test_ids_estritamente_crescentes_e_decomponiveis(self):
+        relogio = RelogioMsFalso()
+        gerador = GeradorIds(id_no=7, relogio_ms=relogio)
+        primeiro = gerador.proximo()
+        segundo = gerador.proximo()
+        assert segundo > primeiro
+        assert decompor_id(primeiro) == (relogio.instante_ms, 7, 0)
+        assert decompor_id(segundo) == (relogio.instante_ms, 7, 1)
+
+    def test_relogio_retrocedendo_nao_quebra_monotonicidade(self):
+        relogio = RelogioMsFalso()
+        gerador = GeradorIds(id_no=1, relogio_ms=relogio)
+        antes = gerador.proximo()
+        relogio.instante_ms -= 500
+        assert gerador.proximo() > antes
+
+    def test_sequencia_esgotada_avanca_milissegundo_logico(self):
+        relogio = RelogioMsFalso()
+        gerador = GeradorIds(id_no=1, relogio_ms=relogio)
+        ids = [gerador.proximo() for _ in range(GeradorIds.MAX_SEQUENCIA + 2)]
+        assert len(set(ids)) == len(ids)
+        assert decompor_id(ids[-1])[0] == relogio.instante_ms + 1
+
+    def test_nos_diferentes_nao_colidem(self):
+        relogio = RelogioMsFalso()
+        a = GeradorIds(id_no=1, relogio_ms=relogio)
+        b = GeradorIds(id_no=2, relogio_ms=relogio)
+        assert a.proximo() != b.proximo()
+
+    def test_id_no_invalido(self):
+        with pytest.raises(ValueError):
+            GeradorIds(id_no=GeradorIds.MAX_NO + 1)
+
+    def test_unicidade_entre_threads(self):
+        gerador = GeradorIds(id_no=3)
+        resultados = []
+
+        def gerar():
+            resultados.extend(gerador.proximo() for _ in range(2_000))
+
+        threads = [threading.Thread(target=gerar) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(set(resultados)) == 16_000
+
+    def test_formato_ordenavel_e_intervalo_de_tempo(self):
+        relogio = RelogioMsFalso()
+        gerador = GeradorIds(id_no=5, relogio_ms=relogio)
+        id_antigo = gerador.proximo_com_prefixo("CC_SIM")
+        relogio.instante_ms += 10
+        id_novo = gerador.proximo_com_prefixo("CC_SIM")
+        assert id_antigo < id_novo
+        menor, maior = intervalo_ids(relogio.instante_ms, relogio.instante_ms)
+        assert menor <= extrair_valor(id_novo) <= maior
+        assert not menor <= extrair_valor(id_antigo) <= maior
+
+    def test_compras_identicas_recebem_ids_distintos(self):
+        pagamento = SistemaPagamento()
+        detalhes = {"numero_cartao": "4111-1111", "numero_parcelas": 1}
+        r1 = pagamento.processar_pagamento(99.9, "cartao_credito", detalhes)
+        r2 = pagamento.processar_pagamento(99.9, "cartao_credito", detalhes)
+        assert r1["id_transacao"].startswith("CC_SIM_")
+        assert r1["id_transacao"] != r2["id_transacao"]
+        reembolso = pagamento.processar_reembolso(r1["id_transacao"], 10.0)
+        assert reembolso["id_reembolso"].startswith("REEMB_")
+
+    def test_sistema_ecommerce_compartilha_gerador_com_pagamento(self):
+        gerador = GeradorIds(id_no=9)
+        sistema = SistemaEcommerce(gerador_ids=gerador)
+        sistema.configurar_sistema_pagamento(desconto_pix=0.05)
+        assert sistema.sistema_pagamento.gerador_ids is gerador
@@ -0,0 +1,111 @@
+import pytest
+from datetime import datetime, timedelta
+from app.ecommerce_sistema import SistemaEcommerce, Carrinho
+from app.indices_pedidos import IndicesPedidos
+from app.snapshot_binario import carregar_snapshot_binario, salvar_snapshot_binario
+from app.armazenamento_sqlite import abrir_sistema_sqlite
+from app.persistencia import GerenciadorPersistencia, recuperar_sistema
+
+
+def _comprar(sistema, cliente, produto, pagar=True):
+    carrinho = Carrinho()
+    carrinho.adicionar_item(produto, 1)
+    pedido = sistema.criar_pedido(cliente, carrinho, {"rua": "A"}, "pix")
+    if pagar:
+        sistema.processar_pagamento_pedido(pedido.id_pedido, {"chave_pix": "x@pix.com"})
+    return pedido
+
+
+def _popular(sistema):
+    sistema.registrar_usuario("ana", {"nome": "Ana"})
+    sistema.registrar_usuario("bia", {"nome": "Bia"})
+    livro = sistema.adicionar_produto_catalogo("Livro", "Romance", 100.0, 50, "Livros")
+    for i in range(6):
+        _comprar(sistema, "ana" if i % 2 == 0 else "bia", livro, pagar=i != 5)
+    sistema.pedidos_registrados[1].atualizar_status("enviado")
+    sistema.cancelar_pedido(4)
+
+
+def _ids(pedidos):
+    return [pedido.id_pedido for pedido in pedidos]
+
+
+class TestIndicesPedidos:
+    """
+    Testes para os índices secundários de pedidos (cliente, status e data).
+    """
+
+    def test_consultas_paginadas(self):
+        sistema = SistemaEcommerce()
+        _popular(sistema)
+        assert _ids(sistema.pedidos_do_cliente("ana")) == [1, 3, 5]
+        assert _ids(sistema.pedidos_do_cliente("bia", pagina=2, tamanho_pagina=2)) == [6]
+        assert sistema.pedidos_do_cliente("carla") == []
+        assert _ids(sistema.pedidos_aguardando_envio()) == [2, 3, 5]
+        assert _ids(sistema.pedidos_por_status("pago", pagina=2, tamanho_pagina=2)) == [5]
+        assert _ids(sistema.pedidos_por_status("pendente")) == [6]
+        assert _ids(sistema.pedidos_por_status("cancelado")) == [4]
+        assert sistema.indices_pedidos.contar_por_status("enviado") == 1
+        assert sistema.indices_pedidos.contar_do_cliente("bia") == 3
+
+        sistema.pedidos_registrados[2].atualizar_status("enviado")
+        assert _ids(sistema.pedidos_aguardando_envio()) == [3, 5]
+        agora = datetime.now()
+        assert _ids(sistema.pedidos_por_data(agora - timedelta(hours=1), agora + timedelta(hours=1))) == [
+            1, 2, 3, 4, 5, 6
+        ]
+        assert _ids(sistema.pedidos_por_data(inicio=agora + timedelta(hours=1))) == []
+        assert _ids(sistema.pedidos_por_data(pagina=3, tamanho_pagina=2)) == [5, 6]
+
+    def test_indice_por_data_ordena_insercoes_fora_de_ordem(self):
+        indices = IndicesPedidos()
+        base = datetime(2024, 3, 1)
+        for id_pedido, dias in [(1, 5), (2, 1), (3, 3), (4, 1)]:
+            indices.registrar(id_pedido, "ana", "pago", (base + timedelta(days=dias)).timestamp())
+        assert indices.por_data() == [2, 4, 3, 1]
+        assert indices.por_data(base + timedelta(days=2), base + timedelta(days=5)) == [3]
+        assert indices.por_data(base, tamanho_pagina=3, pagina=2) == [1]
+        with pytest.raises(ValueError):
+            indices.por_data(base + timedelta(days=1), base)
+        with pytest.raises(ValueError, match="Página"):
+            indices.do_cliente("ana", pagina=0)
+        with pytest.raises(ValueError, match="Tamanho"):
+            indices.por_status("pago", tamanho_pagina=0)
+
+    def test_sistemas_restaurados_tem_os_mesmos_indices(self, tmp_path):
+        original = SistemaEcommerce()
+        _popular(original)
+
+        def resumo(sistema):
+            return (
+                _ids(sistema.pedidos_do_cliente("ana")),
+                {s: _ids(sistema.pedidos_por_status(s)) for s in ("pendente", "pago", "enviado", "cancelado")},
+                _ids(sistema.pedidos_por_data()),
+            )
+
+        esperado = resumo(original)
+
+        salvar_snapshot_binario(original, str(tmp_path / "loja.bin"))
+        carregado, _ = carregar_snapshot_binario(str(tmp_path / "loja.bin"))
+        assert resumo(carregado) == esperado
+        assert carregado.pedidos_registrados.num_materializados == len(esperado[2])
+        # Mudanças antes da primeira consulta partem dos índices do snapshot.
+        relido, _ = carregar_snapshot_binario(str(tmp_path / "loja.bin"))
+        relido.pedidos_registrados[2].atualizar_status("enviado")
+        assert relido.pedidos_registrados.num_materializados == 1
+        assert relido.indices_pedidos.por_status("pago") == [3, 5]
+        assert relido.indices_pedidos.por_status("enviado") == [1, 2]
+
+        banco = str(tmp_path / "loja.db")
+        gravado = abrir_sistema_sqlite(banco)
+        _popular(gravado)
+        gravado.armazenamento.fechar()
+        reaberto = abrir_sistema_sqlite(banco)
+        assert resumo(reaberto) == esperado
+
+        diretorio = str(tmp_path / "wal")
+        persistencia = GerenciadorPersistencia.abrir(diretorio, eventos_por_snapshot=None)
+        _popular(persistencia.sistema)
+        persistencia.fechar()
+        recuperado, _ = recuperar_sistema(diretorio)
+        assert resumo(recuperado) == esperado
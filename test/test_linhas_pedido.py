@@ -0,0 +1,56 @@
+import gc
+import weakref
+from app.ecommerce_sistema import SistemaEcommerce, Carrinho, LinhasPedido, ItemPedido
+
+
+def _sistema_com_pedido():
+    sistema = SistemaEcommerce()
+    sistema.registrar_usuario("ana", {"nome": "Ana"})
+    livro = sistema.adicionar_produto_catalogo("Livro", "Romance", 50.0, 10, "Livros")
+    caneta = sistema.adicionar_produto_catalogo("Caneta", "Azul", 2.5, 100, "Papelaria")
+    carrinho = Carrinho()
+    carrinho.adicionar_item(livro, 2)
+    carrinho.adicionar_item(caneta, 4)
+    pedido = sistema.criar_pedido("ana", carrinho, {"rua": "A"}, "pix")
+    return sistema, pedido
+
+
+class TestLinhasPedido:
+    """
+    Testes para as linhas compactas de pedido (preço e nome da época da compra).
+    """
+
+    def test_linhas_guardam_a_compra(self):
+        _, pedido = _sistema_com_pedido()
+        assert len(pedido.linhas) == 2
+        assert list(pedido.linhas) == [
+            ItemPedido(1, 2, 50.0, "Livro"),
+            ItemPedido(2, 4, 2.5, "Caneta"),
+        ]
+        assert list(pedido.linhas.pares()) == [(1, 2), (2, 4)]
+        assert pedido.linhas.subtotal() == 110.0
+        item, quantidade = pedido.itens_comprados[0]
+        assert (item.id_produto, item.nome, item.preco, quantidade) == (1, "Livro", 50.0, 2)
+
+    def test_nota_fiscal_usa_o_preco_da_compra(self):
+        sistema, pedido = _sistema_com_pedido()
+        sistema.processar_pagamento_pedido(pedido.id_pedido, {"chave_pix": "ana@pix.com"})
+        sistema.atualizar_preco(1, 80.0)
+        sistema.recuperar_produto_por_id(2).nome = "Caneta Nova"
+        nota = pedido.gerar_nota_fiscal()
+        assert "Livro: 2 x R$50.00 = R$100.00" in nota
+        assert "Caneta: 4 x R$2.50 = R$10.00" in nota
+        assert "Subtotal: R$110.00" in nota
+
+    def test_pedido_nao_prende_o_produto(self):
+        sistema, pedido = _sistema_com_pedido()
+        referencia = weakref.ref(sistema.produtos_catalogo.pop(1))
+        gc.collect()
+        assert referencia() is None
+        assert pedido.linhas[0].nome == "Livro"
+
+    def test_de_tuplas(self):
+        linhas = LinhasPedido.de_tuplas([(7, 3, 1.5, "Lápis")])
+        assert linhas[0] == ItemPedido(7, 3, 1.5, "Lápis")
+        assert linhas[0].preco == 1.5
+        assert len(LinhasPedido.de_tuplas([])) == 0
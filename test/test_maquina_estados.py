@@ -0,0 +1,80 @@
+import pytest
+from app.ecommerce_sistema import Pedido, LinhasPedido
+from app.maquina_estados import MaquinaEstados
+
+
+class PedidoComSeparacao(Pedido):
+    MAQUINA_ESTADOS = Pedido.MAQUINA_ESTADOS.copiar()
+
+
+PedidoComSeparacao.MAQUINA_ESTADOS.adicionar_estado("em_separacao", "separacao")
+PedidoComSeparacao.MAQUINA_ESTADOS.adicionar_estado("devolvido", "devolucao")
+PedidoComSeparacao.MAQUINA_ESTADOS.permitir("pago", "em_separacao")
+PedidoComSeparacao.MAQUINA_ESTADOS.permitir("em_separacao", "enviado", "cancelado")
+PedidoComSeparacao.MAQUINA_ESTADOS.permitir("entregue", "devolvido")
+
+
+def _pedido(classe=Pedido):
+    return classe.restaurar(1, "ana", LinhasPedido.de_tuplas([(1, 1, 10.0, "Livro")]), 10.0, {"rua": "A"}, "pix", None)
+
+
+class TestMaquinaEstados:
+    """
+    Testes para a máquina de estados pré-compilada dos pedidos.
+    """
+
+    def test_tabela_compilada_e_visoes_por_nome(self):
+        maquina = Pedido.MAQUINA_ESTADOS
+        assert Pedido.ESTADOS_VALIDOS == ["pendente", "pago", "enviado", "entregue", "cancelado"]
+        assert Pedido.TRANSICOES_PERMITIDAS["pago"] == ["enviado", "cancelado"]
+        assert Pedido.TRANSICOES_PERMITIDAS["cancelado"] == []
+        assert maquina.mascaras[maquina.codigos["pendente"]] == 0b10010
+        assert maquina.origens("cancelado") == {"pendente", "pago", "enviado", "entregue"}
+        assert maquina.campo_data("entregue") == "entrega"
+        assert not maquina.permite("entregue", "em_separacao")
+        with pytest.raises(ValueError, match="já existe"):
+            maquina.copiar().adicionar_estado("pago")
+        with pytest.raises(ValueError, match="desconhecido"):
+            maquina.copiar().permitir("pago", "extraviado")
+
+    def test_estados_novos_com_data_e_ganchos(self):
+        chamadas = []
+        maquina = PedidoComSeparacao.MAQUINA_ESTADOS
+        gancho = lambda pedido, anterior: chamadas.append((pedido.status_pedido, anterior))
+        maquina.adicionar_gancho(gancho, "em_separacao")
+        try:
+            pedido = _pedido(PedidoComSeparacao)
+            assert not pedido.atualizar_status("em_separacao")
+            assert pedido.atualizar_status("pago")
+            assert pedido.atualizar_status("em_separacao")
+            assert pedido.datas["separacao"] is not None
+            assert pedido.atualizar_status("enviado")
+            assert pedido.atualizar_status("entregue")
+            assert pedido.atualizar_status("devolvido")
+            assert pedido.datas["devolucao"] is not None
+            assert chamadas == [("em_separacao", "pago")]
+        finally:
+            maquina.remover_gancho(gancho, "em_separacao")
+        # A máquina padrão não foi alterada pela subclasse.
+        assert "em_separacao" not in Pedido.ESTADOS_VALIDOS
+        assert not _pedido().atualizar_status("devolvido")
+
+    def test_mesmo_status_nao_refaz_a_transicao(self):
+        vistos = []
+        maquina = MaquinaEstados()
+        maquina.adicionar_estado("a")
+        maquina.adicionar_estado("b", "b")
+        maquina.permitir("a", "b")
+        maquina.adicionar_gancho(lambda objeto, anterior: vistos.append(anterior))
+
+        class Objeto(Pedido):
+            MAQUINA_ESTADOS = maquina
+
+        objeto = _pedido(Objeto)
+        objeto.status_pedido = "a"
+        assert objeto.atualizar_status("b")
+        data = objeto.datas["b"]
+        assert objeto.atualizar_status("b")
+        assert objeto.datas["b"] is data
+        assert not objeto.atualizar_status("a")
+        assert vistos == ["a"]
@@ -0,0 +1,298 @@
+import gc
+import gzip
+import json
+import os
+import threading
+import pytest
+from datetime import datetime
+from app.ecommerce_sistema import SistemaEcommerce, Carrinho
+from app.estoque_armazens import MotorAlocacao, TabelaZonas
+from app.persistencia import (
+    GerenciadorPersistencia,
+    RegistroEscritaAntecipada,
+    aplicar_estado,
+    capturar_estado,
+    carregar_snapshot,
+    recuperar_sistema,
+    salvar_snapshot,
+)
+
+
+def _popular(sistema):
+    produto = sistema.adicionar_produto_catalogo("Livro", "Romance", 50.0, 10, "Livros")
+    outro = sistema.adicionar_produto_catalogo("Caneta", "Azul", 2.5, 100, "Papelaria")
+    sistema.registrar_usuario("ana", {"nome": "Ana"})
+    carrinho = Carrinho()
+    carrinho.adicionar_item(produto, 2)
+    carrinho.adicionar_item(outro, 4)
+    pago = sistema.criar_pedido("ana", carrinho, {"rua": "A", "cep": "1"}, "pix")
+    sistema.processar_pagamento_pedido(pago.id_pedido, {"chave_pix": "ana@pix.com"})
+    carrinho = Carrinho()
+    carrinho.adicionar_item(produto, 1)
+    cancelado = sistema.criar_pedido("ana", carrinho, {"rua": "A", "cep": "1"}, "pix")
+    sistema.processar_pagamento_pedido(cancelado.id_pedido, {"chave_pix": "ana@pix.com"})
+    sistema.cancelar_pedido(cancelado.id_pedido)
+    return pago, cancelado
+
+
+def _pagar_com_alocacao(sistema):
+    caneta = sistema.adicionar_produto_catalogo("Caneta", "Azul", 5.0, 10, "Papelaria")
+    sistema.registrar_usuario("ana", {"nome": "Ana"})
+    tabela = TabelaZonas()
+    tabela.adicionar_faixa("01000-000", "09999-999", {"SP": (7.5, 1), "RJ": (20.0, 2)})
+    sistema.configurar_alocacao(MotorAlocacao(tabela, sistema.estoque_armazens))
+    sistema.estoque_armazens.definir(caneta.id_produto, "SP", 10)
+    carrinho = Carrinho()
+    carrinho.adicionar_item(caneta, 2)
+    pedido = sistema.criar_pedido("ana", carrinho, {"rua": "A", "cep": "01310-100"}, "pix")
+    sistema.processar_pagamento_pedido(pedido.id_pedido, {"chave_pix": "ana@pix.com"})
+    return pedido
+
+
+def _assert_mesmo_estado(original, recuperado):
+    assert recuperado.usuarios == original.usuarios
+    assert recuperado.produtos_catalogo.keys() == original.produtos_catalogo.keys()
+    for id_produto, produto in original.produtos_catalogo.items():
+        copia = recuperado.produtos_catalogo[id_produto]
+        assert copia.obter_informacoes_detalhadas() == produto.obter_informacoes_detalhadas()
+    assert recuperado.pedidos_registrados.keys() == original.pedidos_registrados.keys()
+    for id_pedido, pedido in original.pedidos_registrados.items():
+        copia = recuperado.pedidos_registrados[id_pedido]
+        assert copia.status_pedido == pedido.status_pedido
+        assert copia.valor_final_pago == pedido.valor_final_pago
+        assert copia.id_transacao_pagamento == pedido.id_transacao_pagamento
+        assert copia.datas == pedido.datas
+        assert [(p.id_produto, q) for p, q in copia.itens_comprados] == [
+            (p.id_produto, q) for p, q in pedido.itens_comprados
+        ]
+    assert recuperado.agregados_vendas.por_status() == original.agregados_vendas.por_status()
+    inicio, fim = datetime(2000, 1, 1), datetime(2100, 1, 1)
+    assert recuperado.rollups_vendas.totais(inicio, fim) == original.rollups_vendas.totais(inicio, fim)
+    assert recuperado.rollups_vendas.por_categoria(inicio, fim) == (
+        original.rollups_vendas.por_categoria(inicio, fim)
+    )
+    assert recuperado._proximo_id_produto == original._proximo_id_produto
+    assert recuperado._proximo_id_pedido == original._proximo_id_pedido
+
+
+class TestPersistencia:
+    """
+    Testes para o log de escrita antecipada, snapshots e recuperação.
+    """
+
+    @pytest.mark.parametrize("politica", ["sempre", "lote", "nunca"])
+    def test_recuperacao_reproduz_o_log(self, tmp_path, politica):
+        gerenciador = GerenciadorPersistencia.abrir(
+            str(tmp_path), politica_fsync=politica, eventos_por_snapshot=None
+        )
+        _popular(gerenciador.sistema)
+        gerenciador.fechar()
+
+        recuperado, lsn = recuperar_sistema(str(tmp_path))
+        assert lsn == gerenciador.registro.ultimo_lsn
+        _assert_mesmo_estado(gerenciador.sistema, recuperado)
+        assert recuperado.produtos_catalogo[1].quantidade_em_estoque == 8
+
+    def test_snapshot_mais_cauda_do_log(self, tmp_path):
+        gerenciador = GerenciadorPersistencia.abrir(str(tmp_path), eventos_por_snapshot=None)
+        pago, _ = _popular(gerenciador.sistema)
+        lsn_snapshot = gerenciador.compactar()
+        gerenciador.sistema.pedidos_registrados[pago.id_pedido].atualizar_status("enviado")
+        gerenciador.sistema.produtos_catalogo[2].adicionar_estoque(5)
+        gerenciador.fechar()
+
+        nomes = os.listdir(tmp_path)
+        assert sum(nome.startswith("snapshot-") for nome in nomes) == 1
+        # O segmento compactado foi removido; só resta o da cauda.
+        assert sum(nome.startswith("wal-") for nome in nomes) == 1
+        eventos = list(RegistroEscritaAntecipada.ler_eventos(str(tmp_path)))
+        assert [lsn for lsn, _, _ in eventos] == [lsn_snapshot + 1, lsn_snapshot + 2]
+
+        recuperado, _ = recuperar_sistema(str(tmp_path))
+        _assert_mesmo_estado(gerenciador.sistema, recuperado)
+        assert recuperado.pedidos_registrados[pago.id_pedido].status_pedido == "enviado"
+
+    def test_registro_incompleto_no_fim_e_descartado(self, tmp_path):
+        gerenciador = GerenciadorPersistencia.abrir(str(tmp_path), eventos_por_snapshot=None)
+        _popular(gerenciador.sistema)
+        gerenciador.fechar()
+        ultimo_lsn = gerenciador.registro.ultimo_lsn
+
+        (segmento,) = [n for n in os.listdir(tmp_path) if n.startswith("wal-")]
+        caminho = os.path.join(tmp_path, segmento)
+        with open(caminho, "r+b") as arquivo:
+            arquivo.truncate(os.path.getsize(caminho) - 3)
+
+        _, lsn = recuperar_sistema(str(tmp_path))
+        assert lsn == ultimo_lsn - 1
+
+        # Ao reabrir, o registro quebrado é truncado e a numeração continua.
+        reaberto = GerenciadorPersistencia.abrir(str(tmp_path), eventos_por_snapshot=None)
+        reaberto.sistema.registrar_usuario("bia", {"nome": "Bia"})
+        reaberto.fechar()
+        recuperado, lsn = recuperar_sistema(str(tmp_path))
+        assert lsn == ultimo_lsn
+        assert "bia" in recuperado.usuarios
+
+    def test_compactacao_automatica(self, tmp_path):
+        gerenciador = GerenciadorPersistencia.abrir(str(tmp_path), eventos_por_snapshot=5)
+        _popular(gerenciador.sistema)
+        gerenciador.fechar()
+        assert gerenciador.snapshots_criados >= 1
+        recuperado, _ = recuperar_sistema(str(tmp_path))
+        _assert_mesmo_estado(gerenciador.sistema, recuperado)
+
+    def test_recuperacoes_simultaneas_religam_o_coletor(self, tmp_path):
+        gerenciador = GerenciadorPersistencia.abrir(str(tmp_path), eventos_por_snapshot=None)
+        _popular(gerenciador.sistema)
+        gerenciador.fechar()
+        barreira = threading.Barrier(4)
+
+        def recuperar():
+            barreira.wait()
+            for _ in range(20):
+                recuperar_sistema(str(tmp_path))
+
+        threads = [threading.Thread(target=recuperar) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert gc.isenabled()
+
+    def test_eventos_de_varias_threads_disparam_snapshots(self, tmp_path):
+        gerenciador = GerenciadorPersistencia.abrir(str(tmp_path), eventos_por_snapshot=10)
+        sistema = gerenciador.sistema
+        threads = [
+            threading.Thread(
+                target=lambda n=n: [sistema.registrar_usuario(f"u{n}-{i}", {}) for i in range(25)]
+            )
+            for n in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        gerenciador.fechar()
+        assert gerenciador._eventos_registrados.proximo == 101
+        recuperado, _ = recuperar_sistema(str(tmp_path))
+        assert len(recuperado.usuarios) == 100
+
+    def test_sistema_recuperado_continua_operando(self, tmp_path):
+        gerenciador = GerenciadorPersistencia.abrir(str(tmp_path), eventos_por_snapshot=None)
+        _popular(gerenciador.sistema)
+        gerenciador.fechar()
+
+        reaberto = GerenciadorPersistencia.abrir(str(tmp_path), eventos_por_snapshot=None)
+        sistema = reaberto.sistema
+        novo = sistema.adicionar_produto_catalogo("Mochila", "Preta", 90.0, 3, "Acessórios")
+        assert novo.id_produto == 3
+        sistema.produtos_catalogo[1].reduzir_estoque(1)
+        reaberto.fechar()
+        recuperado, _ = recuperar_sistema(str(tmp_path))
+        _assert_mesmo_estado(sistema, recuperado)
+
+    def test_politica_fsync_invalida(self, tmp_path):
+        with pytest.raises(ValueError, match="Política de fsync"):
+            RegistroEscritaAntecipada(str(tmp_path), politica_fsync="as_vezes")
+
+    def test_diretorio_vazio_recupera_sistema_vazio(self, tmp_path):
+        sistema, lsn = recuperar_sistema(str(tmp_path / "inexistente"))
+        assert lsn == 0
+        assert isinstance(sistema, SistemaEcommerce)
+        assert not sistema.produtos_catalogo
+
+    @pytest.mark.parametrize("formato", ["json", "binario"])
+    def test_reembolso_de_pedido_recuperado(self, tmp_path, formato):
+        gerenciador = GerenciadorPersistencia.abrir(
+            str(tmp_path), eventos_por_snapshot=None, formato_snapshot=formato
+        )
+        pago, _ = _popular(gerenciador.sistema)
+        gerenciador.compactar()
+        gerenciador.fechar()
+        os.remove(tmp_path / "razao.log")
+
+        # Sem o arquivo do livro razão, as capturas vêm dos pedidos pagos.
+        recuperado, _ = recuperar_sistema(str(tmp_path))
+        livro = recuperado.sistema_pagamento.livro_razao
+        assert livro.saldo_reembolsavel(pago.id_transacao_pagamento) == pago.valor_final_pago
+
+        reaberto = GerenciadorPersistencia.abrir(str(tmp_path), eventos_por_snapshot=None)
+        relatorio = reaberto.sistema.cancelar_pedidos_em_lote([pago.id_pedido])
+        assert relatorio["falhas_reembolso"] == {}
+        assert relatorio["total_reembolsado"] == pago.valor_final_pago
+        reaberto.fechar()
+
+        # O reembolso fica no livro razão gravado ao lado do log.
+        de_novo = GerenciadorPersistencia.abrir(str(tmp_path), eventos_por_snapshot=None)
+        livro = de_novo.sistema.sistema_pagamento.livro_razao
+        assert livro.saldo_reembolsavel(pago.id_transacao_pagamento) == 0.0
+        assert livro.conciliar_pedido(pago.id_pedido)["liquido"] == 0.0
+        de_novo.fechar()
+
+    def test_compactacao_mantem_snapshot_em_uso(self, tmp_path):
+        diretorio = str(tmp_path)
+        gerenciador = GerenciadorPersistencia.abrir(
+            diretorio, eventos_por_snapshot=None, formato_snapshot="binario"
+        )
+        _popular(gerenciador.sistema)
+        gerenciador.compactar()
+        gerenciador.fechar()
+        (antigo,) = [n for n in os.listdir(diretorio) if n.startswith("snapshot-")]
+
+        reaberto = GerenciadorPersistencia.abrir(
+            diretorio, eventos_por_snapshot=None, formato_snapshot="binario"
+        )
+        sistema = reaberto.sistema
+        sistema.registrar_usuario("bia", {"nome": "Bia"})
+        reaberto.compactar()
+        # O sistema em uso ainda lê o snapshot antigo sob demanda.
+        assert antigo in os.listdir(diretorio)
+        assert sistema.recuperar_produto_por_id(2).quantidade_em_estoque == 96
+
+        sistema.snapshot_origem.fechar()
+        sistema.registrar_usuario("caio", {"nome": "Caio"})
+        reaberto.compactar()
+        assert antigo not in os.listdir(diretorio)
+        assert len([n for n in os.listdir(diretorio) if n.startswith("snapshot-")]) == 1
+        reaberto.fechar()
+
+    def test_snapshot_guarda_datas_de_estados_extras(self):
+        sistema = SistemaEcommerce()
+        pago, _ = _popular(sistema)
+        pago.datas["devolucao"] = datetime(2024, 5, 1, 12, 30)
+        restaurado = SistemaEcommerce()
+        aplicar_estado(restaurado, capturar_estado(sistema))
+        assert restaurado.pedidos_registrados[pago.id_pedido].datas == pago.datas
+
+    def test_snapshot_de_versao_desconhecida_e_rejeitado(self, tmp_path):
+        sistema = SistemaEcommerce()
+        _popular(sistema)
+        caminho = salvar_snapshot(capturar_estado(sistema), str(tmp_path), 7)
+        assert carregar_snapshot(caminho)[1] == 7
+        with open(caminho, "rb") as arquivo:
+            conteudo = json.loads(gzip.decompress(arquivo.read()))
+        conteudo["versao"] = 1
+        with open(caminho, "wb") as arquivo:
+            arquivo.write(gzip.compress(json.dumps(conteudo).encode("utf-8")))
+        with pytest.raises(ValueError, match="Versão de snapshot não suportada: 1"):
+            carregar_snapshot(caminho)
+
+    @pytest.mark.parametrize("formato", [None, "json", "binario"])
+    def test_alocacao_e_estoque_por_armazem_recuperados(self, tmp_path, formato):
+        gerenciador = GerenciadorPersistencia.abrir(
+            str(tmp_path), eventos_por_snapshot=None, formato_snapshot=formato or "json"
+        )
+        pedido = _pagar_com_alocacao(gerenciador.sistema)
+        if formato is not None:
+            gerenciador.compactar()
+        gerenciador.fechar()
+
+        recuperado, _ = recuperar_sistema(str(tmp_path))
+        copia = recuperado.pedidos_registrados[pedido.id_pedido]
+        assert copia.alocacao == pedido.alocacao
+        assert copia.calcular_frete() == 7.5
+        assert recuperado.estoque_armazens.por_armazem(1) == {"SP": 8}
+        # Mesmo sem motor configurado, o cancelamento devolve o estoque.
+        assert recuperado.cancelar_pedido(pedido.id_pedido)
+        assert recuperado.estoque_armazens.por_armazem(1) == {"SP": 10}
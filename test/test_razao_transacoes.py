@@ -0,0 +1,81 @@
+import pytest
+from app.razao_transacoes import Lancamento, LivroRazaoTransacoes
+from app.ecommerce_sistema import SistemaEcommerce, SistemaPagamento, Carrinho
+
+
+@pytest.fixture
+def livro():
+    livro = LivroRazaoTransacoes()
+    livro.registrar_captura("CC_1", 100.00, metodo="cartao_credito", id_pedido=1)
+    return livro
+
+
+class TestRazaoTransacoes:
+    """
+    Testes para o livro razão de transações e a validação de reembolsos.
+    """
+
+    def test_reembolso_parcial_ate_o_valor_capturado(self, livro):
+        livro.registrar_reembolso("R_1", "CC_1", 60.00)
+        assert livro.saldo_reembolsavel("CC_1") == pytest.approx(40.00)
+        assert livro.validar_reembolso("CC_1", 40.01) is not None
+        livro.registrar_reembolso("R_2", "CC_1", 40.00)
+        assert livro.saldo_reembolsavel("CC_1") == 0.0
+
+    def test_reembolso_de_transacao_desconhecida(self, livro):
+        with pytest.raises(ValueError, match="não encontrada"):
+            livro.registrar_reembolso("R_1", "CC_INEXISTENTE", 1.00)
+
+    def test_captura_duplicada(self, livro):
+        with pytest.raises(ValueError):
+            livro.registrar_captura("CC_1", 10.00)
+
+    def test_indice_por_pedido_e_conciliacao(self, livro):
+        livro.registrar_reembolso("R_1", "CC_1", 25.50)
+        assert livro.transacoes_do_pedido(1) == ["CC_1", "R_1"]
+        assert livro.conciliar_pedido(1) == {
+            "capturado": 100.00,
+            "reembolsado": 25.50,
+            "liquido": 74.50,
+        }
+
+    def test_grava_e_recarrega_do_arquivo(self, tmp_path):
+        caminho = str(tmp_path / "razao.tsv")
+        livro = LivroRazaoTransacoes(caminho)
+        livro.registrar_captura("PIX_1", 90.00, metodo="pix", id_pedido=7)
+        livro.registrar_reembolso("R_1", "PIX_1", 30.00)
+        livro.fechar()
+
+        lancamentos = list(LivroRazaoTransacoes.ler_lancamentos(caminho))
+        assert [l.tipo for l in lancamentos] == [Lancamento.CAPTURA, Lancamento.REEMBOLSO]
+
+        recarregado = LivroRazaoTransacoes.carregar(caminho)
+        assert recarregado.saldo_reembolsavel("PIX_1") == pytest.approx(60.00)
+        recarregado.registrar_reembolso("R_2", "PIX_1", 60.00)
+        recarregado.fechar()
+        assert len(list(LivroRazaoTransacoes.ler_lancamentos(caminho))) == 3
+
+    def test_processar_reembolso_valida_contra_pagamento_original(self):
+        pagamento = SistemaPagamento()
+        resultado = pagamento.processar_pagamento(
+            50.00, "pix", {"chave_pix": "cliente@pix.com"}
+        )
+        id_transacao = resultado["id_transacao"]
+
+        assert pagamento.processar_reembolso("PIX_SIM_FALSO", 10.00)["status"] == "falha"
+        assert pagamento.processar_reembolso(id_transacao, 50.01)["status"] == "falha"
+        assert pagamento.processar_reembolso(id_transacao, 50.00)["status"] == "sucesso"
+        assert pagamento.processar_reembolso(id_transacao, 0.01)["status"] == "falha"
+
+    def test_pagamento_de_pedido_registrado_no_indice_do_pedido(self):
+        sistema = SistemaEcommerce()
+        sistema.registrar_usuario("cliente_razao", {"nome": "Razão"})
+        produto = sistema.adicionar_produto_catalogo("Livro", "Capa dura", 80.0, 3, "Livros")
+        carrinho = Carrinho()
+        carrinho.adicionar_item(produto, 1)
+        pedido = sistema.criar_pedido("cliente_razao", carrinho, {"rua": "Rua B"}, "pix")
+        sistema.processar_pagamento_pedido(pedido.id_pedido, {"chave_pix": "a@pix.com"})
+
+        livro = sistema.sistema_pagamento.livro_razao
+        assert livro.transacoes_do_pedido(pedido.id_pedido) == [pedido.id_transacao_pagamento]
+        assert livro.conciliar_pedido(pedido.id_pedido)["capturado"] == pedido.valor_final_pago
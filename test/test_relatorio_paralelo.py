@@ -0,0 +1,76 @@
+import pytest
+from datetime import datetime, timedelta
+from app.ecommerce_sistema import SistemaEcommerce, Carrinho
+from app.relatorio_paralelo import gerar_relatorio_paralelo
+from app.snapshot_binario import salvar_snapshot_binario
+
+
+def _comprar(sistema, itens, metodo="pix", pagar=True):
+    carrinho = Carrinho()
+    for produto, quantidade in itens:
+        carrinho.adicionar_item(produto, quantidade)
+    pedido = sistema.criar_pedido("ana", carrinho, {"rua": "A"}, metodo)
+    if pagar:
+        detalhes = (
+            {"chave_pix": "ana@pix.com"}
+            if metodo == "pix"
+            else {"numero_cartao": "1234567812345678", "validade": "12/30", "cvv": "123"}
+        )
+        sistema.processar_pagamento_pedido(pedido.id_pedido, detalhes)
+    return pedido
+
+
+@pytest.fixture
+def sistema():
+    sistema = SistemaEcommerce()
+    sistema.registrar_usuario("ana", {"nome": "Ana"})
+    livro = sistema.adicionar_produto_catalogo("Livro", "Romance", 100.0, 1000, "Livros")
+    caneta = sistema.adicionar_produto_catalogo("Caneta", "Azul", 2.5, 1000, "Papelaria")
+    for i in range(12):
+        _comprar(sistema, [(livro, 1 + i % 3), (caneta, 2)], "pix" if i % 2 else "cartao_credito")
+    _comprar(sistema, [(livro, 1)], pagar=False)
+    sistema.cancelar_pedido(3)
+    sistema.pedidos_registrados[5].atualizar_status("enviado")
+    return sistema
+
+
+class TestRelatorioParalelo:
+    """
+    Testes para o relatório de vendas agregado por partições em processos.
+    """
+
+    def test_particoes_em_processos_batem_com_os_agregados(self, sistema):
+        relatorio = gerar_relatorio_paralelo(sistema, processos=2, particoes=5)
+        esperado = sistema.gerar_relatorio_vendas()
+        assert relatorio["particoes"] == 5
+        for chave in (
+            "total_vendas_apuradas",
+            "numero_de_pedidos_contabilizados",
+            "filtro_status_aplicado",
+            "vendas_por_metodo_pagamento",
+        ):
+            assert relatorio[chave] == esperado[chave]
+        assert relatorio["vendas_por_dia"] == sistema.agregados_vendas.por_dia()
+        inicio = datetime.now() - timedelta(days=1)
+        fim = datetime.now() + timedelta(days=1)
+        assert relatorio["vendas_por_produto"] == sistema.rollups_vendas.por_produto(inicio, fim)
+        assert relatorio["vendas_por_categoria"] == sistema.rollups_vendas.por_categoria(inicio, fim)
+
+    def test_filtros_e_snapshot_existente(self, sistema, tmp_path):
+        caminho = salvar_snapshot_binario(sistema, str(tmp_path / "loja.bin"))
+        enviados = gerar_relatorio_paralelo(caminho, status_filtro="enviado", processos=1)
+        assert enviados["numero_de_pedidos_contabilizados"] == 1
+        assert enviados["total_vendas_apuradas"] == sistema.pedidos_registrados[5].valor_final_pago
+        futuro = datetime.now() + timedelta(days=1)
+        vazio = gerar_relatorio_paralelo(caminho, inicio=futuro, processos=1)
+        assert vazio["numero_de_pedidos_contabilizados"] == 0
+        assert vazio["vendas_por_produto"] == {}
+        assert gerar_relatorio_paralelo(SistemaEcommerce(), processos=1)["particoes"] == 1
+
+    def test_argumentos_invalidos(self, sistema):
+        with pytest.raises(ValueError, match="processos"):
+            gerar_relatorio_paralelo(sistema, processos=0)
+        with pytest.raises(ValueError, match="partições"):
+            gerar_relatorio_paralelo(sistema, particoes=0)
+        with pytest.raises(ValueError):
+            gerar_relatorio_paralelo(sistema, inicio=datetime(2024, 2, 1), fim=datetime(2024, 1, 1))
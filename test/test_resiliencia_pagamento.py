@@ -0,0 +1,160 @@
+import random
+
+import pytest
+from app.resiliencia_pagamento import (
+    Disjuntor,
+    PoliticaRetentativa,
+    RelogioSimulado,
+    ResilienciaGateway,
+)
+from app.ecommerce_sistema import SistemaPagamento
+
+TIMEOUT = {
+    "status": "erro",
+    "mensagem": "Timeout na comunicação com o gateway de pagamento.",
+    "id_transacao": None,
+    "codigo_erro": "timeout",
+}
+APROVADO = {"status": "aprovado", "mensagem": "ok", "id_transacao": "T1"}
+
+
+class GatewayRoteirizado:
+    """
+    Gateway falso que devolve as respostas de um roteiro, uma por chamada.
+    """
+
+    def __init__(self, relogio, respostas, duracao=0.0):
+        self.relogio = relogio
+        self.respostas = list(respostas)
+        self.duracao = duracao
+        self.chamadas = 0
+
+    def __call__(self):
+        self.chamadas += 1
+        self.relogio.avancar(self.duracao)
+        return self.respostas.pop(0) if self.respostas else APROVADO
+
+
+@pytest.fixture
+def relogio():
+    return RelogioSimulado()
+
+
+def criar_resiliencia(relogio, **kwargs):
+    politica = PoliticaRetentativa(
+        max_tentativas=kwargs.pop("max_tentativas", 3),
+        espera_base=0.1,
+        aleatorio=random.Random(42),
+    )
+    disjuntor = Disjuntor(
+        limiar_falhas=kwargs.pop("limiar_falhas", 5),
+        tempo_abertura=30,
+        relogio=relogio,
+    )
+    return ResilienciaGateway(politica, disjuntor, relogio=relogio, **kwargs)
+
+
+class TestResilienciaPagamento:
+    """
+    Testes para retentativas, prazos e disjuntor em volta do gateway de pagamento.
+    """
+
+    def test_retenta_timeout_ate_sucesso(self, relogio):
+        resiliencia = criar_resiliencia(relogio)
+        gateway = GatewayRoteirizado(relogio, [TIMEOUT, TIMEOUT])
+        resultado = resiliencia.executar(gateway)
+        assert resultado["status"] == "aprovado"
+        assert gateway.chamadas == 3
+        assert resiliencia.metricas["retentativas"] == 2
+        assert relogio.total_dormido <= 0.1 + 0.2  # jitter limitado pelo teto exponencial
+
+    def test_nao_retenta_rejeicao_de_negocio(self, relogio):
+        resiliencia = criar_resiliencia(relogio)
+        rejeitado = {"status": "rejeitado", "mensagem": "Falha na autorização", "id_transacao": None}
+        gateway = GatewayRoteirizado(relogio, [rejeitado])
+        assert resiliencia.executar(gateway)["status"] == "rejeitado"
+        assert gateway.chamadas == 1
+
+    def test_resposta_apos_prazo_da_tentativa_vira_timeout(self, relogio):
+        resiliencia = criar_resiliencia(relogio, max_tentativas=1, prazo_tentativa=1.0)
+        gateway = GatewayRoteirizado(relogio, [TIMEOUT], duracao=2.0)
+        resultado = resiliencia.executar(gateway)
+        assert resultado["codigo_erro"] == "prazo_excedido"
+        assert resiliencia.metricas["prazos_excedidos"] == 1
+
+    def test_aprovacao_apos_prazo_nao_e_retentada(self, relogio):
+        resiliencia = criar_resiliencia(relogio, max_tentativas=3, prazo_tentativa=1.0)
+        gateway = GatewayRoteirizado(relogio, [APROVADO], duracao=2.0)
+        resultado = resiliencia.executar(gateway)
+        # Repetir cobraria o cliente de novo: a aprovação é devolvida para conciliação.
+        assert gateway.chamadas == 1
+        assert resultado["status"] == "aprovado"
+        assert resultado["id_transacao"] == "T1"
+        assert resultado["aprovado_apos_prazo"] is True
+        assert resiliencia.metricas["aprovacoes_tardias"] == 1
+        assert resiliencia.metricas["prazos_excedidos"] == 1
+
+    def test_prazo_total_interrompe_retentativas(self, relogio):
+        resiliencia = criar_resiliencia(
+            relogio, max_tentativas=10, prazo_tentativa=None, prazo_total=3.0
+        )
+        gateway = GatewayRoteirizado(relogio, [TIMEOUT] * 10, duracao=1.0)
+        resultado = resiliencia.executar(gateway)
+        assert resultado["status"] == "erro"
+        assert gateway.chamadas == 3
+        assert resultado["tentativas"] == 3
+
+    def test_disjuntor_abre_e_falha_rapido(self, relogio):
+        resiliencia = criar_resiliencia(relogio, max_tentativas=1, limiar_falhas=2)
+        gateway = GatewayRoteirizado(relogio, [TIMEOUT] * 5)
+        resiliencia.executar(gateway)
+        resiliencia.executar(gateway)
+        assert resiliencia.obter_estado()["estado_disjuntor"] == Disjuntor.ABERTO
+
+        resultado = resiliencia.executar(gateway)
+        assert resultado["codigo_erro"] == "circuito_aberto"
+        assert gateway.chamadas == 2
+        assert resiliencia.metricas["rejeitadas_circuito_aberto"] == 1
+
+    def test_disjuntor_meio_aberto_fecha_apos_sucesso(self, relogio):
+        resiliencia = criar_resiliencia(relogio, max_tentativas=1, limiar_falhas=1)
+        gateway = GatewayRoteirizado(relogio, [TIMEOUT])
+        resiliencia.executar(gateway)
+        assert resiliencia.disjuntor.estado == Disjuntor.ABERTO
+
+        relogio.avancar(30)
+        assert resiliencia.disjuntor.estado == Disjuntor.MEIO_ABERTO
+        assert resiliencia.executar(gateway)["status"] == "aprovado"
+        assert resiliencia.disjuntor.estado == Disjuntor.FECHADO
+
+    def test_excecao_na_chamada_meio_aberta_reabre_o_disjuntor(self, relogio):
+        resiliencia = criar_resiliencia(relogio, max_tentativas=1, limiar_falhas=1)
+        resiliencia.executar(GatewayRoteirizado(relogio, [TIMEOUT]))
+        relogio.avancar(30)
+
+        def falhar():
+            raise ConnectionError("conexão recusada")
+
+        with pytest.raises(ConnectionError):
+            resiliencia.executar(falhar)
+        # A vaga de teste foi liberada: o disjuntor reabriu e, passado o
+        # tempo de abertura, aceita uma nova chamada de teste.
+        assert resiliencia.disjuntor.estado == Disjuntor.ABERTO
+        relogio.avancar(30)
+        assert resiliencia.executar(GatewayRoteirizado(relogio, []))["status"] == "aprovado"
+        assert resiliencia.disjuntor.estado == Disjuntor.FECHADO
+
+    def test_sistema_pagamento_usa_camada_de_resiliencia(self, relogio):
+        resiliencia = criar_resiliencia(relogio, max_tentativas=2, limiar_falhas=2)
+        pagamento = SistemaPagamento(resiliencia=resiliencia)
+        detalhes = {"numero_cartao": "0000_timeout", "numero_parcelas": 1}
+
+        resultado = pagamento.processar_pagamento(100.0, "cartao_credito", detalhes)
+        assert resultado["status"] == "erro"
+        assert resultado["tentativas"] == 2
+        assert resiliencia.obter_estado()["estado_disjuntor"] == Disjuntor.ABERTO
+
+        resultado = pagamento.processar_pagamento(
+            100.0, "pix", {"chave_pix": "cliente@pix.com"}
+        )
+        assert resultado["codigo_erro"] == "circuito_aberto"
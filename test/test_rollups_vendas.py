@@ -0,0 +1,131 @@
+import random
+import pytest
+from datetime import datetime, timedelta
+from app.ecommerce_sistema import SistemaEcommerce, Carrinho
+from app.rollups_vendas import RollupsVendas
+from app.snapshot_binario import carregar_snapshot_binario, salvar_snapshot_binario
+from app.armazenamento_sqlite import abrir_sistema_sqlite
+
+
+CATEGORIAS = {1: "Livros", 2: "Papelaria", 3: "Livros"}
+
+
+def _vendas_sinteticas(quantidade=400):
+    aleatorio = random.Random(7)
+    inicio = datetime(2023, 11, 20)
+    vendas = []
+    for _ in range(quantidade):
+        momento = inicio + timedelta(minutes=aleatorio.randint(0, 200 * 24 * 60))
+        id_produto = aleatorio.randint(1, 3)
+        unidades = aleatorio.randint(1, 4)
+        vendas.append((momento, 10.0 * unidades, [(id_produto, unidades, 10.0)]))
+    return vendas
+
+
+def _comprar(sistema, produto, quantidade):
+    carrinho = Carrinho()
+    carrinho.adicionar_item(produto, quantidade)
+    pedido = sistema.criar_pedido("ana", carrinho, {"rua": "A"}, "pix")
+    sistema.processar_pagamento_pedido(pedido.id_pedido, {"chave_pix": "ana@pix.com"})
+    return pedido
+
+
+def _popular(sistema):
+    sistema.registrar_usuario("ana", {"nome": "Ana"})
+    livro = sistema.adicionar_produto_catalogo("Livro", "Romance", 100.0, 50, "Livros")
+    caneta = sistema.adicionar_produto_catalogo("Caneta", "Azul", 2.5, 50, "Papelaria")
+    pedidos = [_comprar(sistema, livro, 2), _comprar(sistema, caneta, 4), _comprar(sistema, livro, 1)]
+    sistema.cancelar_pedido(pedidos[2].id_pedido)
+    return pedidos
+
+
+class TestRollupsVendas:
+    """
+    Testes para os baldes de vendas por hora/dia/mês e as consultas por intervalo.
+    """
+
+    def test_intervalos_combinam_baldes_como_a_varredura(self):
+        rollups = RollupsVendas(CATEGORIAS.get)
+        vendas = _vendas_sinteticas()
+        for momento, valor, itens in vendas:
+            rollups.registrar_venda(momento, valor, itens)
+        aleatorio = random.Random(3)
+        base = datetime(2023, 11, 15)
+        for _ in range(50):
+            inicio = base + timedelta(hours=aleatorio.randint(0, 220 * 24))
+            fim = inicio + timedelta(hours=aleatorio.randint(0, 120 * 24))
+            dentro = [v for v in vendas if inicio.replace(minute=0) <= v[0] < fim.replace(minute=0)]
+            totais = rollups.totais(inicio, fim)
+            assert totais["pedidos"] == len(dentro)
+            assert totais["receita"] == pytest.approx(sum(v[1] for v in dentro))
+
+            dias = [v for v in vendas if inicio.date() <= v[0].date() < fim.date()]
+            por_categoria = rollups.por_categoria(inicio, fim)
+            for categoria in ("Livros", "Papelaria"):
+                esperado = sum(
+                    u for v in dias for i, u, _ in v[2] if CATEGORIAS[i] == categoria
+                )
+                assert por_categoria.get(categoria, {"unidades": 0})["unidades"] == esperado
+
+    def test_serie_por_granularidade(self):
+        rollups = RollupsVendas(CATEGORIAS.get)
+        rollups.registrar_venda(datetime(2024, 1, 31, 23, 30), 10.0, [(1, 1, 10.0)])
+        rollups.registrar_venda(datetime(2024, 2, 1, 0, 15), 20.0, [(2, 2, 10.0)])
+        rollups.registrar_venda(datetime(2024, 2, 1, 0, 45), 5.0, [(2, 1, 5.0)])
+        assert rollups.serie("hora", datetime(2024, 1, 31), datetime(2024, 2, 2)) == [
+            (datetime(2024, 1, 31, 23), 1, 10.0),
+            (datetime(2024, 2, 1, 0), 2, 25.0),
+        ]
+        assert rollups.serie("mes", datetime(2024, 1, 1), datetime(2024, 3, 1)) == [
+            (datetime(2024, 1, 1), 1, 10.0),
+            (datetime(2024, 2, 1), 2, 25.0),
+        ]
+        with pytest.raises(ValueError, match="Granularidade"):
+            rollups.serie("semana", datetime(2024, 1, 1), datetime(2024, 2, 1))
+        with pytest.raises(ValueError):
+            rollups.totais(datetime(2024, 2, 1), datetime(2024, 1, 1))
+
+    def test_pagamento_soma_e_cancelamento_subtrai(self):
+        sistema = SistemaEcommerce()
+        pedidos = _popular(sistema)
+        inicio = datetime.now() - timedelta(days=1)
+        fim = datetime.now() + timedelta(days=1)
+        rollups = sistema.rollups_vendas
+        totais = rollups.totais(inicio, fim)
+        assert totais["pedidos"] == 2
+        assert totais["receita"] == pytest.approx(
+            pedidos[0].valor_final_pago + pedidos[1].valor_final_pago
+        )
+        assert rollups.por_produto(inicio, fim) == {
+            1: {"unidades": 2, "valor": 200.0},
+            2: {"unidades": 4, "valor": 10.0},
+        }
+        assert rollups.por_categoria(inicio, fim)["Livros"] == {"unidades": 2, "valor": 200.0}
+        # Envio e entrega não mudam as vendas; só o cancelamento as retira.
+        pedidos[0].atualizar_status("enviado")
+        assert rollups.totais(inicio, fim)["pedidos"] == 2
+        sistema.cancelar_pedido(pedidos[0].id_pedido)
+        assert rollups.totais(inicio, fim)["pedidos"] == 1
+        assert 1 not in rollups.por_produto(inicio, fim)
+
+    def test_sistemas_restaurados_tem_os_mesmos_baldes(self, tmp_path):
+        sistema = SistemaEcommerce()
+        _popular(sistema)
+        inicio = datetime.now() - timedelta(days=1)
+        fim = datetime.now() + timedelta(days=1)
+        esperado = sistema.rollups_vendas.por_categoria(inicio, fim)
+
+        caminho = str(tmp_path / "loja.bin")
+        salvar_snapshot_binario(sistema, caminho)
+        carregado, _ = carregar_snapshot_binario(caminho)
+        assert carregado.rollups_vendas.por_categoria(inicio, fim) == esperado
+        assert carregado.produtos_catalogo.num_materializados == 0
+        assert carregado.pedidos_registrados.num_materializados == 0
+
+        banco = str(tmp_path / "loja.db")
+        original = abrir_sistema_sqlite(banco)
+        _popular(original)
+        original.armazenamento.fechar()
+        reaberto = abrir_sistema_sqlite(banco)
+        assert reaberto.rollups_vendas.por_categoria(inicio, fim) == esperado
+        assert reaberto.rollups_vendas.totais(inicio, fim) == sistema.rollups_vendas.totais(inicio, fim)
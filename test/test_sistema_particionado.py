@@ -0,0 +1,126 @@
+import threading
+
+import pytest
+from app.identificadores import decompor_id, extrair_valor
+from app.sistema_particionado import SistemaParticionado, particao_do_cliente, particao_do_produto
+
+PIX = {"chave_pix": "cliente@pix.com"}
+
+
+@pytest.fixture
+def particionado():
+    sistema = SistemaParticionado(3)
+    yield sistema
+    sistema.fechar()
+
+
+def _clientes_em_particoes_distintas(num_particoes):
+    clientes = {}
+    for i in range(100):
+        clientes.setdefault(particao_do_cliente(f"cliente{i}", num_particoes), f"cliente{i}")
+    return [clientes[p] for p in sorted(clientes)]
+
+
+class TestSistemaParticionado:
+    """
+    Testes para o sistema dividido entre processos.
+    """
+
+    def test_pedidos_roteados_pelo_cliente(self, particionado):
+        livro = particionado.adicionar_produto_catalogo("Livro", "Romance", 100.0, 10, "Livros")
+        caneta = particionado.adicionar_produto_catalogo("Caneta", "Azul", 5.0, 10, "Papelaria")
+        assert particao_do_produto(livro, 3) != particao_do_produto(caneta, 3)
+        clientes = _clientes_em_particoes_distintas(3)
+        for cliente in clientes:
+            particionado.registrar_usuario(cliente, {"nome": cliente})
+        with pytest.raises(ValueError, match="já existe"):
+            particionado.registrar_usuario(clientes[0], {})
+
+        ids = particionado.criar_pedidos(
+            [(cliente, [(livro, 1), (caneta, 2)], {"rua": "A"}, "pix") for cliente in clientes]
+            + [("desconhecido", [(livro, 1)], {"rua": "A"}, "pix")]
+        )
+        assert ids[-1] is None
+        assert sorted(i % 3 for i in ids[:-1]) == [0, 1, 2]
+        pedido = particionado.consultar_pedido(ids[0])
+        assert pedido["cliente_id"] == clientes[0] and pedido["status"] == "pendente"
+        assert pedido["valor_total"] == 110.0
+        # O estoque só sai no pagamento.
+        assert particionado.estoque(livro) == 10
+
+    def test_pagamento_reserva_em_duas_fases(self, particionado):
+        livro = particionado.adicionar_produto_catalogo("Livro", "Romance", 100.0, 3, "Livros")
+        caneta = particionado.adicionar_produto_catalogo("Caneta", "Azul", 5.0, 10, "Papelaria")
+        clientes = _clientes_em_particoes_distintas(3)
+        for cliente in clientes:
+            particionado.registrar_usuario(cliente, {"nome": cliente})
+        ids = particionado.criar_pedidos(
+            [(cliente, [(livro, 2), (caneta, 1)], {"rua": "A"}, "pix") for cliente in clientes]
+        )
+        resultados = particionado.processar_pagamentos([(i, PIX) for i in ids])
+        assert [r["status"] for r in resultados] == ["aprovado", "erro", "erro"]
+        assert "Estoque insuficiente" in resultados[1]["mensagem"]
+        assert "não está pendente" in particionado.processar_pagamento_pedido(ids[0], PIX)["mensagem"]
+        # A reserva da caneta dos pedidos recusados foi liberada.
+        assert (particionado.estoque(livro), particionado.estoque(caneta)) == (1, 9)
+        assert particionado.vendas_por_status()["pago"] == {"quantidade": 1, "receita": 184.5}
+
+        assert particionado.cancelar_pedido(ids[0])
+        assert (particionado.estoque(livro), particionado.estoque(caneta)) == (3, 10)
+        assert particionado.processar_pagamento_pedido(ids[1], PIX)["status"] == "aprovado"
+        assert particionado.consultar_pedido(ids[1])["status"] == "pago"
+
+    def test_falha_no_pagamento_libera_as_reservas(self, particionado):
+        livro = particionado.adicionar_produto_catalogo("Livro", "Romance", 100.0, 5, "Livros")
+        caneta = particionado.adicionar_produto_catalogo("Caneta", "Azul", 5.0, 10, "Papelaria")
+        clientes = _clientes_em_particoes_distintas(3)
+        for cliente in clientes:
+            particionado.registrar_usuario(cliente, {"nome": cliente})
+        ids = particionado.criar_pedidos(
+            [(cliente, [(livro, 1), (caneta, 1)], {"rua": "A"}, "pix") for cliente in clientes]
+        )
+
+        # Erro dentro da partição: só o pedido afetado falha.
+        resultados = particionado.processar_pagamentos([(ids[0], PIX), (ids[1], None)])
+        assert [r["status"] for r in resultados] == ["aprovado", "erro"]
+        assert (particionado.estoque(livro), particionado.estoque(caneta)) == (4, 9)
+
+        # Detalhes que não chegam à partição: a exceção sobe e nada fica reservado.
+        with pytest.raises(Exception):
+            particionado.processar_pagamentos([(ids[1], PIX), (ids[2], {"chave_pix": lambda: None})])
+        # O pedido enviado antes da falha foi pago e mantém sua reserva.
+        assert particionado.consultar_pedido(ids[1])["status"] == "pago"
+        assert particionado.consultar_pedido(ids[2])["status"] == "pendente"
+        assert (particionado.estoque(livro), particionado.estoque(caneta)) == (3, 8)
+
+    def test_ids_de_transacao_usam_o_no_da_particao(self, particionado):
+        livro = particionado.adicionar_produto_catalogo("Livro", "Romance", 100.0, 10, "Livros")
+        clientes = _clientes_em_particoes_distintas(3)
+        for cliente in clientes:
+            particionado.registrar_usuario(cliente, {"nome": cliente})
+        ids = particionado.criar_pedidos([(cliente, [(livro, 1)], {"rua": "A"}, "pix") for cliente in clientes])
+        resultados = particionado.processar_pagamentos([(i, PIX) for i in ids])
+        nos = [decompor_id(extrair_valor(r["id_transacao"]))[1] for r in resultados]
+        assert nos == [i % 3 for i in ids]
+
+    def test_produtos_criados_em_paralelo_mantem_o_id(self, particionado):
+        criados = []
+
+        def criar(quantidade):
+            id_produto = particionado.adicionar_produto_catalogo(f"P{quantidade}", "", 1.0, quantidade, "Outros")
+            criados.append((id_produto, quantidade))
+
+        threads = [threading.Thread(target=criar, args=(q,)) for q in range(1, 13)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sorted(i for i, _ in criados) == list(range(1, 13))
+        # O estoque está na partição dona do id devolvido a cada thread.
+        assert all(particionado.estoque(i) == q for i, q in criados)
+
+    def test_numero_de_particoes_invalido(self):
+        with pytest.raises(ValueError, match="partições"):
+            SistemaParticionado(0)
+        with pytest.raises(ValueError, match="1024"):
+            SistemaParticionado(1025)
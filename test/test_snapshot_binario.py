@@ -0,0 +1,148 @@
+import pytest
+from datetime import datetime
+from app.ecommerce_sistema import SistemaEcommerce, Carrinho
+from app.persistencia import GerenciadorPersistencia, recuperar_sistema
+from app.snapshot_binario import (
+    SnapshotBinario,
+    carregar_snapshot_binario,
+    salvar_snapshot_binario,
+)
+
+
+@pytest.fixture
+def sistema():
+    sistema = SistemaEcommerce()
+    for i in range(1, 21):
+        sistema.adicionar_produto_catalogo(f"Produto {i}", "Descrição ção", 10.0 * i, 100, "Cat")
+    sistema.registrar_usuario("ana", {"nome": "Ana", "email": "ana@exemplo.com"})
+    for i in range(1, 11):
+        carrinho = Carrinho()
+        carrinho.adicionar_item(sistema.recuperar_produto_por_id(i), 1)
+        carrinho.adicionar_item(sistema.recuperar_produto_por_id(i + 10), 2)
+        pedido = sistema.criar_pedido("ana", carrinho, {"rua": "Rua Ç", "cep": "1"}, "pix")
+        if i % 2 == 0:
+            sistema.processar_pagamento_pedido(pedido.id_pedido, {"chave_pix": "ana@pix.com"})
+    sistema.cancelar_pedido(2)
+    return sistema
+
+
+@pytest.fixture
+def caminho(tmp_path, sistema):
+    caminho = str(tmp_path / "catalogo.bin")
+    salvar_snapshot_binario(sistema, caminho, lsn=42)
+    return caminho
+
+
+class TestSnapshotBinario:
+    """
+    Testes para o snapshot binário com materialização sob demanda.
+    """
+
+    def test_ida_e_volta_preserva_estado(self, sistema, caminho):
+        carregado, lsn = carregar_snapshot_binario(caminho)
+        assert lsn == 42
+        assert carregado.usuarios == sistema.usuarios
+        assert len(carregado.produtos_catalogo) == 20
+        assert len(carregado.pedidos_registrados) == 10
+        for id_produto, produto in sistema.produtos_catalogo.items():
+            copia = carregado.recuperar_produto_por_id(id_produto)
+            assert copia.obter_informacoes_detalhadas() == produto.obter_informacoes_detalhadas()
+        for id_pedido, pedido in sistema.pedidos_registrados.items():
+            copia = carregado.pedidos_registrados[id_pedido]
+            assert copia.status_pedido == pedido.status_pedido
+            assert copia.datas == pedido.datas
+            assert copia.valor_final_pago == pedido.valor_final_pago
+            assert copia.id_transacao_pagamento == pedido.id_transacao_pagamento
+            assert copia.endereco_entrega == pedido.endereco_entrega
+            assert [(p.id_produto, q) for p, q in copia.itens_comprados] == [
+                (p.id_produto, q) for p, q in pedido.itens_comprados
+            ]
+        assert carregado._proximo_id_produto == 21
+        assert carregado._proximo_id_pedido == 11
+
+    def test_datas_de_estados_extras(self, sistema, tmp_path):
+        pago = sistema.pedidos_registrados[4]
+        pago.datas["separacao"] = datetime(2024, 5, 1, 12, 30, 0, 123456)
+        caminho = salvar_snapshot_binario(sistema, str(tmp_path / "extras.bin"))
+        carregado, _ = carregar_snapshot_binario(caminho)
+        assert carregado.pedidos_registrados[4].datas == pago.datas
+        assert "separacao" not in carregado.pedidos_registrados[6].datas
+
+    def test_materializa_apenas_o_que_e_acessado(self, caminho):
+        carregado, _ = carregar_snapshot_binario(caminho)
+        assert carregado.produtos_catalogo.num_materializados == 0
+        assert carregado.pedidos_registrados.num_materializados == 0
+
+        produto = carregado.recuperar_produto_por_id(5)
+        assert carregado.produtos_catalogo.num_materializados == 1
+        assert carregado.recuperar_produto_por_id(5) is produto
+        assert carregado.recuperar_produto_por_id(999) is None
+        assert 7 in carregado.produtos_catalogo
+        assert carregado.produtos_catalogo.num_materializados == 1
+
+        pedido = carregado.pedidos_registrados.get(3)
+        assert carregado.pedidos_registrados.num_materializados == 1
+        # As linhas do pedido trazem preço e nome da compra, sem carregar o catálogo.
+        assert tuple(pedido.linhas[0])[:2] == (3, 1)
+        assert pedido.linhas[0].nome == "Produto 3"
+        assert carregado.produtos_catalogo.num_materializados == 1
+
+    def test_sistema_carregado_continua_operando(self, caminho):
+        carregado, _ = carregar_snapshot_binario(caminho)
+        novo = carregado.adicionar_produto_catalogo("Novo", "Desc", 5.0, 3, "Cat")
+        assert novo.id_produto == 21
+        assert len(carregado.produtos_catalogo) == 21
+        assert list(carregado.produtos_catalogo)[-1] == 21
+
+        resultado = carregado.processar_pagamento_pedido(1, {"chave_pix": "ana@pix.com"})
+        assert resultado["status"] == "aprovado"
+        assert carregado.recuperar_produto_por_id(1).quantidade_em_estoque == 99
+        assert carregado.recuperar_produto_por_id(11).quantidade_em_estoque == 98
+
+    def test_reembolso_de_pedido_pago_antes_do_snapshot(self, sistema, caminho):
+        carregado, _ = carregar_snapshot_binario(caminho)
+        pago = sistema.pedidos_registrados[4]
+        livro = carregado.sistema_pagamento.livro_razao
+        assert livro.saldo_reembolsavel(pago.id_transacao_pagamento) == pago.valor_final_pago
+        # As capturas são lidas dos registros, sem materializar os pedidos.
+        assert carregado.pedidos_registrados.num_materializados == 0
+
+        relatorio = carregado.cancelar_pedidos_em_lote([4])
+        assert relatorio["falhas_reembolso"] == {}
+        assert relatorio["total_reembolsado"] == pago.valor_final_pago
+        assert livro.saldo_reembolsavel(pago.id_transacao_pagamento) == 0.0
+
+    def test_registros_brutos_de_uma_faixa(self, sistema, caminho):
+        snapshot = SnapshotBinario(caminho)
+        try:
+            registros = list(snapshot.registros_pedidos(2, 5))
+            assert [campos[0] for campos in registros] == [3, 4, 5]
+            for campos in registros:
+                pedido = sistema.pedidos_registrados[campos[0]]
+                assert snapshot.texto(campos[7], campos[8]) == pedido.status_pedido
+                assert list(snapshot.itens_do_registro(campos)) == [
+                    (p.id_produto, q, p.preco) for p, q in pedido.itens_comprados
+                ]
+        finally:
+            snapshot.fechar()
+
+    def test_arquivo_invalido(self, tmp_path):
+        caminho = tmp_path / "invalido.bin"
+        caminho.write_bytes(b"X" * 200)
+        with pytest.raises(ValueError, match="não é um snapshot binário"):
+            carregar_snapshot_binario(str(caminho))
+
+    def test_gerenciador_com_snapshot_binario(self, tmp_path):
+        diretorio = str(tmp_path / "dados")
+        gerenciador = GerenciadorPersistencia.abrir(
+            diretorio, eventos_por_snapshot=None, formato_snapshot="binario"
+        )
+        produto = gerenciador.sistema.adicionar_produto_catalogo("Livro", "Desc", 50.0, 10, "Livros")
+        gerenciador.compactar()
+        produto.reduzir_estoque(4)
+        gerenciador.fechar()
+
+        recuperado, _ = recuperar_sistema(diretorio)
+        assert recuperado.produtos_catalogo.num_materializados == 1
+        assert recuperado.recuperar_produto_por_id(1).quantidade_em_estoque == 6
+        assert recuperado._proximo_id_produto == 2
@@ -0,0 +1,72 @@
+import pytest
+from app.ecommerce_sistema import SistemaEcommerce, Carrinho
+from app.persistencia import GerenciadorPersistencia, recuperar_sistema
+
+
+def _popular(sistema):
+    sistema.registrar_usuario("ana", {"nome": "Ana"})
+    livro = sistema.adicionar_produto_catalogo("Livro", "Romance", 100.0, 50, "Livros")
+    for i in range(6):
+        carrinho = Carrinho()
+        carrinho.adicionar_item(livro, 1)
+        pedido = sistema.criar_pedido("ana", carrinho, {"rua": "A"}, "pix")
+        if i < 5:
+            sistema.processar_pagamento_pedido(pedido.id_pedido, {"chave_pix": "ana@pix.com"})
+    sistema.cancelar_pedido(5)
+
+
+class TestStatusLote:
+    """
+    Testes para as transições de status de pedidos em lote.
+    """
+
+    def test_aceita_validas_e_rejeita_as_demais(self):
+        sistema = SistemaEcommerce()
+        _popular(sistema)
+        resultado = sistema.atualizar_status_em_lote([1, 2, 3, 5, 6, 99, 2], "enviado", tamanho_bloco=2)
+        assert resultado["aceitos"] == [1, 2, 3]
+        assert resultado["rejeitados"] == {
+            5: "Transição de 'cancelado' para 'enviado' não permitida.",
+            6: "Transição de 'pendente' para 'enviado' não permitida.",
+            99: "Pedido não encontrado.",
+        }
+        pedidos = sistema.pedidos_registrados
+        assert {pedidos[i].datas["envio"] for i in (1, 2, 3)} == {pedidos[1].datas["envio"]}
+        assert [p.id_pedido for p in sistema.pedidos_aguardando_envio()] == [4]
+        assert sistema.indices_pedidos.por_status("enviado") == [1, 2, 3]
+        assert sistema.agregados_vendas.por_status()["enviado"]["quantidade"] == 3
+        # Pagos e enviados continuam contando como vendas.
+        assert sistema.gerar_relatorio_vendas()["numero_de_pedidos_contabilizados"] == 4
+
+        resultado = sistema.atualizar_status_em_lote([1, 4], "entregue")
+        assert resultado["aceitos"] == [1]
+        assert resultado["rejeitados"] == {4: "Transição de 'pago' para 'entregue' não permitida."}
+        assert sistema.atualizar_status_em_lote([1], "entregue")["rejeitados"] == {
+            1: "Pedido já está 'entregue'."
+        }
+        assert sistema.atualizar_status_em_lote([2], "extraviado")["rejeitados"] == {
+            2: "Status 'extraviado' inválido."
+        }
+
+    def test_eventos_do_lote_vao_para_o_log(self, tmp_path):
+        persistencia = GerenciadorPersistencia.abrir(str(tmp_path), eventos_por_snapshot=None)
+        sistema = persistencia.sistema
+        _popular(sistema)
+        sistema.atualizar_status_em_lote([1, 2, 3], "enviado")
+        sistema.atualizar_status_em_lote([2], "entregue")
+        persistencia.fechar()
+        recuperado, _ = recuperar_sistema(str(tmp_path))
+        assert [recuperado.pedidos_registrados[i].status_pedido for i in (1, 2, 3, 4)] == [
+            "enviado", "entregue", "enviado", "pago"
+        ]
+        assert recuperado.pedidos_registrados[2].datas["entrega"] == sistema.pedidos_registrados[2].datas["entrega"]
+        assert recuperado.indices_pedidos.por_status("enviado") == [1, 3]
+
+    def test_status_nao_suportados(self):
+        sistema = SistemaEcommerce()
+        with pytest.raises(ValueError, match="cancelar_pedidos_em_lote"):
+            sistema.atualizar_status_em_lote([1], "cancelado")
+        with pytest.raises(ValueError, match="processar_pagamento_pedido"):
+            sistema.atualizar_status_em_lote([1], "pago")
+        with pytest.raises(ValueError, match="bloco"):
+            sistema.atualizar_status_em_lote([1], "enviado", tamanho_bloco=0)
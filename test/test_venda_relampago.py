@@ -0,0 +1,112 @@
+import pickle
+import threading
+
+import pytest
+from app.venda_relampago import EstoqueFragmentado
+from app.ecommerce_sistema import SistemaEcommerce, Produto, Carrinho
+
+
+class TestVendaRelampago:
+    """
+    Testes para o modo de venda relâmpago com estoque fragmentado.
+    """
+
+    def test_divisao_inicial_e_total(self):
+        estoque = EstoqueFragmentado(10, 4)
+        assert estoque.fragmentos() == [3, 3, 2, 2]
+        assert estoque.total() == 10
+
+    def test_reserva_rouba_de_outros_fragmentos_e_rebalanceia(self):
+        estoque = EstoqueFragmentado(12, 3)  # [4, 4, 4]
+        assert estoque.reservar(5, indice=0)
+        assert estoque.total() == 7
+        assert estoque.roubos == 1
+        # levou 1 que faltava + metade do excedente (3 // 2) para o fragmento 0
+        assert estoque.fragmentos() == [1, 2, 4]
+
+    def test_reserva_insuficiente_nao_altera_total(self):
+        estoque = EstoqueFragmentado(5, 2)
+        assert not estoque.reservar(6, indice=1)
+        assert estoque.total() == 5
+
+    def test_rebalancear(self):
+        estoque = EstoqueFragmentado(9, 3)
+        estoque.reservar(3, indice=0)
+        estoque.rebalancear()
+        assert estoque.fragmentos() == [2, 2, 2]
+
+    def test_devolucao_apos_drenar_vai_para_o_destino(self):
+        recebidos = []
+        estoque = EstoqueFragmentado(4, 2, destino_apos_encerramento=recebidos.append)
+        assert estoque.drenar() == 4
+        estoque.devolver(2)
+        assert recebidos == [2]
+        assert not estoque.reservar(1)
+
+    def test_produto_em_venda_relampago(self):
+        produto = Produto(1, "Console", "Edição limitada", 3000.0, 10, "Games")
+        produto.iniciar_venda_relampago(4)
+        assert produto.em_venda_relampago
+        assert produto.verificar_disponibilidade(10)
+        produto.reduzir_estoque(7)
+        assert produto.quantidade_em_estoque == 3
+        with pytest.raises(ValueError):
+            produto.reduzir_estoque(4)
+        with pytest.raises(ValueError):
+            produto.comparar_e_definir_estoque(produto.versao_estoque, 1)
+        produto.adicionar_estoque(2)
+        assert produto.encerrar_venda_relampago() == 5
+        assert not produto.em_venda_relampago
+        assert produto.ler_estoque()[0] == 5
+
+    def test_produto_em_venda_relampago_serializavel(self):
+        produto = Produto(1, "Console", "Edição limitada", 3000.0, 10, "Games")
+        produto.iniciar_venda_relampago(4)
+        copia = pickle.loads(pickle.dumps(produto))
+        assert not copia.em_venda_relampago
+        assert copia.quantidade_em_estoque == 10
+
+    def test_pedido_misto_devolve_reserva_se_outra_linha_falhar(self):
+        sistema = SistemaEcommerce()
+        sistema.registrar_usuario("cliente_flash", {"nome": "Flash"})
+        console = sistema.adicionar_produto_catalogo("Console", "d", 3000.0, 10, "Games")
+        controle = sistema.adicionar_produto_catalogo("Controle", "d", 300.0, 1, "Games")
+        sistema.iniciar_venda_relampago(console.id_produto, 4)
+        carrinho = Carrinho()
+        carrinho.adicionar_item(console, 2)
+        carrinho.adicionar_item(controle, 1)
+        pedido = sistema.criar_pedido("cliente_flash", carrinho, {"rua": "R"}, "pix")
+        controle.reduzir_estoque(1)
+
+        resultado = sistema.processar_pagamento_pedido(pedido.id_pedido, {"chave_pix": "f@pix"})
+        assert resultado["status"] == "aprovado_com_erro_estoque"
+        assert console.quantidade_em_estoque == 10
+
+    def test_sem_venda_acima_do_estoque_com_muitas_threads(self):
+        sistema = SistemaEcommerce()
+        sistema.registrar_usuario("cliente_flash", {"nome": "Flash"})
+        console = sistema.adicionar_produto_catalogo("Console", "d", 3000.0, 200, "Games")
+        pedidos = []
+        for _ in range(300):
+            carrinho = Carrinho()
+            carrinho.adicionar_item(console, 1)
+            pedidos.append(sistema.criar_pedido("cliente_flash", carrinho, {"rua": "R"}, "pix"))
+        sistema.iniciar_venda_relampago(console.id_produto, 8)
+        aprovados = []
+        barreira = threading.Barrier(16)
+
+        def comprar(indice):
+            barreira.wait()
+            for pedido in pedidos[indice::16]:
+                resultado = sistema.processar_pagamento_pedido(pedido.id_pedido, {"chave_pix": "f@pix"})
+                if resultado["status"] == "aprovado":
+                    aprovados.append(pedido.id_pedido)
+
+        threads = [threading.Thread(target=comprar, args=(i,)) for i in range(16)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(aprovados) == 200
+        assert sistema.encerrar_venda_relampago(console.id_produto) == 0